@@ -158,6 +158,12 @@ doc_events = {
         "validate": "za_local.sa_vat.item_sync.sync_item_zero_rated_flag",
     },
 
+    # Salary Component classification registry is cached per site
+    "Salary Component": {
+        "on_update": "za_local.utils.component_registry.clear_component_registry",
+        "on_trash": "za_local.utils.component_registry.clear_component_registry",
+    },
+
 }
 
 # Monkey Patching
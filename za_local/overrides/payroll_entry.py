@@ -8,10 +8,14 @@ bank entry management.
 Note: This module only works when HRMS is installed.
 """
 
+import json
+from contextlib import contextmanager
+
 import frappe
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import get_accounting_dimensions
 from frappe import _
-from frappe.utils import escape_html, flt, getdate
+from frappe.query_builder.functions import Sum
+from frappe.utils import cint, escape_html, flt, getdate
 
 from za_local.utils.hrms_detection import get_hrms_doctype_class, require_hrms
 
@@ -35,14 +39,28 @@ except ImportError:
         return []
 
 # Import ZA Local utilities
+from za_local.utils.eti_utils import build_eti_batch, use_eti_batch
 from za_local.utils.payroll_utils import (
     get_current_block_period,
     get_employee_frequency_map,
-    is_payroll_processed,
+    get_payroll_frequency_check,
+)
+from za_local.utils.payroll_ytd import (
+    build_employee_tax_inputs,
+    build_payroll_ytd_context,
+    use_employee_tax_inputs,
+    use_payroll_ytd_context,
 )
 
 LOGGER = frappe.logger("za_local_payroll")
 
+SALARY_SLIP_SHARD_FIELD = "za_salary_slip_shards"
+SALARY_SLIP_SHARD_TIMEOUT = 600
+# Shards wait behind each other on the long queue, so a queued shard is only
+# treated as lost after far longer than one shard's run time.
+SALARY_SLIP_SHARD_QUEUE_TIMEOUT = 6 * 3600
+DEFAULT_SALARY_SLIP_SHARD_SIZE = 200
+
 
 class ZAPayrollEntry(PayrollEntry):
     """
@@ -240,44 +258,25 @@ class ZAPayrollEntry(PayrollEntry):
         """
         self.check_permission("write")
 
-        SalarySlip = frappe.qb.DocType("Salary Slip")
-        Comp = frappe.qb.DocType("Company Contribution")
-
-        slips = (
-            frappe.qb.from_(SalarySlip)
-            .select(SalarySlip.name)
-            .where(
-                (SalarySlip.docstatus == 1)
-                & (SalarySlip.start_date >= self.start_date)
-                & (SalarySlip.end_date <= self.end_date)
-                & (SalarySlip.payroll_entry == self.name)
-            )
-        ).run(pluck=True)
-
-        if not slips:
+        slip_filters = {
+            "docstatus": 1,
+            "start_date": [">=", self.start_date],
+            "end_date": ["<=", self.end_date],
+            "payroll_entry": self.name,
+        }
+        if not frappe.db.exists("Salary Slip", slip_filters):
             frappe.throw("No submitted Salary Slips found for this Payroll Entry.")
 
-        # Aggregate by component account
+        # Aggregate by component account in one grouped join
         totals_by_account = {}
-        rows = (
-            frappe.qb.from_(Comp)
-            .select(Comp.parent, Comp.salary_component, Comp.amount)
-            .where(Comp.parent.isin(slips))
-        ).run(as_dict=True)
-
-        for r in rows:
-            account = frappe.db.get_value(
-                "Salary Component Account",
-                {"parent": r.salary_component, "company": self.company},
-                "account",
-            )
-            if not account:
+        for r in self.get_company_contribution_totals():
+            if not r.account:
                 frappe.throw(
                     frappe._("Please set account in Salary Component {0}").format(
                         frappe.get_desk_link("Salary Component", r.salary_component)
                     )
                 )
-            totals_by_account[account] = totals_by_account.get(account, 0) + float(r.amount or 0)
+            totals_by_account[r.account] = totals_by_account.get(r.account, 0) + float(r.amount or 0)
 
         if not totals_by_account:
             frappe.throw("No company contributions found on the salary slips.")
@@ -335,18 +334,52 @@ class ZAPayrollEntry(PayrollEntry):
             submit_journal_entry=True,
         )
 
-        # Mark flags for employees in this payroll entry
-        for ped in self.employees:
-            frappe.db.set_value(
-                "Payroll Employee Detail",
-                {"parent": self.name, "employee": ped.employee},
-                "za_is_company_contribution_created",
-                1,
-            )
+        # Mark flags for every employee in this payroll entry with one update
+        PayrollEmployeeDetail = frappe.qb.DocType("Payroll Employee Detail")
+        (
+            frappe.qb.update(PayrollEmployeeDetail)
+            .set(PayrollEmployeeDetail.za_is_company_contribution_created, 1)
+            .where(PayrollEmployeeDetail.parenttype == self.doctype)
+            .where(PayrollEmployeeDetail.parent == self.name)
+        ).run()
 
         frappe.msgprint(_(f"Created Company Contribution Journal Entry: {je.name}"))
         return je.name
 
+    def get_company_contribution_totals(self):
+        """
+        Return Company Contribution totals per component and resolved account
+        for this entry's submitted Salary Slips. ``account`` is None when the
+        component has no Salary Component Account for the company.
+        """
+        SalarySlip = frappe.qb.DocType("Salary Slip")
+        Comp = frappe.qb.DocType("Company Contribution")
+        ComponentAccount = frappe.qb.DocType("Salary Component Account")
+
+        return (
+            frappe.qb.from_(Comp)
+            .join(SalarySlip)
+            .on((Comp.parent == SalarySlip.name) & (Comp.parenttype == "Salary Slip"))
+            .left_join(ComponentAccount)
+            .on(
+                (ComponentAccount.parent == Comp.salary_component)
+                & (ComponentAccount.parenttype == "Salary Component")
+                & (ComponentAccount.company == self.company)
+            )
+            .select(
+                Comp.salary_component,
+                ComponentAccount.account,
+                Sum(Comp.amount).as_("amount"),
+            )
+            .where(
+                (SalarySlip.docstatus == 1)
+                & (SalarySlip.start_date >= self.start_date)
+                & (SalarySlip.end_date <= self.end_date)
+                & (SalarySlip.payroll_entry == self.name)
+            )
+            .groupby(Comp.salary_component, ComponentAccount.account)
+        ).run(as_dict=True)
+
     @frappe.whitelist()
     def create_salary_slips(self):
         """
@@ -374,19 +407,15 @@ class ZAPayrollEntry(PayrollEntry):
 
         # Try to filter by frequency, but don't block if frequency check fails
         try:
-            frequency = get_current_block_period(self)
-            employee_frequency = get_employee_frequency_map()
+            frequency_check = get_payroll_frequency_check(self)
 
             # Filter out employees who already have salary slips for this frequency period
             # Only filter if we have frequency data and employee frequency mapping
-            if frequency and employee_frequency:
-                for emp in self.employees:
-                    emp_freq = employee_frequency.get(emp.employee)
-                    if emp_freq and emp_freq in frequency:
-                        freq_period = frequency[emp_freq]
-                        if freq_period and is_payroll_processed(emp.employee, freq_period):
-                            continue
-                    employees.append(emp.employee)
+            if frequency_check.blocks and frequency_check.employee_frequency:
+                frequency_check.preload([emp.employee for emp in self.employees])
+                employees = [
+                    emp.employee for emp in self.employees if not frequency_check.is_processed(emp.employee)
+                ]
             else:
                 # No frequency data - include all employees
                 employees = [emp.employee for emp in self.employees]
@@ -402,41 +431,22 @@ class ZAPayrollEntry(PayrollEntry):
 
         if employees:
             require_hrms("Payroll Entry - Create Salary Slips")
-            try:
-                from hrms.payroll.doctype.payroll_entry.payroll_entry import create_salary_slips_for_employees
-            except ImportError:
-                frappe.throw(_("HRMS is required to create salary slips. Please install HRMS app."))
-
-            args = frappe._dict({
-                "salary_slip_based_on_timesheet": self.salary_slip_based_on_timesheet,
-                "payroll_frequency": self.payroll_frequency,
-                "start_date": self.start_date,
-                "end_date": self.end_date,
-                "company": self.company,
-                "posting_date": self.posting_date,
-                "deduct_tax_for_unsubmitted_tax_exemption_proof": self.deduct_tax_for_unsubmitted_tax_exemption_proof,
-                "payroll_entry": self.name,
-                "exchange_rate": self.exchange_rate,
-                "currency": self.currency,
-            })
+
+            args = self.get_salary_slip_args()
 
             try:
                 if len(employees) > 30 or frappe.flags.enqueue_payroll_entry:
-                    # Enqueue for background processing
-                    frappe.enqueue(
-                        create_salary_slips_for_employees,
-                        timeout=600,
-                        employees=employees,
-                        args=args,
-                        publish_progress=True
-                    )
+                    # Enqueue for background processing, one job per shard. The entry
+                    # stays Queued until the last shard settles.
+                    self.db_set({"status": "Queued", "salary_slips_created": 0, "error_message": ""})
+                    shard_count = enqueue_salary_slip_shards(self.name, employees, args)
                     frappe.msgprint(
-                        _("Salary slip creation has been enqueued. "
-                          "It may take a few minutes to complete."),
+                        _("Salary slip creation has been enqueued in {0} background job(s). "
+                          "It may take a few minutes to complete.").format(shard_count),
                         alert=True
                     )
                 else:
-                    create_salary_slips_for_employees(employees, args, publish_progress=False)
+                    create_za_salary_slips_for_employees(employees, args, publish_progress=False)
                     self.reload()
 
                     created_for = set(
@@ -479,6 +489,85 @@ class ZAPayrollEntry(PayrollEntry):
 
         return False
 
+    def prefetch_payroll_cost_centers(self, rows):
+        """
+        Fill HRMS's ``employee_cost_centers`` cache for payment rows with grouped
+        queries, using the same resolution as ``get_payroll_cost_centers_for_employee``:
+        the latest Salary Structure Assignment split, then the Employee's or
+        Department's payroll cost centre, then the entry's cost centre.
+        """
+        if not hasattr(self, "employee_cost_centers"):
+            self.employee_cost_centers = {}
+        pending = [row for row in rows if row.employee not in self.employee_cost_centers]
+        if not pending:
+            return
+
+        latest_assignments = {}
+        structures = {row.salary_structure for row in pending if row.salary_structure}
+        if structures:
+            for assignment in frappe.get_all(
+                "Salary Structure Assignment",
+                filters={
+                    "employee": ["in", [row.employee for row in pending]],
+                    "salary_structure": ["in", list(structures)],
+                    "docstatus": 1,
+                    "from_date": ["<=", self.start_date],
+                },
+                fields=["name", "employee", "salary_structure"],
+                order_by="from_date desc",
+            ):
+                latest_assignments.setdefault((assignment.employee, assignment.salary_structure), assignment.name)
+
+        allocations = {}
+        if latest_assignments:
+            for row in frappe.get_all(
+                "Employee Cost Center",
+                filters={
+                    "parenttype": "Salary Structure Assignment",
+                    "parent": ["in", list(latest_assignments.values())],
+                },
+                fields=["parent", "cost_center", "percentage"],
+            ):
+                allocations.setdefault(row.parent, {})[row.cost_center] = row.percentage
+
+        departments = {row.department for row in pending if row.department and not row.payroll_cost_center}
+        department_cost_centers = {}
+        if departments:
+            department_cost_centers = dict(
+                frappe.get_all(
+                    "Department",
+                    filters={"name": ["in", list(departments)]},
+                    fields=["name", "payroll_cost_center"],
+                    as_list=True,
+                )
+            )
+
+        for row in pending:
+            cost_centers = allocations.get(latest_assignments.get((row.employee, row.salary_structure)))
+            if not cost_centers:
+                default_cost_center = (
+                    row.payroll_cost_center
+                    or department_cost_centers.get(row.department)
+                    or self.cost_center
+                )
+                cost_centers = {default_cost_center: 100}
+            self.employee_cost_centers[row.employee] = cost_centers
+
+    def get_salary_slip_args(self):
+        """Return the Salary Slip values HRMS copies onto every slip in this run."""
+        return frappe._dict({
+            "salary_slip_based_on_timesheet": self.salary_slip_based_on_timesheet,
+            "payroll_frequency": self.payroll_frequency,
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "company": self.company,
+            "posting_date": self.posting_date,
+            "deduct_tax_for_unsubmitted_tax_exemption_proof": self.deduct_tax_for_unsubmitted_tax_exemption_proof,
+            "payroll_entry": self.name,
+            "exchange_rate": self.exchange_rate,
+            "currency": self.currency,
+        })
+
     @frappe.whitelist(methods=["POST"])
     def make_payment_entry(self, selected_payment_account=None):
         """
@@ -540,20 +629,16 @@ class ZAPayrollEntry(PayrollEntry):
         if not selected_employees:
             frappe.throw(_("Select at least one employee for payment."))
 
+        # Bank account, cost centre fallbacks and submitted net pay in one query
         employee_details = {
-            row.name: row
-            for row in frappe.get_all(
-                "Employee",
-                filters={"name": ["in", selected_employees]},
-                fields=["name", "employee_name", "za_payroll_payable_bank_account"],
-            )
+            row.employee: row for row in get_payroll_entry_payment_rows(self.name, selected_employees)
         }
         missing_bank_accounts = [
             escape_html(
                 f"{employee}: {(employee_details.get(employee) or {}).get('employee_name') or ''}"
             )
             for employee in selected_employees
-            if not (employee_details.get(employee) or {}).get("za_payroll_payable_bank_account")
+            if not (employee_details.get(employee) or {}).get("bank_account")
         ]
 
         if missing_bank_accounts:
@@ -567,20 +652,22 @@ class ZAPayrollEntry(PayrollEntry):
         employee_wise_accounting_enabled = frappe.db.get_single_value(
             "Payroll Settings", "process_payroll_accounting_entry_based_on_employee"
         )
+        if employee_wise_accounting_enabled:
+            self.prefetch_payroll_cost_centers(employee_details.values())
 
-        # Get salary slip details for all employees
-        salary_slips = frappe.get_all(
-            "Salary Slip",
-            filters={
-                "payroll_entry": self.name,
-                "docstatus": 1,
-                "employee": ["in", selected_employees]
-            },
-            fields=["name", "employee", "net_pay", "base_net_pay"]
-        )
+        # Create a mapping of employee to submitted salary slip
+        employee_salary_map = {
+            employee: row for employee, row in employee_details.items() if row.salary_slip
+        }
 
-        # Create a mapping of employee to salary slip
-        employee_salary_map = {ss.employee: ss for ss in salary_slips}
+        payment_accounts = dict(
+            frappe.get_all(
+                "Bank Account",
+                filters={"name": ["in", list(selected_accounts)]},
+                fields=["name", "account"],
+                as_list=True,
+            )
+        )
 
         precision = frappe.get_precision("Journal Entry Account", "debit_in_account_currency")
         company_currency = frappe.get_cached_value("Company", self.company, "default_currency")
@@ -589,6 +676,7 @@ class ZAPayrollEntry(PayrollEntry):
             accounting_dimensions = self.get_accounting_dimensions() or []
 
         created_journal_entries = []
+        paid_employees = []
 
         # Process each bank account
         for bank_account_name, account_data in selected_accounts.items():
@@ -604,9 +692,9 @@ class ZAPayrollEntry(PayrollEntry):
             if not posting_date:
                 frappe.throw(_("Posting date is required for bank account {0}").format(bank_account_name))
 
-            # Get bank account details
-            bank_account_doc = frappe.get_doc("Bank Account", bank_account_name)
-            payment_account = bank_account_doc.account
+            if bank_account_name not in payment_accounts:
+                frappe.throw(_("Bank Account {0} not found").format(bank_account_name))
+            payment_account = payment_accounts[bank_account_name]
 
             # Calculate total amount for this bank account
             total_amount = 0
@@ -650,9 +738,9 @@ class ZAPayrollEntry(PayrollEntry):
                     if amount <= 0:
                         continue
 
-                    # Get cost centers for employee
+                    # Get cost centers for employee (prefetched above)
                     cost_centers = self.get_payroll_cost_centers_for_employee(
-                        employee, None  # We'd need salary structure, but for now use None
+                        employee, employee_salary_map[employee].salary_structure
                     )
 
                     if cost_centers:
@@ -731,17 +819,20 @@ class ZAPayrollEntry(PayrollEntry):
             bank_entry.posting_date = posting_date
             bank_entry.save()
 
-            # Update flags for employees
-            for employee in employees:
-                frappe.db.set_value(
-                    "Payroll Employee Detail",
-                    {"parent": self.name, "employee": employee},
-                    "za_is_bank_entry_created",
-                    1,
-                )
-
+            paid_employees.extend(employees)
             created_journal_entries.append(bank_entry.name)
 
+        # Update flags for every paid employee with one update
+        if paid_employees:
+            PayrollEmployeeDetail = frappe.qb.DocType("Payroll Employee Detail")
+            (
+                frappe.qb.update(PayrollEmployeeDetail)
+                .set(PayrollEmployeeDetail.za_is_bank_entry_created, 1)
+                .where(PayrollEmployeeDetail.parenttype == self.doctype)
+                .where(PayrollEmployeeDetail.parent == self.name)
+                .where(PayrollEmployeeDetail.employee.isin(paid_employees))
+            ).run()
+
         # Clear selected_payment_account after processing
         self.selected_payment_account = {}
 
@@ -758,6 +849,277 @@ class ZAPayrollEntry(PayrollEntry):
         return created_journal_entries
 
 
+def create_za_salary_slips_for_employees(employees, args, publish_progress=True):
+    """
+    Create Salary Slips through HRMS with the run's year-to-date context,
+    rebate/medical credit inputs, ETI batch and frequency check preloaded.
+
+    Runs in the same process that builds the slips (request or background job), so
+    every slip in the run reads prior-period totals from one set of grouped queries.
+    """
+    try:
+        from hrms.payroll.doctype.payroll_entry.payroll_entry import create_salary_slips_for_employees
+    except ImportError:
+        frappe.throw(_("HRMS is required to create salary slips. Please install HRMS app."))
+
+    with use_salary_slip_run_context(args, employees):
+        create_salary_slips_for_employees(employees, args, publish_progress=publish_progress)
+
+
+@contextmanager
+def use_salary_slip_run_context(args, employees):
+    """Preload the run's year-to-date totals, tax inputs, ETI batch and frequency check."""
+    get_payroll_frequency_check(args, employees)
+    ytd_context = build_payroll_ytd_context(args.company, args.start_date, args.end_date, employees)
+    tax_inputs = build_employee_tax_inputs(args.end_date, employees)
+    eti_batch = build_eti_batch(args.end_date, employees)
+    with (
+        use_payroll_ytd_context(ytd_context),
+        use_employee_tax_inputs(tax_inputs),
+        use_eti_batch(eti_batch),
+    ):
+        yield
+
+
+def get_salary_slip_shard_size():
+    """Employees per background job; 0 in Payroll Settings disables sharding."""
+    shard_size = frappe.get_cached_doc("Payroll Settings").get("za_salary_slip_shard_size")
+    if shard_size is None:
+        return DEFAULT_SALARY_SLIP_SHARD_SIZE
+    return cint(shard_size)
+
+
+def get_salary_slip_shards(payroll_entry, for_update=False):
+    """Return ``{shard_id: shard}`` progress recorded on a Payroll Entry."""
+    shards = frappe.db.get_value(
+        "Payroll Entry", payroll_entry, SALARY_SLIP_SHARD_FIELD, for_update=for_update
+    )
+    return {shard_id: frappe._dict(shard) for shard_id, shard in json.loads(shards or "{}").items()}
+
+
+def _save_salary_slip_shards(payroll_entry, shards):
+    frappe.db.set_value(
+        "Payroll Entry",
+        payroll_entry,
+        SALARY_SLIP_SHARD_FIELD,
+        json.dumps(shards, default=str),
+        update_modified=False,
+    )
+
+
+def _set_salary_slip_shard(payroll_entry, shard_id, shard):
+    # Shards settle concurrently; the row lock serialises their updates.
+    shards = get_salary_slip_shards(payroll_entry, for_update=True)
+    shards[shard_id] = shard
+    _save_salary_slip_shards(payroll_entry, shards)
+
+
+def enqueue_salary_slip_shards(payroll_entry, employees, args):
+    """
+    Split a run into shards and enqueue one salary slip job per shard.
+
+    Each shard commits on its own and records its status on the Payroll Entry, so
+    shards run in parallel on the available workers and a failed shard can be
+    retried without redoing the ones that finished.
+    """
+    shard_size = get_salary_slip_shard_size() or len(employees)
+
+    shards = {}
+    for index, start in enumerate(range(0, len(employees), shard_size), start=1):
+        shards[str(index)] = frappe._dict(
+            employees=employees[start : start + shard_size],
+            status="Queued",
+            attempts=0,
+            queued_at=frappe.utils.now(),
+            started_at=None,
+            error=None,
+        )
+    _save_salary_slip_shards(payroll_entry, shards)
+
+    for shard_id in shards:
+        _enqueue_salary_slip_shard(payroll_entry, shard_id, args)
+    return len(shards)
+
+
+def _enqueue_salary_slip_shard(payroll_entry, shard_id, args):
+    frappe.enqueue(
+        run_salary_slip_shard,
+        queue="long",
+        timeout=SALARY_SLIP_SHARD_TIMEOUT,
+        job_id=f"za_salary_slip_shard::{payroll_entry}::{shard_id}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        payroll_entry=payroll_entry,
+        shard_id=shard_id,
+        args=args,
+    )
+
+
+def run_salary_slip_shard(payroll_entry, shard_id, args):
+    """Background job: create the slips for one shard and record the outcome."""
+    shard = get_salary_slip_shards(payroll_entry).get(shard_id)
+    if not shard or shard.status == "Completed":
+        return
+
+    shard.status = "Running"
+    shard.attempts = cint(shard.attempts) + 1
+    shard.started_at = frappe.utils.now()
+    shard.error = None
+    _set_salary_slip_shard(payroll_entry, shard_id, shard)
+    frappe.db.commit()
+    _publish_salary_slip_shard_progress(payroll_entry)
+
+    try:
+        insert_salary_slips_for_shard(payroll_entry, shard.employees, frappe._dict(args))
+        frappe.db.commit()
+        shard.status = "Completed"
+    except Exception:
+        frappe.db.rollback()
+        shard.status = "Failed"
+        shard.error = frappe.get_traceback()
+        frappe.log_error(
+            title=f"Payroll Entry salary slip shard {shard_id} failed: {payroll_entry}",
+            message=shard.error,
+        )
+
+    _set_salary_slip_shard(payroll_entry, shard_id, shard)
+    frappe.db.commit()
+    _update_salary_slip_shard_progress(payroll_entry)
+
+
+def insert_salary_slips_for_shard(payroll_entry, employees, args):
+    """
+    Insert the shard's missing Salary Slips without HRMS's run wrapper.
+
+    ``create_salary_slips_for_employees`` marks the whole entry Submitted and
+    publishes ``completed_salary_slip_creation`` when it returns, which would
+    report the run as finished after its first shard. The entry's status is
+    left to ``_update_salary_slip_shard_progress`` instead.
+    """
+    pending = _get_employees_without_salary_slips(payroll_entry, employees)
+    if not pending:
+        return
+
+    with use_salary_slip_run_context(args, pending):
+        for employee in pending:
+            frappe.get_doc({**args, "doctype": "Salary Slip", "employee": employee}).insert()
+
+
+def _get_employees_without_salary_slips(payroll_entry, employees):
+    created_for = set(
+        frappe.get_all(
+            "Salary Slip",
+            filters={
+                "payroll_entry": payroll_entry,
+                "employee": ["in", employees],
+                "docstatus": ["<", 2],
+            },
+            pluck="employee",
+        )
+    )
+    return sorted(set(employees) - created_for)
+
+
+def get_salary_slip_shard_summary(payroll_entry):
+    shards = get_salary_slip_shards(payroll_entry)
+    summary = frappe._dict(total=len(shards), queued=0, running=0, completed=0, failed=0, failed_shards=[])
+    for shard_id, shard in shards.items():
+        if _is_salary_slip_shard_stalled(shard):
+            shard.status = "Failed"
+        summary[shard.status.lower()] += 1
+        if shard.status == "Failed":
+            summary.failed_shards.append(shard_id)
+    return summary
+
+
+def _is_salary_slip_shard_stalled(shard):
+    """
+    A shard still Running after its job timeout was killed by the worker; one
+    still Queued long after it was enqueued lost its job.
+    """
+    if shard.status == "Running":
+        since, timeout = shard.started_at, SALARY_SLIP_SHARD_TIMEOUT
+    elif shard.status == "Queued":
+        since, timeout = shard.get("queued_at"), SALARY_SLIP_SHARD_QUEUE_TIMEOUT
+    else:
+        return False
+    if not since:
+        return False
+    return frappe.utils.time_diff_in_seconds(frappe.utils.now(), since) > timeout
+
+
+def _publish_salary_slip_shard_progress(payroll_entry, summary=None):
+    frappe.publish_realtime(
+        "za_salary_slip_shard_progress",
+        summary or get_salary_slip_shard_summary(payroll_entry),
+        doctype="Payroll Entry",
+        docname=payroll_entry,
+    )
+
+
+def _update_salary_slip_shard_progress(payroll_entry):
+    summary = get_salary_slip_shard_summary(payroll_entry)
+    _publish_salary_slip_shard_progress(payroll_entry, summary)
+    if summary.queued or summary.running:
+        return
+
+    # Last shard to settle records the run outcome.
+    if summary.failed:
+        frappe.db.set_value(
+            "Payroll Entry",
+            payroll_entry,
+            {
+                "status": "Failed",
+                "salary_slips_created": 0,
+                "error_message": _(
+                    "Salary slip creation failed for shard(s) {0}. Review the Error Log and retry the failed shards."
+                ).format(", ".join(summary.failed_shards)),
+            },
+        )
+    else:
+        frappe.db.set_value(
+            "Payroll Entry",
+            payroll_entry,
+            {"status": "Submitted", "salary_slips_created": 1, "error_message": ""},
+        )
+    frappe.db.commit()
+    frappe.publish_realtime("completed_salary_slip_creation", user=frappe.session.user)
+
+
+@frappe.whitelist()
+def get_salary_slip_shard_status(payroll_entry):
+    """Return shard progress for a Payroll Entry's background slip creation."""
+    frappe.get_doc("Payroll Entry", payroll_entry).check_permission("read")
+    return get_salary_slip_shard_summary(payroll_entry)
+
+
+@frappe.whitelist(methods=["POST"])
+def retry_failed_salary_slip_shards(payroll_entry):
+    """Re-enqueue failed or stalled shards; completed shards are left untouched."""
+    doc = frappe.get_doc("Payroll Entry", payroll_entry)
+    doc.check_permission("write")
+
+    summary = get_salary_slip_shard_summary(payroll_entry)
+    if not summary.failed_shards:
+        frappe.msgprint(_("No failed salary slip shards to retry."))
+        return 0
+
+    shards = get_salary_slip_shards(payroll_entry, for_update=True)
+    args = doc.get_salary_slip_args()
+    for shard_id in summary.failed_shards:
+        shards[shard_id].update(status="Queued", queued_at=frappe.utils.now(), started_at=None)
+    _save_salary_slip_shards(payroll_entry, shards)
+    frappe.db.set_value("Payroll Entry", payroll_entry, {"status": "Queued", "error_message": ""})
+    for shard_id in summary.failed_shards:
+        _enqueue_salary_slip_shard(payroll_entry, shard_id, args)
+
+    frappe.msgprint(
+        _("Retrying {0} salary slip shard(s).").format(len(summary.failed_shards)),
+        alert=True,
+    )
+    return len(summary.failed_shards)
+
+
 @frappe.whitelist(methods=["POST"])
 def make_payment_entry_for_payroll(dt, dn, selected_payment_account=None):
     """
@@ -794,6 +1156,53 @@ def make_payment_entry_for_payroll(dt, dn, selected_payment_account=None):
     return doc.make_payment_entry(selected_payment_account)
 
 
+def get_payroll_entry_payment_rows(payroll_entry, employees=None):
+    """
+    Return one row per Payroll Employee Detail with the employee's payroll payable
+    bank account, payroll cost centre fallbacks and submitted Salary Slip pay.
+
+    Args:
+        payroll_entry: Payroll Entry document name
+        employees: Optional employees to restrict the rows to
+
+    Returns:
+        list: Rows with employee, employee_name, bank_account, payroll_cost_center,
+        department, salary_slip, salary_structure, net_pay and base_net_pay
+    """
+    PayrollEmployeeDetail = frappe.qb.DocType("Payroll Employee Detail")
+    Employee = frappe.qb.DocType("Employee")
+    SalarySlip = frappe.qb.DocType("Salary Slip")
+
+    query = (
+        frappe.qb.from_(PayrollEmployeeDetail)
+        .join(Employee)
+        .on(Employee.name == PayrollEmployeeDetail.employee)
+        .left_join(SalarySlip)
+        .on(
+            (SalarySlip.payroll_entry == PayrollEmployeeDetail.parent)
+            & (SalarySlip.employee == PayrollEmployeeDetail.employee)
+            & (SalarySlip.docstatus == 1)
+        )
+        .select(
+            PayrollEmployeeDetail.employee,
+            PayrollEmployeeDetail.employee_name,
+            Employee.za_payroll_payable_bank_account.as_("bank_account"),
+            Employee.payroll_cost_center,
+            Employee.department,
+            SalarySlip.name.as_("salary_slip"),
+            SalarySlip.salary_structure,
+            SalarySlip.net_pay,
+            SalarySlip.base_net_pay,
+        )
+        .where(PayrollEmployeeDetail.parenttype == "Payroll Entry")
+        .where(PayrollEmployeeDetail.parent == payroll_entry)
+        .orderby(PayrollEmployeeDetail.idx)
+    )
+    if employees is not None:
+        query = query.where(PayrollEmployeeDetail.employee.isin(list(employees) or [""]))
+    return query.run(as_dict=True)
+
+
 def get_payroll_entry_bank_entries(payroll_entry):
     """
     Get bank entries for payroll entry with SA-specific handling.
@@ -811,49 +1220,37 @@ def get_payroll_entry_bank_entries(payroll_entry):
     Raises:
         ValidationError: If any employee is missing bank account configuration
     """
-    payroll_entry_doc = frappe.get_doc("Payroll Entry", payroll_entry)
-
     journal_entries = []
 
     # Group employees by bank account
     bank_account_groups = {}
     employees_without_bank_account = []
 
-    for emp in payroll_entry_doc.employees:
-        # Fetch bank account from Employee doctype (not stored on child table)
-        bank_account = frappe.db.get_value(
-            "Employee",
-            emp.employee,
-            "za_payroll_payable_bank_account"
-        )
-        if bank_account:
-            if bank_account not in bank_account_groups:
-                bank_account_groups[bank_account] = []
-            bank_account_groups[bank_account].append(emp)
+    for row in get_payroll_entry_payment_rows(payroll_entry):
+        if row.bank_account:
+            bank_account_groups.setdefault(row.bank_account, []).append(row)
         else:
-            employees_without_bank_account.append(emp)
+            employees_without_bank_account.append(row)
 
     # Validate: Bank account is required when creating bank entries
     if employees_without_bank_account:
         error_msg = "Payroll Payable Bank Account is required for creating bank entries. "
         error_msg += "Please configure bank accounts for the following employees:<br><ul>"
-        for emp in employees_without_bank_account:
-            error_msg += f"<li><a href='/app/employee/{emp.employee}'>{emp.employee}: {emp.employee_name}</a></li>"
+        for row in employees_without_bank_account:
+            error_msg += "<li><a href='/app/employee/{0}'>{1}: {2}</a></li>".format(
+                escape_html(row.employee),
+                escape_html(row.employee),
+                escape_html(row.employee_name or ""),
+            )
         error_msg += "</ul>"
         frappe.throw(error_msg, title=_("Bank Account Required"))
 
     # Create journal entry for each bank account group
-    for bank_account, employees in bank_account_groups.items():
-        # Calculate total for this bank account
-        total_amount = sum(
-            flt(frappe.db.get_value("Salary Slip", {"employee": emp.employee, "payroll_entry": payroll_entry}, "net_pay"))
-            for emp in employees
-        )
-
+    for bank_account, rows in bank_account_groups.items():
         journal_entry = {
             "bank_account": bank_account,
-            "total_amount": total_amount,
-            "employees": [emp.employee for emp in employees]
+            "total_amount": sum(flt(row.net_pay) for row in rows),
+            "employees": [row.employee for row in rows]
         }
 
         journal_entries.append(journal_entry)
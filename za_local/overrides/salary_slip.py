@@ -48,6 +48,7 @@ if get_period_factor is None:
 
 
 # Import ZA Local utilities
+from za_local.utils.component_registry import get_component_metadata, is_statutory_earning_row
 from za_local.utils.eti_utils import (
     calculate_eti_amount,
     cancel_eti_log,
@@ -55,11 +56,15 @@ from za_local.utils.eti_utils import (
     log_eti_calculation,
     submit_eti_log,
 )
+from za_local.utils.payroll_ledger import delete_payroll_ledger_entry, sync_payroll_ledger_entry
 from za_local.utils.payroll_utils import (
     get_additional_salaries,
-    get_current_block_period,
-    get_employee_frequency_map,
-    is_payroll_processed,
+    get_payroll_frequency_check,
+)
+from za_local.utils.payroll_ytd import (
+    PayrollYTDContext,
+    get_active_employee_tax_inputs,
+    get_active_payroll_ytd_context,
 )
 from za_local.utils.statutory_rates import (
     get_default_travel_paye_inclusion_percentage,
@@ -78,6 +83,16 @@ RETIREMENT_FUND_DEDUCTION_CODES = {"4001", "4003", "4006"}
 UIF_CODES = {"4141"}
 SDL_CODES = {"4142"}
 PAYE_CODES = {"4102", "4115"}
+SA_COMPONENT_METADATA_FIELDS = (
+    "za_sars_payroll_code",
+    "za_payroll_treatment",
+    "za_paye_inclusion_percentage",
+    "za_uif_applicable",
+    "za_sdl_applicable",
+    "za_coida_applicable",
+    "za_is_reimbursement",
+    "za_variable_pay_treatment",
+)
 
 
 class ZASalarySlip(SalarySlip):
@@ -130,6 +145,12 @@ class ZASalarySlip(SalarySlip):
         # Note: Parent class (SalarySlip) doesn't have before_submit, so we don't call super()
         # Validate all components have accounts before allowing submission
         self.validate_component_accounts()
+        self.set_coida_basis()
+
+    def set_coida_basis(self):
+        """Persist the COIDA assessable basis so the annual return is a single SUM per employee."""
+        if self.meta.has_field("za_coida_basis"):
+            self.za_coida_basis = self.get_statutory_earning_basis("za_coida_applicable")
 
     def after_insert(self):
         """Persist ETI audit evidence only after the Salary Slip link exists."""
@@ -140,14 +161,13 @@ class ZASalarySlip(SalarySlip):
         Validate that salary slip doesn't duplicate an existing one for the frequency period.
         """
         try:
-            frequency = get_current_block_period(self)
-            employee_frequency = get_employee_frequency_map()
+            frequency_check = get_payroll_frequency_check(self)
 
-            if self.employee in employee_frequency:
-                if is_payroll_processed(self.employee, frequency[employee_frequency[self.employee]]):
+            if frequency_check.get_frequency(self.employee):
+                if frequency_check.is_processed(self.employee):
                     frappe.throw(
                         _("Salary Slip already created for current {0}").format(
-                            employee_frequency[self.employee]
+                            frequency_check.get_frequency(self.employee)
                         )
                     )
         except Exception as e:
@@ -269,34 +289,25 @@ class ZASalarySlip(SalarySlip):
         if not self.payroll_period:
             return 0
 
-        previous_slips = frappe.get_all(
-            "Salary Slip",
-            filters={
-                "employee": self.employee,
-                "company": self.company,
-                "docstatus": 1,
-                "start_date": [">=", self.payroll_period.start_date],
-                "end_date": ["<", self.start_date],
-            },
-            pluck="name",
+        totals = self.get_payroll_ytd_context().get_exempt_deduction_totals(self.employee)
+        return sum(
+            flt(amount)
+            for salary_component, amount in totals.items()
+            if self.is_retirement_fund_component(salary_component)
         )
-        if not previous_slips:
-            return 0
 
-        total = 0
-        for row in frappe.get_all(
-            "Salary Detail",
-            filters={
-                "parent": ["in", previous_slips],
-                "parentfield": "deductions",
-                "exempted_from_income_tax": 1,
-            },
-            fields=["salary_component", "amount"],
-        ):
-            if self.is_retirement_fund_component(row.salary_component):
-                total += flt(row.amount)
+    def get_payroll_ytd_context(self):
+        """Return the Payroll Entry's preloaded YTD context, or a lazy one for this slip."""
+        period_start_date = self.payroll_period.start_date
+        context = get_active_payroll_ytd_context()
+        if context and context.matches(self.company, period_start_date, self.start_date):
+            return context
 
-        return total
+        context = getattr(self, "_za_payroll_ytd_context", None)
+        if not context or not context.matches(self.company, period_start_date, self.start_date):
+            context = PayrollYTDContext(self.company, period_start_date, self.start_date)
+            self._za_payroll_ytd_context = context
+        return context
 
     def is_retirement_fund_component(self, salary_component):
         return self.get_required_sars_code(salary_component) in RETIREMENT_FUND_DEDUCTION_CODES
@@ -338,32 +349,8 @@ class ZASalarySlip(SalarySlip):
         if inclusion_percentage >= 100:
             return 0
 
-        previous_slips = frappe.get_all(
-            "Salary Slip",
-            filters={
-                "employee": self.employee,
-                "company": self.company,
-                "docstatus": 1,
-                "start_date": [">=", self.payroll_period.start_date],
-                "end_date": ["<", self.start_date],
-            },
-            pluck="name",
-        )
-        if not previous_slips:
-            return 0
-
-        total = 0
-        for row in frappe.get_all(
-            "Salary Detail",
-            filters={
-                "parent": ["in", previous_slips],
-                "parentfield": "earnings",
-                "salary_component": salary_component,
-            },
-            fields=["amount"],
-        ):
-            total += flt(row.amount) * (100 - inclusion_percentage) / 100
-        return total
+        previous_amount = self.get_payroll_ytd_context().get_earning_total(self.employee, salary_component)
+        return flt(previous_amount) * (100 - inclusion_percentage) / 100
 
     def get_component_paye_inclusion_percentage(self, salary_component):
         metadata = self.get_sa_component_metadata(salary_component)
@@ -378,33 +365,9 @@ class ZASalarySlip(SalarySlip):
         return 100
 
     def get_sa_component_metadata(self, salary_component):
-        if not salary_component:
-            return frappe._dict()
-
-        fields = [
-            "za_sars_payroll_code",
-            "za_payroll_treatment",
-            "za_paye_inclusion_percentage",
-            "za_uif_applicable",
-            "za_sdl_applicable",
-            "za_coida_applicable",
-            "za_is_reimbursement",
-            "za_variable_pay_treatment",
-        ]
-        try:
-            meta = frappe.get_meta("Salary Component")
-            fields = [field for field in fields if meta.has_field(field)]
-        except Exception:
-            fields = ["za_sars_payroll_code"]
-
-        if not fields:
-            return frappe._dict()
-        # Cached read: this metadata is fetched repeatedly per component within
-        # the payroll loop, and Salary Component master data rarely changes.
-        return (
-            frappe.get_cached_value("Salary Component", salary_component, fields, as_dict=True)
-            or frappe._dict()
-        )
+        # The registry holds every component's SA classification for the site,
+        # so the payroll loop does no per-component lookups.
+        return get_component_metadata(salary_component, SA_COMPONENT_METADATA_FIELDS)
 
     def get_annual_bonus(self):
         """
@@ -591,11 +554,22 @@ class ZASalarySlip(SalarySlip):
         Returns:
             float: Annual tax rebate amount
         """
-        dob = frappe.db.get_value("Employee", self.employee, "date_of_birth")
+        tax_inputs = self.get_employee_tax_inputs()
+        if tax_inputs:
+            dob = tax_inputs.get_date_of_birth(self.employee)
+        else:
+            dob = frappe.db.get_value("Employee", self.employee, "date_of_birth")
         if dob:
             return get_tax_rebate(self, dob)
         return 0
 
+    def get_employee_tax_inputs(self):
+        """Return the payroll run's prefetched rebate/credit inputs when they match this slip."""
+        tax_inputs = get_active_employee_tax_inputs()
+        if tax_inputs and tax_inputs.matches(self.end_date):
+            return tax_inputs
+        return None
+
     def get_medical_aid_credits(self):
         """
         Calculate medical aid tax credits.
@@ -605,21 +579,25 @@ class ZASalarySlip(SalarySlip):
         """
         # Get active medical aid details from Employee Private Benefit. A main
         # member with zero dependants still qualifies for the main-member credit.
-        benefits = frappe.get_all(
-            "Employee Private Benefit",
-            filters={
-                "effective_from": ["<=", self.end_date],
-                "disable": 0,
-                "employee": self.employee,
-            },
-            fields=[
-                "private_medical_aid",
-                "medical_aid_dependant",
-                "effective_from",
-                "to",
-            ],
-            order_by="effective_from desc",
-        )
+        tax_inputs = self.get_employee_tax_inputs()
+        if tax_inputs:
+            benefits = tax_inputs.get_medical_benefits(self.employee)
+        else:
+            benefits = frappe.get_all(
+                "Employee Private Benefit",
+                filters={
+                    "effective_from": ["<=", self.end_date],
+                    "disable": 0,
+                    "employee": self.employee,
+                },
+                fields=[
+                    "private_medical_aid",
+                    "medical_aid_dependant",
+                    "effective_from",
+                    "to",
+                ],
+                order_by="effective_from desc",
+            )
 
         for benefit in benefits:
             if benefit.to and getdate(benefit.to) < getdate(self.start_date):
@@ -686,7 +664,7 @@ class ZASalarySlip(SalarySlip):
         if eligibility["eligible"] and eti_amount <= 0:
             eligibility["eligible"] = False
             eligibility["reason"] = "No ETI is available at the employee's monthly remuneration"
-        log_eti_calculation(self.employee, self, eti_amount, eligibility)
+        log_eti_calculation(self.employee, self, eti_amount, eligibility, new_slip=True)
 
     def calculate_company_contributions(self):
         """
@@ -783,14 +761,8 @@ class ZASalarySlip(SalarySlip):
                     ),
                     title=_("Incomplete SARS Payroll Classification"),
                 )
-            treatment = metadata.get("za_payroll_treatment")
-            if treatment in {"Reimbursive Travel", "Non-Taxable Reimbursement", "Working Paper Only"}:
-                continue
-            if metadata.get("za_is_reimbursement"):
-                continue
-            if metadata.get(applicability_field) in (0, "0", False, None, ""):
-                continue
-            total += flt(row.amount)
+            if is_statutory_earning_row(row, metadata, applicability_field):
+                total += flt(row.amount)
         return flt(total, 2)
 
     def is_component_in_codes(self, salary_component, codes):
@@ -865,6 +837,7 @@ class ZASalarySlip(SalarySlip):
         """
         super().on_submit()
         submit_eti_log(self.employee, self)
+        sync_payroll_ledger_entry(self)
 
         # Create loan repayment entries if applicable
         if self.get("loans"):
@@ -875,6 +848,7 @@ class ZASalarySlip(SalarySlip):
         Post-cancellation tasks.
         """
         cancel_eti_log(self.employee, self)
+        delete_payroll_ledger_entry(self)
         super().on_cancel()
 
         # Cancel loan repayment entries if applicable
@@ -0,0 +1,26 @@
+"""Index Salary Slip for the COIDA annual SUM and set the COIDA basis of older submitted slips."""
+
+import frappe
+
+from za_local.sa_setup.custom_fields import _apply_custom_field_fixtures
+from za_local.utils.coida_utils import backfill_salary_slip_coida_basis
+from za_local.utils.component_registry import clear_component_registry
+
+# Custom fields are otherwise synced after patches run, so the backfill would
+# find no za_coida_basis column and no COIDA classification on components.
+COIDA_BASIS_CUSTOM_FIELDS = (
+	"Salary Component-za_payroll_treatment",
+	"Salary Component-za_coida_applicable",
+	"Salary Component-za_is_reimbursement",
+	"Salary Slip-za_coida_basis",
+)
+
+
+def execute():
+	if not frappe.db.table_exists("Salary Slip"):
+		return
+
+	frappe.db.add_index("Salary Slip", ["company", "docstatus", "start_date", "end_date"])
+	_apply_custom_field_fixtures(COIDA_BASIS_CUSTOM_FIELDS)
+	clear_component_registry()
+	backfill_salary_slip_coida_basis()
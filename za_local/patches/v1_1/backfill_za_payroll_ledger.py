@@ -0,0 +1,13 @@
+"""Fill the ZA Payroll Ledger for Salary Slips submitted before it existed."""
+
+import frappe
+
+from za_local.utils.payroll_ledger import backfill_payroll_ledger
+
+
+def execute():
+	if not frappe.db.table_exists("Salary Slip"):
+		return
+
+	frappe.reload_doc("sa_payroll", "doctype", "za_payroll_ledger")
+	backfill_payroll_ledger()
@@ -1,5 +1,28 @@
 frappe.ui.form.on("Payroll Entry", {
+	setup(frm) {
+		frappe.realtime.on("za_salary_slip_shard_progress", (summary) => {
+			// Published to this document's room only.
+			if (!summary || !summary.total) {
+				return;
+			}
+			if (summary.queued || summary.running) {
+				const settled = summary.completed + summary.failed;
+				frappe.show_progress(
+					__("Creating Salary Slips"),
+					settled,
+					summary.total,
+					__("{0} of {1} background jobs finished", [settled, summary.total])
+				);
+				return;
+			}
+			frappe.hide_progress();
+			frm.reload_doc();
+		});
+	},
+
 	refresh(frm) {
+		add_salary_slip_shard_buttons(frm);
+
 		if (
 			frm.doc.docstatus !== 1 ||
 			!(frm.doc.salary_slips_submitted || frm.doc.__onload?.submitted_ss)
@@ -99,6 +122,63 @@ frappe.ui.form.on("Payroll Entry", {
 	},
 });
 
+function add_salary_slip_shard_buttons(frm) {
+	if (frm.doc.docstatus !== 1 || !frm.doc.za_salary_slip_shards || frm.doc.salary_slips_created) {
+		return;
+	}
+
+	frm.add_custom_button(__("Salary Slip Progress"), async () => {
+		try {
+			const { message: summary } = await frappe.call({
+				method: "za_local.overrides.payroll_entry.get_salary_slip_shard_status",
+				args: { payroll_entry: frm.doc.name },
+			});
+			frappe.msgprint({
+				title: __("Salary Slip Creation"),
+				message: __("{0} of {1} background jobs completed, {2} running, {3} queued, {4} failed.", [
+					summary.completed,
+					summary.total,
+					summary.running,
+					summary.queued,
+					summary.failed,
+				]),
+				indicator: summary.failed ? "red" : "blue",
+			});
+		} catch {
+			show_payroll_request_error();
+		}
+	});
+
+	if (frm.doc.status === "Failed") {
+		add_salary_slip_retry_button(frm);
+		return;
+	}
+
+	// A shard killed by its worker, or whose job was lost, is only reported as
+	// failed by the summary; the entry itself stays Queued until it is retried.
+	frappe.call({
+		method: "za_local.overrides.payroll_entry.get_salary_slip_shard_status",
+		args: { payroll_entry: frm.doc.name },
+		callback(r) {
+			if (r.message && r.message.failed) {
+				add_salary_slip_retry_button(frm);
+			}
+		},
+	});
+}
+
+function add_salary_slip_retry_button(frm) {
+	frm.add_custom_button(__("Retry Failed Salary Slip Jobs"), () => {
+		frappe.call({
+			method: "za_local.overrides.payroll_entry.retry_failed_salary_slip_shards",
+			args: { payroll_entry: frm.doc.name },
+			callback: () => frm.reload_doc(),
+			error: show_payroll_request_error,
+			freeze: true,
+		});
+	}).addClass("btn-primary");
+}
+
 function show_bank_entry_dialog(frm, account_map) {
 	let field_list = [];
 	let company_currency = frappe.get_doc(":Company", frm.doc.company).default_currency;
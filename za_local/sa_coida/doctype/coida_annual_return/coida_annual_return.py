@@ -93,18 +93,10 @@ class COIDAAnnualReturn(Document):
 		return self
 
 	def _get_director_earnings(self, earnings, cap):
-		if not earnings:
-			return 0
-
-		designations = frappe.get_all(
-			"Employee",
-			filters={"name": ["in", list(earnings)]},
-			fields=["name", "designation"],
-		)
 		return flt(
 			sum(
-				min(earnings[row.name].assessable_total, cap)
-				for row in designations
+				min(row.assessable_total, cap)
+				for row in earnings.values()
 				if row.designation in DIRECTOR_DESIGNATIONS
 			),
 			2,
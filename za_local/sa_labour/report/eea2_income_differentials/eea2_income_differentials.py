@@ -4,10 +4,17 @@ import frappe
 from frappe import _
 
 from za_local.sa_labour.report_utils import get_permitted_company, validate_employee_fields
+from za_local.utils.report_cache import get_cached_report_result
 
 
 def execute(filters=None):
-	return get_columns(), get_data(filters)
+	get_permitted_company(filters)
+	return get_cached_report_result(
+		"Eea2 Income Differentials",
+		filters,
+		("Employee", "Salary Structure Assignment"),
+		lambda: (get_columns(), get_data(filters)),
+	)
 
 
 def get_columns():
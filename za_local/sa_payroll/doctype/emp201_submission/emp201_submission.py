@@ -6,8 +6,12 @@ import hashlib
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.query_builder import Case
+from frappe.query_builder.functions import Coalesce, Count, Sum
 from frappe.utils import add_months, flt, get_first_day, get_last_day, getdate
 
+from za_local.utils.component_registry import get_component_metadata
+
 PAYE_CODES = {"4102", "4115"}
 UIF_CODES = {"4141"}
 SDL_CODES = {"4142"}
@@ -17,18 +21,7 @@ ETI_RECONCILIATION_OPENING_MONTHS = {3, 9}
 
 
 def _get_salary_component_metadata(component_name):
-	if not component_name:
-		return frappe._dict()
-
-	return (
-		frappe.db.get_value(
-			"Salary Component",
-			component_name,
-			["za_sars_payroll_code", "is_income_tax_component"],
-			as_dict=True,
-		)
-		or frappe._dict()
-	)
+	return get_component_metadata(component_name, ("za_sars_payroll_code", "is_income_tax_component"))
 
 
 def _get_emp201_bucket(component_name):
@@ -63,6 +56,58 @@ def _looks_like_legacy_statutory_component(component_name, metadata):
 	)
 
 
+def _get_emp201_salary_slip_totals(company, start_date, end_date):
+	"""Return the submitted slip count and ``SUM(za_monthly_eti)`` for the period."""
+	salary_slip = frappe.qb.DocType("Salary Slip")
+	rows = (
+		frappe.qb.from_(salary_slip)
+		.select(
+			Count(salary_slip.name).as_("slip_count"),
+			Sum(salary_slip.za_monthly_eti).as_("eti_generated"),
+		)
+		.where(salary_slip.company == company)
+		.where(salary_slip.docstatus == 1)
+		.where(salary_slip.end_date[start_date:end_date])
+	).run(as_dict=True)
+	return rows[0] if rows else frappe._dict(slip_count=0, eti_generated=0)
+
+
+def _get_emp201_component_totals(company, start_date, end_date):
+	"""Return period totals per salary component from one grouped query.
+
+	Earnings, deductions and company contributions are summed per component and
+	split on whether the slip carries ``za_monthly_eti``: a 4118 row only counts
+	as ETI generated when its slip has no ETI figure of its own.
+	"""
+	salary_slip = frappe.qb.DocType("Salary Slip")
+	slip_has_eti = Case().when(Coalesce(salary_slip.za_monthly_eti, 0) != 0, 1).else_(0)
+
+	def component_totals(child, parentfields):
+		return (
+			frappe.qb.from_(child)
+			.join(salary_slip)
+			.on(child.parent == salary_slip.name)
+			.select(
+				child.salary_component,
+				slip_has_eti.as_("slip_has_eti"),
+				Sum(child.amount).as_("amount"),
+			)
+			.where(child.parenttype == "Salary Slip")
+			.where(child.parentfield.isin(parentfields))
+			.where(Coalesce(child.salary_component, "") != "")
+			.where(child.amount != 0)
+			.where(salary_slip.company == company)
+			.where(salary_slip.docstatus == 1)
+			.where(salary_slip.end_date[start_date:end_date])
+			.groupby(child.salary_component, slip_has_eti)
+		)
+
+	query = component_totals(frappe.qb.DocType("Salary Detail"), ["deductions", "earnings"]).union_all(
+		component_totals(frappe.qb.DocType("Company Contribution"), ["company_contribution"])
+	)
+	return query.run(as_dict=True)
+
+
 def calculate_eti_utilisation(gross_paye, eti_generated, previous_carry_forward, period_start_date):
 	"""Apply the employer PAYE cap and six-month ETI reconciliation boundaries."""
 	period_start_date = getdate(period_start_date)
@@ -194,47 +239,33 @@ class EMP201Submission(Document):
 		sdl = 0
 		unmapped_statutory_components = set()
 
-		salary_slips = frappe.get_all(
-			"Salary Slip",
-			filters={
-				"company": self.company,
-				"end_date": [
-					"between",
-					[self.submission_period_start_date, self.submission_period_end_date],
-				],
-				"docstatus": 1,
-			},
-			fields=["name"],
+		slip_totals = _get_emp201_salary_slip_totals(
+			self.company, self.submission_period_start_date, self.submission_period_end_date
 		)
-
-		if not salary_slips:
+		if not slip_totals.slip_count:
 			frappe.msgprint(_("No submitted salary slips found for the selected period."))
 			return {}
 
-		for slip in salary_slips:
-			ss = frappe.get_doc("Salary Slip", slip.name)
-			slip_eti_amount = flt(ss.get("za_monthly_eti"))
-			if slip_eti_amount:
-				eti_generated += slip_eti_amount
-
-			for table_name in ("deductions", "company_contribution", "earnings"):
-				for comp in ss.get(table_name) or []:
-					component_name = comp.get("salary_component")
-					amount = flt(comp.amount)
-					if not component_name or not amount:
-						continue
-
-					bucket, metadata = _get_emp201_bucket(component_name)
-					if bucket == "paye":
-						gross_paye += amount
-					elif bucket == "uif":
-						uif += amount
-					elif bucket == "sdl":
-						sdl += amount
-					elif bucket == "eti" and not slip_eti_amount:
-						eti_generated += amount
-					elif _looks_like_legacy_statutory_component(component_name, metadata):
-						unmapped_statutory_components.add(component_name)
+		eti_generated += flt(slip_totals.eti_generated)
+
+		for row in _get_emp201_component_totals(
+			self.company, self.submission_period_start_date, self.submission_period_end_date
+		):
+			amount = flt(row.amount)
+			if not amount:
+				continue
+
+			bucket, metadata = _get_emp201_bucket(row.salary_component)
+			if bucket == "paye":
+				gross_paye += amount
+			elif bucket == "uif":
+				uif += amount
+			elif bucket == "sdl":
+				sdl += amount
+			elif bucket == "eti" and not row.slip_has_eti:
+				eti_generated += amount
+			elif _looks_like_legacy_statutory_component(row.salary_component, metadata):
+				unmapped_statutory_components.add(row.salary_component)
 
 		if unmapped_statutory_components:
 			frappe.throw(
@@ -1,4 +1,89 @@
 frappe.ui.form.on('EMP501 Reconciliation', {
+    setup: function(frm) {
+        frappe.realtime.on('za_irp5_bulk_progress', function(data) {
+            // Published to this document's room only.
+            if (!data) {
+                return;
+            }
+            if (data.status === 'Completed' || data.status === 'Failed') {
+                frappe.hide_progress();
+                frm.reload_doc();
+                if (data.status === 'Failed') {
+                    frappe.msgprint({
+                        title: __('IRP5 Generation Interrupted'),
+                        message: __('IRP5 generation stopped after {0} of {1} employees. Review the Error Log, then resume.', [data.processed, data.total]),
+                        indicator: 'red',
+                        primary_action: {
+                            label: __('Resume'),
+                            action: function() {
+                                frappe.call({
+                                    method: 'za_local.utils.irp5_bulk.resume_irp5_bulk_generation',
+                                    args: { emp501_name: frm.doc.name }
+                                });
+                                frappe.msg_dialog && frappe.msg_dialog.hide();
+                            }
+                        }
+                    });
+                }
+                return;
+            }
+            frappe.show_progress(__('Generating IRP5 Certificates'), data.processed, data.total,
+                __('{0} of {1} employees', [data.processed, data.total]));
+        });
+
+        frappe.realtime.on('za_emp501_export_ready', function(data) {
+            // Published for both inline and background exports.
+            if (data && data.file_url) {
+                frm.reload_doc();
+                frappe.msgprint({
+                    title: __('Working Paper Exported'),
+                    message: __('{0} certificates, {1} rows written in {2}s ({3} rows/s). <a href="{4}">Download CSV</a>', [
+                        data.certificates, data.rows, data.seconds, data.rows_per_second, encodeURI(data.file_url)
+                    ]),
+                    indicator: 'green'
+                });
+            }
+        });
+
+        frappe.realtime.on('za_irp5_pdf_progress', function(data) {
+            if (!data) {
+                return;
+            }
+            if (data.zip_url) {
+                frappe.hide_progress();
+                frm.reload_doc();
+                frappe.msgprint({
+                    title: __('Certificate PDFs Ready'),
+                    message: __('{0} rendered, {1} unchanged and reused, {2} failed. <a href="{3}">Download ZIP</a>', [
+                        data.rendered, data.reused, (data.errors || []).length, encodeURI(data.zip_url)
+                    ]),
+                    indicator: (data.errors || []).length ? 'orange' : 'green'
+                });
+                return;
+            }
+            if (!data.queued && !data.running && data.failed) {
+                frappe.hide_progress();
+                frappe.msgprint({
+                    title: __('Certificate PDFs Incomplete'),
+                    message: __('{0} of {1} batches failed; {2} certificates are not rendered, so no ZIP was built. Review the Error Log, then retry.', [
+                        data.failed, data.total, (data.missing || []).length
+                    ]),
+                    indicator: 'red',
+                    primary_action: {
+                        label: __('Retry'),
+                        action: function() {
+                            retryIRP5PdfShards(frm);
+                            frappe.msg_dialog && frappe.msg_dialog.hide();
+                        }
+                    }
+                });
+                return;
+            }
+            frappe.show_progress(__('Rendering Certificate PDFs'), data.completed, data.total,
+                __('{0} of {1} batches', [data.completed, data.total]));
+        });
+    },
+
     refresh: function(frm) {
         // Step-by-step workflow with standalone buttons (not in dropdown)
         if (frm.doc.docstatus === 0) {
@@ -77,10 +162,91 @@ frappe.ui.form.on('EMP501 Reconciliation', {
             }
         }
         
+        if (!frm.is_new() && frm.doc.irp5_certificates && frm.doc.irp5_certificates.length) {
+            frm.add_custom_button(__('Reconciliation Differences'), function() {
+                frm.call({
+                    doc: frm.doc,
+                    method: 'get_reconciliation_diff',
+                    freeze: true,
+                    callback: function(r) {
+                        if (r.message) {
+                            showReconciliationDiff(r.message);
+                        }
+                    }
+                });
+            }, __('Actions'));
+
+            frm.add_custom_button(__('Render Certificate PDFs'), function() {
+                frappe.call({
+                    method: 'za_local.utils.irp5_pdf.render_irp5_certificate_pdfs',
+                    args: { emp501_name: frm.doc.name }
+                });
+            }, __('Actions'));
+
+            if (frm.doc.irp5_pdf_shards) {
+                // Killed or lost batches are only reported as failed by the status summary.
+                frappe.call({
+                    method: 'za_local.utils.irp5_pdf.get_irp5_pdf_render_status',
+                    args: { emp501_name: frm.doc.name },
+                    callback: function(r) {
+                        if (r.message && r.message.failed) {
+                            frm.add_custom_button(__('Retry Failed Certificate PDFs'), function() {
+                                retryIRP5PdfShards(frm);
+                            }, __('Actions'));
+                        }
+                    }
+                });
+            }
+
+            frm.add_custom_button(__('Export Working Paper'), function() {
+                frappe.call({
+                    method: 'za_local.utils.emp501_export.export_emp501_working_paper',
+                    args: { emp501_name: frm.doc.name },
+                    freeze: true
+                });
+            }, __('Actions'));
+        }
+
         if (frm.doc.docstatus === 1) {
             frm.set_intro(__('Direct SARS electronic submission is not supported in this release. Complete submission through SARS eFiling or an approved e@syFile-compatible payroll export.'), 'orange');
         }
         
+        function showReconciliationDiff(diff) {
+            const esc = frappe.utils.escape_html;
+            const describe = function(differences) {
+                return Object.keys(differences || {}).map(function(field) {
+                    return esc(field.toUpperCase()) + ' ' + format_currency(differences[field]);
+                }).join(', ');
+            };
+            if (diff.in_balance) {
+                frappe.msgprint({
+                    title: __('Reconciliation Differences'),
+                    message: __('All {0} employees and every month reconcile.', [diff.employee_count]),
+                    indicator: 'green'
+                });
+                return;
+            }
+            const rows = [];
+            (diff.employees || []).forEach(function(row) {
+                rows.push('<tr><td>' + esc(row.employee_name || row.employee) + '</td><td>'
+                    + (row.issue === 'missing_certificate' ? __('No linked certificate') : describe(row.differences))
+                    + '</td></tr>');
+            });
+            (diff.months || []).forEach(function(row) {
+                rows.push('<tr><td>' + esc(row.month) + '</td><td>'
+                    + (row.issue === 'missing_emp201' ? __('No linked EMP201') : describe(row.differences))
+                    + '</td></tr>');
+            });
+            frappe.msgprint({
+                title: __('Reconciliation Differences'),
+                message: '<table class="table table-bordered"><thead><tr><th>' + __('Employee / Month')
+                    + '</th><th>' + __('Difference') + '</th></tr></thead><tbody>' + rows.join('')
+                    + '</tbody></table>',
+                indicator: 'orange',
+                wide: true
+            });
+        }
+
         // Helper function to fetch EMP201 submissions
         function fetchEMP201Submissions(frm) {
             frm.call({
@@ -142,6 +308,10 @@ frappe.ui.form.on('EMP501 Reconciliation', {
                         freeze: true,
                         freeze_message: __('Generating IRP5 Certificates... This may take a few moments.'),
                         callback: function(r) {
+                            if (r.message && r.message.queued) {
+                                // Progress arrives over realtime; see setup().
+                                return;
+                            }
                             if (r.message) {
                                 const msg = r.message.message || __('IRP5 certificates generated');
                                 const details = [];
@@ -277,3 +447,13 @@ frappe.ui.form.on('EMP501 Reconciliation', {
         }
     }
 });
+
+function retryIRP5PdfShards(frm) {
+    frappe.call({
+        method: 'za_local.utils.irp5_pdf.retry_irp5_pdf_shards',
+        args: { emp501_name: frm.doc.name },
+        callback: function() {
+            frm.reload_doc();
+        }
+    });
+}
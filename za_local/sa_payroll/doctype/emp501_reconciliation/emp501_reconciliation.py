@@ -7,9 +7,20 @@ from frappe.model.document import Document
 from frappe.utils import add_days, add_months, escape_html, flt, get_first_day, get_last_day, getdate
 
 from za_local.sa_payroll.doctype.irp5_certificate.irp5_certificate import (
-	get_active_certificate_names,
 	require_certificate_generation_permissions,
 )
+from za_local.utils.emp501_diff import (
+	EMP501ReconciliationCache,
+	clear_emp501_diff_cache,
+	get_emp501_diff,
+)
+from za_local.utils.irp5_bulk import (
+	IRP5_BULK_STATE_FIELD,
+	IRP5_BULK_SYNC_LIMIT,
+	generate_irp5_certificates_now,
+	start_irp5_bulk_generation,
+)
+from za_local.utils.irp5_pdf import IRP5_PDF_SHARD_FIELD
 
 DIRECTIVE_INCOME_CODES = {
 	"3901",
@@ -26,6 +37,18 @@ DIRECTIVE_INCOME_CODES = {
 }
 DIRECTIVE_DEDUCTION_CODES = {"4115"}
 TOTAL_TOLERANCE = 0.01
+EMP201_ROW_FIELDS = (
+	"name",
+	"submission_period_start_date",
+	"gross_paye_before_eti",
+	"uif_payable",
+	"sdl_payable",
+	"eti_carried_forward_from_previous",
+	"eti_generated_current_month",
+	"eti_utilized_current_month",
+	"eti_to_be_carried_forward",
+	"eti_reconciliation_refund",
+)
 
 
 def _get_reconciliation_period_dates(tax_year, reconciliation_period):
@@ -55,6 +78,13 @@ def _get_reconciliation_period_dates(tax_year, reconciliation_period):
 	return from_date, to_date
 
 
+def _format_differences(differences):
+	return ", ".join(
+		f"{fieldname.upper()} {frappe.format_value(amount, {'fieldtype': 'Currency'})}"
+		for fieldname, amount in differences.items()
+	)
+
+
 @frappe.whitelist()
 def get_company_tax_details(company):
 	# frappe.db.get_value does no permission check; these are the company's SARS
@@ -85,6 +115,17 @@ class EMP501Reconciliation(Document):
 	def validate(self):
 		self.validate_dates()  # This should be called after tax_year and reconciliation_period are set
 		self.calculate_totals()
+		if not self.is_new() and any(
+			self.has_value_changed(fieldname) for fieldname in ("company", "from_date", "to_date")
+		):
+			clear_emp501_diff_cache(self.name)
+		if not self.is_new():
+			# Background IRP5 jobs own their progress fields; a save must not overwrite them.
+			self.update(
+				frappe.db.get_value(
+					self.doctype, self.name, [IRP5_BULK_STATE_FIELD, IRP5_PDF_SHARD_FIELD], as_dict=True
+				)
+			)
 
 	def _get_expected_emp201_period_starts(self):
 		if not self.from_date or not self.to_date:
@@ -304,8 +345,6 @@ class EMP501Reconciliation(Document):
 
 	def validate_irp5_certificate_readiness(self):
 		errors = []
-		certificate_totals = frappe._dict(paye=0, uif=0, sdl=0, eti=0, tax_payable=0)
-
 		for row in self.irp5_certificates or []:
 			if not row.irp5_certificate or not frappe.db.exists("IRP5 Certificate", row.irp5_certificate):
 				continue
@@ -364,12 +403,6 @@ class EMP501Reconciliation(Document):
 					_("{0}: certificate code 4149 does not reconcile to PAYE + UIF + SDL").format(label)
 				)
 
-			certificate_totals.paye += flt(certificate.paye)
-			certificate_totals.uif += flt(certificate.uif)
-			certificate_totals.sdl += flt(certificate.sdl)
-			certificate_totals.eti += flt(certificate.eti)
-			certificate_totals.tax_payable += flt(certificate.total_tax_payable)
-
 		if errors:
 			frappe.throw(
 				_(
@@ -378,30 +411,24 @@ class EMP501Reconciliation(Document):
 				title=_("IRP5 Certificate Readiness Required"),
 			)
 
-		return certificate_totals
-
 	def _get_linked_emp201_rows(self):
-		names = [row.emp201_submission for row in self.emp201_submissions or [] if row.emp201_submission]
+		"""Return the linked submitted EMP201 rows, read once per set of links on this instance."""
+		names = tuple(row.emp201_submission for row in self.emp201_submissions or [] if row.emp201_submission)
 		if not names:
 			return []
 
-		return frappe.get_all(
+		linked = getattr(self, "_linked_emp201_rows", None)
+		if linked and linked[0] == names:
+			return linked[1]
+
+		rows = frappe.get_all(
 			"EMP201 Submission",
 			filters={"name": ["in", names], "docstatus": 1},
-			fields=[
-				"name",
-				"submission_period_start_date",
-				"gross_paye_before_eti",
-				"uif_payable",
-				"sdl_payable",
-				"eti_carried_forward_from_previous",
-				"eti_generated_current_month",
-				"eti_utilized_current_month",
-				"eti_to_be_carried_forward",
-				"eti_reconciliation_refund",
-			],
+			fields=list(EMP201_ROW_FIELDS),
 			order_by="submission_period_start_date, name",
 		)
+		self._linked_emp201_rows = (names, rows)
+		return rows
 
 	def validate_linked_emp201_references(self):
 		coverage = self.validate_emp201_period_coverage(throw=False)
@@ -436,11 +463,22 @@ class EMP501Reconciliation(Document):
 				title=_("Invalid EMP201 References"),
 			)
 
-	def validate_certificate_reconciliation(self, certificate_totals):
+	def validate_certificate_reconciliation(self, certificate_totals=None):
+		"""Compare certificate totals with the linked EMP201 declarations.
+
+		Certificate totals come from the incremental reconciliation cache unless
+		they are passed in, and the same refresh supplies the per-employee and
+		per-month detail when the totals do not reconcile.
+		"""
 		emp201_rows = self._get_linked_emp201_rows()
 		if not emp201_rows:
 			frappe.throw(_("No submitted EMP201 declarations are linked to this reconciliation."))
 
+		reconciliation = None
+		if certificate_totals is None:
+			reconciliation = EMP501ReconciliationCache(self).refresh()
+			certificate_totals = reconciliation.get_certificate_totals()
+
 		emp201_totals = frappe._dict(
 			paye=sum(flt(row.gross_paye_before_eti) for row in emp201_rows),
 			uif=sum(flt(row.uif_payable) for row in emp201_rows),
@@ -493,6 +531,7 @@ class EMP501Reconciliation(Document):
 			)
 
 		if errors:
+			errors.extend(self._describe_reconciliation_diff(reconciliation, emp201_rows))
 			frappe.throw(
 				_("EMP501 does not reconcile to the submitted employee certificates:<br><br>{0}").format(
 					"<br>".join(f"• {frappe.bold(escape_html(error))}" for error in errors)
@@ -502,6 +541,45 @@ class EMP501Reconciliation(Document):
 
 		return emp201_totals
 
+	@frappe.whitelist()
+	def get_reconciliation_diff(self):
+		"""Return the employees and months that are out of balance, refreshing only what changed."""
+		self.check_permission("read")
+		return get_emp501_diff(self)
+
+	def _describe_reconciliation_diff(self, reconciliation=None, emp201_rows=None, limit=10):
+		if reconciliation is None:
+			if self.is_new():
+				return []
+			reconciliation = EMP501ReconciliationCache(self).refresh()
+
+		diff = reconciliation.get_diff(emp201_rows)
+		details = []
+		for row in diff.employees:
+			label = row.employee_name or row.employee
+			if row.issue == "missing_certificate":
+				details.append(_("{0}: salary slips have no linked certificate").format(label))
+			else:
+				details.append(
+					_("{0}: certificate differs from salary slips ({1})").format(
+						label, _format_differences(row.differences)
+					)
+				)
+		for row in diff.months:
+			if row.issue == "missing_emp201":
+				details.append(_("{0}: salary slips have no linked EMP201").format(row.month))
+			else:
+				details.append(
+					_("{0}: EMP201 differs from salary slips ({1})").format(
+						row.month, _format_differences(row.differences)
+					)
+				)
+
+		if len(details) > limit:
+			remaining = len(details) - limit
+			details = [*details[:limit], _("... and {0} more differences").format(remaining)]
+		return details
+
 	def validate_dates(self):
 		"""
 		Validate date ranges for EMP501 Reconciliation based on selected Tax Year and Period.
@@ -577,16 +655,20 @@ class EMP501Reconciliation(Document):
 		self.validate_linked_emp201_references()
 		self.calculate_totals()
 		self.validate_irp5_coverage()
-		certificate_totals = self.validate_irp5_certificate_readiness()
-		self.validate_certificate_reconciliation(certificate_totals)
+		self.validate_irp5_certificate_readiness()
+		self.validate_certificate_reconciliation()
 
 	def on_submit(self):
 		self.db_set("status", "Submitted", update_modified=False)
 
 	def on_cancel(self):
 		self.db_set("status", "Cancelled", update_modified=False)
+		clear_emp501_diff_cache(self.name)
 		frappe.msgprint(_("EMP501 Reconciliation {0} has been cancelled.").format(self.name))
 
+	def on_trash(self):
+		clear_emp501_diff_cache(self.name)
+
 	@frappe.whitelist()
 	def fetch_emp201_submissions(self):
 		self.check_permission("write")
@@ -616,14 +698,8 @@ class EMP501Reconciliation(Document):
 					"submission_period_start_date": [">=", from_date],
 					"submission_period_end_date": ["<=", to_date],
 				},
-				fields=[
-					"name",
-					"submission_period_start_date as submission_date",
-					"gross_paye_before_eti as paye",
-					"sdl_payable as sdl",
-					"uif_payable as uif",
-					"eti_utilized_current_month as eti",
-				],
+				fields=list(EMP201_ROW_FIELDS),
+				order_by="submission_period_start_date, name",
 			)
 		except Exception as e:
 			error_msg = str(e)
@@ -643,15 +719,18 @@ class EMP501Reconciliation(Document):
 				"emp201_submissions",
 				{
 					"emp201_submission": emp201_doc.name,
-					"submission_date": emp201_doc.submission_date,
-					"paye": emp201_doc.paye,
-					"sdl": emp201_doc.sdl,
-					"uif": emp201_doc.uif,
-					"eti": emp201_doc.eti,
+					"submission_date": emp201_doc.submission_period_start_date,
+					"paye": emp201_doc.gross_paye_before_eti,
+					"sdl": emp201_doc.sdl_payable,
+					"uif": emp201_doc.uif_payable,
+					"eti": emp201_doc.eti_utilized_current_month,
 				},
 			)
 			count += 1
 
+		# The fetched rows are the linked rows; calculate_totals and the save's
+		# validate reuse them instead of reading the declarations again.
+		self._linked_emp201_rows = (tuple(row.name for row in emp201_docs), emp201_docs)
 		self.calculate_totals()
 		self.save(ignore_permissions=True)
 
@@ -729,133 +808,20 @@ class EMP501Reconciliation(Document):
 			)
 			return {"created": 0, "updated": 0, "errors": 0, "message": "No salary slips found"}
 
-		# Clear existing references (will be regenerated)
-		self.irp5_certificates = []
-
-		created_count = 0
-		updated_count = 0
-		reused_count = 0
-		errors = []
-
-		for emp_id, emp_name in unique_employees.items():
-			try:
-				existing_certificates = get_active_certificate_names(
-					{
-						"employee": emp_id,
-						"tax_year": self.tax_year,
-						"company": self.company,
-						"reconciliation_period": self.reconciliation_period,
-					}
-				)
-				if len(existing_certificates) > 1:
-					frappe.throw(
-						_(
-							"Multiple active certificates exist for {0}. Cancel the duplicate before generating again."
-						).format(emp_name),
-						title=_("Duplicate IRP5 Certificates"),
-					)
-				existing_cert_name = existing_certificates[0] if existing_certificates else None
-
-				if existing_cert_name:
-					# Update existing certificate
-					cert = frappe.get_doc("IRP5 Certificate", existing_cert_name)
-
-					# Only update if certificate is not submitted
-					if cert.docstatus == 1:
-						self.append(
-							"irp5_certificates",
-							{
-								"irp5_certificate": existing_cert_name,
-								"employee": emp_id,
-								"employee_name": emp_name,
-								"status": cert.status,
-							},
-						)
-						reused_count += 1
-						continue
-
-					# Update certificate fields
-					cert.from_date = self.from_date
-					cert.to_date = self.to_date
-					# Only update emp501_reconciliation if it's not already set or if it's different
-					if not cert.emp501_reconciliation or cert.emp501_reconciliation != self.name:
-						cert.emp501_reconciliation = self.name
-					# Regenerate certificate data to ensure it's up to date
-					cert.generate_certificate_data()
-					cert.save(ignore_permissions=True)
-					cert_status = cert.status
-					irp5_cert_name = cert.name
-					updated_count += 1
-				else:
-					# Create new certificate
-					cert = frappe.new_doc("IRP5 Certificate")
-					cert.employee = emp_id
-					cert.tax_year = self.tax_year
-					cert.company = self.company
-					cert.from_date = self.from_date
-					cert.to_date = self.to_date
-					cert.reconciliation_period = self.reconciliation_period
-					cert.emp501_reconciliation = self.name
-					# Generate certificate data from salary slips
-					cert.generate_certificate_data()
-					# Validate before inserting
-					cert.validate()
-					cert.insert(ignore_permissions=True)
-					# Refresh to get the actual saved document
-					cert.reload()
-					cert_status = cert.status
-					irp5_cert_name = cert.name
-					created_count += 1
-
-				# Verify certificate exists in database before adding to child table
-				if irp5_cert_name:
-					# Double-check that the certificate actually exists
-					cert_exists = frappe.db.exists("IRP5 Certificate", irp5_cert_name)
-					if cert_exists:
-						self.append(
-							"irp5_certificates",
-							{
-								"irp5_certificate": irp5_cert_name,
-								"employee": emp_id,
-								"employee_name": emp_name,
-								"status": cert_status,
-							},
-						)
-					else:
-						# Certificate was supposed to be created but doesn't exist
-						error_msg = f"Certificate {irp5_cert_name} was created but not found in database"
-						frappe.log_error(
-							title=f"IRP5 Certificate Missing - {emp_name}",
-							message=error_msg,
-						)
-						errors.append(
-							{
-								"employee": emp_name,
-								"error": "Certificate creation failed - certificate not found in database",
-							}
-						)
-
-			except Exception as e:
-				# Log full traceback for debugging
-				error_traceback = frappe.get_traceback()
-				error_msg = f"Failed to process IRP5 for employee {emp_name} ({emp_id}): {e!s}"
-				frappe.log_error(
-					title=f"IRP5 Generation Error - {emp_name}",
-					message=error_traceback,
-				)
-				# Include more details in error message
-				error_details = {
-					"employee": emp_name,
-					"employee_id": emp_id,
-					"error": str(e),
-					"error_type": type(e).__name__,
-				}
-				errors.append(error_details)
-				# Don't add to child table if certificate creation failed
-				continue
-
-		# Save EMP501 with updated IRP5 references
-		self.save(ignore_permissions=True)
+		if len(unique_employees) > IRP5_BULK_SYNC_LIMIT:
+			total = start_irp5_bulk_generation(self, unique_employees)
+			message = _(
+				"IRP5 generation for {0} employees has been queued. Certificates are committed in batches; "
+				"progress is shown on this form."
+			).format(total)
+			frappe.msgprint(message, indicator="blue", title=_("IRP5 Generation Queued"))
+			return {"queued": True, "total": total, "message": message}
+
+		summary = generate_irp5_certificates_now(self, unique_employees)
+		created_count = summary.created
+		updated_count = summary.updated
+		reused_count = summary.reused
+		errors = summary.errors
 
 		# Prepare summary message
 		total_processed = created_count + updated_count + reused_count
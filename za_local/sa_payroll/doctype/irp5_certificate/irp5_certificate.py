@@ -1,7 +1,9 @@
 import base64
 import hashlib
 import json
+import re
 from collections import defaultdict
+from functools import lru_cache
 from io import BytesIO
 
 import frappe
@@ -9,6 +11,7 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import cint, escape_html, flt, getdate, today
 
+from za_local.utils.component_registry import get_component_registry
 from za_local.utils.statutory_rates import get_rate_pack
 
 pdf_generation_available = False
@@ -30,6 +33,10 @@ except Exception:  # pragma: no cover - defensive import
 	get_active_directive = None
 
 
+# Bump when the PDF layout changes so cached certificate PDFs are re-rendered.
+IRP5_PDF_RENDER_VERSION = "1"
+# Cached renders are named "<certificate>-<16 hex digits of the snapshot hash>.pdf".
+IRP5_PDF_CACHE_FILE_PATTERN = re.compile(r"-[0-9a-f]{16}\.pdf$")
 MEDICAL_SCHEME_TAX_CREDIT_CODE = "4116"
 ADDITIONAL_MEDICAL_EXPENSES_TAX_CREDIT_CODE = "4120"
 VALID_IT3A_REASON_CODES = {"02", "03", "04", "05", "06", "07", "08", "09", "10"}
@@ -501,10 +508,16 @@ class IRP5Certificate(Document):
 		self._unmapped_salary_components = []
 		self._mapping_errors = []
 		self._sars_code_cache = {}
+		self._salary_slips = None
 
 	def _snapshot_master_data(self):
-		employee = frappe.get_doc("Employee", self.employee)
-		company = frappe.get_doc("Company", self.company)
+		source = getattr(self, "_bulk_source", None)
+		if source:
+			employee = source.get_employee(self.employee)
+			company = source.company_doc
+		else:
+			employee = frappe.get_doc("Employee", self.employee)
+			company = frappe.get_doc("Company", self.company)
 		self.employee_name = employee.employee_name
 
 		to_date = getdate(self.to_date)
@@ -567,7 +580,7 @@ class IRP5Certificate(Document):
 		self.directive_numbers = self._get_directive_numbers()
 
 	def _generate_certificate_lines(self):
-		salary_slips = self._get_salary_slips(self.employee, self.from_date, self.to_date)
+		salary_slips = self._salary_slips = self._get_salary_slips(self.employee, self.from_date, self.to_date)
 		if not salary_slips:
 			frappe.throw(_("No salary slips found for this employee in the selected period."))
 
@@ -580,48 +593,46 @@ class IRP5Certificate(Document):
 		gross_taxable_income = 0.0
 		non_taxable_income = 0.0
 
-		for salary_slip in salary_slips:
-			salary_slip_doc = frappe.get_doc("Salary Slip", salary_slip.name)
-
-			for earning in salary_slip_doc.earnings:
-				code_doc = self._get_sars_payroll_code(earning.salary_component)
+		for line in self._get_salary_lines(salary_slips):
+			component_name = line.salary_component
+			if line.parentfield == "earnings":
+				code_doc = self._get_sars_payroll_code(component_name)
 				if not code_doc:
 					continue
 				if code_doc.category != "Income":
 					self._mapping_errors.append(
-						f"{earning.salary_component} is mapped to {code_doc.category}, but appears in salary slip earnings"
+						f"{component_name} is mapped to {code_doc.category}, but appears in salary slip earnings"
 					)
 					continue
 				income_map[code_doc.code]["description"] = code_doc.description
-				income_map[code_doc.code]["amount"] += flt(earning.amount)
+				income_map[code_doc.code]["amount"] += flt(line.amount)
 				if code_doc.tax_treatment == "Taxable":
-					gross_taxable_income += flt(earning.amount)
+					gross_taxable_income += flt(line.amount)
 				elif code_doc.tax_treatment == "Non-Taxable":
-					non_taxable_income += flt(earning.amount)
+					non_taxable_income += flt(line.amount)
 				elif code_doc.tax_treatment != "Reference":
 					self._mapping_errors.append(
-						f"{earning.salary_component} has unsupported tax treatment '{code_doc.tax_treatment}'"
+						f"{component_name} has unsupported tax treatment '{code_doc.tax_treatment}'"
 					)
 
-			for deduction in salary_slip_doc.deductions:
-				code_doc = self._get_sars_payroll_code(deduction.salary_component)
+			elif line.parentfield == "deductions":
+				code_doc = self._get_sars_payroll_code(component_name)
 				if not code_doc:
 					continue
 				if code_doc.category == "Tax Credit":
-					medical_credits[code_doc.code] += flt(deduction.amount)
+					medical_credits[code_doc.code] += flt(line.amount)
 					deduction_map[code_doc.code]["description"] = code_doc.description
-					deduction_map[code_doc.code]["amount"] += flt(deduction.amount)
+					deduction_map[code_doc.code]["amount"] += flt(line.amount)
 					continue
 				if code_doc.category != "Deduction":
 					self._mapping_errors.append(
-						f"{deduction.salary_component} is mapped to {code_doc.category}, but appears in salary slip deductions"
+						f"{component_name} is mapped to {code_doc.category}, but appears in salary slip deductions"
 					)
 					continue
 				deduction_map[code_doc.code]["description"] = code_doc.description
-				deduction_map[code_doc.code]["amount"] += flt(deduction.amount)
+				deduction_map[code_doc.code]["amount"] += flt(line.amount)
 
-			for contribution in getattr(salary_slip_doc, "company_contribution", []) or []:
-				component_name = getattr(contribution, "salary_component", None)
+			elif line.parentfield == "company_contribution":
 				if not component_name:
 					continue
 				code_doc = self._get_sars_payroll_code(component_name)
@@ -633,7 +644,7 @@ class IRP5Certificate(Document):
 					)
 					continue
 				contribution_map[code_doc.code]["description"] = code_doc.description
-				contribution_map[code_doc.code]["amount"] += flt(contribution.amount)
+				contribution_map[code_doc.code]["amount"] += flt(line.amount)
 
 		for code, details in sorted(
 			income_map.items(),
@@ -694,7 +705,32 @@ class IRP5Certificate(Document):
 			"contribution_count": len(contribution_map),
 		}
 
+	def _get_salary_lines(self, salary_slips):
+		"""Yield ``parentfield``, ``salary_component`` and ``amount`` for the period's slip rows.
+
+		Bulk generation supplies the rows already summed per component; a single
+		certificate reads them from each Salary Slip.
+		"""
+		source = getattr(self, "_bulk_source", None)
+		if source:
+			yield from source.get_salary_lines(self.employee)
+			return
+
+		for salary_slip in salary_slips:
+			salary_slip_doc = frappe.get_doc("Salary Slip", salary_slip.name)
+			for parentfield in ("earnings", "deductions", "company_contribution"):
+				for row in salary_slip_doc.get(parentfield) or []:
+					yield frappe._dict(
+						parentfield=parentfield,
+						salary_component=row.get("salary_component"),
+						amount=row.get("amount"),
+					)
+
 	def _get_salary_slips(self, employee, from_date, to_date):
+		source = getattr(self, "_bulk_source", None)
+		if source and employee == self.employee:
+			return source.get_salary_slips(employee)
+
 		return frappe.get_all(
 			"Salary Slip",
 			filters={
@@ -709,6 +745,7 @@ class IRP5Certificate(Document):
 				"payroll_frequency",
 				"total_working_days",
 				"payment_days",
+				"za_monthly_eti",
 			],
 			order_by="start_date",
 		)
@@ -760,30 +797,21 @@ class IRP5Certificate(Document):
 		if salary_component_name in cache:
 			return cache[salary_component_name]
 
-		component = (
-			frappe.get_cached_value(
-				"Salary Component",
-				salary_component_name,
-				["za_sars_payroll_code", "za_exclude_from_irp5"],
-				as_dict=True,
-			)
-			or frappe._dict()
-		)
+		component = get_component_registry().get(salary_component_name)
 
-		if component.get("za_exclude_from_irp5"):
+		if component and component.za_exclude_from_irp5:
 			cache[salary_component_name] = None
 			return None
 
-		code = component.get("za_sars_payroll_code")
+		code = component.za_sars_payroll_code if component else None
 		if not code:
 			self._unmapped_salary_components.append(
 				f"Salary Component '{salary_component_name}' has no SARS Payroll Code"
 			)
 			cache[salary_component_name] = None
 			return None
-		try:
-			code_doc = frappe.get_cached_doc("SARS Payroll Code", code)
-		except frappe.DoesNotExistError:
+		code_doc = component.sars_code
+		if not code_doc:
 			self._unmapped_salary_components.append(
 				f"SARS Payroll Code '{code}' linked from Salary Component '{salary_component_name}' does not exist"
 			)
@@ -822,13 +850,21 @@ class IRP5Certificate(Document):
 	def _resolve_address(
 		self, explicit_address_name=None, link_doctype=None, link_name=None, fallback_text=None
 	):
-		if explicit_address_name and frappe.db.exists("Address", explicit_address_name):
-			return {"type": "doc", "value": frappe.get_doc("Address", explicit_address_name)}
+		source = getattr(self, "_bulk_source", None)
+		if source:
+			address = source.get_address(explicit_address_name)
+			if not address and link_doctype and link_name:
+				address = source.get_primary_linked_address(link_doctype, link_name)
+			if address:
+				return {"type": "doc", "value": address}
+		else:
+			if explicit_address_name and frappe.db.exists("Address", explicit_address_name):
+				return {"type": "doc", "value": frappe.get_doc("Address", explicit_address_name)}
 
-		if link_doctype and link_name:
-			address_name = _get_primary_linked_address(link_doctype, link_name)
-			if address_name:
-				return {"type": "doc", "value": frappe.get_doc("Address", address_name)}
+			if link_doctype and link_name:
+				address_name = _get_primary_linked_address(link_doctype, link_name)
+				if address_name:
+					return {"type": "doc", "value": frappe.get_doc("Address", address_name)}
 
 		if fallback_text:
 			return {"type": "text", "value": fallback_text}
@@ -854,8 +890,14 @@ class IRP5Certificate(Document):
 		}
 
 		bank_account_name = employee.get("za_payroll_payable_bank_account")
-		if bank_account_name and frappe.db.exists("Bank Account", bank_account_name):
+		source = getattr(self, "_bulk_source", None)
+		if source:
+			bank_account = source.get_bank_account(bank_account_name)
+		elif bank_account_name and frappe.db.exists("Bank Account", bank_account_name):
 			bank_account = frappe.get_doc("Bank Account", bank_account_name)
+		else:
+			bank_account = None
+		if bank_account:
 			bank_details["bank_name"] = bank_details["bank_name"] or bank_account.get("bank")
 			bank_details["bank_account_no"] = bank_details["bank_account_no"] or bank_account.get(
 				"bank_account_no"
@@ -870,6 +912,10 @@ class IRP5Certificate(Document):
 		return bank_details
 
 	def _get_directive_numbers(self):
+		source = getattr(self, "_bulk_source", None)
+		if source:
+			return source.get_directive_numbers(self.employee)
+
 		if not frappe.db.exists("DocType", "Tax Directive"):
 			return None
 
@@ -891,13 +937,10 @@ class IRP5Certificate(Document):
 		return ", ".join(numbers) if numbers else None
 
 	def _sort_sars_code(self, code):
-		meta = frappe.db.get_value(
-			"SARS Payroll Code",
-			code,
-			["print_sequence"],
-			as_dict=True,
-		)
-		return (cint(meta.print_sequence) if meta else 9999, code)
+		# The registry holds every SARS Payroll Code linked from a component, which
+		# is every code a certificate line can carry.
+		details = get_component_registry().get_sars_code(code)
+		return (cint(details.print_sequence) if details else 9999, code)
 
 	def calculate_eti(self):
 		"""ETI code 4118 is the theoretical ETI calculated for the employee's
@@ -912,22 +955,61 @@ class IRP5Certificate(Document):
 			self.eti = 0
 			return
 
-		slips = self._get_salary_slips(self.employee, self.from_date, self.to_date)
-		self.eti = sum(flt(frappe.db.get_value("Salary Slip", slip.name, "za_monthly_eti")) for slip in slips)
+		slips = getattr(self, "_salary_slips", None)
+		if slips is None:
+			slips = self._get_salary_slips(self.employee, self.from_date, self.to_date)
+		self.eti = sum(flt(slip.get("za_monthly_eti")) for slip in slips)
 
 	@frappe.whitelist()
 	def export_pdf(self):
 		if self.status == "Draft":
 			frappe.throw(_("Cannot export a draft certificate. Generate certificate data first."))
 		self.validate_statutory_readiness(throw=True)
-		pdf_content = self.generate_official_pdf()
-		return save_file(
-			f"{self.certificate_number or self.name}.pdf",
-			pdf_content,
-			"IRP5 Certificate",
-			self.name,
-			is_private=True,
-		).file_url
+		return self.get_cached_pdf_file().file_url
+
+	def get_pdf_content_hash(self):
+		"""Hash of everything the rendered PDF depends on."""
+		snapshot = self.as_dict(no_default_fields=True, convert_dates_to_str=True)
+		snapshot["name"] = self.name
+		return hashlib.sha256(f"{IRP5_PDF_RENDER_VERSION}|{frappe.as_json(snapshot)}".encode()).hexdigest()
+
+	def get_cached_pdf_file(self):
+		"""Return the private PDF File for this snapshot, rendering it only when the snapshot changed."""
+		file_name = f"{self.certificate_number or self.name}-{self.get_pdf_content_hash()[:16]}.pdf"
+		existing = frappe.db.get_value(
+			"File",
+			{
+				"attached_to_doctype": "IRP5 Certificate",
+				"attached_to_name": self.name,
+				"file_name": file_name,
+			},
+			"name",
+		)
+		self.flags.pdf_rendered = not existing
+		if existing:
+			return frappe.get_doc("File", existing)
+
+		file_doc = save_file(
+			file_name, self.generate_official_pdf(), "IRP5 Certificate", self.name, is_private=True
+		)
+		self.delete_superseded_pdf_files(file_doc.name)
+		return file_doc
+
+	def delete_superseded_pdf_files(self, current_file):
+		"""Remove cached PDFs rendered from earlier snapshots of this certificate."""
+		cached_files = frappe.get_all(
+			"File",
+			filters={
+				"attached_to_doctype": "IRP5 Certificate",
+				"attached_to_name": self.name,
+				"file_name": ["like", "%.pdf"],
+				"name": ["!=", current_file],
+			},
+			fields=["name", "file_name"],
+		)
+		for cached_file in cached_files:
+			if IRP5_PDF_CACHE_FILE_PATTERN.search(cached_file.file_name or ""):
+				frappe.delete_doc("File", cached_file.name, ignore_permissions=True, force=True)
 
 	def generate_official_pdf(self):
 		if not pdf_generation_available:
@@ -1356,12 +1438,23 @@ def _is_leap_year(year):
 	return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
 
 
-def _try_set_pdf_font(can):
+@lru_cache(maxsize=1)
+def _get_pdf_body_font():
+	"""Register Arial once per worker process, falling back to Helvetica."""
 	try:
 		pdfmetrics.registerFont(TTFont("Arial", "Arial.ttf"))
-		can.setFont("Arial", 9)
+		return "Arial"
 	except Exception:
-		can.setFont("Helvetica", 9)
+		return "Helvetica"
+
+
+def _try_set_pdf_font(can):
+	can.setFont(_get_pdf_body_font(), 9)
+
+
+@lru_cache(maxsize=16384)
+def _pdf_string_width(text, font_name, font_size):
+	return pdfmetrics.stringWidth(text, font_name, font_size)
 
 
 def _wrap_pdf_text(value, max_width, font_name="Helvetica", font_size=8.5):
@@ -1369,31 +1462,39 @@ def _wrap_pdf_text(value, max_width, font_name="Helvetica", font_size=8.5):
 	value = str(value or "")
 	if not value:
 		return [""]
+	return list(_wrap_pdf_text_cached(value, max_width, font_name, font_size))
+
 
+@lru_cache(maxsize=4096)
+def _wrap_pdf_text_cached(value, max_width, font_name, font_size):
 	lines = []
 	for paragraph in value.splitlines() or [""]:
 		words = paragraph.split(" ") if paragraph else [""]
 		current = ""
 		for word in words:
 			candidate = f"{current} {word}".strip()
-			if pdfmetrics.stringWidth(candidate, font_name, font_size) <= max_width:
+			if _pdf_string_width(candidate, font_name, font_size) <= max_width:
 				current = candidate
 				continue
 			if current:
 				lines.append(current)
 			current = ""
-			while word and pdfmetrics.stringWidth(word, font_name, font_size) > max_width:
-				chunk = ""
+			while word and _pdf_string_width(word, font_name, font_size) > max_width:
+				# Glyph widths are additive for the unkerned base fonts, so the
+				# longest fitting prefix is found from cached per-character widths.
+				chunk_width = 0.0
+				chunk_length = 0
 				for char in word:
-					if pdfmetrics.stringWidth(chunk + char, font_name, font_size) > max_width:
+					chunk_width += _pdf_string_width(char, font_name, font_size)
+					if chunk_width > max_width:
 						break
-					chunk += char
-				lines.append(chunk)
-				word = word[len(chunk) :]
+					chunk_length += 1
+				lines.append(word[:chunk_length])
+				word = word[chunk_length:]
 			current = word
 		if current:
 			lines.append(current)
-	return lines or [""]
+	return tuple(lines or [""])
 
 
 @frappe.whitelist()
@@ -1,6 +1,8 @@
 import frappe
 from frappe.model.document import Document
 
+from za_local.utils.component_registry import clear_component_registry
+
 
 class SARSPayrollCode(Document):
 	def validate(self):
@@ -15,3 +17,8 @@ class SARSPayrollCode(Document):
 		if self.code and not self.name:
 			self.name = self.code
 
+	def on_update(self):
+		clear_component_registry()
+
+	def on_trash(self):
+		clear_component_registry()
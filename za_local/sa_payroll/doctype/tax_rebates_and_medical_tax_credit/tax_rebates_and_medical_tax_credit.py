@@ -1,6 +1,9 @@
 #
 from frappe.model.document import Document
 
+from za_local.utils.tax_utils import clear_tax_credit_rate_cache
+
 
 class TaxRebatesandMedicalTaxCredit(Document):
-	pass
+	def on_update(self):
+		clear_tax_credit_rate_cache()
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Kartoza and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class ZAPayrollLedger(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("ZA Payroll Ledger", ["company", "end_date"])
+	frappe.db.add_index("ZA Payroll Ledger", ["company", "employee", "end_date"])
@@ -3,12 +3,14 @@
 import frappe
 from frappe import _
 
+from za_local.utils.report_cache import get_cached_report_result
+
 
 def execute(filters=None):
 	filters = _validate_filters(filters)
-	columns = get_columns()
-	data = get_data(filters)
-	return columns, data
+	return get_cached_report_result(
+		"Department Cost Analysis", filters, ("ZA Payroll Ledger",), lambda: (get_columns(), get_data(filters))
+	)
 
 
 def _validate_filters(filters):
@@ -46,51 +48,18 @@ def get_columns():
 def get_data(filters):
 	query = """
 		SELECT
-			e.department,
-			COUNT(DISTINCT ss.employee) as employee_count,
-			SUM(ss.gross_pay) as total_gross,
-			SUM(ss.total_deduction) as total_deductions,
-			SUM(ss.net_pay) as total_net,
-			SUM((
-				SELECT IFNULL(SUM(sd.amount), 0)
-				FROM `tabSalary Detail` sd
-				LEFT JOIN `tabSalary Component` sc ON sc.name = sd.salary_component
-				WHERE sd.parent = ss.name
-					AND sd.parentfield = 'deductions'
-					AND (sd.salary_component = 'PAYE' OR sc.za_sars_payroll_code = '4102')
-			)) as total_paye,
-			SUM((
-				SELECT IFNULL(SUM(sd.amount), 0)
-				FROM `tabSalary Detail` sd
-				LEFT JOIN `tabSalary Component` sc ON sc.name = sd.salary_component
-				WHERE sd.parent = ss.name
-					AND sd.parentfield = 'deductions'
-					AND (sd.salary_component IN ('UIF', 'UIF Employee Contribution')
-						OR sc.za_sars_payroll_code = '4141')
-			) + (
-				SELECT IFNULL(SUM(cc.amount), 0)
-				FROM `tabCompany Contribution` cc
-				LEFT JOIN `tabSalary Component` sc ON sc.name = cc.salary_component
-				WHERE cc.parent = ss.name
-					AND cc.parenttype = 'Salary Slip'
-					AND (cc.salary_component = 'UIF Employer Contribution'
-						OR sc.za_sars_payroll_code = '4141')
-			)) as total_uif,
-			SUM((
-				SELECT IFNULL(SUM(cc.amount), 0)
-				FROM `tabCompany Contribution` cc
-				LEFT JOIN `tabSalary Component` sc ON sc.name = cc.salary_component
-				WHERE cc.parent = ss.name
-					AND cc.parenttype = 'Salary Slip'
-					AND (cc.salary_component IN ('SDL', 'SDL Contribution', 'Skills Development Levy')
-						OR sc.za_sars_payroll_code = '4142')
-			)) as total_sdl
-		FROM `tabSalary Slip` ss
-		INNER JOIN `tabEmployee` e ON e.name = ss.employee
-		WHERE ss.company = %(company)s
-			AND ss.end_date BETWEEN %(from_date)s AND %(to_date)s
-			AND ss.docstatus = 1
-		GROUP BY e.department
+			department,
+			COUNT(DISTINCT employee) as employee_count,
+			SUM(gross_pay) as total_gross,
+			SUM(total_deduction) as total_deductions,
+			SUM(net_pay) as total_net,
+			SUM(paye) as total_paye,
+			SUM(uif_employee + uif_employer) as total_uif,
+			SUM(sdl) as total_sdl
+		FROM `tabZA Payroll Ledger`
+		WHERE company = %(company)s
+			AND end_date BETWEEN %(from_date)s AND %(to_date)s
+		GROUP BY department
 		ORDER BY total_gross DESC
 	"""
 
@@ -4,12 +4,14 @@
 import frappe
 from frappe import _
 
+from za_local.utils.report_cache import get_cached_report_result
+
 
 def execute(filters=None):
 	filters = _validate_filters(filters)
-	columns = get_columns()
-	data = get_data(filters)
-	return columns, data
+	return get_cached_report_result(
+		"EMP201 Report", filters, ("EMP201 Submission",), lambda: (get_columns(), get_data(filters))
+	)
 
 
 def _validate_filters(filters):
@@ -26,6 +26,27 @@ frappe.query_reports["Payroll Register"] = {
 			fieldtype: "Date",
 			default: frappe.datetime.month_end(),
 			reqd: 1
+		},
+		{
+			fieldname: "group_by",
+			label: __("Group By"),
+			fieldtype: "Select",
+			options: ["", "Department"]
+		},
+		{
+			fieldname: "page_length",
+			label: __("Rows per Page"),
+			fieldtype: "Select",
+			options: ["", "500", "1000", "5000"],
+			description: __("Leave empty to show, export and print every slip in the period."),
+			depends_on: "eval:!doc.group_by"
+		},
+		{
+			fieldname: "page",
+			label: __("Page"),
+			fieldtype: "Int",
+			default: 1,
+			depends_on: "eval:!doc.group_by && doc.page_length"
 		}
 	]
 };
@@ -2,13 +2,20 @@
 
 import frappe
 from frappe import _
+from frappe.utils import cint
+
+MAX_PAGE_LENGTH = 5000
+AMOUNT_FIELDS = ("basic", "gross_pay", "paye", "uif", "total_deduction", "net_pay")
 
 
 def execute(filters=None):
 	filters = _validate_filters(filters)
+	if filters.group_by == "Department":
+		return get_department_columns(), get_department_data(filters)
+
 	columns = get_columns()
 	data = get_data(filters)
-	return columns, data
+	return columns, data, get_page_message(filters, len(data))
 
 
 def _validate_filters(filters):
@@ -16,6 +23,10 @@ def _validate_filters(filters):
 	if not filters.company or not filters.from_date or not filters.to_date:
 		frappe.throw(_("Company, From Date, and To Date are required."))
 	frappe.has_permission("Company", "read", doc=filters.company, throw=True)
+	# No Rows per Page returns every slip, so exports and prints are complete. Paging
+	# is opt-in for browsing very large periods on screen.
+	filters.page_length = min(max(cint(filters.page_length), 0), MAX_PAGE_LENGTH)
+	filters.page = max(cint(filters.page) or 1, 1) if filters.page_length else 1
 	return filters
 
 
@@ -51,46 +62,91 @@ def get_columns():
 	]
 
 
+def get_department_columns():
+	return [
+		{
+			"label": _("Department"),
+			"fieldname": "department",
+			"fieldtype": "Link",
+			"options": "Department",
+			"width": 150,
+		},
+		{"label": _("Employees"), "fieldname": "employee_count", "fieldtype": "Int", "width": 100},
+		{"label": _("Salary Slips"), "fieldname": "slip_count", "fieldtype": "Int", "width": 100},
+		*(column for column in get_columns() if column["fieldname"] in AMOUNT_FIELDS),
+	]
+
+
 def get_data(filters):
+	"""Return the submitted slips, or one page of them, ordered by department and employee name."""
 	query = """
 		SELECT
-			ss.employee,
-			ss.employee_name,
-			e.department,
-			e.designation,
-			(
-				SELECT SUM(sd.amount)
-				FROM `tabSalary Detail` sd
-				LEFT JOIN `tabSalary Component` sc ON sc.name = sd.salary_component
-				WHERE sd.parent = ss.name
-					AND sd.parentfield = 'earnings'
-					AND (sd.salary_component IN ('Basic', 'Basic Salary') OR sc.za_sars_payroll_code = '3601')
-			) as basic,
-			ss.gross_pay,
-			ss.total_deduction,
-			ss.net_pay,
-			(
-				SELECT SUM(sd.amount)
-				FROM `tabSalary Detail` sd
-				LEFT JOIN `tabSalary Component` sc ON sc.name = sd.salary_component
-				WHERE sd.parent = ss.name
-					AND sd.parentfield = 'deductions'
-					AND (sd.salary_component = 'PAYE' OR sc.za_sars_payroll_code = '4102')
-			) as paye,
-			(
-				SELECT SUM(sd.amount)
-				FROM `tabSalary Detail` sd
-				LEFT JOIN `tabSalary Component` sc ON sc.name = sd.salary_component
-				WHERE sd.parent = ss.name
-					AND sd.parentfield = 'deductions'
-					AND (sd.salary_component IN ('UIF', 'UIF Employee Contribution') OR sc.za_sars_payroll_code = '4141')
-			) as uif
-		FROM `tabSalary Slip` ss
-		INNER JOIN `tabEmployee` e ON e.name = ss.employee
-		WHERE ss.company = %(company)s
-			AND ss.end_date BETWEEN %(from_date)s AND %(to_date)s
-			AND ss.docstatus = 1
-		ORDER BY e.department, ss.employee_name
+			employee,
+			employee_name,
+			department,
+			designation,
+			basic,
+			gross_pay,
+			total_deduction,
+			net_pay,
+			paye,
+			uif_employee AS uif
+		FROM `tabZA Payroll Ledger`
+		WHERE company = %(company)s
+			AND end_date BETWEEN %(from_date)s AND %(to_date)s
+		ORDER BY department, employee_name, salary_slip
+	"""
+	if filters.page_length:
+		query += " LIMIT %(page_length)s OFFSET %(offset)s"
+
+	return frappe.db.sql(
+		query,
+		{**filters, "offset": (filters.page - 1) * filters.page_length},
+		as_dict=1,
+	)
+
+
+def get_department_data(filters):
+	"""Return one row per department with its payroll totals."""
+	query = """
+		SELECT
+			department,
+			COUNT(DISTINCT employee) AS employee_count,
+			COUNT(*) AS slip_count,
+			SUM(basic) AS basic,
+			SUM(gross_pay) AS gross_pay,
+			SUM(total_deduction) AS total_deduction,
+			SUM(net_pay) AS net_pay,
+			SUM(paye) AS paye,
+			SUM(uif_employee) AS uif
+		FROM `tabZA Payroll Ledger`
+		WHERE company = %(company)s
+			AND end_date BETWEEN %(from_date)s AND %(to_date)s
+		GROUP BY department
+		ORDER BY department
 	"""
 
 	return frappe.db.sql(query, filters, as_dict=1)
+
+
+def get_row_count(filters):
+	return frappe.db.count(
+		"ZA Payroll Ledger",
+		{"company": filters.company, "end_date": ["between", [filters.from_date, filters.to_date]]},
+	)
+
+
+def get_page_message(filters, page_rows):
+	if not filters.page_length or (filters.page == 1 and page_rows < filters.page_length):
+		return None
+
+	total_rows = get_row_count(filters)
+	if not page_rows:
+		return _("Page {0} is empty; the period has {1} salary slips.").format(filters.page, total_rows)
+
+	first_row = (filters.page - 1) * filters.page_length + 1
+	return _(
+		"Showing slips {0} to {1} of {2}. Exports and prints contain this page only; clear Rows per Page for every slip."
+	).format(
+		first_row, first_row + page_rows - 1, total_rows
+	)
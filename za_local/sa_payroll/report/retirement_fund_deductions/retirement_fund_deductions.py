@@ -1,7 +1,8 @@
 import frappe
 from frappe import _
+from frappe.utils import flt
 
-RETIREMENT_FUND_CODES = {"4001", "4003", "4006"}
+from za_local.utils.payroll_ledger import RETIREMENT_FUND_CODES, get_payroll_ledger_code_totals
 
 
 def execute(filters=None):
@@ -43,13 +44,12 @@ def get_columns():
 		},
 		{"label": _("Posting Date"), "fieldname": "posting_date", "fieldtype": "Date", "width": 110},
 		{
-			"label": _("Salary Component"),
-			"fieldname": "salary_component",
+			"label": _("SARS Code"),
+			"fieldname": "za_sars_payroll_code",
 			"fieldtype": "Link",
-			"options": "Salary Component",
-			"width": 220,
+			"options": "SARS Payroll Code",
+			"width": 110,
 		},
-		{"label": _("SARS Code"), "fieldname": "za_sars_payroll_code", "fieldtype": "Data", "width": 90},
 		{
 			"label": _("Employee Deduction"),
 			"fieldname": "employee_deduction",
@@ -76,66 +76,52 @@ def get_data(filters):
 		return []
 
 	conditions = [
-		"ss.company = %(company)s",
-		"ss.docstatus = 1",
+		"company = %(company)s",
+		"(retirement_employee != 0 OR retirement_employer != 0)",
 	]
 	if filters.get("from_date"):
-		conditions.append("ss.end_date >= %(from_date)s")
+		conditions.append("end_date >= %(from_date)s")
 	if filters.get("to_date"):
-		conditions.append("ss.end_date <= %(to_date)s")
+		conditions.append("end_date <= %(to_date)s")
 	if filters.get("employee"):
-		conditions.append("ss.employee = %(employee)s")
+		conditions.append("employee = %(employee)s")
 	if filters.get("department"):
-		conditions.append("e.department = %(department)s")
+		conditions.append("department = %(department)s")
 
 	query = """
-			SELECT
-				ss.name AS salary_slip,
-				ss.employee,
-			ss.employee_name,
-			e.department,
-			ss.posting_date,
-			src.salary_component,
-			sc.za_sars_payroll_code,
-			SUM(CASE WHEN src.source_table = 'deductions' THEN src.amount ELSE 0 END) AS employee_deduction,
-			SUM(CASE WHEN src.source_table = 'company_contribution' THEN src.amount ELSE 0 END) AS employer_contribution,
-			MAX(IFNULL(ss.za_retirement_fund_taxable_excess, 0)) AS retirement_taxable_excess
-		FROM (
-			SELECT parent, salary_component, amount, 'deductions' AS source_table
-			FROM `tabSalary Detail`
-			WHERE parenttype = 'Salary Slip' AND parentfield = 'deductions'
-			UNION ALL
-			SELECT parent, salary_component, amount, 'company_contribution' AS source_table
-			FROM `tabCompany Contribution`
-			WHERE parenttype = 'Salary Slip'
-		) src
-			INNER JOIN `tabSalary Slip` ss ON ss.name = src.parent
-			INNER JOIN `tabEmployee` e ON e.name = ss.employee
-			LEFT JOIN `tabSalary Component` sc ON sc.name = src.salary_component
-			WHERE """
+		SELECT
+			salary_slip,
+			employee,
+			employee_name,
+			department,
+			posting_date,
+			retirement_taxable_excess,
+			sars_code_totals
+		FROM `tabZA Payroll Ledger`
+		WHERE """
 	query += " AND ".join(conditions)
 	query += """
-				AND sc.za_sars_payroll_code IN %(retirement_codes)s
-		GROUP BY
-			ss.name,
-			ss.employee,
-			ss.employee_name,
-			e.department,
-				ss.posting_date,
-				src.salary_component,
-				sc.za_sars_payroll_code
-			ORDER BY ss.posting_date, ss.employee_name, src.salary_component
-			"""
+		ORDER BY posting_date, employee_name, salary_slip
+	"""
 
-	rows = frappe.db.sql(
-		query,
-		{**filters, "retirement_codes": tuple(RETIREMENT_FUND_CODES)},
-		as_dict=True,
-	)
-	seen_salary_slips = set()
-	for row in rows:
-		if row.salary_slip in seen_salary_slips:
-			row.retirement_taxable_excess = 0
-		else:
-			seen_salary_slips.add(row.salary_slip)
+	rows = []
+	for entry in frappe.db.sql(query, filters, as_dict=True):
+		code_totals = get_payroll_ledger_code_totals(entry)
+		# The taxable excess is a slip total, so only the slip's first code row carries it.
+		taxable_excess = flt(entry.retirement_taxable_excess)
+		for code in sorted(RETIREMENT_FUND_CODES & set(code_totals)):
+			rows.append(
+				frappe._dict(
+					salary_slip=entry.salary_slip,
+					employee=entry.employee,
+					employee_name=entry.employee_name,
+					department=entry.department,
+					posting_date=entry.posting_date,
+					za_sars_payroll_code=code,
+					employee_deduction=flt(code_totals[code].get("deductions")),
+					employer_contribution=flt(code_totals[code].get("company_contribution")),
+					retirement_taxable_excess=taxable_excess,
+				)
+			)
+			taxable_excess = 0
 	return rows
@@ -2,6 +2,7 @@
 
 import frappe
 from frappe import _
+from frappe.utils import flt
 
 
 def execute(filters=None):
@@ -27,60 +28,38 @@ def get_columns():
 	]
 
 
-def get_data(filters):
-	# Get totals for PAYE, UIF, SDL, and ETI using SARS code mappings.
-	query = """
-		SELECT component, SUM(amount) AS amount
-		FROM (
-			SELECT
-				CASE
-					WHEN sd.salary_component = 'PAYE' OR sc.za_sars_payroll_code = '4102' THEN 'PAYE'
-					WHEN sd.salary_component IN ('UIF', 'UIF Employee Contribution') OR sc.za_sars_payroll_code = '4141' THEN 'UIF Employee Contribution'
-					WHEN (sd.salary_component = 'ETI' OR sc.za_sars_payroll_code = '4118')
-						AND IFNULL(ss.za_monthly_eti, 0) = 0 THEN 'ETI'
-				END AS component,
-				sd.amount AS amount
-			FROM `tabSalary Detail` sd
-			INNER JOIN `tabSalary Slip` ss ON ss.name = sd.parent
-			LEFT JOIN `tabSalary Component` sc ON sc.name = sd.salary_component
-			WHERE ss.company = %(company)s
-				AND ss.end_date BETWEEN %(from_date)s AND %(to_date)s
-				AND ss.docstatus = 1
-				AND sd.parentfield = 'deductions'
-
-			UNION ALL
-
-			SELECT
-				CASE
-					WHEN cc.salary_component IN ('UIF Employer Contribution') OR sc.za_sars_payroll_code = '4141' THEN 'UIF Employer Contribution'
-					WHEN cc.salary_component IN ('SDL', 'SDL Contribution', 'Skills Development Levy') OR sc.za_sars_payroll_code = '4142' THEN 'SDL Contribution'
-				END AS component,
-				cc.amount AS amount
-			FROM `tabCompany Contribution` cc
-			INNER JOIN `tabSalary Slip` ss ON ss.name = cc.parent
-			LEFT JOIN `tabSalary Component` sc ON sc.name = cc.salary_component
-			WHERE ss.company = %(company)s
-				AND ss.end_date BETWEEN %(from_date)s AND %(to_date)s
-				AND ss.docstatus = 1
-				AND cc.parenttype = 'Salary Slip'
+STATUTORY_COMPONENTS = (
+	("PAYE", "paye"),
+	("UIF Employee Contribution", "uif_employee"),
+	("UIF Employer Contribution", "uif_employer"),
+	("SDL Contribution", "sdl"),
+	("ETI", "eti"),
+)
 
-			UNION ALL
 
-			SELECT
-				'ETI' AS component,
-				ss.za_monthly_eti AS amount
-			FROM `tabSalary Slip` ss
-			WHERE ss.company = %(company)s
-				AND ss.end_date BETWEEN %(from_date)s AND %(to_date)s
-				AND ss.docstatus = 1
-				AND IFNULL(ss.za_monthly_eti, 0) != 0
-		) statutory
-		WHERE component IS NOT NULL
-		GROUP BY component
-		ORDER BY FIELD(component, 'PAYE', 'UIF Employee Contribution', 'UIF Employer Contribution', 'SDL Contribution', 'ETI'), component
+def get_data(filters):
+	# PAYE, UIF, SDL and ETI are bucketed by SARS code when each slip is ledgered.
+	query = """
+		SELECT
+			COUNT(*) AS slip_count,
+			SUM(paye) AS paye,
+			SUM(uif_employee) AS uif_employee,
+			SUM(uif_employer) AS uif_employer,
+			SUM(sdl) AS sdl,
+			SUM(eti) AS eti
+		FROM `tabZA Payroll Ledger`
+		WHERE company = %(company)s
+			AND end_date BETWEEN %(from_date)s AND %(to_date)s
 	"""
 
-	return frappe.db.sql(query, filters, as_dict=1)
+	totals = frappe.db.sql(query, filters, as_dict=1)
+	if not totals or not totals[0].slip_count:
+		return []
+	return [
+		frappe._dict(component=component, amount=flt(totals[0].get(fieldname)))
+		for component, fieldname in STATUTORY_COMPONENTS
+		if flt(totals[0].get(fieldname))
+	]
 
 
 def get_chart_data(data):
@@ -1161,6 +1161,20 @@ def _get_hrms_compliance_custom_field_fixtures():
 			"allow_on_submit": 1,
 			"description": "Audit value for the remuneration excluded from PAYE by South African component classification.",
 		},
+		{
+			"doctype": "Custom Field",
+			"name": "Salary Slip-za_coida_basis",
+			"dt": "Salary Slip",
+			"module": "SA Payroll",
+			"label": "COIDA Basis",
+			"fieldname": "za_coida_basis",
+			"fieldtype": "Currency",
+			"insert_after": "za_paye_inclusion_adjustment",
+			"read_only": 1,
+			"allow_on_submit": 1,
+			"no_copy": 1,
+			"description": "COIDA-applicable earnings of this slip, set on submit and summed by the COIDA annual return.",
+		},
 		{
 			"doctype": "Custom Field",
 			"name": "Salary Slip-za_eti_hours",
@@ -1184,6 +1198,34 @@ def _get_hrms_compliance_custom_field_fixtures():
 			"default": "2500",
 			"description": "ETI Act section 4 monthly floor for an employee with 160 ordinary hours where no wage regulating measure applies or the employee is NMW-exempt. Verify after legislative changes.",
 		},
+		{
+			"doctype": "Custom Field",
+			"name": "Payroll Settings-za_salary_slip_shard_size",
+			"dt": "Payroll Settings",
+			"module": "SA Payroll",
+			"label": "Salary Slip Shard Size",
+			"fieldname": "za_salary_slip_shard_size",
+			"fieldtype": "Int",
+			"insert_after": "za_eti_unregulated_minimum_monthly_wage",
+			"default": "200",
+			"description": "Employees per background job when a Payroll Entry creates Salary Slips. Shards run in parallel on the available workers and failed shards can be retried on their own. Set to 0 to use a single job.",
+		},
+		{
+			"doctype": "Custom Field",
+			"name": "Payroll Entry-za_salary_slip_shards",
+			"dt": "Payroll Entry",
+			"module": "SA Payroll",
+			"label": "Salary Slip Shards",
+			"fieldname": "za_salary_slip_shards",
+			"fieldtype": "Long Text",
+			"insert_after": "error_message",
+			"hidden": 1,
+			"read_only": 1,
+			"allow_on_submit": 1,
+			"no_copy": 1,
+			"print_hide": 1,
+			"description": "Status of each background salary slip job for this entry, kept for progress and retries.",
+		},
 		{
 			"doctype": "Custom Field",
 			"name": "Employee-za_eti_eligibility_section",
@@ -1365,10 +1407,16 @@ def get_custom_field_fixtures():
 	return data
 
 
-def _apply_custom_field_fixtures():
-	"""Apply custom field fixtures from embedded JSON. Skips doctypes that don't exist (e.g. HRMS-only)."""
+def _apply_custom_field_fixtures(names=None):
+	"""Apply custom field fixtures from embedded JSON. Skips doctypes that don't exist (e.g. HRMS-only).
+
+	``names`` limits the run to those Custom Fields, for patches that need a
+	field before ``sync_za_local`` applies the rest after migrate.
+	"""
 	errors = []
 	for d in get_custom_field_fixtures():
+		if names is not None and d["name"] not in names:
+			continue
 		if not frappe.db.exists("DocType", d["dt"]):
 			continue
 		try:
@@ -30,6 +30,7 @@ from za_local.sa_vat.setup import (
 	migrate_legacy_vat_account_rows,
 	seed_vat_vendor_types,
 )
+from za_local.utils.component_registry import clear_component_registry
 from za_local.utils.file_utils import read_app_json, resolve_app_path
 from za_local.utils.hrms_detection import is_hrms_installed
 from za_local.utils.statutory_rates import (
@@ -2492,6 +2493,7 @@ def seed_sars_payroll_codes(overwrite=False):
 						update_modified=False,
 					)
 
+	clear_component_registry()
 	print("  ✓ SARS Payroll Codes seeded")
 
 
@@ -2518,6 +2520,7 @@ def seed_salary_component_classifications(overwrite=False):
 		if update_values:
 			frappe.db.set_value("Salary Component", component, update_values, update_modified=False)
 
+	clear_component_registry()
 	print("  ✓ Salary Component SA payroll classifications seeded")
 
 
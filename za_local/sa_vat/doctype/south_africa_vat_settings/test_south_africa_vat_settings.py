@@ -371,27 +371,39 @@ class TestSouthAfricaVATSettings(UnitTestCase):
 		doc.to_date = "2026-04-30"
 		settings = frappe._dict(output_vat_account="VAT Output - TC")
 
-		with patch("frappe.get_all") as get_all:
-			get_all.side_effect = [
-				[
-					frappe._dict(
-						{
-							"name": "SINV-0001",
-							"posting_date": "2026-04-10",
-							"taxes_and_charges": "SA Standard Rated Sales 15% - Test Company",
-							"base_net_total": 100,
-							"is_return": 0,
-						}
-					)
-				],
-				[
-					frappe._dict({"base_net_amount": 100, "custom_sa_vat_category": "Standard Rated"}),
-				],
-				[
-					frappe._dict({"name": "TAX-1", "rate": 15, "tax_amount": 15, "total": 115}),
-				],
+		with (
+			patch("frappe.get_all") as get_all,
+			patch.object(
+				VAT201Return,
+				"get_invoice_item_category_totals",
+				return_value={
+					"SINV-0001": [
+						frappe._dict({"base_net_amount": 100, "custom_sa_vat_category": "Standard Rated"}),
+					]
+				},
+			),
+			patch.object(
+				VAT201Return,
+				"get_invoice_vat_taxes",
+				return_value={
+					"SINV-0001": [
+						frappe._dict({"name": "TAX-1", "rate": 15, "tax_amount": 15, "total": 115}),
+					]
+				},
+			),
+		):
+			get_all.return_value = [
+				frappe._dict(
+					{
+						"name": "SINV-0001",
+						"posting_date": "2026-04-10",
+						"taxes_and_charges": "SA Standard Rated Sales 15% - Test Company",
+						"base_net_total": 100,
+						"is_return": 0,
+					}
+				)
 			]
-			rows = VAT201Return.get_sales_invoice_rows(doc, settings)
+			rows = VAT201Return.get_sales_invoice_rows(doc, settings, doc.from_date, doc.to_date)
 
 		self.assertEqual(1, len(rows))
 		self.assertEqual(15, rows[0]["tax_amount"])
@@ -405,25 +417,31 @@ class TestSouthAfricaVATSettings(UnitTestCase):
 		doc.to_date = "2026-04-30"
 		settings = frappe._dict(input_vat_account="VAT Input - TC")
 
-		with patch("frappe.get_all") as get_all:
-			get_all.side_effect = [
-				[
-					frappe._dict(
-						{
-							"name": "PINV-0001",
-							"posting_date": "2026-04-10",
-							"taxes_and_charges": "",
-							"base_net_total": 200,
-							"is_return": 0,
-						}
-					)
-				],
-				[
-					frappe._dict({"base_net_amount": 200, "custom_sa_vat_category": "Zero Rated"}),
-				],
-				[],
+		with (
+			patch("frappe.get_all") as get_all,
+			patch.object(
+				VAT201Return,
+				"get_invoice_item_category_totals",
+				return_value={
+					"PINV-0001": [
+						frappe._dict({"base_net_amount": 200, "custom_sa_vat_category": "Zero Rated"}),
+					]
+				},
+			),
+			patch.object(VAT201Return, "get_invoice_vat_taxes", return_value={}),
+		):
+			get_all.return_value = [
+				frappe._dict(
+					{
+						"name": "PINV-0001",
+						"posting_date": "2026-04-10",
+						"taxes_and_charges": "",
+						"base_net_total": 200,
+						"is_return": 0,
+					}
+				)
 			]
-			rows = VAT201Return.get_purchase_invoice_rows(doc, settings)
+			rows = VAT201Return.get_purchase_invoice_rows(doc, settings, doc.from_date, doc.to_date)
 
 		self.assertEqual([], rows)
 
@@ -434,23 +452,23 @@ class TestSouthAfricaVATSettings(UnitTestCase):
 		doc.to_date = "2026-04-30"
 		settings = frappe._dict(input_vat_account="VAT Input - TC", input_goods_local="SA Standard Rated Purchases 15% - Test Company")
 
-		with patch("frappe.get_all") as get_all:
-			get_all.side_effect = [
-				[
-					frappe._dict(
-						{
-							"name": "PINV-0002",
-							"posting_date": "2026-04-11",
-							"taxes_and_charges": "SA Standard Rated Purchases 15% - Test Company",
-							"base_net_total": 200,
-							"is_return": 0,
-						}
-					)
-				],
-				[],
-				[],
+		with (
+			patch("frappe.get_all") as get_all,
+			patch.object(VAT201Return, "get_invoice_item_category_totals", return_value={}),
+			patch.object(VAT201Return, "get_invoice_vat_taxes", return_value={}),
+		):
+			get_all.return_value = [
+				frappe._dict(
+					{
+						"name": "PINV-0002",
+						"posting_date": "2026-04-11",
+						"taxes_and_charges": "SA Standard Rated Purchases 15% - Test Company",
+						"base_net_total": 200,
+						"is_return": 0,
+					}
+				)
 			]
-			rows = VAT201Return.get_purchase_invoice_rows(doc, settings)
+			rows = VAT201Return.get_purchase_invoice_rows(doc, settings, doc.from_date, doc.to_date)
 
 		self.assertEqual(1, len(rows))
 		self.assertEqual("Needs Review", rows[0]["classification_status"])
@@ -1,4 +1,29 @@
 frappe.ui.form.on("VAT201 Return", {
+	setup(frm) {
+		frappe.realtime.on("za_vat201_refresh_progress", function (data) {
+			// Published to this document's room only.
+			if (!data) {
+				return;
+			}
+			if (["Completed", "Cancelled", "Failed"].includes(data.status)) {
+				frappe.hide_progress();
+				frm.reload_doc();
+				if (data.status !== "Completed") {
+					frappe.msgprint({
+						title: __("VAT Refresh Stopped"),
+						message:
+							data.status === "Cancelled"
+								? __("The VAT transaction refresh was cancelled. The transactions and totals of the previous fetch are unchanged.")
+								: __("The VAT transaction refresh failed and the previous transactions were kept. Review the Error Log, then fetch VAT transactions again."),
+						indicator: data.status === "Cancelled" ? "orange" : "red",
+					});
+				}
+				return;
+			}
+			show_vat_refresh_progress(data);
+		});
+	},
+
 	onload(frm) {
 		update_submission_period(frm);
 	},
@@ -45,6 +70,10 @@ frappe.ui.form.on("VAT201 Return", {
 			});
 		}
 
+		if (frm.doc.docstatus === 0 && !frm.doc.__islocal) {
+			add_vat_refresh_controls(frm);
+		}
+
 		if (!frm.doc.__islocal) {
 			frm.add_custom_button(__("Open Linked Transactions"), function () {
 				route_to_report(frm.doc.name);
@@ -107,6 +136,21 @@ frappe.ui.form.on("VAT201 Return", {
 					},
 				});
 			}, __("Exports"));
+
+			frm.add_custom_button(__("Export Classification Totals CSV"), function () {
+				frm.call({
+					method: "get_classification_total_rows",
+					type: "GET",
+					doc: frm.doc,
+					callback(r) {
+						if (!r.message) return;
+						const rows = [["Classification", "Incl Tax Amount", "Tax Amount"]].concat(
+							r.message.map((row) => [row.classification, row.incl_tax_amount || 0, row.tax_amount || 0]),
+						);
+						download_csv(`${frm.doc.name}-vat201-classification-totals.csv`, rows);
+					},
+				});
+			}, __("Exports"));
 		}
 
 		if (frm.doc.status) {
@@ -150,6 +194,38 @@ function set_form_intro(frm) {
 	}
 }
 
+function add_vat_refresh_controls(frm) {
+	frappe.call({
+		method: "za_local.sa_vat.vat201_refresh.get_vat201_refresh_status",
+		args: { vat_return: frm.doc.name },
+		callback(r) {
+			const progress = r && r.message;
+			if (!progress || !["Queued", "Running"].includes(progress.status)) {
+				return;
+			}
+			show_vat_refresh_progress(progress);
+			frm.add_custom_button(__("Cancel VAT Refresh"), function () {
+				frappe.call({
+					method: "za_local.sa_vat.vat201_refresh.cancel_vat201_refresh",
+					args: { vat_return: frm.doc.name },
+				});
+			});
+		},
+	});
+}
+
+function show_vat_refresh_progress(progress) {
+	frappe.show_progress(
+		__("Refreshing VAT Transactions"),
+		progress.processed_windows,
+		progress.total_windows,
+		__("{0} transactions fetched up to {1}", [
+			progress.transactions,
+			progress.processed_to ? frappe.datetime.str_to_user(progress.processed_to) : "-",
+		]),
+	);
+}
+
 function route_to_report(docname) {
 	frappe.route_options = { vat_return: docname };
 	frappe.set_route("query-report", "VAT 201 Linked Transactions");
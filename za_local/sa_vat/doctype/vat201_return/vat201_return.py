@@ -1,11 +1,24 @@
 # For license information, please see license.txt
 
+import json
+
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.query_builder.functions import Min, Sum
 from frappe.utils import cint, flt, formatdate, getdate, today
 
 from za_local.sa_vat.setup import VAT_RETURN_SETTING_FIELD_MAP, get_vat_settings
+from za_local.sa_vat.vat201_refresh import (
+	VAT201_REFRESH_SYNC_LIMIT,
+	count_period_invoices,
+	get_changed_vouchers,
+	get_transaction_watermarks,
+	is_incremental_refresh,
+	is_vat201_refresh_active,
+	start_vat201_refresh,
+)
+from za_local.sa_vat.vat201_totals import get_vat201_totals
 
 OUTPUT_STANDARD_NON_CAPITAL = "Output - A Standard rate (excl capital goods)"
 OUTPUT_STANDARD_CAPITAL = "Output - B Standard rate (only capital goods)"
@@ -27,17 +40,33 @@ PURCHASE_INPUT_CLASSIFICATIONS = {
 	INPUT_OTHER_LOCAL,
 	INPUT_OTHER_IMPORTED,
 }
+# (box field, classification, transaction amount summed into it)
+VAT201_BOX_CLASSIFICATIONS = (
+	("standard_rated_supplies_non_capital", OUTPUT_STANDARD_NON_CAPITAL, "incl_tax_amount"),
+	("standard_rated_supplies_capital", OUTPUT_STANDARD_CAPITAL, "incl_tax_amount"),
+	("zero_rated_supplies_local", OUTPUT_ZERO_LOCAL, "incl_tax_amount"),
+	("zero_rated_supplies_exported", OUTPUT_ZERO_EXPORTED, "incl_tax_amount"),
+	("exempt_supplies", OUTPUT_EXEMPT, "incl_tax_amount"),
+	("standard_rated_output_non_capital", OUTPUT_STANDARD_NON_CAPITAL, "tax_amount"),
+	("standard_rated_output_capital", OUTPUT_STANDARD_CAPITAL, "tax_amount"),
+	("capital_goods_input_local", INPUT_CAPITAL_LOCAL, "tax_amount"),
+	("capital_goods_input_imported", INPUT_CAPITAL_IMPORTED, "tax_amount"),
+	("other_goods_services_input_local", INPUT_OTHER_LOCAL, "tax_amount"),
+	("other_goods_services_input_imported", INPUT_OTHER_IMPORTED, "tax_amount"),
+)
 
 
 class VAT201Return(Document):
 	def validate(self):
 		self.validate_dates()
+		self.validate_no_active_refresh()
 		self.prevent_duplicate_open_return()
 		self.ensure_period_dates()
 		self.set_submission_period()
 		self.set_vat_registration_number()
-		self.calculate_totals()
-		self.set_review_summary()
+		totals = get_vat201_totals(self.transactions)
+		self.calculate_totals(totals)
+		self.set_review_summary(totals)
 
 	def validate_dates(self):
 		if getdate(self.submission_date) > getdate(today()):
@@ -84,44 +113,12 @@ class VAT201Return(Document):
 		if self.company:
 			self.vat_registration_number = frappe.db.get_value("Company", self.company, "za_vat_number") or ""
 
-	def calculate_totals(self):
-		transactions = [
-			row
-			for row in self.transactions
-			if not row.is_cancelled and row.classification and row.classification_status == CLASSIFIED
-		]
-
-		self.standard_rated_supplies_non_capital = sum(
-			flt(row.incl_tax_amount) for row in transactions if row.classification == OUTPUT_STANDARD_NON_CAPITAL
-		)
-		self.standard_rated_supplies_capital = sum(
-			flt(row.incl_tax_amount) for row in transactions if row.classification == OUTPUT_STANDARD_CAPITAL
-		)
-		self.zero_rated_supplies_local = sum(
-			flt(row.incl_tax_amount) for row in transactions if row.classification == OUTPUT_ZERO_LOCAL
-		)
-		self.zero_rated_supplies_exported = sum(
-			flt(row.incl_tax_amount) for row in transactions if row.classification == OUTPUT_ZERO_EXPORTED
-		)
-		self.standard_rated_output_non_capital = sum(
-			flt(row.tax_amount) for row in transactions if row.classification == OUTPUT_STANDARD_NON_CAPITAL
-		)
-		self.standard_rated_output_capital = sum(
-			flt(row.tax_amount) for row in transactions if row.classification == OUTPUT_STANDARD_CAPITAL
-		)
-		self.capital_goods_input_local = sum(
-			flt(row.tax_amount) for row in transactions if row.classification == INPUT_CAPITAL_LOCAL
-		)
-		self.capital_goods_input_imported = sum(
-			flt(row.tax_amount) for row in transactions if row.classification == INPUT_CAPITAL_IMPORTED
-		)
-		self.other_goods_services_input_local = sum(
-			flt(row.tax_amount) for row in transactions if row.classification == INPUT_OTHER_LOCAL
-		)
-		self.other_goods_services_input_imported = sum(
-			flt(row.tax_amount) for row in transactions if row.classification == INPUT_OTHER_IMPORTED
-		)
-		self.exempt_supplies = sum(flt(row.incl_tax_amount) for row in transactions if row.classification == OUTPUT_EXEMPT)
+	def calculate_totals(self, totals=None):
+		"""Set the VAT201 boxes from ``totals`` (``get_vat201_totals``), by default of this return."""
+		if totals is None:
+			totals = get_vat201_totals(self.transactions)
+		for fieldname, classification, amount_field in VAT201_BOX_CLASSIFICATIONS:
+			self.set(fieldname, (totals.classifications.get(classification) or {}).get(amount_field, 0))
 
 		self.standard_rated_supplies = flt(self.standard_rated_supplies_non_capital) + flt(
 			self.standard_rated_supplies_capital
@@ -166,29 +163,18 @@ class VAT201Return(Document):
 			self.total_amount_payable = 0
 			self.vat_refundable = self.vat_refundable + flt(self.diesel_refund)
 
-	def set_review_summary(self):
-		review_rows = [
-			row
-			for row in self.transactions
-			if not row.is_cancelled and getattr(row, "classification_status", None) == NEEDS_REVIEW
-		]
-		self.unresolved_transaction_count = len(review_rows)
-		self.unresolved_issues_summary = "\n".join(
-			f"{row.voucher_type} {row.voucher_no}: {row.classification_issue}"
-			for row in review_rows[:10]
-			if row.classification_issue
-		)
+	def set_review_summary(self, totals=None):
+		if totals is None:
+			totals = get_vat201_totals(self.transactions)
+		self.unresolved_transaction_count = totals.review_count
+		self.unresolved_issues_summary = "\n".join(totals.review_issues)
 
 	def on_submit(self):
-		review_rows = [
-			row
-			for row in self.transactions
-			if not row.is_cancelled and getattr(row, "classification_status", None) == NEEDS_REVIEW
-		]
-		if review_rows:
+		review_count = get_vat201_totals(self.transactions).review_count
+		if review_count:
 			frappe.throw(
 				_("Please resolve the remaining {0} VAT201 review items before submitting.").format(
-					len(review_rows)
+					review_count
 				)
 			)
 		updates = {}
@@ -253,9 +239,47 @@ class VAT201Return(Document):
 			)
 		return rows
 
+	@frappe.whitelist(methods=["GET"])
+	def get_classification_total_rows(self):
+		"""Return the classified totals behind the VAT201 boxes, one row per classification."""
+		self.check_permission("read")
+		classifications = get_vat201_totals(self.transactions).classifications
+		return [
+			{
+				"classification": classification,
+				"incl_tax_amount": classifications[classification]["incl_tax_amount"],
+				"tax_amount": classifications[classification]["tax_amount"],
+			}
+			for classification in sorted(classifications)
+		]
+
 	@frappe.whitelist(methods=["POST"])
 	def get_vat_transactions(self):
 		self.check_permission("write")
+		self.validate_no_active_refresh()
+		settings = self.get_refresh_settings()
+		watermarks = get_transaction_watermarks(self, settings)
+		previous = self.get_saved_watermarks()
+
+		refreshed_vouchers = None
+		if self.transactions and is_incremental_refresh(previous, watermarks):
+			refreshed_vouchers = self.refresh_changed_transactions(
+				settings, get_changed_vouchers(self, previous)
+			)
+		elif count_period_invoices(self) > VAT201_REFRESH_SYNC_LIMIT:
+			windows = start_vat201_refresh(self)
+			return self.get_vat_refresh_queued_feedback(windows)
+		else:
+			self.set("transactions", self.get_transaction_rows(settings, self.from_date, self.to_date))
+
+		self.transaction_watermarks = json.dumps(watermarks)
+		self.save()
+		return self.get_vat_transactions_feedback(
+			len(self.transactions), self.unresolved_transaction_count, refreshed_vouchers
+		)
+
+	def get_refresh_settings(self):
+		"""Validate that this return can refresh its linked transactions and return the VAT settings."""
 		if not self.company or not self.from_date or not self.to_date:
 			frappe.throw(_("Company, From Date, and To Date are required."))
 		if self.docstatus != 0 or self.status != "Draft":
@@ -264,47 +288,101 @@ class VAT201Return(Document):
 		settings = get_vat_settings(self.company)
 		if not settings.output_vat_account or not settings.input_vat_account:
 			frappe.throw(_("VAT accounts are not configured in South Africa VAT Settings for company {0}.").format(self.company))
+		return settings
+
+	def validate_no_active_refresh(self):
+		if not self.is_new() and is_vat201_refresh_active(self.name):
+			frappe.throw(
+				_(
+					"VAT transactions for {0} are being refreshed in the background. Wait for the refresh to finish or cancel it first."
+				).format(self.name),
+				title=_("VAT Refresh In Progress"),
+			)
 
+	def get_transaction_rows(self, settings, from_date, to_date, vouchers=None):
+		"""Return the linked transaction rows for invoices and journals posted in the given date range.
+
+		``vouchers`` (``{voucher_type: [names]}``), when given, limits the rows to those vouchers.
+		"""
 		rows = []
-		rows.extend(self.get_sales_invoice_rows(settings))
-		rows.extend(self.get_purchase_invoice_rows(settings))
-		rows.extend(self.get_journal_entry_rows(settings))
+		for voucher_type, get_rows in (
+			("Sales Invoice", self.get_sales_invoice_rows),
+			("Purchase Invoice", self.get_purchase_invoice_rows),
+			("Journal Entry", self.get_journal_entry_rows),
+		):
+			if vouchers is None:
+				rows.extend(get_rows(settings, from_date, to_date))
+			elif vouchers.get(voucher_type):
+				rows.extend(get_rows(settings, from_date, to_date, vouchers[voucher_type]))
+		return rows
 
-		self.transactions = []
+	def refresh_changed_transactions(self, settings, vouchers):
+		"""Rebuild the rows of ``vouchers`` (``{voucher_type: [names]}``) only; return how many were re-read."""
+		changed = {(voucher_type, name) for voucher_type, names in vouchers.items() for name in names}
+		if not changed:
+			return 0
+
+		rows = self.get_transaction_rows(settings, self.from_date, self.to_date, vouchers)
+		kept = [row for row in self.transactions if (row.voucher_type, row.voucher_no) not in changed]
+		self.set("transactions", kept)
 		for row in rows:
 			self.append("transactions", row)
+		for idx, row in enumerate(self.transactions, start=1):
+			row.idx = idx
+		return len(changed)
 
-		self.calculate_totals()
-		self.set_review_summary()
-		self.set_submission_period()
-		unclassified_count = len(
-			[
-				row
-				for row in rows
-				if row.get("classification_status") == NEEDS_REVIEW and not row.get("is_cancelled")
-			]
-		)
-		return self.get_vat_transactions_feedback(len(rows), unclassified_count)
+	def get_saved_watermarks(self):
+		value = self.get("transaction_watermarks")
+		if isinstance(value, dict):
+			return value
+		return json.loads(value or "{}")
+
+	def get_vat_refresh_queued_feedback(self, window_count):
+		return {
+			"title": _("VAT Refresh Queued"),
+			"indicator": "blue",
+			"message": _(
+				"This VAT period is large, so its transactions are being fetched in the background in {0} date windows."
+			).format(window_count),
+			"details": [
+				{"label": _("Company"), "value": self.company},
+				{"label": _("Period"), "value": self.submission_period},
+			],
+			"warnings": [],
+			"next_steps": [
+				_("Progress is shown on this form. The return is locked until the refresh finishes."),
+				_(
+					"Use Cancel VAT Refresh to stop it. Until the refresh completes, the return keeps the transactions and totals of its previous fetch."
+				),
+			],
+			"queued": True,
+		}
 
-	def get_vat_transactions_feedback(self, transaction_count, unclassified_count):
+	def get_vat_transactions_feedback(self, transaction_count, unclassified_count, refreshed_vouchers=None):
 		warnings = []
 		if unclassified_count:
 			warnings.append(
 				_("{0} linked VAT transactions still need practitioner review.").format(unclassified_count)
 			)
 
+		details = [
+			{"label": _("Company"), "value": self.company},
+			{"label": _("Period"), "value": self.submission_period},
+			{"label": _("Linked Transactions"), "value": transaction_count},
+			{"label": _("Needs Review"), "value": unclassified_count},
+			{"label": _("VAT Payable"), "value": self.vat_payable},
+			{"label": _("VAT Refundable"), "value": self.vat_refundable},
+		]
+		message = _("VAT transactions were fetched and classified for this VAT201 working paper.")
+		if refreshed_vouchers is not None:
+			details.append({"label": _("Changed Vouchers Re-read"), "value": refreshed_vouchers})
+			message = _("Only vouchers submitted, cancelled or amended since the last refresh were re-read.")
+
 		return {
 			"title": _("VAT Transactions Fetched"),
 			"indicator": "orange" if warnings else "green",
-			"message": _("VAT transactions were fetched and classified for this VAT201 working paper."),
-			"details": [
-				{"label": _("Company"), "value": self.company},
-				{"label": _("Period"), "value": self.submission_period},
-				{"label": _("Linked Transactions"), "value": transaction_count},
-				{"label": _("Needs Review"), "value": unclassified_count},
-				{"label": _("VAT Payable"), "value": self.vat_payable},
-				{"label": _("VAT Refundable"), "value": self.vat_refundable},
-			],
+			"message": message,
+			"details": details,
 			"warnings": warnings,
 			"next_steps": [
 				_("Review any transactions marked Needs Review."),
@@ -315,102 +393,171 @@ class VAT201Return(Document):
 			"unclassified_count": unclassified_count,
 		}
 
-	def get_sales_invoice_rows(self, settings):
+	def get_sales_invoice_rows(self, settings, from_date, to_date, names=None):
 		rows = []
-		invoices = frappe.get_all(
-			"Sales Invoice",
-			filters={
-				"company": self.company,
-				"docstatus": 1,
-				"posting_date": ["between", [self.from_date, self.to_date]],
-			},
-			fields=["name", "posting_date", "taxes_and_charges", "base_net_total", "is_return"],
+		period = (from_date, to_date, names)
+		invoices = self.get_period_invoices("Sales Invoice", *period)
+		item_totals = self.get_invoice_item_category_totals("Sales Invoice", "Sales Invoice Item", *period)
+		taxes_by_invoice = self.get_invoice_vat_taxes(
+			"Sales Invoice", "Sales Taxes and Charges", settings.output_vat_account, "total", *period
 		)
 		for invoice in invoices:
 			sign = self.get_invoice_sign(invoice)
 			default_classification = self.get_template_classification(
 				settings, invoice.taxes_and_charges, "Sales Invoice"
 			)
-			item_groups = self.get_invoice_item_groups(
-				invoice.name, "Sales Invoice Item", self.classify_sales_item_category, default_classification, sign
-			)
-			taxes = frappe.get_all(
-				"Sales Taxes and Charges",
-				filters={"parent": invoice.name, "account_head": settings.output_vat_account},
-				fields=["name", "rate", "base_tax_amount as tax_amount", "total"],
-				order_by="idx asc",
+			item_groups = self.group_invoice_items(
+				item_totals.get(invoice.name, []),
+				self.classify_sales_item_category,
+				default_classification,
+				sign,
 			)
 			rows.extend(
 				self.build_sales_invoice_rows(
 					invoice=invoice,
 					item_groups=item_groups,
-					taxes=taxes,
+					taxes=taxes_by_invoice.get(invoice.name, []),
 					default_classification=default_classification,
 					sign=sign,
 				)
 			)
 		return rows
 
-	def get_purchase_invoice_rows(self, settings):
+	def get_purchase_invoice_rows(self, settings, from_date, to_date, names=None):
 		rows = []
-		invoices = frappe.get_all(
+		period = (from_date, to_date, names)
+		invoices = self.get_period_invoices("Purchase Invoice", *period)
+		item_totals = self.get_invoice_item_category_totals(
+			"Purchase Invoice", "Purchase Invoice Item", *period
+		)
+		taxes_by_invoice = self.get_invoice_vat_taxes(
 			"Purchase Invoice",
-			filters={
-				"company": self.company,
-				"docstatus": 1,
-				"posting_date": ["between", [self.from_date, self.to_date]],
-			},
-			fields=["name", "posting_date", "taxes_and_charges", "base_net_total", "is_return"],
+			"Purchase Taxes and Charges",
+			settings.input_vat_account,
+			"base_total",
+			*period,
 		)
 		for invoice in invoices:
 			sign = self.get_invoice_sign(invoice)
 			default_classification = self.get_template_classification(
 				settings, invoice.taxes_and_charges, "Purchase Invoice"
 			)
-			item_groups = self.get_invoice_item_groups(
-				invoice.name, "Purchase Invoice Item", self.classify_purchase_item_category, default_classification, sign
-			)
-			taxes = frappe.get_all(
-				"Purchase Taxes and Charges",
-				filters={"parent": invoice.name, "account_head": settings.input_vat_account},
-				fields=["name", "rate", "base_tax_amount as tax_amount", "base_total as total"],
-				order_by="idx asc",
+			item_groups = self.group_invoice_items(
+				item_totals.get(invoice.name, []),
+				self.classify_purchase_item_category,
+				default_classification,
+				sign,
 			)
 			rows.extend(
 				self.build_purchase_invoice_rows(
 					invoice=invoice,
 					item_groups=item_groups,
-					taxes=taxes,
+					taxes=taxes_by_invoice.get(invoice.name, []),
 					default_classification=default_classification,
 					sign=sign,
 				)
 			)
 		return rows
 
-	def get_journal_entry_rows(self, settings):
+	def get_period_invoices(self, invoice_doctype, from_date, to_date, names=None):
+		filters = {
+			"company": self.company,
+			"docstatus": 1,
+			"posting_date": ["between", [from_date, to_date]],
+		}
+		if names is not None:
+			filters["name"] = ["in", names]
+		return frappe.get_all(
+			invoice_doctype,
+			filters=filters,
+			fields=["name", "posting_date", "taxes_and_charges", "base_net_total", "is_return"],
+		)
+
+	def get_period_invoice_query(self, invoice_doctype, child_doctype, from_date, to_date, names=None):
+		"""Return a query over ``child_doctype`` rows of the invoices submitted in the given date range.
+
+		``names``, when given, limits the query to those invoices.
+		"""
+		invoice = frappe.qb.DocType(invoice_doctype)
+		child = frappe.qb.DocType(child_doctype)
+		query = (
+			frappe.qb.from_(child)
+			.join(invoice)
+			.on(invoice.name == child.parent)
+			.where(child.parenttype == invoice_doctype)
+			.where(invoice.company == self.company)
+			.where(invoice.docstatus == 1)
+			.where(invoice.posting_date.between(from_date, to_date))
+		)
+		if names is not None:
+			query = query.where(invoice.name.isin(names))
+		return query, child
+
+	def get_invoice_item_category_totals(self, invoice_doctype, item_doctype, from_date, to_date, names=None):
+		"""Return ``{invoice: [item totals per VAT category]}`` for every invoice in the period, in one query.
+
+		Categories are ordered by their first item on the invoice, so the groups
+		built from them keep the order the item rows were entered in.
+		"""
+		query, item = self.get_period_invoice_query(invoice_doctype, item_doctype, from_date, to_date, names)
+		totals = {}
+		for row in (
+			query.select(
+				item.parent,
+				item.custom_sa_vat_category,
+				Sum(item.base_net_amount).as_("base_net_amount"),
+			)
+			.groupby(item.parent, item.custom_sa_vat_category)
+			.orderby(item.parent)
+			.orderby(Min(item.idx))
+		).run(as_dict=True):
+			totals.setdefault(row.parent, []).append(row)
+		return totals
+
+	def get_invoice_vat_taxes(
+		self, invoice_doctype, tax_doctype, vat_account, total_field, from_date, to_date, names=None
+	):
+		"""Return ``{invoice: [VAT tax rows]}`` for every invoice in the period, in one query."""
+		query, tax = self.get_period_invoice_query(invoice_doctype, tax_doctype, from_date, to_date, names)
+		taxes = {}
+		for row in (
+			query.select(
+				tax.parent,
+				tax.name,
+				tax.rate,
+				tax.base_tax_amount.as_("tax_amount"),
+				tax[total_field].as_("total"),
+			)
+			.where(tax.account_head == vat_account)
+			.orderby(tax.parent)
+			.orderby(tax.idx)
+		).run(as_dict=True):
+			taxes.setdefault(row.parent, []).append(row)
+		return taxes
+
+	def get_journal_entry_rows(self, settings, from_date, to_date, names=None):
 		rows = []
 		vat_account_rows = getattr(settings, "vat_accounts", None) or getattr(settings, "tax_accounts", [])
 		tax_accounts = {row.account for row in vat_account_rows if row.account}
-		classified_accounts = set(
-			frappe.get_all(
-				"Account",
-				filters={"company": self.company},
-				or_filters=[
-					["custom_vat_return_debit_classification", "not in", ["", None]],
-					["custom_vat_return_credit_classification", "not in", ["", None]],
-				],
-				pluck="name",
-			)
-		)
+		accounts = self.get_account_vat_map()
+		classified_accounts = {
+			name
+			for name, account in accounts.items()
+			if account.custom_vat_return_debit_classification
+			or account.custom_vat_return_credit_classification
+		}
+		filters = {
+			"company": self.company,
+			"voucher_type": "Journal Entry",
+			"posting_date": ["between", [from_date, to_date]],
+			"account": ["in", list(tax_accounts | classified_accounts)],
+			"is_cancelled": ["in", [0, 1]],
+		}
+		if names is not None:
+			filters["voucher_no"] = ["in", names]
 		gl_rows = frappe.get_all(
 			"GL Entry",
-			filters={
-				"company": self.company,
-				"voucher_type": "Journal Entry",
-				"posting_date": ["between", [self.from_date, self.to_date]],
-				"account": ["in", list(tax_accounts | classified_accounts)],
-				"is_cancelled": ["in", [0, 1]],
-			},
+			filters=filters,
 			fields=["name", "voucher_no", "posting_date", "account", "debit", "credit", "is_cancelled"],
 			order_by="posting_date asc, creation asc",
 		)
@@ -418,33 +565,33 @@ class VAT201Return(Document):
 		by_voucher = {}
 		for row in gl_rows:
 			by_voucher.setdefault(row.voucher_no, []).append(row)
+		journal_accounts = self.get_journal_entry_accounts(
+			sorted({row.voucher_no for row in gl_rows if row.account in tax_accounts})
+		)
 
 		for voucher_no, voucher_rows in by_voucher.items():
-			jea_rows = frappe.get_all(
-				"Journal Entry Account",
-				filters={"parent": voucher_no},
-				fields=["account", "debit_in_account_currency as debit", "credit_in_account_currency as credit", "idx"],
-				order_by="idx asc",
-			)
 			tax_entries = [row for row in voucher_rows if row.account in tax_accounts]
 			if tax_entries:
+				jea_rows = journal_accounts.get(voucher_no, [])
 				available_non_tax = [row for row in jea_rows if row.account not in tax_accounts]
 				for entry in tax_entries:
 					classification = None
 					debug = []
 					tax_amount = flt(entry.debit) or -flt(entry.credit)
 					tax_side = "debit" if flt(entry.debit) > 0 else "credit"
-					candidate = self.find_matching_non_tax_leg(available_non_tax, tax_side)
+					candidate = self.find_matching_non_tax_leg(available_non_tax, tax_side, accounts)
 					if candidate:
 						available_non_tax.remove(candidate)
-						classification = self.get_account_classification(candidate.account, tax_side)
+						classification = self.get_account_classification(
+							candidate.account, tax_side, accounts
+						)
 						debug.append(f"Matched non-tax leg {candidate.account}")
 						incl_tax_amount = (
 							(flt(candidate.debit) if tax_side == "debit" else -flt(candidate.credit)) + tax_amount
 						)
 					else:
 						incl_tax_amount = tax_amount
-						if self.is_sars_settlement_entry(jea_rows, tax_accounts):
+						if self.is_sars_settlement_entry(jea_rows, tax_accounts, accounts):
 							classification = SARS_PAYMENT_RECEIPT
 							debug.append("Matched bank/cash settlement pattern")
 
@@ -468,7 +615,7 @@ class VAT201Return(Document):
 			else:
 				for entry in voucher_rows:
 					side = "debit" if flt(entry.debit) > 0 else "credit"
-					classification = self.get_account_classification(entry.account, side)
+					classification = self.get_account_classification(entry.account, side, accounts)
 					if not classification:
 						continue
 					rows.append(
@@ -490,30 +637,66 @@ class VAT201Return(Document):
 
 		return rows
 
-	def find_matching_non_tax_leg(self, rows, tax_side):
+	def get_account_vat_map(self):
+		"""Return ``{account: row}`` with the VAT201 classifications and type of every company account."""
+		return {
+			row.name: row
+			for row in frappe.get_all(
+				"Account",
+				filters={"company": self.company},
+				fields=[
+					"name",
+					"account_type",
+					"custom_vat_return_debit_classification",
+					"custom_vat_return_credit_classification",
+				],
+			)
+		}
+
+	def get_journal_entry_accounts(self, voucher_nos):
+		"""Return ``{journal entry: [account rows]}`` for ``voucher_nos``, in one query."""
+		if not voucher_nos:
+			return {}
+		journal_accounts = {}
+		for row in frappe.get_all(
+			"Journal Entry Account",
+			filters={"parenttype": "Journal Entry", "parent": ["in", voucher_nos]},
+			fields=[
+				"parent",
+				"account",
+				"debit_in_account_currency as debit",
+				"credit_in_account_currency as credit",
+				"idx",
+			],
+			order_by="parent asc, idx asc",
+		):
+			journal_accounts.setdefault(row.parent, []).append(row)
+		return journal_accounts
+
+	def find_matching_non_tax_leg(self, rows, tax_side, accounts):
 		candidates = []
 		for row in rows:
 			if tax_side == "debit" and flt(row.debit) > 0:
-				if self.get_account_classification(row.account, "debit"):
+				if self.get_account_classification(row.account, "debit", accounts):
 					candidates.append(row)
 			elif tax_side == "credit" and flt(row.credit) > 0:
-				if self.get_account_classification(row.account, "credit"):
+				if self.get_account_classification(row.account, "credit", accounts):
 					candidates.append(row)
 		candidates.sort(key=lambda row: flt(row.debit or row.credit), reverse=True)
 		return candidates[0] if candidates else None
 
-	def is_sars_settlement_entry(self, rows, tax_accounts):
+	def is_sars_settlement_entry(self, rows, tax_accounts, accounts):
 		non_tax_rows = [row for row in rows if row.account not in tax_accounts]
 		if len(non_tax_rows) != 1:
 			return False
-		account_type = frappe.get_cached_value("Account", non_tax_rows[0].account, "account_type")
-		return account_type in {"Bank", "Cash"}
+		account = accounts.get(non_tax_rows[0].account)
+		return bool(account) and account.account_type in {"Bank", "Cash"}
 
-	def get_account_classification(self, account, side):
+	def get_account_classification(self, account, side, accounts):
 		fieldname = (
 			"custom_vat_return_debit_classification" if side == "debit" else "custom_vat_return_credit_classification"
 		)
-		return frappe.db.get_value("Account", account, fieldname)
+		return (accounts.get(account) or {}).get(fieldname)
 
 	def get_template_classification(self, settings, template, reference_doctype):
 		for entry in VAT_RETURN_SETTING_FIELD_MAP:
@@ -523,13 +706,9 @@ class VAT201Return(Document):
 				return entry["classification"]
 		return None
 
-	def get_invoice_item_groups(self, parent, item_doctype, classifier, default_classification, sign):
+	def group_invoice_items(self, items, classifier, default_classification, sign):
 		item_groups = {}
-		for item in frappe.get_all(
-			item_doctype,
-			filters={"parent": parent},
-			fields=["base_net_amount", "custom_sa_vat_category"],
-		):
+		for item in items:
 			classification = classifier(item.custom_sa_vat_category) or default_classification
 			if not classification:
 				continue
@@ -1,9 +1,23 @@
 import frappe
 from frappe import _
 
+from za_local.sa_vat.vat201_totals import get_vat201_totals
+from za_local.utils.report_cache import get_cached_report_result
+
 
 def execute(filters=None):
-	return get_columns(), get_data(filters or {})
+	filters = filters or {}
+	if not filters.get("vat_return"):
+		return get_columns(), []
+	frappe.get_doc("VAT201 Return", filters["vat_return"], check_permission=True)
+	return get_cached_report_result(
+		"VAT 201 Linked Transactions", filters, ("VAT201 Return",), lambda: get_report_result(filters)
+	)
+
+
+def get_report_result(filters):
+	data = get_data(filters)
+	return get_columns(), data, None, None, get_report_summary(data)
 
 
 def get_columns():
@@ -28,7 +42,6 @@ def get_columns():
 def get_data(filters):
 	if not filters.get("vat_return"):
 		return []
-	frappe.get_doc("VAT201 Return", filters["vat_return"], check_permission=True)
 
 	return frappe.get_all(
 		"VAT201 Return Transaction",
@@ -57,3 +70,26 @@ def get_data(filters):
 		],
 		order_by="posting_date asc, voucher_no asc",
 	)
+
+
+def get_report_summary(data):
+	totals = get_vat201_totals(data)
+	classifications = totals.classifications.values()
+	return [
+		{
+			"value": sum(amounts["incl_tax_amount"] for amounts in classifications),
+			"label": _("Classified Incl Tax Amount"),
+			"datatype": "Currency",
+		},
+		{
+			"value": sum(amounts["tax_amount"] for amounts in classifications),
+			"label": _("Classified Tax Amount"),
+			"datatype": "Currency",
+		},
+		{
+			"value": totals.review_count,
+			"label": _("Needs Review"),
+			"datatype": "Int",
+			"indicator": "Red" if totals.review_count else "Green",
+		},
+	]
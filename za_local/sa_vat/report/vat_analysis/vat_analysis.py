@@ -1,10 +1,14 @@
 import frappe
 from frappe import _
 
+from za_local.utils.report_cache import get_cached_report_result
+
 
 def execute(filters=None):
 	filters = frappe._dict(filters or {})
-	return get_columns(), get_data(filters)
+	return get_cached_report_result(
+		"VAT Analysis", filters, ("VAT201 Return",), lambda: (get_columns(), get_data(filters))
+	)
 
 
 def get_columns():
@@ -0,0 +1,455 @@
+"""Background refresh of a VAT201 Return's linked transactions.
+
+A large VAT period is refreshed in a long-queue job instead of the request.
+The period is split into date-ordered windows; for each window the sales
+invoice, purchase invoice and journal rows are built, bulk inserted as staged
+VAT201 Return Transaction rows and folded into running box totals, and the
+job commits. Progress is kept in the site cache and published to the form, so
+memory use follows the window rather than the whole period.
+
+Staged rows carry their own ``parentfield``, so the form does not load them.
+Once the last window is in, they replace the return's transactions and the box
+totals are written in a single commit. The return is locked while the job runs
+and cannot be saved or submitted. A refresh can be cancelled between windows;
+a cancelled or failed refresh deletes only its staged rows, so the return keeps
+the transactions and totals of its previous fetch and never shows part of a
+period.
+
+Every full refresh records watermarks on the return: the latest ``modified``
+of the period's sales invoices, purchase invoices and journal entries, and
+the latest GL Entry ``creation`` of its journals. While the company, period,
+VAT settings and account classifications are unchanged, the next refresh
+re-reads only the vouchers submitted, cancelled or amended after those
+watermarks and patches their rows in place.
+"""
+
+import json
+
+import frappe
+from frappe import _
+from frappe.query_builder.functions import Max
+from frappe.utils import add_days, add_to_date, cint, get_datetime, getdate, now, time_diff_in_seconds
+
+from za_local.sa_vat.vat201_totals import VAT201_REVIEW_SUMMARY_LIMIT, get_vat201_totals
+
+VAT201_REFRESH_CACHE_KEY = "za_local:vat201_refresh:{0}"
+VAT201_REFRESH_CANCEL_KEY = "za_local:vat201_refresh_cancel:{0}"
+VAT201_REFRESH_WINDOW_DAYS = 7
+VAT201_REFRESH_TIMEOUT = 3600
+# Periods with up to this many sales and purchase invoices are refreshed in the request.
+VAT201_REFRESH_SYNC_LIMIT = 2000
+# A voucher committed just after a refresh can carry a ``modified`` older than the
+# recorded watermark, so changed vouchers are looked up from a little before it.
+VAT201_WATERMARK_OVERLAP_SECONDS = 300
+
+WATERMARK_VOUCHER_TYPES = ("Sales Invoice", "Purchase Invoice", "Journal Entry")
+# A change to any of these makes the next refresh a full one.
+WATERMARK_SCOPE_KEYS = ("company", "from_date", "to_date", "settings_modified", "accounts_modified")
+
+TRANSACTION_DOCTYPE = "VAT201 Return Transaction"
+STAGED_TRANSACTIONS_FIELD = "za_staged_transactions"
+TRANSACTION_FIELDS = (
+	"gl_entry",
+	"voucher_type",
+	"voucher_no",
+	"posting_date",
+	"taxes_and_charges",
+	"tax_account_debit",
+	"tax_account_credit",
+	"tax_amount",
+	"incl_tax_amount",
+	"classification",
+	"classification_status",
+	"classification_issue",
+	"is_cancelled",
+	"classification_debugging",
+)
+VAT201_TOTAL_FIELDS = (
+	"standard_rated_supplies_non_capital",
+	"standard_rated_supplies_capital",
+	"standard_rated_supplies",
+	"zero_rated_supplies_local",
+	"zero_rated_supplies_exported",
+	"zero_rated_supplies",
+	"exempt_supplies",
+	"total_supplies",
+	"capital_goods_input_local",
+	"capital_goods_input_imported",
+	"capital_goods_input",
+	"other_goods_services_input_local",
+	"other_goods_services_input_imported",
+	"other_goods_services_input",
+	"total_input_tax",
+	"standard_rated_output_non_capital",
+	"standard_rated_output_capital",
+	"standard_rated_output",
+	"total_output_tax",
+	"vat_payable",
+	"vat_refundable",
+	"total_amount_payable",
+	"unresolved_transaction_count",
+	"unresolved_issues_summary",
+)
+ACTIVE_STATUSES = ("Queued", "Running")
+
+
+def get_period_windows(from_date, to_date, days=VAT201_REFRESH_WINDOW_DAYS):
+	"""Split ``from_date``..``to_date`` into consecutive ``[start, end]`` windows of at most ``days`` days."""
+	windows = []
+	start = getdate(from_date)
+	to_date = getdate(to_date)
+	while start <= to_date:
+		end = min(add_days(start, days - 1), to_date)
+		windows.append([str(start), str(end)])
+		start = add_days(end, 1)
+	return windows
+
+
+def count_period_invoices(vat_return):
+	filters = {
+		"company": vat_return.company,
+		"docstatus": 1,
+		"posting_date": ["between", [vat_return.from_date, vat_return.to_date]],
+	}
+	return frappe.db.count("Sales Invoice", filters) + frappe.db.count("Purchase Invoice", filters)
+
+
+def _get_high_water_mark(doctype, field, vat_return, **filters):
+	"""Return the latest ``field`` of the period's ``doctype`` rows matching ``filters`` (lists of values)."""
+	table = frappe.qb.DocType(doctype)
+	query = (
+		frappe.qb.from_(table)
+		.select(Max(table[field]))
+		.where(table.company == vat_return.company)
+		.where(table.posting_date.between(vat_return.from_date, vat_return.to_date))
+	)
+	for fieldname, values in filters.items():
+		query = query.where(table[fieldname].isin(values))
+	value = query.run()[0][0]
+	return str(value) if value else None
+
+
+def get_transaction_watermarks(vat_return, settings):
+	"""Return the refresh scope of ``vat_return`` and the high-water marks of its vouchers."""
+	account = frappe.qb.DocType("Account")
+	accounts_modified = (
+		frappe.qb.from_(account).select(Max(account.modified)).where(account.company == vat_return.company)
+	).run()[0][0]
+	watermarks = {
+		"company": vat_return.company,
+		"from_date": str(getdate(vat_return.from_date)),
+		"to_date": str(getdate(vat_return.to_date)),
+		"settings_modified": str(settings.modified) if settings.get("modified") else None,
+		"accounts_modified": str(accounts_modified) if accounts_modified else None,
+	}
+	for voucher_type in WATERMARK_VOUCHER_TYPES:
+		watermarks[voucher_type] = {
+			"modified": _get_high_water_mark(voucher_type, "modified", vat_return, docstatus=[1, 2]),
+		}
+	watermarks["Journal Entry"]["gl_creation"] = _get_high_water_mark(
+		"GL Entry", "creation", vat_return, voucher_type=["Journal Entry"]
+	)
+	return watermarks
+
+
+def is_incremental_refresh(previous, watermarks):
+	"""Whether rows recorded under ``previous`` watermarks can be patched instead of rebuilt."""
+	return bool(previous) and all(previous.get(key) == watermarks.get(key) for key in WATERMARK_SCOPE_KEYS)
+
+
+def _changed_since(watermark):
+	if not watermark:
+		return None
+	return add_to_date(get_datetime(watermark), seconds=-VAT201_WATERMARK_OVERLAP_SECONDS)
+
+
+def get_changed_vouchers(vat_return, previous):
+	"""Return ``{voucher_type: [names]}`` of vouchers changed after the ``previous`` watermarks.
+
+	Vouchers that the return still has rows for but that no longer exist as
+	submitted or cancelled documents (they were deleted) are included too, so
+	re-reading them drops their rows.
+	"""
+	period_filters = {
+		"company": vat_return.company,
+		"posting_date": ["between", [vat_return.from_date, vat_return.to_date]],
+	}
+	changed = {}
+	for voucher_type in WATERMARK_VOUCHER_TYPES:
+		filters = {**period_filters, "docstatus": ["in", [1, 2]]}
+		since = _changed_since((previous.get(voucher_type) or {}).get("modified"))
+		if since:
+			filters["modified"] = [">", since]
+		changed[voucher_type] = set(frappe.get_all(voucher_type, filters=filters, pluck="name"))
+
+	filters = {**period_filters, "voucher_type": "Journal Entry"}
+	since = _changed_since((previous.get("Journal Entry") or {}).get("gl_creation"))
+	if since:
+		filters["creation"] = [">", since]
+	changed["Journal Entry"].update(
+		frappe.get_all("GL Entry", filters=filters, pluck="voucher_no", distinct=True)
+	)
+
+	recorded = {}
+	for row in vat_return.get("transactions") or []:
+		if row.voucher_type in changed and row.voucher_no:
+			recorded.setdefault(row.voucher_type, set()).add(row.voucher_no)
+	for voucher_type, names in recorded.items():
+		existing = frappe.get_all(
+			voucher_type,
+			filters={"name": ["in", sorted(names)], "docstatus": ["in", [1, 2]]},
+			pluck="name",
+		)
+		changed[voucher_type].update(names.difference(existing))
+	return {voucher_type: sorted(names) for voucher_type, names in changed.items()}
+
+
+def get_vat201_refresh_state(vat_return_name):
+	state = frappe.cache.get_value(VAT201_REFRESH_CACHE_KEY.format(vat_return_name))
+	return frappe._dict(state) if state else None
+
+
+def _set_vat201_refresh_state(vat_return_name, state):
+	frappe.cache.set_value(VAT201_REFRESH_CACHE_KEY.format(vat_return_name), state)
+
+
+def get_vat201_refresh_progress(vat_return_name):
+	state = get_vat201_refresh_state(vat_return_name)
+	if not state:
+		return frappe._dict(status=None)
+
+	status = state.status
+	# A job that was never picked up, or died without settling, must not keep the return locked.
+	since = state.started_at if status == "Running" else state.queued_at
+	if status in ACTIVE_STATUSES and since:
+		if time_diff_in_seconds(now(), since) > VAT201_REFRESH_TIMEOUT:
+			status = "Failed"
+
+	windows = state.windows or []
+	next_window = cint(state.next_window)
+	return frappe._dict(
+		status=status,
+		total_windows=len(windows),
+		processed_windows=next_window,
+		processed_to=windows[next_window - 1][1] if next_window else None,
+		transactions=cint(state.transactions),
+		cancel_requested=bool(frappe.cache.get_value(VAT201_REFRESH_CANCEL_KEY.format(vat_return_name))),
+		error=state.error,
+	)
+
+
+def is_vat201_refresh_active(vat_return_name):
+	return get_vat201_refresh_progress(vat_return_name).status in ACTIVE_STATUSES
+
+
+def start_vat201_refresh(vat_return):
+	"""Record a background refresh for ``vat_return`` and enqueue its job; return the window count."""
+	windows = get_period_windows(vat_return.from_date, vat_return.to_date)
+	frappe.cache.delete_value(VAT201_REFRESH_CANCEL_KEY.format(vat_return.name))
+	_set_vat201_refresh_state(
+		vat_return.name,
+		frappe._dict(
+			windows=windows,
+			next_window=0,
+			status="Queued",
+			queued_at=now(),
+			started_at=None,
+			error=None,
+			transactions=0,
+			classification_totals={},
+			review_count=0,
+			review_issues=[],
+		),
+	)
+	frappe.enqueue(
+		run_vat201_refresh,
+		queue="long",
+		timeout=VAT201_REFRESH_TIMEOUT,
+		job_id=f"za_vat201_refresh::{vat_return.name}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		vat_return_name=vat_return.name,
+	)
+	return len(windows)
+
+
+def run_vat201_refresh(vat_return_name):
+	"""Background job: refresh the return's transactions window by window, committing after each one."""
+	state = get_vat201_refresh_state(vat_return_name)
+	if not state or state.status != "Queued":
+		return
+
+	vat_return = frappe.get_doc("VAT201 Return", vat_return_name)
+	try:
+		# Fail at once rather than sleeping on a return another job holds.
+		vat_return.lock()
+	except frappe.DocumentLockedError:
+		state.status = "Failed"
+		state.error = _("VAT201 Return {0} is locked by another background job.").format(vat_return_name)
+		_set_vat201_refresh_state(vat_return_name, state)
+		_publish_vat201_refresh_progress(vat_return_name)
+		return
+
+	state.status = "Running"
+	state.started_at = now()
+	_set_vat201_refresh_state(vat_return_name, state)
+
+	try:
+		settings = vat_return.get_refresh_settings()
+		watermarks = get_transaction_watermarks(vat_return, settings)
+		_delete_staged_transactions(vat_return_name)
+		frappe.db.commit()
+
+		for index in range(cint(state.next_window), len(state.windows)):
+			if frappe.cache.get_value(VAT201_REFRESH_CANCEL_KEY.format(vat_return_name)):
+				state.status = "Cancelled"
+				break
+
+			from_date, to_date = state.windows[index]
+			rows = vat_return.get_transaction_rows(settings, from_date, to_date)
+			_insert_transaction_rows(vat_return_name, rows, cint(state.transactions) + 1)
+			_add_window_totals(state, rows)
+			frappe.db.commit()
+
+			state.next_window = index + 1
+			_set_vat201_refresh_state(vat_return_name, state)
+			_publish_vat201_refresh_progress(vat_return_name)
+		else:
+			_publish_staged_transactions(vat_return, state, watermarks)
+			frappe.db.commit()
+			state.status = "Completed"
+	except Exception:
+		frappe.db.rollback()
+		state.status = "Failed"
+		state.error = frappe.get_traceback()
+		frappe.log_error(title=f"VAT201 refresh failed: {vat_return_name}", message=state.error)
+
+	if state.status != "Completed":
+		_delete_staged_transactions(vat_return_name)
+		frappe.db.commit()
+	vat_return.unlock()
+	frappe.cache.delete_value(VAT201_REFRESH_CANCEL_KEY.format(vat_return_name))
+	_set_vat201_refresh_state(vat_return_name, state)
+	_publish_vat201_refresh_progress(vat_return_name)
+
+
+def _insert_transaction_rows(vat_return_name, rows, start_idx):
+	if not rows:
+		return
+	timestamp = now()
+	user = frappe.session.user
+	frappe.db.bulk_insert(
+		TRANSACTION_DOCTYPE,
+		(
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"docstatus",
+			"parent",
+			"parenttype",
+			"parentfield",
+			"idx",
+			*TRANSACTION_FIELDS,
+		),
+		[
+			(
+				frappe.generate_hash(length=10),
+				timestamp,
+				timestamp,
+				user,
+				user,
+				0,
+				vat_return_name,
+				"VAT201 Return",
+				STAGED_TRANSACTIONS_FIELD,
+				idx,
+				*(row.get(field) for field in TRANSACTION_FIELDS),
+			)
+			for idx, row in enumerate(rows, start=start_idx)
+		],
+	)
+
+
+def _add_window_totals(state, rows):
+	"""Fold one window's rows into the running classification totals and review summary."""
+	window = get_vat201_totals(
+		rows,
+		review_limit=max(VAT201_REVIEW_SUMMARY_LIMIT - cint(state.review_count), 0),
+	)
+	state.transactions = cint(state.transactions) + len(rows)
+	state.review_count = cint(state.review_count) + window.review_count
+	state.review_issues.extend(window.review_issues)
+	for classification, amounts in window.classifications.items():
+		totals = state.classification_totals.setdefault(
+			classification, {"incl_tax_amount": 0, "tax_amount": 0}
+		)
+		totals["incl_tax_amount"] += amounts["incl_tax_amount"]
+		totals["tax_amount"] += amounts["tax_amount"]
+
+
+def _write_vat201_totals(vat_return, state):
+	totals = frappe._dict(
+		classifications=state.classification_totals,
+		review_count=cint(state.review_count),
+		review_issues=state.review_issues,
+	)
+	vat_return.calculate_totals(totals)
+	vat_return.set_review_summary(totals)
+	vat_return.db_set({field: vat_return.get(field) for field in VAT201_TOTAL_FIELDS})
+
+
+def _delete_staged_transactions(vat_return_name):
+	frappe.db.delete(
+		TRANSACTION_DOCTYPE,
+		{"parenttype": "VAT201 Return", "parent": vat_return_name, "parentfield": STAGED_TRANSACTIONS_FIELD},
+	)
+
+
+def _publish_staged_transactions(vat_return, state, watermarks):
+	"""Swap the staged rows in for the return's transactions and write their box totals and watermarks."""
+	frappe.db.delete(
+		TRANSACTION_DOCTYPE,
+		{"parenttype": "VAT201 Return", "parent": vat_return.name, "parentfield": "transactions"},
+	)
+	transaction = frappe.qb.DocType(TRANSACTION_DOCTYPE)
+	(
+		frappe.qb.update(transaction)
+		.set(transaction.parentfield, "transactions")
+		.where(transaction.parenttype == "VAT201 Return")
+		.where(transaction.parent == vat_return.name)
+		.where(transaction.parentfield == STAGED_TRANSACTIONS_FIELD)
+	).run()
+	_write_vat201_totals(vat_return, state)
+	vat_return.db_set("transaction_watermarks", json.dumps(watermarks))
+
+
+def _publish_vat201_refresh_progress(vat_return_name):
+	frappe.publish_realtime(
+		"za_vat201_refresh_progress",
+		get_vat201_refresh_progress(vat_return_name),
+		doctype="VAT201 Return",
+		docname=vat_return_name,
+	)
+
+
+@frappe.whitelist()
+def get_vat201_refresh_status(vat_return):
+	"""Return progress of the background transaction refresh for a VAT201 Return."""
+	frappe.get_doc("VAT201 Return", vat_return).check_permission("read")
+	return get_vat201_refresh_progress(vat_return)
+
+
+@frappe.whitelist(methods=["POST"])
+def cancel_vat201_refresh(vat_return):
+	"""Ask a running refresh to stop before its next date window."""
+	frappe.get_doc("VAT201 Return", vat_return).check_permission("write")
+	if not is_vat201_refresh_active(vat_return):
+		frappe.msgprint(_("There is no VAT transaction refresh to cancel."))
+		return False
+
+	cancel_key = VAT201_REFRESH_CANCEL_KEY.format(vat_return)
+	frappe.cache.set_value(cancel_key, 1, expires_in_sec=VAT201_REFRESH_TIMEOUT)
+	frappe.msgprint(_("The VAT transaction refresh will stop after the current date window."), alert=True)
+	return True
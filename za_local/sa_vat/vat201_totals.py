@@ -0,0 +1,49 @@
+"""Single-pass totals of VAT201 Return transaction rows.
+
+The VAT201 boxes, the review summary, the linked transactions report and the
+classification totals export all total the same rows: uncancelled classified
+rows summed by classification, and the uncancelled rows still needing review.
+The rows are walked once, so a return with tens of thousands of rows validates
+without filtering them again for every box.
+"""
+
+import frappe
+from frappe.utils import flt
+
+VAT201_REVIEW_SUMMARY_LIMIT = 10
+
+
+def get_vat201_totals(rows, review_limit=VAT201_REVIEW_SUMMARY_LIMIT):
+	"""Walk transaction documents or dicts once and return the totals by classification and the review summary.
+
+	``classifications`` maps each classification to its ``incl_tax_amount`` and
+	``tax_amount``; ``review_issues`` lists the issues of the first
+	``review_limit`` rows needing review.
+	"""
+	from za_local.sa_vat.doctype.vat201_return.vat201_return import CLASSIFIED, NEEDS_REVIEW
+
+	classifications = {}
+	review_count = 0
+	review_issues = []
+	for row in rows:
+		if row.get("is_cancelled"):
+			continue
+		status = row.get("classification_status")
+		if status == CLASSIFIED:
+			classification = row.get("classification")
+			if not classification:
+				continue
+			totals = classifications.get(classification)
+			if totals is None:
+				totals = classifications[classification] = {"incl_tax_amount": 0.0, "tax_amount": 0.0}
+			totals["incl_tax_amount"] += flt(row.get("incl_tax_amount"))
+			totals["tax_amount"] += flt(row.get("tax_amount"))
+		elif status == NEEDS_REVIEW:
+			review_count += 1
+			issue = row.get("classification_issue")
+			if review_count <= review_limit and issue:
+				review_issues.append(f"{row.get('voucher_type')} {row.get('voucher_no')}: {issue}")
+
+	return frappe._dict(
+		classifications=classifications, review_count=review_count, review_issues=review_issues
+	)
@@ -0,0 +1,99 @@
+"""Benchmark for the Payroll Register on a large synthetic payroll.
+
+Run on a development site:
+
+    bench --site za-local-e2e.test execute za_local.tests.benchmark_payroll_register.run
+
+It bulk inserts synthetic ZA Payroll Ledger rows for an existing company,
+times the first page, a late page and the department rollup, and rolls the
+rows back afterwards. Timings are indicative only; they depend on the host
+and database configuration.
+"""
+
+import time
+
+import frappe
+from frappe.utils import add_months, get_last_day
+
+from za_local.sa_payroll.report.payroll_register import payroll_register
+from za_local.utils.payroll_ledger import LEDGER_FIELDS
+
+DEPARTMENTS = ("Operations", "Sales", "Finance", "Engineering", "Support")
+
+
+def _synthetic_rows(company, slips, start_date):
+	now = frappe.utils.now()
+	employees = max(slips // 12, 1)
+	for index in range(slips):
+		end_date = get_last_day(add_months(start_date, index // employees))
+		employee = f"BENCH-EMP-{index % employees:06d}"
+		entry = {
+			"salary_slip": f"BENCH-SS-{index:07d}",
+			"company": company,
+			"employee": employee,
+			"employee_name": employee,
+			"department": DEPARTMENTS[index % len(DEPARTMENTS)],
+			"designation": None,
+			"posting_date": end_date,
+			"start_date": end_date.replace(day=1),
+			"end_date": end_date,
+			"gross_pay": 25_000,
+			"total_deduction": 5_200,
+			"net_pay": 19_800,
+			"basic": 22_000,
+			"paye": 4_500,
+			"uif_employee": 177.12,
+			"uif_employer": 177.12,
+			"sdl": 250,
+			"eti": 0,
+			"retirement_employee": 500,
+			"retirement_employer": 500,
+			"retirement_taxable_excess": 0,
+			"coida_basis": 25_000,
+			"sars_code_totals": "{}",
+		}
+		yield (
+			frappe.generate_hash(length=10),
+			now,
+			now,
+			"Administrator",
+			"Administrator",
+			*(entry[field] for field in LEDGER_FIELDS),
+		)
+
+
+def _timed(label, fn, results):
+	started = time.perf_counter()
+	rows = fn()
+	results[f"{label}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+	results[f"{label}_rows"] = len(rows)
+
+
+def run(company=None, slips=100_000, start_date="2025-03-01"):
+	company = company or frappe.db.get_value("Company", {}, "name")
+	if not company:
+		frappe.throw("Create a Company before running the benchmark.")
+
+	try:
+		rows = list(_synthetic_rows(company, slips, start_date))
+		for start in range(0, len(rows), 10_000):
+			frappe.db.bulk_insert(
+				"ZA Payroll Ledger",
+				("name", "creation", "modified", "owner", "modified_by", *LEDGER_FIELDS),
+				rows[start : start + 10_000],
+			)
+
+		filters = frappe._dict(company=company, from_date=start_date, to_date="2099-12-31", page_length=500)
+		filters = payroll_register._validate_filters(filters)
+		last_page = frappe._dict(filters, page=max(slips // filters.page_length, 1))
+		results = {"slips": slips, "page_length": filters.page_length}
+		_timed("first_page", lambda: payroll_register.get_data(filters), results)
+		_timed("last_page", lambda: payroll_register.get_data(last_page), results)
+		_timed("department_rollup", lambda: payroll_register.get_department_data(filters), results)
+		started = time.perf_counter()
+		results["row_count"] = payroll_register.get_row_count(filters)
+		results["row_count_ms"] = round((time.perf_counter() - started) * 1000, 1)
+	finally:
+		frappe.db.rollback()
+
+	return results
@@ -0,0 +1,68 @@
+"""Micro-benchmark for per-slip statutory rate resolution.
+
+Run on a development site:
+
+    bench --site za-local-e2e.test execute za_local.tests.benchmark_statutory_rates.run
+
+It compares the compiled ``RatePackIndex`` lookups with the previous approach
+of scanning every pack and re-parsing effective dates and dotted paths on each
+call. Timings are indicative only; they depend on the host and Python build.
+"""
+
+import timeit
+
+from frappe.utils import getdate
+
+from za_local.utils import statutory_rates
+from za_local.utils.statutory_rates import get_nested_rate, get_tax_year_for_date
+
+# Rate paths resolved while building one salary slip.
+SLIP_RATE_PATHS = (
+	"uif.monthly_remuneration_cap",
+	"uif.employee_rate",
+	"uif.employer_rate",
+	"sdl.rate",
+	"retirement.annual_deduction_cap",
+	"retirement.deduction_percentage",
+	"travel.fixed_allowance_default_paye_inclusion_percentage",
+	"coida.annual_earnings_cap",
+)
+
+
+def _scan_nested_rate(path, date_value):
+	tax_year = get_tax_year_for_date(date_value)
+	date_value = getdate(date_value)
+	for pack in statutory_rates._load_rate_packs():
+		if pack.get("tax_year") != tax_year:
+			continue
+		if getdate(pack.get("effective_from")) <= date_value <= getdate(pack.get("effective_to")):
+			value = pack
+			for part in path.split("."):
+				value = value[part]
+			return value
+
+
+def _scan_slip(date_value):
+	for path in SLIP_RATE_PATHS:
+		_scan_nested_rate(path, date_value)
+
+
+def _indexed_slip(date_value):
+	for path in SLIP_RATE_PATHS:
+		get_nested_rate(path, date_value)
+
+
+def run(date_value="2026-09-30", slips=5000):
+	statutory_rates.clear_rate_pack_cache()
+	statutory_rates.get_rate_pack(date_value)
+
+	before = timeit.timeit(lambda: _scan_slip(date_value), number=slips)
+	after = timeit.timeit(lambda: _indexed_slip(date_value), number=slips)
+
+	result = {
+		"slips": slips,
+		"lookups_per_slip": len(SLIP_RATE_PATHS),
+		"scan_us_per_slip": round(before / slips * 1_000_000, 2),
+		"indexed_us_per_slip": round(after / slips * 1_000_000, 2),
+	}
+	return result
@@ -86,6 +86,8 @@ def stage_foundation():
 
 def stage_payroll_masters():
 	"""Create employees, working calendar, structures and assignments."""
+	from za_local.utils.component_registry import clear_component_registry
+
 	_require_isolated_test_site()
 	stage_foundation()
 
@@ -101,6 +103,7 @@ def stage_payroll_masters():
 	)
 	_ensure_company_bank_account()
 	frappe.db.set_value("Salary Component", "Basic", "za_eti_wage_component", 1)
+	clear_component_registry()
 	for gender in ("Male", "Female"):
 		if not frappe.db.exists("Gender", gender):
 			frappe.get_doc({"doctype": "Gender", "gender": gender}).insert(ignore_permissions=True)
@@ -2,11 +2,14 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import frappe
 from frappe.utils import add_days, today
 
+from za_local.overrides.salary_slip import ZASalarySlip
+from za_local.patches.v1_1 import backfill_salary_slip_coida_basis as backfill_salary_slip_coida_basis_patch
 from za_local.sa_coida.doctype.coida_annual_return.coida_annual_return import COIDAAnnualReturn
 from za_local.sa_coida.doctype.oid_claim.oid_claim import OIDClaim
 from za_local.sa_coida.doctype.workplace_injury.workplace_injury import WorkplaceInjury
@@ -22,6 +25,7 @@ from za_local.sa_labour.report.eea2_income_differentials.eea2_income_differentia
 from za_local.sa_labour.report_utils import get_permitted_company
 from za_local.tests.compat import UnitTestCase
 from za_local.utils.coida_utils import (
+	get_coida_basis,
 	get_coida_earnings_by_employee,
 	get_company_industry_rate,
 	get_oid_claims_for_period,
@@ -30,7 +34,7 @@ from za_local.utils.coida_utils import (
 
 
 class TestCOIDARemediation(UnitTestCase):
-	def test_persisted_salary_slip_basis_is_preferred(self):
+	def test_annual_earnings_are_one_sum_over_persisted_slip_basis(self):
 		salary_slip_meta = MagicMock()
 		salary_slip_meta.has_field.side_effect = lambda fieldname: fieldname == "za_coida_basis"
 		with (
@@ -38,43 +42,84 @@ class TestCOIDARemediation(UnitTestCase):
 			patch("frappe.get_meta", return_value=salary_slip_meta),
 			patch(
 				"frappe.db.sql",
-				side_effect=[
-					[frappe._dict(employee="EMP-001", assessable_total=500000)],
-					[frappe._dict(employee="EMP-001", gross_total=550000)],
+				return_value=[
+					frappe._dict(
+						employee="EMP-001", designation="Director", gross_total=550000, assessable_total=500000
+					)
 				],
 			) as sql,
 		):
 			result = get_coida_earnings_by_employee("Test Company", "2026-03-01", "2027-02-28")
 
-		self.assertIn("za_coida_basis", sql.call_args_list[0].args[0])
+		sql.assert_called_once()
+		self.assertIn("SUM(ss.za_coida_basis)", sql.call_args.args[0])
 		self.assertEqual(500000, result["EMP-001"].assessable_total)
 		self.assertEqual(550000, result["EMP-001"].gross_total)
+		self.assertEqual("Director", result["EMP-001"].designation)
 
-	def test_component_applicability_is_used_without_persisted_basis(self):
-		salary_slip_meta = MagicMock()
-		salary_slip_meta.has_field.return_value = False
-		component_meta = MagicMock()
-		component_meta.has_field.return_value = True
-		detail_meta = MagicMock()
-		detail_meta.has_field.return_value = True
+	def test_coida_basis_uses_component_applicability(self):
+		metadata = {
+			"Basic Salary": frappe._dict(za_coida_applicable=1),
+			"Travel Reimbursement": frappe._dict(za_coida_applicable=1, za_is_reimbursement=1),
+			"Subsistence": frappe._dict(za_coida_applicable=1, za_payroll_treatment="Working Paper Only"),
+			"Share Scheme": frappe._dict(za_coida_applicable=0),
+		}
+		earnings = [
+			frappe._dict(salary_component="Basic Salary", amount=30000),
+			frappe._dict(salary_component="Basic Salary", amount=2000, statistical_component=1),
+			frappe._dict(salary_component="Travel Reimbursement", amount=1500),
+			frappe._dict(salary_component="Subsistence", amount=800),
+			frappe._dict(salary_component="Share Scheme", amount=5000),
+		]
+		with patch(
+			"za_local.utils.coida_utils.get_component_metadata",
+			side_effect=lambda component: metadata[component],
+		):
+			self.assertEqual(30000, get_coida_basis(earnings))
 
+	def test_slip_coida_basis_reuses_the_statutory_earning_basis(self):
+		slip = SimpleNamespace(
+			meta=MagicMock(),
+			za_coida_basis=0,
+			get_statutory_earning_basis=MagicMock(return_value=30000),
+		)
+		slip.meta.has_field.return_value = True
+
+		ZASalarySlip.set_coida_basis(slip)
+
+		slip.get_statutory_earning_basis.assert_called_once_with("za_coida_applicable")
+		self.assertEqual(30000, slip.za_coida_basis)
+
+	def test_backfill_patch_installs_the_basis_field_before_filling_slips(self):
+		events = []
+		module = "za_local.patches.v1_1.backfill_salary_slip_coida_basis"
 		with (
-			patch("frappe.has_permission", return_value=True),
-			patch("frappe.get_meta", side_effect=[salary_slip_meta, component_meta, detail_meta]),
+			patch("frappe.db.table_exists", return_value=True),
+			patch("frappe.db.add_index"),
 			patch(
-				"frappe.db.sql",
-				side_effect=[
-					[frappe._dict(employee="EMP-001", assessable_total=400000)],
-					[frappe._dict(employee="EMP-001", gross_total=425000)],
-				],
-			) as sql,
+				f"{module}._apply_custom_field_fixtures",
+				side_effect=lambda names: events.append(("fields", names)),
+			),
+			patch(f"{module}.clear_component_registry"),
+			patch(
+				f"{module}.backfill_salary_slip_coida_basis",
+				side_effect=lambda: events.append(("backfill", None)),
+			),
 		):
-			result = get_coida_earnings_by_employee("Test Company", "2026-03-01", "2027-02-28")
+			backfill_salary_slip_coida_basis_patch.execute()
 
-		basis_query = sql.call_args_list[0].args[0]
-		self.assertIn("sc.za_coida_applicable", basis_query)
-		self.assertIn("sd.parentfield = 'earnings'", basis_query)
-		self.assertEqual(400000, result["EMP-001"].assessable_total)
+		self.assertEqual(["fields", "backfill"], [event for event, _names in events])
+		self.assertIn("Salary Slip-za_coida_basis", events[0][1])
+
+	def test_director_earnings_use_designation_from_the_earnings_query(self):
+		doc = frappe.new_doc("COIDA Annual Return")
+		earnings = {
+			"EMP-001": frappe._dict(assessable_total=800000, designation="Managing Director"),
+			"EMP-002": frappe._dict(assessable_total=300000, designation="Clerk"),
+		}
+		with patch("frappe.get_all") as get_all:
+			self.assertEqual(668000, COIDAAnnualReturn._get_director_earnings(doc, earnings, 668000))
+		get_all.assert_not_called()
 
 	def test_company_scoped_industry_rate_wins_over_legacy_row(self):
 		settings = frappe._dict(
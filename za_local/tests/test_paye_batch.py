@@ -0,0 +1,121 @@
+import calendar
+import random
+from datetime import date
+from unittest.mock import patch
+
+import frappe
+
+from za_local.tests.compat import UnitTestCase
+from za_local.utils.paye_batch import calculate_paye_batch
+from za_local.utils.statutory_rates import calculate_tax_from_brackets, get_rate_pack
+from za_local.utils.tax_utils import clear_tax_credit_rate_cache, get_medical_aid_credit, get_tax_rebate
+
+RATE_DATE = "2026-09-30"
+PAYROLL_PERIOD = "2026-2027 - TC"
+TAX_YEAR_END = date(2027, 2, 28)
+
+
+def _tax_credit_settings(pack):
+	rebates = pack["paye"]["rebates"]
+	credits = pack["medical_tax_credit"]
+	return frappe._dict(
+		tax_rebates_rate=[
+			frappe._dict(
+				payroll_period=PAYROLL_PERIOD,
+				primary=rebates["primary"],
+				secondary=rebates["secondary"],
+				tertiary=rebates["tertiary"],
+			)
+		],
+		medical_tax_credit=[
+			frappe._dict(
+				payroll_period=PAYROLL_PERIOD,
+				one_dependant=credits["main_member"],
+				two_dependant=credits["first_dependant"],
+				additional_dependant=credits["additional_dependant"],
+			)
+		],
+	)
+
+
+def _membership_dates(first_month, last_month):
+	"""Membership covering tax-year months ``first_month``..``last_month`` (0 = March)."""
+	start_year, start_month = divmod(first_month + 2, 12)
+	end_year, end_month = divmod(last_month + 2, 12)
+	end_year, end_month = 2026 + end_year, end_month + 1
+	start = date(2026 + start_year, start_month + 1, 1)
+	return start, date(end_year, end_month, calendar.monthrange(end_year, end_month)[1])
+
+
+class TestPAYEBatch(UnitTestCase):
+	def setUp(self):
+		clear_tax_credit_rate_cache()
+
+	def tearDown(self):
+		clear_tax_credit_rate_cache()
+
+	def test_batch_matches_scalar_path_over_randomised_grid(self):
+		pack = get_rate_pack(RATE_DATE)
+		rng = random.Random(20260930)
+		boundaries = [bracket["to_amount"] for bracket in pack["paye"]["brackets"] if bracket["to_amount"]]
+
+		incomes = [rng.uniform(0, 3_000_000) for _ in range(2000)]
+		incomes += [0, -100] + boundaries + [amount + 0.01 for amount in boundaries]
+		ages = [rng.choice([18, 40, 64, 65, 74, 75, 90]) for _ in incomes]
+		dependants = [rng.randint(-1, 5) for _ in incomes]
+		membership = []
+		for _ in incomes:
+			first_month = rng.choice([0, 0, rng.randint(0, 11)])
+			membership.append((first_month, rng.choice([11, rng.randint(first_month, 11)])))
+
+		result = calculate_paye_batch(
+			incomes,
+			ages,
+			dependants,
+			RATE_DATE,
+			medical_months=[last - first + 1 for first, last in membership],
+		)
+
+		salary_slip = frappe._dict(company="Test Company", end_date=RATE_DATE)
+		with (
+			patch("za_local.utils.tax_utils.frappe.db.get_value", return_value=PAYROLL_PERIOD),
+			patch("za_local.utils.tax_utils.frappe.get_single", return_value=_tax_credit_settings(pack)),
+		):
+			for index, income in enumerate(incomes):
+				tax = calculate_tax_from_brackets(income, pack["paye"]["brackets"])
+				rebate = get_tax_rebate(salary_slip, date(TAX_YEAR_END.year - ages[index], 1, 1))
+				start, end = _membership_dates(*membership[index])
+				credit = get_medical_aid_credit(salary_slip, dependants[index], start, end)
+
+				self.assertAlmostEqual(tax, float(result.tax[index]), places=2, msg=income)
+				self.assertAlmostEqual(rebate, float(result.rebate[index]), places=2, msg=ages[index])
+				self.assertAlmostEqual(
+					credit, float(result.medical_credit[index]), places=2, msg=membership[index]
+				)
+				self.assertAlmostEqual(
+					max(0, tax - rebate - credit), float(result.net_tax[index]), places=2, msg=income
+				)
+
+	def test_medical_credit_defaults_to_a_full_year_of_membership(self):
+		pack = get_rate_pack(RATE_DATE)
+		monthly = pack["medical_tax_credit"]["main_member"] + pack["medical_tax_credit"]["first_dependant"]
+
+		full_year = calculate_paye_batch([400000, 400000], [40, 40], [1, 1], RATE_DATE)
+		part_year = calculate_paye_batch([400000, 400000], [40, 40], [1, 1], RATE_DATE, medical_months=[4, 0])
+
+		self.assertAlmostEqual(monthly * 12, float(full_year.medical_credit[0]), places=2)
+		self.assertAlmostEqual(monthly * 4, float(part_year.medical_credit[0]), places=2)
+		self.assertEqual(0, float(part_year.medical_credit[1]))
+
+	def test_override_pack_reprices_the_run(self):
+		pack = get_rate_pack(RATE_DATE)
+		override = dict(pack, paye=dict(pack["paye"], rebates=dict(pack["paye"]["rebates"], primary=0)))
+
+		baseline = calculate_paye_batch([500000], [40], [-1], RATE_DATE)
+		repriced = calculate_paye_batch([500000], [40], [-1], rate_pack=override)
+
+		self.assertAlmostEqual(
+			float(baseline.net_tax[0]) + pack["paye"]["rebates"]["primary"],
+			float(repriced.net_tax[0]),
+			places=2,
+		)
@@ -5,6 +5,7 @@ import frappe
 
 from za_local.overrides.salary_slip import SalarySlip, ZASalarySlip
 from za_local.tests.compat import UnitTestCase
+from za_local.utils.payroll_ytd import PayrollYTDContext, use_payroll_ytd_context
 
 
 class TestSalarySlipTaxRegressions(UnitTestCase):
@@ -238,3 +239,72 @@ class TestSalarySlipBenefitsAndEti(UnitTestCase):
 		check_eligibility.assert_called_once_with("EMP-1", slip, 5_000)
 		calculate.assert_called_once_with("EMP-1", slip, 5_000, eligibility=eligibility)
 		log.assert_not_called()
+
+
+class TestPayrollYTDContext(UnitTestCase):
+	def test_grouped_rows_are_folded_per_employee_and_bucket(self):
+		context = PayrollYTDContext("Test Company", "2026-03-01", "2026-09-01")
+		context._get_grouped_totals = Mock(
+			return_value=[
+				frappe._dict(
+					employee="EMP-1",
+					parentfield="earnings",
+					salary_component="Travel Allowance",
+					exempted_from_income_tax=0,
+					amount=3_000,
+				),
+				frappe._dict(
+					employee="EMP-1",
+					parentfield="deductions",
+					salary_component="Pension",
+					exempted_from_income_tax=1,
+					amount=1_200,
+				),
+				frappe._dict(
+					employee="EMP-1",
+					parentfield="deductions",
+					salary_component="Loan",
+					exempted_from_income_tax=0,
+					amount=500,
+				),
+			]
+		)
+
+		context.preload(["EMP-1", "EMP-2", "EMP-1"])
+
+		context._get_grouped_totals.assert_called_once_with(["EMP-1", "EMP-2"])
+		self.assertEqual(context.get_earning_total("EMP-1", "Travel Allowance"), 3_000)
+		self.assertEqual(context.get_exempt_deduction_totals("EMP-1"), {"Pension": 1_200})
+		self.assertEqual(context.get_exempt_deduction_totals("EMP-2"), {})
+		context._get_grouped_totals.assert_called_once()
+
+	def test_employee_outside_preloaded_run_is_lazily_loaded(self):
+		context = PayrollYTDContext("Test Company", "2026-03-01", "2026-09-01")
+		context._get_grouped_totals = Mock(return_value=[])
+
+		self.assertEqual(context.get_earning_total("EMP-9", "Basic"), 0)
+		context._get_grouped_totals.assert_called_once_with(["EMP-9"])
+
+	def test_slip_reads_previous_exclusion_from_active_run_context(self):
+		context = PayrollYTDContext("Test Company", "2026-03-01", "2026-09-01")
+		context._totals["EMP-1"] = {
+			"earnings": {"Travel Allowance": 6_000},
+			"exempt_deductions": {"Pension": 900, "Medical Aid": 300},
+		}
+		slip = SimpleNamespace(
+			employee="EMP-1",
+			company="Test Company",
+			start_date="2026-09-01",
+			payroll_period=frappe._dict(start_date="2026-03-01"),
+		)
+		slip.get_payroll_ytd_context = lambda: ZASalarySlip.get_payroll_ytd_context(slip)
+		slip.get_component_paye_inclusion_percentage = Mock(return_value=80)
+		slip.is_retirement_fund_component = lambda component: component == "Pension"
+
+		with use_payroll_ytd_context(context), patch.object(frappe, "get_all") as get_all:
+			exclusion = ZASalarySlip.get_previous_component_paye_exclusion(slip, "Travel Allowance")
+			retirement = ZASalarySlip.get_previous_retirement_fund_contribution(slip)
+
+		get_all.assert_not_called()
+		self.assertAlmostEqual(exclusion, 1_200)
+		self.assertEqual(retirement, 900)
@@ -1,4 +1,4 @@
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import frappe
 
@@ -76,3 +76,199 @@ class TestPayrollEntryValidation(UnitTestCase):
 
 		self.assertNotIn("<img", str(error.exception))
 		self.assertIn("&lt;img", str(error.exception))
+
+
+class TestSalarySlipShards(UnitTestCase):
+	def setUp(self):
+		self.shards = {}
+		self.patches = [
+			patch(
+				"za_local.overrides.payroll_entry.get_salary_slip_shards",
+				side_effect=lambda _entry, for_update=False: {
+					key: frappe._dict(value) for key, value in self.shards.items()
+				},
+			),
+			patch(
+				"za_local.overrides.payroll_entry._set_salary_slip_shard",
+				side_effect=lambda _entry, shard_id, shard: self.shards.__setitem__(shard_id, dict(shard)),
+			),
+			patch(
+				"za_local.overrides.payroll_entry._save_salary_slip_shards",
+				side_effect=lambda _entry, shards: self.shards.update(
+					{key: dict(value) for key, value in shards.items()}
+				),
+			),
+			patch("za_local.overrides.payroll_entry.frappe.db.set_value"),
+			patch("za_local.overrides.payroll_entry.frappe.db.commit"),
+			patch("za_local.overrides.payroll_entry.frappe.publish_realtime"),
+		]
+		for patcher in self.patches:
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def test_run_is_split_into_one_job_per_shard(self):
+		from za_local.overrides.payroll_entry import enqueue_salary_slip_shards
+
+		employees = [f"EMP-{index:04d}" for index in range(5)]
+		with (
+			patch("za_local.overrides.payroll_entry.get_salary_slip_shard_size", return_value=2),
+			patch("za_local.overrides.payroll_entry.frappe.enqueue") as enqueue,
+		):
+			self.assertEqual(3, enqueue_salary_slip_shards("PAY-TEST", employees, frappe._dict()))
+
+		self.assertEqual(["EMP-0004"], self.shards["3"]["employees"])
+		self.assertEqual(
+			["1", "2", "3"],
+			[call.kwargs["shard_id"] for call in enqueue.call_args_list],
+		)
+
+	def test_retry_only_requeues_failed_shards(self):
+		from za_local.overrides.payroll_entry import retry_failed_salary_slip_shards
+
+		self.shards.update(
+			{
+				"1": {"employees": ["EMP-1"], "status": "Completed", "started_at": None},
+				"2": {"employees": ["EMP-2"], "status": "Failed", "started_at": None},
+			}
+		)
+		doc = frappe._dict(check_permission=lambda _ptype: None, get_salary_slip_args=frappe._dict)
+		with (
+			patch("za_local.overrides.payroll_entry.frappe.get_doc", return_value=doc),
+			patch("za_local.overrides.payroll_entry.frappe.enqueue") as enqueue,
+			patch("za_local.overrides.payroll_entry.frappe.msgprint"),
+		):
+			self.assertEqual(1, retry_failed_salary_slip_shards("PAY-TEST"))
+
+		enqueue.assert_called_once()
+		self.assertEqual("2", enqueue.call_args.kwargs["shard_id"])
+		self.assertEqual("Queued", self.shards["2"]["status"])
+		self.assertEqual("Completed", self.shards["1"]["status"])
+
+	def test_killed_and_lost_shards_are_reported_failed(self):
+		from za_local.overrides.payroll_entry import get_salary_slip_shard_summary
+
+		self.shards.update(
+			{
+				"1": {"status": "Running", "started_at": "2026-10-16 08:00:00"},
+				"2": {"status": "Queued", "queued_at": "2026-10-16 01:00:00", "started_at": None},
+				"3": {"status": "Queued", "queued_at": "2026-10-16 09:50:00", "started_at": None},
+				"4": {"status": "Running", "started_at": "2026-10-16 09:55:00"},
+			}
+		)
+		with patch("za_local.overrides.payroll_entry.frappe.utils.now", return_value="2026-10-16 10:00:00"):
+			summary = get_salary_slip_shard_summary("PAY-TEST")
+
+		self.assertEqual(["1", "2"], summary.failed_shards)
+		self.assertEqual((1, 1), (summary.queued, summary.running))
+
+	def test_entry_is_marked_created_only_after_the_last_shard_settles(self):
+		from za_local.overrides import payroll_entry
+
+		self.shards.update(
+			{
+				"1": {"employees": ["EMP-1"], "status": "Queued", "attempts": 0},
+				"2": {"employees": ["EMP-2"], "status": "Queued", "attempts": 0},
+			}
+		)
+		with patch("za_local.overrides.payroll_entry.insert_salary_slips_for_shard") as insert_slips:
+			payroll_entry.run_salary_slip_shard("PAY-TEST", "1", {"payroll_entry": "PAY-TEST"})
+
+			self.assertEqual("Completed", self.shards["1"]["status"])
+			payroll_entry.frappe.db.set_value.assert_not_called()
+			self.assertNotIn(
+				"completed_salary_slip_creation",
+				[call.args[0] for call in payroll_entry.frappe.publish_realtime.call_args_list],
+			)
+
+			payroll_entry.run_salary_slip_shard("PAY-TEST", "2", {"payroll_entry": "PAY-TEST"})
+
+		self.assertEqual(2, insert_slips.call_count)
+		payroll_entry.frappe.db.set_value.assert_called_once_with(
+			"Payroll Entry",
+			"PAY-TEST",
+			{"status": "Submitted", "salary_slips_created": 1, "error_message": ""},
+		)
+		self.assertEqual(
+			"completed_salary_slip_creation",
+			payroll_entry.frappe.publish_realtime.call_args.args[0],
+		)
+
+	def test_failed_shard_keeps_the_entry_failed_after_a_later_success(self):
+		from za_local.overrides import payroll_entry
+
+		self.shards.update(
+			{
+				"1": {"employees": ["EMP-1"], "status": "Failed", "attempts": 1},
+				"2": {"employees": ["EMP-2"], "status": "Queued", "attempts": 0},
+			}
+		)
+		with patch("za_local.overrides.payroll_entry.insert_salary_slips_for_shard"):
+			payroll_entry.run_salary_slip_shard("PAY-TEST", "2", {"payroll_entry": "PAY-TEST"})
+
+		values = payroll_entry.frappe.db.set_value.call_args.args[2]
+		self.assertEqual("Failed", values["status"])
+		self.assertEqual(0, values["salary_slips_created"])
+
+
+class TestCompanyContributionEntry(UnitTestCase):
+	def test_unmapped_component_from_grouped_totals_fails_before_posting(self):
+		from za_local.overrides.payroll_entry import ZAPayrollEntry
+
+		doc = frappe._dict(
+			name="PAY-TEST",
+			company="Test Company",
+			start_date="2026-08-01",
+			end_date="2026-08-31",
+			check_permission=lambda _ptype: None,
+			get_company_contribution_totals=lambda: [
+				frappe._dict(salary_component="UIF Employer", account="UIF Payable - TC", amount=100),
+				frappe._dict(salary_component="SDL", account=None, amount=50),
+			],
+			make_journal_entry=Mock(),
+		)
+		with (
+			patch("za_local.overrides.payroll_entry.frappe.db.exists", return_value=True),
+			patch("za_local.overrides.payroll_entry.frappe.db.get_value") as get_value,
+			patch("za_local.overrides.payroll_entry.frappe.get_desk_link", return_value="SDL"),
+		):
+			with self.assertRaises(frappe.ValidationError):
+				ZAPayrollEntry.make_company_contribution_entry(doc)
+
+		get_value.assert_not_called()
+		doc.make_journal_entry.assert_not_called()
+
+
+class TestPayrollEntryBankEntries(UnitTestCase):
+	def test_bank_entries_are_grouped_from_one_payment_query(self):
+		from za_local.overrides.payroll_entry import get_payroll_entry_bank_entries
+
+		rows = [
+			frappe._dict(employee="EMP-1", employee_name="One", bank_account="BANK-A", net_pay=1000),
+			frappe._dict(employee="EMP-2", employee_name="Two", bank_account="BANK-B", net_pay=2000),
+			frappe._dict(employee="EMP-3", employee_name="Three", bank_account="BANK-A", net_pay=None),
+		]
+		with (
+			patch("za_local.overrides.payroll_entry.get_payroll_entry_payment_rows", return_value=rows) as get_rows,
+			patch("za_local.overrides.payroll_entry.frappe.db.get_value") as get_value,
+		):
+			entries = get_payroll_entry_bank_entries("PAY-TEST")
+
+		get_rows.assert_called_once_with("PAY-TEST")
+		get_value.assert_not_called()
+		self.assertEqual(
+			[
+				{"bank_account": "BANK-A", "total_amount": 1000, "employees": ["EMP-1", "EMP-3"]},
+				{"bank_account": "BANK-B", "total_amount": 2000, "employees": ["EMP-2"]},
+			],
+			entries,
+		)
+
+	def test_missing_bank_account_message_escapes_employee_name(self):
+		from za_local.overrides.payroll_entry import get_payroll_entry_bank_entries
+
+		rows = [frappe._dict(employee="EMP-1", employee_name="<b>One</b>", bank_account=None, net_pay=1000)]
+		with patch("za_local.overrides.payroll_entry.get_payroll_entry_payment_rows", return_value=rows):
+			with self.assertRaises(frappe.ValidationError) as error:
+				get_payroll_entry_bank_entries("PAY-TEST")
+
+		self.assertIn("&lt;b&gt;One", str(error.exception))
@@ -5,7 +5,21 @@ import frappe
 
 from za_local.sa_payroll.doctype.emp201_submission.emp201_submission import calculate_eti_utilisation
 from za_local.tests.compat import UnitTestCase
-from za_local.utils import eti_utils, payroll_utils
+from za_local.utils import component_registry, eti_utils, payroll_utils
+from za_local.utils.component_registry import (
+	COMPONENT_FIELDS,
+	ComponentClassification,
+	ComponentClassificationRegistry,
+	SARSCodeDetails,
+)
+
+
+def _wage_registry(*components):
+	return ComponentClassificationRegistry(
+		{name: ComponentClassification(name=name, za_eti_wage_component=1) for name in components},
+		{},
+		COMPONENT_FIELDS,
+	)
 
 
 class TestAdditionalSalarySelection(UnitTestCase):
@@ -157,7 +171,7 @@ class TestEtiCalculationQueries(UnitTestCase):
 		self.assertEqual(month_number, 7)
 		calculate_calendar_months.assert_called_once()
 
-	@patch.object(eti_utils.frappe, "get_cached_value", return_value=1)
+	@patch.object(eti_utils, "get_component_registry", return_value=_wage_registry("Basic Salary"))
 	def test_unregulated_minimum_wage_is_prorated_to_ordinary_hours(self, _get_component_flag):
 		employee = frappe._dict(za_eti_minimum_wage_basis=eti_utils.WAGE_BASIS_UNREGULATED)
 		settings = frappe._dict(za_eti_unregulated_minimum_monthly_wage=2_500)
@@ -170,7 +184,7 @@ class TestEtiCalculationQueries(UnitTestCase):
 		self.assertTrue(result.eligible)
 		self.assertEqual(result.minimum_wage, 1_250)
 
-	@patch.object(eti_utils.frappe, "get_cached_value", return_value=1)
+	@patch.object(eti_utils, "get_component_registry", return_value=_wage_registry("Basic Salary"))
 	def test_regulated_minimum_wage_rejects_underpayment(self, _get_component_flag):
 		employee = frappe._dict(
 			za_eti_minimum_wage_basis=eti_utils.WAGE_BASIS_REGULATED,
@@ -343,3 +357,134 @@ class TestEtiCalculationQueries(UnitTestCase):
 			get_all.call_args.kwargs["filters"]["start_date"],
 			["<=", frappe.utils.getdate("2024-03-31")],
 		)
+
+
+class TestComponentClassificationRegistry(UnitTestCase):
+	def setUp(self):
+		component_registry._site_registries.clear()
+		frappe.local.za_component_registry = None
+
+	def tearDown(self):
+		component_registry._site_registries.clear()
+		frappe.local.za_component_registry = None
+
+	def test_metadata_only_exposes_installed_fields(self):
+		registry = ComponentClassificationRegistry(
+			{
+				"UIF Employee": ComponentClassification(
+					name="UIF Employee",
+					za_sars_payroll_code="4141",
+					za_uif_applicable=0,
+					sars_code=SARSCodeDetails(code="4141", category="Deduction"),
+				)
+			},
+			{},
+			("za_sars_payroll_code",),
+		)
+
+		metadata = registry.get_metadata("UIF Employee")
+
+		self.assertEqual(metadata, {"za_sars_payroll_code": "4141"})
+		self.assertNotIn("za_uif_applicable", metadata)
+		self.assertEqual(registry.get_metadata("Unknown"), {})
+		with self.assertRaises(AttributeError):
+			registry.get("UIF Employee").za_sars_payroll_code = "4102"
+
+	@patch.object(ComponentClassificationRegistry, "load")
+	def test_registry_is_reused_until_version_key_changes(self, load):
+		load.side_effect = lambda version=None: ComponentClassificationRegistry({}, {}, (), version=version)
+		with patch.object(frappe, "cache") as cache:
+			cache.get_value.return_value = "v1"
+			first = component_registry.get_component_registry()
+			frappe.local.za_component_registry = None
+			second = component_registry.get_component_registry()
+			self.assertIs(first, second)
+			load.assert_called_once_with(version="v1")
+
+			frappe.local.za_component_registry = None
+			cache.get_value.return_value = "v2"
+			third = component_registry.get_component_registry()
+
+		self.assertIsNot(first, third)
+		self.assertEqual(load.call_count, 2)
+
+	def test_clearing_registry_drops_site_version_key(self):
+		with patch.object(frappe, "cache") as cache:
+			component_registry.clear_component_registry(frappe._dict(doctype="Salary Component"), "on_update")
+
+		cache.delete_value.assert_called_once_with(component_registry.REGISTRY_VERSION_CACHE_KEY)
+		self.assertIsNone(frappe.local.za_component_registry)
+
+
+class TestETIBatch(UnitTestCase):
+	def _batch(self, history=()):
+		batch = eti_utils.ETIBatch("2026-08-31")
+		batch._employees["EMP-1"] = frappe._dict(name="EMP-1", date_of_joining="2025-01-15")
+		batch._history["EMP-1"] = list(history)
+		return batch
+
+	@patch.object(eti_utils.frappe, "get_all")
+	def test_qualifying_month_uses_prefetched_history(self, get_all):
+		batch = self._batch(
+			[
+				frappe._dict(against_salary_slip="SS-1", date="2026-06-30", is_qualifying_month=1, eti_amount=1_000),
+				frappe._dict(against_salary_slip="SS-2", date="2026-07-31", is_qualifying_month=0, eti_amount=0),
+			]
+		)
+		slip = SimpleNamespace(name="SS-3", end_date="2026-08-31")
+
+		with eti_utils.use_eti_batch(batch), patch.object(batch, "flush"):
+			month = eti_utils.get_eti_qualifying_month_number("EMP-1", slip, "2025-01-15")
+
+		self.assertEqual(2, month)
+		get_all.assert_not_called()
+
+	@patch.object(eti_utils.frappe.db, "bulk_insert")
+	@patch.object(eti_utils.frappe, "get_all", return_value=["SS-3"])
+	@patch.object(eti_utils.frappe.db, "exists")
+	def test_new_slip_logs_are_bulk_inserted_on_exit(self, exists, _get_all, bulk_insert):
+		batch = self._batch()
+		eligibility = frappe._dict(eligible=True, reason="Employee qualifies for ETI", months_employed=3)
+		committed = SimpleNamespace(name="SS-3", employee_name="Test", end_date="2026-08-31")
+		rolled_back = SimpleNamespace(name="SS-4", employee_name="Test", end_date="2026-08-31")
+
+		with eti_utils.use_eti_batch(batch):
+			eti_utils.log_eti_calculation("EMP-1", committed, 1_000, eligibility, new_slip=True)
+			eti_utils.log_eti_calculation("EMP-1", rolled_back, 1_000, eligibility, new_slip=True)
+
+		exists.assert_not_called()
+		bulk_insert.assert_called_once()
+		fields, rows = bulk_insert.call_args.args[1:]
+		self.assertEqual(1, len(rows))
+		self.assertEqual("SS-3", rows[0][fields.index("against_salary_slip")])
+		self.assertEqual(3, rows[0][fields.index("qualifying_month_number")])
+
+
+class TestPayrollFrequencyCheck(UnitTestCase):
+	@patch.object(payroll_utils, "get_employee_frequency_map")
+	@patch.object(payroll_utils, "get_current_block_period")
+	def test_run_resolves_processed_employees_with_one_query(self, get_blocks, get_frequency_map):
+		get_blocks.return_value = {
+			"Quarterly": frappe._dict(start_date="2026-03-01", end_date="2026-05-31"),
+			"Yearly": frappe._dict(start_date="2026-03-01", end_date="2027-02-28"),
+		}
+		get_frequency_map.return_value = {"EMP-Q": "Quarterly", "EMP-Y": "Yearly", "EMP-Y2": "Yearly"}
+		query = Mock()
+		for method in ("select", "where", "groupby"):
+			getattr(query, method).return_value = query
+		query.run.return_value = [
+			frappe._dict(employee="EMP-Q", start_date="2026-06-01", end_date="2026-06-30"),
+			frappe._dict(employee="EMP-Y", start_date="2026-04-01", end_date="2026-04-30"),
+		]
+		run = SimpleNamespace(company="Test Company", start_date="2026-05-01", end_date="2026-05-31")
+
+		with patch.object(payroll_utils.frappe.qb, "from_", return_value=query) as from_:
+			check = payroll_utils.PayrollFrequencyCheck(run)
+			check.preload(["EMP-Q", "EMP-Y", "EMP-Y2", "EMP-MONTHLY"])
+
+			self.assertFalse(check.is_processed("EMP-Q"))
+			self.assertTrue(check.is_processed("EMP-Y"))
+			self.assertFalse(check.is_processed("EMP-Y2"))
+			self.assertFalse(check.is_processed("EMP-MONTHLY"))
+
+		from_.assert_called_once()
@@ -107,3 +107,39 @@ class TestSAPayrollCompliance2027(UnitTestCase):
 		self.assertEqual("2026-2027", data["tax_year"])
 		self.assertEqual(7, len(data["paye"]["brackets"]))
 		self.assertEqual(4, len(data["eti"]["first_12_months"]))
+
+
+class TestRatePackIndex(UnitTestCase):
+	def test_index_resolves_the_same_pack_as_a_full_scan(self):
+		from frappe.utils import add_days, getdate
+
+		from za_local.utils.statutory_rates import _load_rate_packs, find_rate_pack, get_tax_year_for_date
+
+		for pack in _load_rate_packs():
+			for offset in (-1, 0, 180, 364, 365):
+				date_value = add_days(getdate(pack["effective_from"]), offset)
+				tax_year = get_tax_year_for_date(date_value)
+				expected = next(
+					(
+						candidate
+						for candidate in _load_rate_packs()
+						if candidate["tax_year"] == tax_year
+						and getdate(candidate["effective_from"])
+						<= getdate(date_value)
+						<= getdate(candidate["effective_to"])
+					),
+					None,
+				)
+				self.assertIs(expected, find_rate_pack(date_value))
+
+	def test_clear_rate_pack_cache_rebuilds_memoised_lookups(self):
+		from za_local.utils.statutory_rates import clear_rate_pack_cache, get_nested_rate, get_rate_pack_index
+
+		index = get_rate_pack_index()
+		self.assertEqual(17712, get_nested_rate("uif.monthly_remuneration_cap", "2026-03-31"))
+		self.assertEqual(5, get_nested_rate("uif.not_configured", "2026-03-31", default=5))
+
+		clear_rate_pack_cache()
+
+		self.assertIsNot(index, get_rate_pack_index())
+		self.assertEqual(17712, get_nested_rate("uif.monthly_remuneration_cap", "2026-03-31"))
@@ -2,12 +2,21 @@ import json
 import unittest
 from pathlib import Path
 from types import SimpleNamespace
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 import frappe
+from frappe.utils import flt
 
 from za_local.custom.customer import validate as validate_customer
-from za_local.sa_vat.doctype.vat201_return.vat201_return import VAT201Return
+from za_local.sa_vat.doctype.vat201_return.vat201_return import (
+	CLASSIFIED,
+	INPUT_OTHER_LOCAL,
+	NEEDS_REVIEW,
+	OUTPUT_STANDARD_NON_CAPITAL,
+	OUTPUT_ZERO_LOCAL,
+	VAT201_BOX_CLASSIFICATIONS,
+	VAT201Return,
+)
 from za_local.sa_vat.report.vat_201_account_classifications import vat_201_account_classifications
 from za_local.sa_vat.report.vat_201_linked_transactions import vat_201_linked_transactions
 from za_local.sa_vat.setup import validate_vat_posting_account
@@ -16,8 +25,82 @@ from za_local.sa_vat.tax_invoice import (
 	check_tax_invoice_readiness,
 	get_sales_invoice_print_profile,
 )
+from za_local.sa_vat.vat201_refresh import (
+	STAGED_TRANSACTIONS_FIELD,
+	VAT201_TOTAL_FIELDS,
+	_add_window_totals,
+	_write_vat201_totals,
+	get_changed_vouchers,
+	get_period_windows,
+	is_incremental_refresh,
+	run_vat201_refresh,
+)
 
 PACKAGE_ROOT = Path(__file__).resolve().parents[1]
+VAT_TEMPLATES = {
+	"SA Standard Rated Sales 15%": OUTPUT_STANDARD_NON_CAPITAL,
+	"SA Zero Rated Sales": OUTPUT_ZERO_LOCAL,
+	"SA Standard Rated Purchases 15%": INPUT_OTHER_LOCAL,
+}
+
+
+def _invoice(name, template, base_net_total, is_return=0):
+	return frappe._dict(
+		name=name,
+		posting_date="2026-04-10",
+		taxes_and_charges=template,
+		base_net_total=base_net_total,
+		is_return=is_return,
+	)
+
+
+def _item(parent, idx, category, amount):
+	return frappe._dict(parent=parent, idx=idx, custom_sa_vat_category=category, base_net_amount=amount)
+
+
+def _tax(parent, name, tax_amount):
+	return frappe._dict(parent=parent, name=name, rate=15, tax_amount=tax_amount, total=0)
+
+
+def _item_category_totals(items):
+	# What the grouped item query returns: one total per (invoice, category), ordered by first item.
+	totals = {}
+	for item in sorted(items, key=lambda row: (row.parent, row.idx)):
+		key = (item.parent, item.custom_sa_vat_category)
+		if key not in totals:
+			totals[key] = frappe._dict(parent=item.parent, custom_sa_vat_category=key[1], base_net_amount=0)
+		totals[key].base_net_amount += item.base_net_amount
+	return _by_parent(totals.values())
+
+
+def _by_parent(rows):
+	grouped = {}
+	for row in rows:
+		grouped.setdefault(row.parent, []).append(row)
+	return grouped
+
+
+def _per_invoice_rows(worker, invoices, items, taxes, classifier, build_rows):
+	# The former extraction: item and tax rows read separately for every invoice.
+	rows = []
+	for invoice in invoices:
+		sign = worker.get_invoice_sign(invoice)
+		default_classification = VAT_TEMPLATES.get(invoice.taxes_and_charges)
+		rows.extend(
+			build_rows(
+				invoice=invoice,
+				item_groups=worker.group_invoice_items(
+					[item for item in items if item.parent == invoice.name],
+					classifier,
+					default_classification,
+					sign,
+				),
+				taxes=[tax for tax in taxes if tax.parent == invoice.name],
+				default_classification=default_classification,
+				sign=sign,
+			)
+		)
+	return rows
 
 
 class TestSAVATProductionReadiness(unittest.TestCase):
@@ -108,6 +191,604 @@ class TestSAVATProductionReadiness(unittest.TestCase):
 		self.assertEqual(-115, reversal[0]["incl_tax_amount"])
 		self.assertEqual(15, reversal[0]["tax_account_debit"])
 
+	def test_vat201_invoice_extraction_matches_per_invoice_queries(self):
+		sales_invoices = [
+			_invoice("SINV-1", "SA Standard Rated Sales 15%", 200),
+			_invoice("SINV-2", "SA Standard Rated Sales 15%", 100, is_return=1),
+			_invoice("SINV-3", None, 200),
+			_invoice("SINV-4", "SA Zero Rated Sales", 80),
+		]
+		sales_items = [
+			_item("SINV-1", 1, "Standard Rated", 100),
+			_item("SINV-1", 2, "Zero Rated", 50),
+			_item("SINV-1", 3, "Standard Rated", 30),
+			_item("SINV-1", 4, "Capital Goods", 20),
+			_item("SINV-2", 1, None, 100),
+			_item("SINV-3", 1, "Exempt", 200),
+		]
+		sales_taxes = [_tax("SINV-1", "STC-1", 22.5), _tax("SINV-2", "STC-2", 15)]
+		purchase_invoices = [
+			_invoice("PINV-1", "SA Standard Rated Purchases 15%", 410),
+			_invoice("PINV-2", None, 80),
+		]
+		purchase_items = [
+			_item("PINV-1", 1, "Standard Rated", 100),
+			_item("PINV-1", 2, "Imported Capital Goods", 300),
+			_item("PINV-1", 3, None, 10),
+			_item("PINV-2", 1, "Capital Goods", 80),
+		]
+		purchase_taxes = [_tax("PINV-1", "PTC-1", 40), _tax("PINV-1", "PTC-2", 20)]
+
+		worker = frappe.new_doc("VAT201 Return")
+		worker.company = "Test Company"
+		worker.from_date = "2026-04-01"
+		worker.to_date = "2026-04-30"
+		with (
+			patch.object(
+				worker,
+				"get_template_classification",
+				side_effect=lambda settings, template, reference_doctype: VAT_TEMPLATES.get(template),
+			),
+			patch.object(
+				worker,
+				"get_period_invoices",
+				side_effect=lambda doctype, *period: (
+					sales_invoices if doctype == "Sales Invoice" else purchase_invoices
+				),
+			) as get_period_invoices,
+			patch.object(
+				worker,
+				"get_invoice_item_category_totals",
+				side_effect=lambda doctype, item_doctype, *period: _item_category_totals(
+					sales_items if doctype == "Sales Invoice" else purchase_items
+				),
+			) as get_item_totals,
+			patch.object(
+				worker,
+				"get_invoice_vat_taxes",
+				side_effect=lambda doctype, tax_doctype, account, total_field, *period: _by_parent(
+					sales_taxes if doctype == "Sales Invoice" else purchase_taxes
+				),
+			) as get_taxes,
+		):
+			settings = frappe._dict(output_vat_account="VAT Output - TC", input_vat_account="VAT Input - TC")
+			sales_rows = worker.get_sales_invoice_rows(settings, worker.from_date, worker.to_date)
+			purchase_rows = worker.get_purchase_invoice_rows(settings, worker.from_date, worker.to_date)
+
+			expected_sales = _per_invoice_rows(
+				worker,
+				sales_invoices,
+				sales_items,
+				sales_taxes,
+				worker.classify_sales_item_category,
+				worker.build_sales_invoice_rows,
+			)
+			expected_purchases = _per_invoice_rows(
+				worker,
+				purchase_invoices,
+				purchase_items,
+				purchase_taxes,
+				worker.classify_purchase_item_category,
+				worker.build_purchase_invoice_rows,
+			)
+
+		self.assertEqual(expected_sales, sales_rows)
+		self.assertEqual(expected_purchases, purchase_rows)
+		self.assertEqual({"SINV-1", "SINV-2", "SINV-3", "SINV-4"}, {row["voucher_no"] for row in sales_rows})
+		self.assertEqual(2, get_period_invoices.call_count)
+		self.assertEqual(2, get_item_totals.call_count)
+		period = ("2026-04-01", "2026-04-30", None)
+		get_taxes.assert_any_call("Sales Invoice", "Sales Taxes and Charges", "VAT Output - TC", "total", *period)
+		get_taxes.assert_any_call(
+			"Purchase Invoice", "Purchase Taxes and Charges", "VAT Input - TC", "base_total", *period
+		)
+
+	def test_vat201_grouped_invoice_queries_match_per_invoice_reads_on_the_database(self):
+		company = "_Test VAT201 Extraction Company"
+		now = frappe.utils.now()
+
+		def insert(doctype, fields, rows):
+			frappe.db.bulk_insert(
+				doctype,
+				("name", "creation", "modified", "owner", "modified_by", *fields),
+				[
+					(frappe.generate_hash(length=12), now, now, "Administrator", "Administrator", *row)
+					for row in rows
+				],
+			)
+
+		try:
+			frappe.db.bulk_insert(
+				"Sales Invoice",
+				("name", "company", "docstatus", "posting_date", "base_net_total", "is_return"),
+				[
+					("_T-VAT-SINV-1", company, 1, "2026-04-10", 150, 0),
+					("_T-VAT-SINV-2", company, 1, "2026-04-12", -100, 1),
+					("_T-VAT-SINV-3", company, 2, "2026-04-12", 40, 0),
+				],
+			)
+			insert(
+				"Sales Invoice Item",
+				("parent", "parenttype", "parentfield", "idx", "custom_sa_vat_category", "base_net_amount"),
+				[
+					("_T-VAT-SINV-1", "Sales Invoice", "items", 1, "Zero Rated", 50),
+					("_T-VAT-SINV-1", "Sales Invoice", "items", 2, "Standard Rated", 70),
+					("_T-VAT-SINV-1", "Sales Invoice", "items", 3, "Zero Rated", 30),
+					("_T-VAT-SINV-2", "Sales Invoice", "items", 1, "Standard Rated", -100),
+					("_T-VAT-SINV-3", "Sales Invoice", "items", 1, "Standard Rated", 40),
+				],
+			)
+			insert(
+				"Sales Taxes and Charges",
+				(
+					"parent",
+					"parenttype",
+					"parentfield",
+					"idx",
+					"account_head",
+					"rate",
+					"base_tax_amount",
+					"total",
+				),
+				[
+					("_T-VAT-SINV-1", "Sales Invoice", "taxes", 1, "VAT Output - TC", 15, 10.5, 160.5),
+					("_T-VAT-SINV-1", "Sales Invoice", "taxes", 2, "Freight - TC", 0, 5, 165.5),
+					("_T-VAT-SINV-2", "Sales Invoice", "taxes", 1, "VAT Output - TC", 15, -15, -115),
+					# A template row that shares an invoice's name must not be read as that invoice's tax.
+					(
+						"_T-VAT-SINV-1",
+						"Sales Taxes and Charges Template",
+						"taxes",
+						1,
+						"VAT Output - TC",
+						15,
+						99,
+						99,
+					),
+				],
+			)
+
+			worker = frappe.new_doc("VAT201 Return")
+			worker.company = company
+			period = ("2026-04-01", "2026-04-30")
+			item_totals = worker.get_invoice_item_category_totals(
+				"Sales Invoice", "Sales Invoice Item", *period
+			)
+			taxes = worker.get_invoice_vat_taxes(
+				"Sales Invoice", "Sales Taxes and Charges", "VAT Output - TC", "total", *period
+			)
+
+			expected_items = {}
+			expected_taxes = {}
+			for invoice in ("_T-VAT-SINV-1", "_T-VAT-SINV-2"):
+				categories = {}
+				for item in frappe.get_all(
+					"Sales Invoice Item",
+					filters={"parent": invoice, "parenttype": "Sales Invoice"},
+					fields=["custom_sa_vat_category", "base_net_amount"],
+					order_by="idx asc",
+				):
+					categories.setdefault(item.custom_sa_vat_category, 0)
+					categories[item.custom_sa_vat_category] += item.base_net_amount
+				expected_items[invoice] = list(categories.items())
+				expected_taxes[invoice] = [
+					(tax.name, tax.tax_amount, tax.total)
+					for tax in frappe.get_all(
+						"Sales Taxes and Charges",
+						filters={
+							"parent": invoice,
+							"parenttype": "Sales Invoice",
+							"account_head": "VAT Output - TC",
+						},
+						fields=["name", "base_tax_amount as tax_amount", "total"],
+						order_by="idx asc",
+					)
+				]
+		finally:
+			frappe.db.rollback()
+
+		self.assertEqual(
+			expected_items,
+			{
+				invoice: [(row.custom_sa_vat_category, row.base_net_amount) for row in rows]
+				for invoice, rows in item_totals.items()
+			},
+		)
+		self.assertEqual([("Zero Rated", 80), ("Standard Rated", 70)], expected_items["_T-VAT-SINV-1"])
+		self.assertEqual(
+			expected_taxes,
+			{
+				invoice: [(row.name, row.tax_amount, row.total) for row in rows]
+				for invoice, rows in taxes.items()
+			},
+		)
+		self.assertEqual(
+			[10.5], [tax_amount for _name, tax_amount, _total in expected_taxes["_T-VAT-SINV-1"]]
+		)
+
+	def test_vat201_background_refresh_totals_match_a_full_period_refresh(self):
+		self.assertEqual(
+			[
+				["2026-04-01", "2026-04-07"],
+				["2026-04-08", "2026-04-14"],
+				["2026-04-15", "2026-04-21"],
+				["2026-04-22", "2026-04-28"],
+				["2026-04-29", "2026-04-30"],
+			],
+			get_period_windows("2026-04-01", "2026-04-30"),
+		)
+
+		def row(voucher_no, classification, status, incl_tax_amount, tax_amount, is_cancelled=0, issue=None):
+			return frappe._dict(
+				voucher_type="Sales Invoice",
+				voucher_no=voucher_no,
+				classification=classification,
+				classification_status=status,
+				classification_issue=issue,
+				incl_tax_amount=incl_tax_amount,
+				tax_amount=tax_amount,
+				is_cancelled=is_cancelled,
+			)
+
+		rows = [
+			row("SINV-1", OUTPUT_STANDARD_NON_CAPITAL, CLASSIFIED, 115, 15),
+			row("SINV-2", OUTPUT_ZERO_LOCAL, CLASSIFIED, 80, 0),
+			row("SINV-3", None, NEEDS_REVIEW, 230, 30, issue="No VAT201 mapping."),
+			row("PINV-1", INPUT_OTHER_LOCAL, CLASSIFIED, 460, 60),
+			row("SINV-4", OUTPUT_STANDARD_NON_CAPITAL, CLASSIFIED, 230, 30),
+			row("SINV-5", OUTPUT_STANDARD_NON_CAPITAL, CLASSIFIED, 1150, 150, is_cancelled=1),
+		]
+		full = frappe.new_doc("VAT201 Return")
+		full.transactions = rows
+		full.calculate_totals()
+		full.set_review_summary()
+
+		windowed = frappe.new_doc("VAT201 Return")
+		state = frappe._dict(transactions=0, classification_totals={}, review_count=0, review_issues=[])
+		with patch.object(windowed, "db_set") as db_set:
+			for window_rows in (rows[:2], rows[2:4], rows[4:]):
+				_add_window_totals(state, window_rows)
+				_write_vat201_totals(windowed, state)
+
+		self.assertEqual(6, state.transactions)
+		self.assertEqual(
+			{field: full.get(field) for field in VAT201_TOTAL_FIELDS},
+			{field: windowed.get(field) for field in VAT201_TOTAL_FIELDS},
+		)
+		self.assertEqual(345, windowed.standard_rated_supplies_non_capital)
+		self.assertEqual(1, windowed.unresolved_transaction_count)
+		self.assertEqual(set(VAT201_TOTAL_FIELDS), set(db_set.call_args.args[0]))
+
+	def test_vat201_totals_accumulate_every_box_and_the_review_summary_in_one_pass(self):
+		classifications = [classification for _field, classification, _amount in VAT201_BOX_CLASSIFICATIONS]
+		rows = []
+		for index in range(240):
+			status = NEEDS_REVIEW if index % 17 == 0 else CLASSIFIED
+			rows.append(
+				{
+					"voucher_type": "Sales Invoice",
+					"voucher_no": f"SINV-{index}",
+					"classification": classifications[index % len(classifications)],
+					"classification_status": status,
+					"classification_issue": "No VAT201 mapping." if index % 34 == 0 else None,
+					"incl_tax_amount": 115.5 + index,
+					"tax_amount": 15.25 + index,
+					"is_cancelled": 1 if index % 13 == 0 else 0,
+				}
+			)
+		live = [row for row in rows if not row["is_cancelled"]]
+		review_rows = [row for row in live if row["classification_status"] == NEEDS_REVIEW]
+
+		vat_return = frappe.new_doc("VAT201 Return")
+		vat_return.transactions = [frappe._dict(row) for row in rows]
+		vat_return.calculate_totals()
+		vat_return.set_review_summary()
+
+		for fieldname, classification, amount_field in VAT201_BOX_CLASSIFICATIONS:
+			self.assertEqual(
+				sum(
+					row[amount_field]
+					for row in live
+					if row["classification"] == classification and row["classification_status"] == CLASSIFIED
+				),
+				vat_return.get(fieldname),
+				fieldname,
+			)
+		self.assertEqual(len(review_rows), vat_return.unresolved_transaction_count)
+		self.assertEqual(
+			[
+				f"{row['voucher_type']} {row['voucher_no']}: {row['classification_issue']}"
+				for row in review_rows[:10]
+				if row["classification_issue"]
+			],
+			vat_return.unresolved_issues_summary.split("\n"),
+		)
+
+		windowed = frappe.new_doc("VAT201 Return")
+		state = frappe._dict(transactions=0, classification_totals={}, review_count=0, review_issues=[])
+		with patch.object(windowed, "db_set"):
+			for start in range(0, len(rows), 50):
+				_add_window_totals(state, rows[start : start + 50])
+				_write_vat201_totals(windowed, state)
+		self.assertEqual(
+			{field: vat_return.get(field) for field in VAT201_TOTAL_FIELDS},
+			{field: windowed.get(field) for field in VAT201_TOTAL_FIELDS},
+		)
+
+		summary = vat_201_linked_transactions.get_report_summary(rows)
+		self.assertEqual(
+			[
+				sum(row["incl_tax_amount"] for row in live if row["classification_status"] == CLASSIFIED),
+				sum(row["tax_amount"] for row in live if row["classification_status"] == CLASSIFIED),
+				len(review_rows),
+			],
+			[card["value"] for card in summary],
+		)
+
+	def test_vat201_background_refresh_replaces_transactions_only_when_it_completes(self):
+		module = "za_local.sa_vat.vat201_refresh"
+		rows = [
+			frappe._dict(
+				voucher_type="Sales Invoice", voucher_no="SINV-1", tax_amount=15, incl_tax_amount=115
+			)
+		]
+
+		def refresh(cancel_flags):
+			state = frappe._dict(
+				windows=[["2026-04-01", "2026-04-07"], ["2026-04-08", "2026-04-14"]],
+				next_window=0,
+				status="Queued",
+				transactions=0,
+				classification_totals={},
+				review_count=0,
+				review_issues=[],
+			)
+			vat_return = MagicMock()
+			vat_return.name = "VAT-0001"
+			vat_return.get_transaction_rows.return_value = rows
+			with (
+				patch(f"{module}.get_vat201_refresh_state", return_value=state),
+				patch(f"{module}._set_vat201_refresh_state"),
+				patch(f"{module}._publish_vat201_refresh_progress"),
+				patch(f"{module}.get_transaction_watermarks", return_value={"company": "Test Company"}),
+				patch(f"{module}.frappe.get_doc", return_value=vat_return),
+				patch(f"{module}.frappe.cache.get_value", side_effect=cancel_flags),
+				patch(f"{module}.frappe.cache.delete_value"),
+				patch(f"{module}.frappe.db.commit"),
+				patch(f"{module}.frappe.db.bulk_insert") as bulk_insert,
+				patch(f"{module}.frappe.db.delete") as delete,
+				patch(f"{module}._publish_staged_transactions") as publish,
+			):
+				run_vat201_refresh("VAT-0001")
+			return state, vat_return, bulk_insert, delete, publish
+
+		state, vat_return, bulk_insert, delete, publish = refresh([None, 1])
+		self.assertEqual("Cancelled", state.status)
+		publish.assert_not_called()
+		vat_return.db_set.assert_not_called()
+		self.assertEqual(
+			{STAGED_TRANSACTIONS_FIELD}, {call.args[1]["parentfield"] for call in delete.call_args_list}
+		)
+		fields = bulk_insert.call_args.args[1]
+		self.assertEqual(
+			STAGED_TRANSACTIONS_FIELD, bulk_insert.call_args.args[2][0][fields.index("parentfield")]
+		)
+
+		state, vat_return, bulk_insert, delete, publish = refresh([None, None])
+		self.assertEqual("Completed", state.status)
+		publish.assert_called_once_with(vat_return, state, {"company": "Test Company"})
+		vat_return.lock.assert_called_once_with()
+		self.assertEqual(2, bulk_insert.call_count)
+
+	def test_vat201_linked_transaction_export_keeps_classification_totals_separate(self):
+		vat_return = frappe.new_doc("VAT201 Return")
+		for voucher_no, amount in (("SINV-1", "115"), ("SINV-2", 230)):
+			vat_return.append(
+				"transactions",
+				{
+					"voucher_type": "Sales Invoice",
+					"voucher_no": voucher_no,
+					"classification": OUTPUT_STANDARD_NON_CAPITAL,
+					"classification_status": CLASSIFIED,
+					"incl_tax_amount": amount,
+					"tax_amount": flt(amount) * 15 / 115,
+				},
+			)
+
+		with patch.object(vat_return, "check_permission"):
+			transactions = vat_return.get_linked_transaction_rows()
+			totals = vat_return.get_classification_total_rows()
+
+		self.assertEqual(["SINV-1", "SINV-2"], [row["voucher_no"] for row in transactions])
+		self.assertEqual(45, sum(row["tax_amount"] for row in transactions))
+		self.assertEqual(
+			[{"classification": OUTPUT_STANDARD_NON_CAPITAL, "incl_tax_amount": 345, "tax_amount": 45}],
+			totals,
+		)
+
+	def test_vat201_incremental_refresh_patches_only_changed_voucher_rows(self):
+		watermarks = {
+			"company": "Test Company",
+			"from_date": "2026-03-01",
+			"to_date": "2026-04-30",
+			"settings_modified": "2026-02-01 08:00:00",
+			"accounts_modified": "2026-02-01 08:00:00",
+			"Sales Invoice": {"modified": "2026-04-20 10:00:00"},
+		}
+		self.assertFalse(is_incremental_refresh({}, watermarks))
+		self.assertTrue(is_incremental_refresh(watermarks, {**watermarks, "Sales Invoice": {}}))
+		reclassified = {**watermarks, "accounts_modified": "2026-04-21 12:00:00"}
+		self.assertFalse(is_incremental_refresh(watermarks, reclassified))
+
+		worker = frappe.new_doc("VAT201 Return")
+		worker.from_date = "2026-03-01"
+		worker.to_date = "2026-04-30"
+		for voucher_type, voucher_no, tax_amount in (
+			("Sales Invoice", "SINV-1", 15),
+			("Sales Invoice", "SINV-2", 30),
+			("Journal Entry", "JV-1", 45),
+			("Sales Invoice", "SINV-2", 3),
+		):
+			worker.append(
+				"transactions",
+				{"voucher_type": voucher_type, "voucher_no": voucher_no, "tax_amount": tax_amount},
+			)
+
+		with (
+			patch.object(
+				worker,
+				"get_sales_invoice_rows",
+				return_value=[{"voucher_type": "Sales Invoice", "voucher_no": "SINV-2", "tax_amount": 60}],
+			) as get_sales_rows,
+			patch.object(worker, "get_purchase_invoice_rows") as get_purchase_rows,
+			patch.object(worker, "get_journal_entry_rows") as get_journal_rows,
+		):
+			refreshed = worker.refresh_changed_transactions(
+				frappe._dict(), {"Sales Invoice": ["SINV-2"], "Purchase Invoice": [], "Journal Entry": []}
+			)
+
+		self.assertEqual(1, refreshed)
+		get_sales_rows.assert_called_once_with(frappe._dict(), "2026-03-01", "2026-04-30", ["SINV-2"])
+		get_purchase_rows.assert_not_called()
+		get_journal_rows.assert_not_called()
+		self.assertEqual(
+			[("SINV-1", 15, 1), ("JV-1", 45, 2), ("SINV-2", 60, 3)],
+			[(row.voucher_no, row.tax_amount, row.idx) for row in worker.transactions],
+		)
+
+	def test_vat201_changed_vouchers_are_read_from_overlapping_watermarks(self):
+		vat_return = frappe._dict(company="Test Company", from_date="2026-03-01", to_date="2026-04-30")
+		previous = {
+			"Sales Invoice": {"modified": "2026-04-20 10:00:00"},
+			"Purchase Invoice": {"modified": None},
+			"Journal Entry": {"modified": "2026-04-20 10:00:00", "gl_creation": "2026-04-20 09:00:00"},
+		}
+		results = {
+			"Sales Invoice": ["SINV-2"],
+			"Purchase Invoice": [],
+			"Journal Entry": ["JV-2"],
+			"GL Entry": ["JV-3", "JV-2"],
+		}
+		with patch(
+			"za_local.sa_vat.vat201_refresh.frappe.get_all",
+			side_effect=lambda doctype, **kwargs: results[doctype],
+		) as get_all:
+			changed = get_changed_vouchers(vat_return, previous)
+
+		self.assertEqual(
+			{"Sales Invoice": ["SINV-2"], "Purchase Invoice": [], "Journal Entry": ["JV-2", "JV-3"]}, changed
+		)
+		filters = {call.args[0]: call.kwargs["filters"] for call in get_all.call_args_list}
+		get_datetime = frappe.utils.get_datetime
+		self.assertEqual([">", get_datetime("2026-04-20 09:55:00")], filters["Sales Invoice"]["modified"])
+		self.assertEqual(["in", [1, 2]], filters["Sales Invoice"]["docstatus"])
+		self.assertNotIn("modified", filters["Purchase Invoice"])
+		self.assertEqual([">", get_datetime("2026-04-20 08:55:00")], filters["GL Entry"]["creation"])
+
+	def test_vat201_changed_vouchers_include_deleted_vouchers_the_return_still_lists(self):
+		vat_return = frappe._dict(
+			company="Test Company",
+			from_date="2026-03-01",
+			to_date="2026-04-30",
+			transactions=[
+				frappe._dict(voucher_type="Sales Invoice", voucher_no="SINV-1"),
+				frappe._dict(voucher_type="Sales Invoice", voucher_no="SINV-9"),
+				frappe._dict(voucher_type="Journal Entry", voucher_no="JV-7"),
+			],
+		)
+		previous = {
+			voucher_type: {"modified": "2026-04-20 10:00:00"}
+			for voucher_type in ("Sales Invoice", "Purchase Invoice", "Journal Entry")
+		}
+
+		def get_all(doctype, filters, **kwargs):
+			if "name" in filters:
+				# SINV-9 and JV-7 were deleted after the last refresh.
+				return [name for name in filters["name"][1] if name == "SINV-1"]
+			return []
+
+		with patch("za_local.sa_vat.vat201_refresh.frappe.get_all", side_effect=get_all) as mocked:
+			changed = get_changed_vouchers(vat_return, previous)
+
+		self.assertEqual(
+			{"Sales Invoice": ["SINV-9"], "Purchase Invoice": [], "Journal Entry": ["JV-7"]}, changed
+		)
+		existence_checks = [call for call in mocked.call_args_list if "name" in call.kwargs["filters"]]
+		self.assertEqual(["in", [1, 2]], existence_checks[0].kwargs["filters"]["docstatus"])
+		self.assertEqual(2, len(existence_checks))
+
+	def test_vat201_journal_rows_read_accounts_and_legs_in_constant_queries(self):
+		def account(name, account_type="", debit=None, credit=None):
+			return frappe._dict(
+				name=name,
+				account_type=account_type,
+				custom_vat_return_debit_classification=debit,
+				custom_vat_return_credit_classification=credit,
+			)
+
+		def leg(voucher_no, account, debit=0, credit=0, is_cancelled=0):
+			return frappe._dict(
+				name=f"GLE-{voucher_no}-{account}",
+				voucher_no=voucher_no,
+				posting_date="2026-04-10",
+				account=account,
+				debit=debit,
+				credit=credit,
+				is_cancelled=is_cancelled,
+				parent=voucher_no,
+			)
+
+		results = {
+			"Account": [
+				account("VAT - TC", "Tax"),
+				account("Bank - TC", "Bank"),
+				account("Stationery - TC", debit=INPUT_OTHER_LOCAL),
+				account("Export Sales - TC", credit=OUTPUT_ZERO_LOCAL),
+			],
+			"GL Entry": [
+				leg("JV-1", "Stationery - TC", debit=100),
+				leg("JV-1", "VAT - TC", debit=15),
+				leg("JV-2", "VAT - TC", credit=500),
+				leg("JV-3", "Export Sales - TC", credit=200),
+			],
+			"Journal Entry Account": [
+				leg("JV-1", "Stationery - TC", debit=100),
+				leg("JV-1", "VAT - TC", debit=15),
+				leg("JV-1", "Bank - TC", credit=115),
+				leg("JV-2", "VAT - TC", credit=500),
+				leg("JV-2", "Bank - TC", debit=500),
+			],
+		}
+		worker = frappe.new_doc("VAT201 Return")
+		worker.company = "Test Company"
+		settings = frappe._dict(vat_accounts=[frappe._dict(account="VAT - TC")])
+		module = "za_local.sa_vat.doctype.vat201_return.vat201_return.frappe"
+		with (
+			patch(f"{module}.get_all", side_effect=lambda doctype, **kwargs: results[doctype]) as get_all,
+			patch(f"{module}.db.get_value") as get_value,
+			patch(f"{module}.get_cached_value") as get_cached_value,
+		):
+			rows = worker.get_journal_entry_rows(settings, "2026-04-01", "2026-04-30")
+
+		self.assertEqual(
+			[
+				("JV-1", INPUT_OTHER_LOCAL, 115, 15),
+				("JV-2", "SARS Payment/Receipt", -500, -500),
+				("JV-3", OUTPUT_ZERO_LOCAL, -200, 0),
+			],
+			[
+				(row["voucher_no"], row["classification"], row["incl_tax_amount"], row["tax_amount"])
+				for row in rows
+			],
+		)
+		self.assertEqual(
+			["Account", "GL Entry", "Journal Entry Account"],
+			[call.args[0] for call in get_all.call_args_list],
+		)
+		self.assertEqual(["in", ["JV-1", "JV-2"]], get_all.call_args_list[2].kwargs["filters"]["parent"])
+		get_value.assert_not_called()
+		get_cached_value.assert_not_called()
+
 	def test_vat_posting_accounts_must_be_enabled_tax_ledgers_for_the_company(self):
 		with patch(
 			"za_local.sa_vat.setup.frappe.db.get_value",
@@ -115,17 +796,17 @@ class TestSAVATProductionReadiness(unittest.TestCase):
 		):
 			validate_vat_posting_account("VAT Output - TC", "Test Company", "Output VAT Account")
 
-	def test_linked_report_authorizes_parent_before_reading_child_rows(self):
+	def test_linked_report_authorizes_parent_before_reading_cached_rows(self):
+		module = "za_local.sa_vat.report.vat_201_linked_transactions.vat_201_linked_transactions"
 		with (
-			patch("za_local.sa_vat.report.vat_201_linked_transactions.vat_201_linked_transactions.frappe.get_doc") as get_doc,
-			patch(
-				"za_local.sa_vat.report.vat_201_linked_transactions.vat_201_linked_transactions.frappe.get_all",
-				return_value=[],
-			),
+			patch(f"{module}.frappe.get_doc", side_effect=frappe.PermissionError) as get_doc,
+			patch(f"{module}.get_cached_report_result") as get_cached_report_result,
 		):
-			vat_201_linked_transactions.get_data({"vat_return": "VAT201-TEST"})
+			with self.assertRaises(frappe.PermissionError):
+				vat_201_linked_transactions.execute({"vat_return": "VAT201-TEST"})
 
 		get_doc.assert_called_once_with("VAT201 Return", "VAT201-TEST", check_permission=True)
+		get_cached_report_result.assert_not_called()
 
 	def test_account_classification_report_uses_permission_filtered_list(self):
 		with (
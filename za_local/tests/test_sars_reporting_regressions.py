@@ -1,6 +1,8 @@
+import csv
 import json
+import tempfile
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import frappe
 
@@ -13,10 +15,13 @@ from za_local.sa_payroll.doctype.emp501_reconciliation.emp501_reconciliation imp
 )
 from za_local.sa_payroll.doctype.irp5_certificate.irp5_certificate import (
 	IRP5Certificate,
+	_wrap_pdf_text,
 	build_certificate_key,
+	pdf_generation_available,
 	require_certificate_generation_permissions,
 )
 from za_local.sa_payroll.report.emp201_report.emp201_report import get_data as get_emp201_report
+from za_local.sa_payroll.report.payroll_register.payroll_register import execute as execute_payroll_register
 from za_local.sa_payroll.report.retirement_fund_deductions.retirement_fund_deductions import (
 	RETIREMENT_FUND_CODES,
 )
@@ -27,7 +32,13 @@ from za_local.sa_payroll.report.statutory_submissions_summary.statutory_submissi
 	get_data as get_statutory_summary,
 )
 from za_local.tests.compat import UnitTestCase
+from za_local.utils import irp5_pdf
+from za_local.utils.emp501_diff import EMP501ReconciliationCache
+from za_local.utils.emp501_export import write_emp501_working_paper
 from za_local.utils.emp501_utils import generate_emp501_csv
+from za_local.utils.irp5_bulk import finalise_irp5_bulk_generation, get_irp5_bulk_progress
+from za_local.utils.payroll_ledger import build_payroll_ledger_entry
+from za_local.utils.report_cache import REPORT_CACHE_MAX_ROWS, get_cached_report_result
 
 
 class TestSARSReportingRegressions(UnitTestCase):
@@ -128,6 +139,288 @@ class TestSARSReportingRegressions(UnitTestCase):
 		self.assertEqual(5_000, doc.non_taxable_income)
 		self.assertEqual({"3601", "3704", "3901"}, {row.income_code for row in doc.income_details})
 
+	def test_bulk_irp5_lines_use_prefetched_source_without_loading_slips(self):
+		doc = frappe.new_doc("IRP5 Certificate")
+		doc.employee = "_Test Employee"
+		doc.tax_year = "2026-2027"
+		doc.reconciliation_period = "Final"
+		doc.from_date = "2026-03-01"
+		doc.to_date = "2027-02-28"
+		doc._reset_snapshot()
+		doc._bulk_source = Mock()
+		doc._bulk_source.get_salary_slips.return_value = [
+			frappe._dict(
+				name="SS-1",
+				end_date="2026-03-31",
+				payroll_frequency="Monthly",
+				total_working_days=31,
+				payment_days=31,
+			)
+		]
+		doc._bulk_source.get_salary_lines.return_value = [
+			frappe._dict(parentfield="earnings", salary_component="Basic", amount=300_000),
+			frappe._dict(parentfield="deductions", salary_component="PAYE", amount=60_000),
+			frappe._dict(parentfield="company_contribution", salary_component="SDL", amount=3_000),
+			frappe._dict(parentfield="company_contribution", salary_component=None, amount=10),
+		]
+		codes = {
+			"Basic": frappe._dict(code="3601", description="Basic", category="Income", tax_treatment="Taxable"),
+			"PAYE": frappe._dict(code="4102", description="PAYE", category="Deduction"),
+			"SDL": frappe._dict(code="4142", description="SDL", category="Employer Contribution"),
+		}
+
+		with (
+			patch("frappe.get_doc") as get_doc,
+			patch(
+				"za_local.sa_payroll.doctype.irp5_certificate.irp5_certificate.get_component_registry",
+				return_value=Mock(get_sars_code=Mock(return_value=None)),
+			),
+			patch.object(
+				IRP5Certificate,
+				"_get_sars_payroll_code",
+				side_effect=lambda component: codes[component],
+			),
+		):
+			counts = IRP5Certificate._generate_certificate_lines(doc)
+
+		get_doc.assert_not_called()
+		self.assertEqual({"income_count": 1, "deduction_count": 1, "contribution_count": 1}, counts)
+		self.assertEqual(300_000, doc.gross_taxable_income)
+		self.assertEqual(["4142"], [row.contribution_code for row in doc.company_contribution_details])
+
+	def test_irp5_lines_sort_by_registry_print_sequence(self):
+		doc = frappe.new_doc("IRP5 Certificate")
+		sequences = {"3601": frappe._dict(print_sequence=20), "3605": frappe._dict(print_sequence=10)}
+		registry = Mock(get_sars_code=Mock(side_effect=sequences.get))
+		with (
+			patch(
+				"za_local.sa_payroll.doctype.irp5_certificate.irp5_certificate.get_component_registry",
+				return_value=registry,
+			),
+			patch("frappe.db.get_value") as get_value,
+		):
+			codes = sorted(["3601", "3999", "3605"], key=doc._sort_sars_code)
+
+		self.assertEqual(["3605", "3601", "3999"], codes)
+		get_value.assert_not_called()
+
+	def test_bulk_irp5_summary_links_committed_certificates_and_skips_errors(self):
+		emp501 = Mock(tax_year="2027", company="Test Company", reconciliation_period="Annual")
+		summary = frappe._dict(
+			created=1,
+			updated=0,
+			reused=1,
+			errors=[
+				{
+					"employee": "Two",
+					"employee_id": "EMP-2",
+					"error": "Missing",
+					"error_type": "ValidationError",
+				}
+			],
+		)
+		# EMP-1's certificate was committed by an earlier, interrupted job.
+		certificates = [
+			frappe._dict(name="IRP5-1", employee="EMP-1", employee_name="One", status="Prepared"),
+			frappe._dict(name="IRP5-1-OLD", employee="EMP-1", employee_name="One", status="Draft"),
+			frappe._dict(name="IRP5-2", employee="EMP-2", employee_name="Two", status="Draft"),
+			frappe._dict(name="IRP5-3", employee="EMP-3", employee_name="Three", status="Submitted"),
+		]
+
+		with patch("za_local.utils.irp5_bulk.frappe.get_all", return_value=certificates) as get_all:
+			result = finalise_irp5_bulk_generation(emp501, ["EMP-1", "EMP-2", "EMP-3"], summary)
+
+		filters = get_all.call_args.kwargs["filters"]
+		self.assertEqual(
+			("Test Company", "2027", "Annual"),
+			(filters["company"], filters["tax_year"], filters["reconciliation_period"]),
+		)
+		self.assertEqual((1, 0, 1), (result.created, result.updated, result.reused))
+		self.assertEqual(
+			["IRP5-1", "IRP5-3"],
+			[call.args[1]["irp5_certificate"] for call in emp501.append.call_args_list],
+		)
+		emp501.save.assert_called_once_with(ignore_permissions=True)
+
+	def test_bulk_irp5_run_stuck_in_queue_is_reported_failed(self):
+		state = frappe._dict(
+			employees=["EMP-1", "EMP-2"],
+			chunk_size=500,
+			next_chunk=0,
+			status="Queued",
+			queued_at="2026-10-16 01:00:00",
+			started_at=None,
+			error=None,
+		)
+		with (
+			patch("za_local.utils.irp5_bulk.get_irp5_bulk_state", return_value=state),
+			patch("za_local.utils.irp5_bulk.now", return_value="2026-10-16 10:00:00"),
+		):
+			self.assertEqual("Failed", get_irp5_bulk_progress("EMP501-TEST").status)
+			state.queued_at = "2026-10-16 09:50:00"
+			self.assertEqual("Queued", get_irp5_bulk_progress("EMP501-TEST").status)
+
+	def test_irp5_pdf_reuses_file_rendered_for_unchanged_snapshot(self):
+		doc = frappe.new_doc("IRP5 Certificate")
+		doc.name = "IRP5-2027-EMP-1"
+		doc.certificate_number = "IRP5-2027-EMP-1"
+		doc.paye = 1_000
+		content_hash = doc.get_pdf_content_hash()
+		self.assertEqual(content_hash, doc.get_pdf_content_hash())
+
+		cached_file = frappe._dict(name="FILE-1", file_url="/private/files/cached.pdf")
+		with (
+			patch("frappe.db.get_value", return_value="FILE-1") as get_value,
+			patch("frappe.get_doc", return_value=cached_file),
+			patch.object(IRP5Certificate, "generate_official_pdf") as render,
+		):
+			self.assertEqual(cached_file, doc.get_cached_pdf_file())
+
+		render.assert_not_called()
+		self.assertFalse(doc.flags.pdf_rendered)
+		self.assertEqual(
+			f"IRP5-2027-EMP-1-{content_hash[:16]}.pdf", get_value.call_args.args[1]["file_name"]
+		)
+
+		doc.paye = 2_000
+		self.assertNotEqual(content_hash, doc.get_pdf_content_hash())
+
+	def test_irp5_pdf_render_deletes_superseded_cached_files(self):
+		doc = frappe.new_doc("IRP5 Certificate")
+		doc.name = "IRP5-2027-EMP-1"
+		doc.certificate_number = "IRP5-2027-EMP-1"
+
+		attachments = [
+			frappe._dict(name="FILE-OLD", file_name="IRP5-2027-EMP-1-0123456789abcdef.pdf"),
+			frappe._dict(name="FILE-UPLOAD", file_name="signed-copy.pdf"),
+		]
+		with (
+			patch("frappe.db.get_value", return_value=None),
+			patch.object(IRP5Certificate, "generate_official_pdf", return_value=b"%PDF"),
+			patch(
+				"za_local.sa_payroll.doctype.irp5_certificate.irp5_certificate.save_file",
+				return_value=frappe._dict(name="FILE-NEW"),
+			),
+			patch("frappe.get_all", return_value=attachments) as get_all,
+			patch("frappe.delete_doc") as delete_doc,
+		):
+			self.assertEqual("FILE-NEW", doc.get_cached_pdf_file().name)
+
+		self.assertTrue(doc.flags.pdf_rendered)
+		self.assertEqual(["!=", "FILE-NEW"], get_all.call_args.kwargs["filters"]["name"])
+		delete_doc.assert_called_once_with("File", "FILE-OLD", ignore_permissions=True, force=True)
+
+	def patch_irp5_pdf_shards(self, shards):
+		patchers = [
+			patch(
+				"za_local.utils.irp5_pdf.get_irp5_pdf_shards",
+				side_effect=lambda _emp501, for_update=False: {
+					key: frappe._dict(value) for key, value in shards.items()
+				},
+			),
+			patch(
+				"za_local.utils.irp5_pdf._set_irp5_pdf_shard",
+				side_effect=lambda _emp501, shard_id, shard: shards.__setitem__(shard_id, dict(shard)),
+			),
+			patch(
+				"za_local.utils.irp5_pdf._save_irp5_pdf_shards",
+				side_effect=lambda _emp501, values: shards.update(
+					{key: dict(value) for key, value in values.items()}
+				),
+			),
+			patch("za_local.utils.irp5_pdf.frappe.db.commit"),
+			patch("za_local.utils.irp5_pdf.frappe.db.rollback"),
+			patch("za_local.utils.irp5_pdf.frappe.publish_realtime"),
+		]
+		for patcher in patchers:
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def test_irp5_pdf_shard_timeout_is_recorded_and_reraised(self):
+		shards = {"1": {"certificates": ["IRP5-1"], "status": "Queued", "files": {}, "errors": []}}
+		self.patch_irp5_pdf_shards(shards)
+		with (
+			patch("za_local.utils.irp5_pdf.frappe.get_doc", side_effect=irp5_pdf.JobTimeoutException),
+			patch("za_local.utils.irp5_pdf.frappe.log_error") as log_error,
+			patch("za_local.utils.irp5_pdf.frappe.enqueue") as enqueue,
+		):
+			with self.assertRaises(irp5_pdf.JobTimeoutException):
+				irp5_pdf.run_irp5_pdf_shard("EMP501-TEST", "1")
+
+		self.assertEqual("Failed", shards["1"]["status"])
+		self.assertEqual([], shards["1"]["errors"])
+		log_error.assert_not_called()
+		enqueue.assert_not_called()
+
+	def test_irp5_pdf_zip_waits_for_stalled_shards_and_lists_missing_certificates(self):
+		shards = {
+			"1": {
+				"certificates": ["IRP5-1"],
+				"status": "Completed",
+				"files": {"IRP5-1": "FILE-1"},
+				"rendered": 1,
+			},
+			"2": {
+				"certificates": ["IRP5-2", "IRP5-3"],
+				"status": "Running",
+				"started_at": "2026-10-16 08:00:00",
+			},
+		}
+		self.patch_irp5_pdf_shards(shards)
+		with (
+			patch("za_local.utils.irp5_pdf.now", return_value="2026-10-16 10:00:00"),
+			patch("za_local.utils.irp5_pdf.frappe.enqueue") as enqueue,
+		):
+			irp5_pdf._update_irp5_pdf_progress("EMP501-TEST")
+			self.assertIsNone(irp5_pdf.build_irp5_pdf_zip("EMP501-TEST"))
+
+		enqueue.assert_not_called()
+		summary = irp5_pdf.frappe.publish_realtime.call_args.args[1]
+		self.assertEqual(["2"], summary.failed_shards)
+		self.assertEqual(["IRP5-2", "IRP5-3"], summary.missing)
+
+	def test_irp5_pdf_retry_requeues_only_failed_shards(self):
+		shards = {
+			"1": {"certificates": ["IRP5-1"], "status": "Completed"},
+			"2": {"certificates": ["IRP5-2"], "status": "Failed"},
+		}
+		self.patch_irp5_pdf_shards(shards)
+		with (
+			patch("za_local.utils.irp5_pdf.frappe.get_doc"),
+			patch("za_local.utils.irp5_pdf.frappe.has_permission", return_value=True),
+			patch("za_local.utils.irp5_pdf.frappe.enqueue") as enqueue,
+			patch("za_local.utils.irp5_pdf.frappe.msgprint"),
+		):
+			self.assertEqual(1, irp5_pdf.retry_irp5_pdf_shards("EMP501-TEST"))
+
+		self.assertEqual("2", enqueue.call_args.kwargs["shard_id"])
+		self.assertEqual(("Completed", "Queued"), (shards["1"]["status"], shards["2"]["status"]))
+
+	def test_irp5_pdf_zip_replaces_zips_of_earlier_runs(self):
+		with (
+			patch("za_local.utils.irp5_pdf.frappe.get_all", return_value=["FILE-OLD-ZIP"]) as get_all,
+			patch("za_local.utils.irp5_pdf.frappe.delete_doc") as delete_doc,
+		):
+			irp5_pdf.delete_superseded_irp5_pdf_zips("EMP501-TEST", "FILE-NEW-ZIP")
+
+		filters = get_all.call_args.kwargs["filters"]
+		self.assertEqual(["!=", "FILE-NEW-ZIP"], filters["name"])
+		self.assertEqual(["like", "EMP501-TEST-irp5-certificates-%.zip"], filters["file_name"])
+		delete_doc.assert_called_once_with("File", "FILE-OLD-ZIP", ignore_permissions=True, force=True)
+
+	def test_irp5_pdf_wrapping_splits_long_identifiers_to_column_width(self):
+		if not pdf_generation_available:
+			self.skipTest("reportlab is not installed")
+		from reportlab.pdfbase import pdfmetrics
+
+		value = "Short words then " + "X" * 120
+		lines = _wrap_pdf_text(value, 100, "Helvetica", 8.5)
+
+		self.assertEqual(value.replace(" ", ""), "".join(lines).replace(" ", ""))
+		for line in lines:
+			self.assertLessEqual(pdfmetrics.stringWidth(line, "Helvetica", 8.5), 100)
+		self.assertEqual(lines, _wrap_pdf_text(value, 100, "Helvetica", 8.5))
+
 	def test_taxable_it3a_requires_explicit_valid_reason_code(self):
 		doc = frappe.new_doc("IRP5 Certificate")
 		doc.gross_taxable_income = 50_000
@@ -262,6 +555,104 @@ class TestSARSReportingRegressions(UnitTestCase):
 		):
 			EMP501Reconciliation.validate_certificate_reconciliation(doc, certificate_totals)
 
+	def test_emp501_reconciliation_uses_one_cache_refresh_for_totals_and_diff(self):
+		doc = frappe.new_doc("EMP501 Reconciliation")
+		doc.name = "EMP501-CACHE"
+		rows = [
+			frappe._dict(
+				name="EMP201-MAR",
+				submission_period_start_date="2026-03-01",
+				gross_paye_before_eti=1_000,
+				uif_payable=100,
+				sdl_payable=50,
+				eti_carried_forward_from_previous=0,
+				eti_generated_current_month=0,
+				eti_utilized_current_month=0,
+				eti_to_be_carried_forward=0,
+			)
+		]
+		reconciliation = Mock()
+		reconciliation.get_certificate_totals.return_value = frappe._dict(paye=900, uif=100, sdl=50, eti=0)
+		reconciliation.get_diff.return_value = frappe._dict(
+			employees=[
+				frappe._dict(
+					employee="EMP-1", employee_name="Thandi", issue="out_of_balance", differences={"paye": -100}
+				)
+			],
+			months=[],
+		)
+		with (
+			patch.object(EMP501Reconciliation, "_get_linked_emp201_rows", return_value=rows),
+			patch(
+				"za_local.sa_payroll.doctype.emp501_reconciliation.emp501_reconciliation."
+				"EMP501ReconciliationCache"
+			) as cache_class,
+			self.assertRaises(frappe.ValidationError) as error,
+		):
+			cache_class.return_value.refresh.return_value = reconciliation
+			EMP501Reconciliation.validate_certificate_reconciliation(doc)
+
+		cache_class.return_value.refresh.assert_called_once_with()
+		reconciliation.get_diff.assert_called_once_with(rows)
+		self.assertIn("Thandi", str(error.exception))
+
+	def test_emp501_diff_cache_is_cleared_on_cancel(self):
+		doc = frappe.new_doc("EMP501 Reconciliation")
+		doc.name = "EMP501-CANCEL"
+		with (
+			patch.object(EMP501Reconciliation, "db_set"),
+			patch("frappe.msgprint"),
+			patch(
+				"za_local.sa_payroll.doctype.emp501_reconciliation.emp501_reconciliation.clear_emp501_diff_cache"
+			) as clear_cache,
+		):
+			doc.on_cancel()
+
+		clear_cache.assert_called_once_with("EMP501-CANCEL")
+
+	def test_emp501_diff_recomputes_only_employees_with_changed_slips(self):
+		emp501 = frappe._dict(name="EMP501-DIFF", irp5_certificates=[], emp201_submissions=[])
+		store = {}
+		cache = Mock()
+		cache.hgetall.side_effect = lambda key: dict(store)
+		cache.hset.side_effect = lambda key, field, value: store.__setitem__(field, value)
+		cache.hdel.side_effect = lambda key, field: store.pop(field, None)
+
+		fingerprints = {"EMP-1": (1, "2026-03-31 10:00:00"), "EMP-2": (1, "2026-03-31 10:00:00")}
+		certificates = {
+			employee: frappe._dict(
+				name=f"IRP5-{employee}", employee=employee, employee_name=employee, modified="2026-09-01",
+				paye=1_000, uif=100, sdl=50, eti=0,
+			)
+			for employee in fingerprints
+		}
+		slip_totals = {"paye": 1_000.0, "uif": 100.0, "sdl": 50.0, "eti": 0.0}
+
+		def month_totals(employees):
+			return {employee: {"2026-03": dict(slip_totals)} for employee in employees}
+
+		with (
+			patch.object(frappe, "cache", cache),
+			patch.object(EMP501ReconciliationCache, "_get_slip_fingerprints", side_effect=lambda: fingerprints),
+			patch.object(EMP501ReconciliationCache, "_get_linked_certificates", return_value=certificates),
+			patch.object(
+				EMP501ReconciliationCache, "_get_slip_month_totals", side_effect=month_totals
+			) as get_month_totals,
+			patch.object(EMP501ReconciliationCache, "_get_emp201_month_totals", return_value={}),
+		):
+			first = EMP501ReconciliationCache(emp501).refresh()
+			self.assertEqual(2, first.recomputed)
+
+			fingerprints["EMP-2"] = (1, "2026-10-01 09:00:00")
+			slip_totals["paye"] = 1_200.0
+			diff = EMP501ReconciliationCache(emp501).refresh().get_diff()
+
+		self.assertEqual(["EMP-2"], get_month_totals.call_args.args[0])
+		self.assertEqual(1, diff.recomputed)
+		self.assertEqual(["EMP-2"], [row.employee for row in diff.employees])
+		self.assertEqual({"paye": -200.0}, diff.employees[0].differences)
+		self.assertEqual(["missing_emp201"], [row.issue for row in diff.months])
+
 	def test_emp501_coverage_rejects_draft_certificate(self):
 		doc = frappe.new_doc("EMP501 Reconciliation")
 		doc.append(
@@ -323,25 +714,200 @@ class TestSARSReportingRegressions(UnitTestCase):
 			get_emp201_report(filters)
 		self.assertIn("docstatus = 1", sql.call_args.args[0])
 
-		with patch("frappe.db.sql", return_value=[]) as sql:
-			get_statutory_summary(filters)
-		query = sql.call_args.args[0]
-		self.assertIn("IFNULL(ss.za_monthly_eti, 0) = 0", query)
-		self.assertIn("cc.parenttype = 'Salary Slip'", query)
+		ledger_totals = frappe._dict(slip_count=2, paye=900, uif_employee=20, uif_employer=20, sdl=15, eti=0)
+		with patch("frappe.db.sql", return_value=[ledger_totals]) as sql:
+			summary = get_statutory_summary(filters)
+		self.assertIn("`tabZA Payroll Ledger`", sql.call_args.args[0])
+		self.assertEqual(
+			["PAYE", "UIF Employee Contribution", "UIF Employer Contribution", "SDL Contribution"],
+			[row.component for row in summary],
+		)
 
 	def test_retirement_report_uses_only_retirement_sars_codes(self):
 		self.assertEqual({"4001", "4003", "4006"}, RETIREMENT_FUND_CODES)
-		rows = [
-			frappe._dict(salary_slip="SS-1", retirement_taxable_excess=1_000),
-			frappe._dict(salary_slip="SS-1", retirement_taxable_excess=1_000),
+		entries = [
+			frappe._dict(
+				salary_slip="SS-1",
+				employee="EMP-1",
+				retirement_taxable_excess=1_000,
+				sars_code_totals=json.dumps(
+					{
+						"3601": {"earnings": 20_000},
+						"4001": {"deductions": 1_500, "company_contribution": 1_500},
+						"4006": {"deductions": 500},
+					}
+				),
+			),
 		]
-		with patch("frappe.db.sql", return_value=rows) as sql:
+		with patch("frappe.db.sql", return_value=entries) as sql:
 			result = get_retirement_report(frappe._dict(company="_Test Company"))
-		query = sql.call_args.args[0]
-		self.assertNotIn("LIKE '%%pension%%'", query)
-		self.assertIn("parenttype = 'Salary Slip'", query)
+		self.assertIn("`tabZA Payroll Ledger`", sql.call_args.args[0])
+		self.assertEqual(["4001", "4006"], [row.za_sars_payroll_code for row in result])
+		self.assertEqual([1_500, 500], [row.employee_deduction for row in result])
+		self.assertEqual([1_500, 0], [row.employer_contribution for row in result])
 		self.assertEqual([1_000, 0], [row.retirement_taxable_excess for row in result])
 
+	def test_payroll_register_pages_ledger_rows_and_rolls_up_departments(self):
+		filters = {
+			"company": "_Test Company",
+			"from_date": "2026-03-01",
+			"to_date": "2026-03-31",
+			"page": 3,
+			"page_length": "1000",
+		}
+		page_rows = [frappe._dict(employee="EMP-1")] * 1000
+		with (
+			patch("frappe.has_permission", return_value=True),
+			patch("frappe.db.sql", return_value=page_rows) as sql,
+			patch("frappe.db.count", return_value=4_500),
+		):
+			_columns, data, message = execute_payroll_register(filters)
+		query, values = sql.call_args.args[:2]
+		self.assertIn("LIMIT %(page_length)s OFFSET %(offset)s", query)
+		self.assertEqual((1000, 2000), (values["page_length"], values["offset"]))
+		self.assertEqual(1000, len(data))
+		self.assertIn("2001 to 3000 of 4500", message)
+
+		unpaged = {key: value for key, value in filters.items() if key not in ("page", "page_length")}
+		with (
+			patch("frappe.has_permission", return_value=True),
+			patch("frappe.db.sql", return_value=[frappe._dict(employee="EMP-1")] * 4_500) as sql,
+			patch("frappe.db.count") as count,
+		):
+			_columns, data, message = execute_payroll_register(unpaged)
+		self.assertNotIn("LIMIT", sql.call_args.args[0])
+		self.assertEqual(4_500, len(data))
+		self.assertIsNone(message)
+		count.assert_not_called()
+
+		with (
+			patch("frappe.has_permission", return_value=True),
+			patch("frappe.db.sql", return_value=[]) as sql,
+		):
+			columns, _data = execute_payroll_register({**filters, "group_by": "Department"})
+		self.assertIn("GROUP BY department", sql.call_args.args[0])
+		self.assertEqual("department", columns[0]["fieldname"])
+
+	def test_report_result_cache_is_reused_until_source_data_changes(self):
+		store = {}
+		cache = Mock()
+		cache.get_value.side_effect = store.get
+		cache.set_value.side_effect = lambda key, value, expires_in_sec=None: store.__setitem__(key, value)
+		fingerprint = [["ZA Payroll Ledger", 10, "2026-03-31 10:00:00"]]
+		permissions = [["HR Manager"], 0, "None"]
+		build = Mock(side_effect=lambda: ([], [{"department": "Sales"}]))
+		filters = {"company": "_Test Company", "from_date": "2026-03-01", "to_date": "2026-03-31"}
+
+		with (
+			patch.object(frappe, "cache", cache),
+			patch("za_local.utils.report_cache.get_data_fingerprint", side_effect=lambda *args: fingerprint),
+			patch("za_local.utils.report_cache.get_permission_fingerprint", side_effect=lambda: permissions),
+		):
+			first = get_cached_report_result("Department Cost Analysis", filters, ("ZA Payroll Ledger",), build)
+			second = get_cached_report_result("Department Cost Analysis", filters, ("ZA Payroll Ledger",), build)
+			self.assertEqual(1, build.call_count)
+			self.assertEqual(first, second)
+
+			fingerprint = [["ZA Payroll Ledger", 11, "2026-04-01 08:00:00"]]
+			get_cached_report_result("Department Cost Analysis", filters, ("ZA Payroll Ledger",), build)
+			get_cached_report_result(
+				"Department Cost Analysis", {**filters, "to_date": "2026-04-30"}, ("ZA Payroll Ledger",), build
+			)
+			self.assertEqual(3, build.call_count)
+
+			# A tightened User Permission must not be answered from the old entry.
+			permissions = [["HR Manager"], 1, "2026-04-02 09:00:00"]
+			get_cached_report_result("Department Cost Analysis", filters, ("ZA Payroll Ledger",), build)
+			self.assertEqual(4, build.call_count)
+
+			# Large results stay on the Prepared Report only.
+			cache.set_value.reset_mock()
+			get_cached_report_result(
+				"VAT Analysis",
+				filters,
+				("ZA Payroll Ledger",),
+				lambda: ([], [{}] * (REPORT_CACHE_MAX_ROWS + 1)),
+			)
+			cache.set_value.assert_not_called()
+
+	def test_payroll_ledger_entry_buckets_slip_rows_by_sars_code(self):
+		codes = {
+			"Basic Salary": "3601",
+			"Overtime": "3607",
+			"Travel Reimbursement": "3702",
+			"PAYE": "4102",
+			"UIF": "4141",
+			"SDL": "4142",
+			"Pension Fund": "4001",
+			"ETI": "4118",
+		}
+		metadata = {
+			name: frappe._dict(
+				za_sars_payroll_code=code,
+				za_coida_applicable=int(name in {"Basic Salary", "Overtime"}),
+				za_is_reimbursement=int(name == "Travel Reimbursement"),
+			)
+			for name, code in codes.items()
+		}
+		buckets = {"PAYE": "paye", "UIF": "uif", "SDL": "sdl", "ETI": "eti"}
+		slip = frappe._dict(
+			name="SS-1",
+			company="_Test Company",
+			employee="EMP-1",
+			end_date="2026-03-31",
+			gross_pay=23_500,
+			net_pay=19_000,
+			za_monthly_eti=0,
+			za_retirement_fund_taxable_excess=250,
+		)
+		earnings = [
+			frappe._dict(salary_component="Basic Salary", amount=20_000),
+			frappe._dict(salary_component="Overtime", amount=2_000),
+			frappe._dict(salary_component="Travel Reimbursement", amount=1_500),
+		]
+		deductions = [
+			frappe._dict(salary_component="PAYE", amount=3_000),
+			frappe._dict(salary_component="UIF", amount=177),
+			frappe._dict(salary_component="Pension Fund", amount=1_500),
+			frappe._dict(salary_component="ETI", amount=750),
+		]
+		contributions = [
+			frappe._dict(salary_component="UIF", amount=177),
+			frappe._dict(salary_component="SDL", amount=235),
+			frappe._dict(salary_component="Pension Fund", amount=1_500),
+		]
+
+		with (
+			patch(
+				"za_local.utils.payroll_ledger.get_component_metadata",
+				side_effect=lambda component: metadata[component],
+			),
+			patch(
+				"za_local.utils.payroll_ledger._get_emp201_bucket",
+				side_effect=lambda component: (buckets.get(component), metadata[component]),
+			),
+		):
+			entry = build_payroll_ledger_entry(slip, earnings, deductions, contributions)
+			slip_eti_entry = build_payroll_ledger_entry(
+				frappe._dict(slip, za_monthly_eti=1_000), earnings, deductions, contributions
+			)
+
+		self.assertEqual(20_000, entry.basic)
+		self.assertEqual(22_000, entry.coida_basis)
+		self.assertEqual(
+			(3_000, 177, 177, 235, 750),
+			(entry.paye, entry.uif_employee, entry.uif_employer, entry.sdl, entry.eti),
+		)
+		self.assertEqual(
+			(1_500, 1_500, 250),
+			(entry.retirement_employee, entry.retirement_employer, entry.retirement_taxable_excess),
+		)
+		self.assertEqual(
+			{"deductions": 1_500, "company_contribution": 1_500},
+			json.loads(entry.sars_code_totals)["4001"],
+		)
+		self.assertEqual(1_000, slip_eti_entry.eti)
+
 	def test_active_print_template_escapes_values_and_renders_required_fields(self):
 		template = (
 			Path(frappe.get_app_path("za_local"))
@@ -401,3 +967,52 @@ class TestSARSReportingRegressions(UnitTestCase):
 			self.assertRaisesRegex(frappe.ValidationError, "legacy mixed-record CSV was removed"),
 		):
 			generate_emp501_csv("_Test EMP501")
+
+	def test_emp501_working_paper_streams_snapshot_code_and_total_rows(self):
+		batches = [
+			[
+				frappe._dict(
+					name="IRP5-0001", certificate_number="C1", employee="EMP-1", employee_name="=Smith", paye=900
+				),
+				frappe._dict(name="IRP5-0002", certificate_number="C2", employee="EMP-2", employee_name="Jones"),
+			],
+			[frappe._dict(name="IRP5-0003", certificate_number="C3", employee="EMP-3", employee_name="Brown")],
+		]
+		code_lines = {
+			"IRP5-0001": [
+				frappe._dict(section="Income", code="3601", description="Salary", amount=10_000),
+				frappe._dict(section="Deduction", code="4102", description="PAYE", amount=900),
+			]
+		}
+
+		with tempfile.TemporaryDirectory() as directory:
+			with (
+				patch(
+					"za_local.utils.emp501_export._get_certificate_batches", return_value=iter(batches)
+				) as get_batches,
+				patch(
+					"za_local.utils.emp501_export._get_code_lines",
+					side_effect=lambda names: {name: code_lines.get(name, []) for name in names},
+				) as get_code_lines,
+				patch("frappe.get_site_path", side_effect=lambda *parts: str(Path(directory, parts[-1]))),
+				patch("frappe.get_doc") as get_doc,
+				patch("frappe.publish_realtime"),
+			):
+				get_doc.return_value.insert.return_value = frappe._dict(file_url="/private/files/wp.csv")
+				stats = write_emp501_working_paper("EMP501-WP", batch_size=2)
+
+				path = next(Path(directory).glob("EMP501-WP-working-paper-*.csv"))
+				with path.open(newline="") as handle:
+					rows = list(csv.DictReader(handle))
+
+		get_batches.assert_called_once_with("EMP501-WP", 2)
+		self.assertEqual(2, get_code_lines.call_count)
+		self.assertEqual(3, stats.certificates)
+		self.assertEqual(8, stats.rows)
+		self.assertEqual(
+			["Employee", "Code", "Code", "Totals", "Employee", "Totals", "Employee", "Totals"],
+			[row["record_type"] for row in rows],
+		)
+		self.assertEqual("'=Smith", rows[0]["employee_name"])
+		self.assertEqual(("4102", "900.0"), (rows[2]["code"], rows[2]["amount"]))
+		self.assertEqual("900.0", rows[3]["paye"])
@@ -32,6 +32,7 @@ class TestStatutorySetup(UnitTestCase):
 		required = {
 			("Salary Component", "za_is_annual_bonus"),
 			("Salary Slip", "za_paye_inclusion_adjustment"),
+			("Salary Slip", "za_coida_basis"),
 			("Payroll Settings", "za_official_interest_rate"),
 			("Leave Type", "za_bcea_compliant"),
 			("Leave Type", "za_applicable_gender"),
@@ -118,45 +118,66 @@ class TestStatutoryWorkflowRegressions(UnitTestCase):
 		doc.submission_period_start_date = "2026-04-01"
 		doc.submission_period_end_date = "2026-04-30"
 
-		salary_slip = frappe._dict(
-			{
-				"za_monthly_eti": 200,
-				"deductions": [
-					frappe._dict(salary_component="PAYE", amount=1_500),
-					frappe._dict(salary_component="UIF Employee", amount=177.12),
-				],
-				"company_contribution": [
-					frappe._dict(salary_component="SDL Contribution", amount=250),
-				],
-				"earnings": [],
-			}
-		)
+		component_totals = [
+			frappe._dict(salary_component="PAYE", slip_has_eti=1, amount=1_000),
+			frappe._dict(salary_component="PAYE", slip_has_eti=0, amount=500),
+			frappe._dict(salary_component="UIF Employee", slip_has_eti=1, amount=177.12),
+			frappe._dict(salary_component="SDL Contribution", slip_has_eti=1, amount=250),
+			# 4118 rows only count on slips without za_monthly_eti.
+			frappe._dict(salary_component="ETI", slip_has_eti=1, amount=200),
+			frappe._dict(salary_component="ETI", slip_has_eti=0, amount=50),
+		]
 
 		def bucket(component_name):
 			return {
 				"PAYE": ("paye", frappe._dict()),
 				"UIF Employee": ("uif", frappe._dict()),
 				"SDL Contribution": ("sdl", frappe._dict()),
+				"ETI": ("eti", frappe._dict()),
 			}.get(component_name, (None, frappe._dict()))
 
+		module = "za_local.sa_payroll.doctype.emp201_submission.emp201_submission"
 		with (
-			patch("frappe.get_all", return_value=[frappe._dict(name="SAL-SLIP-0001")]),
-			patch("frappe.get_doc", return_value=salary_slip),
-			patch("frappe.db.get_value", return_value=0),
 			patch(
-				"za_local.sa_payroll.doctype.emp201_submission.emp201_submission._get_emp201_bucket",
-				side_effect=bucket,
+				f"{module}._get_emp201_salary_slip_totals",
+				return_value=frappe._dict(slip_count=2, eti_generated=200),
 			),
+			patch(f"{module}._get_emp201_component_totals", return_value=component_totals),
+			patch("frappe.get_doc") as get_doc,
+			patch("frappe.db.get_value", return_value=0),
+			patch(f"{module}._get_emp201_bucket", side_effect=bucket),
 		):
 			result = EMP201Submission.fetch_emp201_data(doc)
 
+		get_doc.assert_not_called()
 		self.assertEqual(1_500, result["gross_paye_before_eti"])
-		self.assertEqual(200, result["eti_generated_current_month"])
-		self.assertEqual(200, result["eti_utilized_current_month"])
-		self.assertEqual(1_300, result["net_paye_payable"])
+		self.assertEqual(250, result["eti_generated_current_month"])
+		self.assertEqual(250, result["eti_utilized_current_month"])
+		self.assertEqual(1_250, result["net_paye_payable"])
 		self.assertEqual(177.12, result["uif_payable"])
 		self.assertEqual(250, result["sdl_payable"])
 
+	def test_emp201_fetch_data_rejects_unmapped_statutory_components(self):
+		doc = frappe.new_doc("EMP201 Submission")
+		doc.company = "Test Company"
+		doc.submission_period_start_date = "2026-04-01"
+		doc.submission_period_end_date = "2026-04-30"
+
+		module = "za_local.sa_payroll.doctype.emp201_submission.emp201_submission"
+		with (
+			patch(
+				f"{module}._get_emp201_salary_slip_totals",
+				return_value=frappe._dict(slip_count=1, eti_generated=0),
+			),
+			patch(
+				f"{module}._get_emp201_component_totals",
+				return_value=[frappe._dict(salary_component="Legacy UIF", slip_has_eti=0, amount=10)],
+			),
+			patch(f"{module}._get_emp201_bucket", return_value=(None, frappe._dict())),
+			self.assertRaises(frappe.ValidationError),
+		):
+			EMP201Submission.fetch_emp201_data(doc)
+
 	def test_irp5_paye_total_includes_lump_sum_directive_tax(self):
 		# IRP5 employees' tax must include ordinary PAYE (4102) AND lump-sum/directive
 		# tax (4115), matching the EMP201 PAYE bucket so the EMP501 reconciles.
@@ -175,14 +196,14 @@ class TestStatutoryWorkflowRegressions(UnitTestCase):
 		doc.employee = "HR-EMP-RECON"
 		doc.from_date = "2025-03-01"
 		doc.to_date = "2026-02-28"
-		slips = [frappe._dict(name=f"SS-{i:02d}") for i in range(12)]
-		monthly_eti = {f"SS-{i:02d}": 500 for i in range(12)}
+		slips = [frappe._dict(name=f"SS-{i:02d}", za_monthly_eti=500) for i in range(12)]
 		with (
 			patch.object(IRP5Certificate, "_get_salary_slips", return_value=slips),
-			patch("frappe.db.get_value", side_effect=lambda dt, name, field: monthly_eti[name]),
+			patch("frappe.db.get_value") as get_value,
 		):
 			IRP5Certificate.calculate_eti(doc)
 		self.assertEqual(6000, doc.eti)
+		get_value.assert_not_called()
 
 	def test_emp501_totals_use_gross_paye_and_reconcile_to_irp5(self):
 		# EMP501 payable uses ETI utilised. Certificate code 4118 is reconciled
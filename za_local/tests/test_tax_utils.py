@@ -5,6 +5,7 @@ import frappe
 from za_local.tests.compat import UnitTestCase
 from za_local.utils.tax_utils import (
 	calculate_south_african_tax,
+	clear_tax_credit_rate_cache,
 	get_medical_aid_credit,
 	get_tax_rebate,
 	get_tax_year_dates,
@@ -17,6 +18,10 @@ class TestTaxUtils(UnitTestCase):
 			company="Test Company",
 			end_date="2026-09-30",
 		)
+		clear_tax_credit_rate_cache()
+
+	def tearDown(self):
+		clear_tax_credit_rate_cache()
 
 	@patch("za_local.utils.tax_utils.frappe.db.get_value", return_value="2026-2027 - TC")
 	@patch("za_local.utils.tax_utils.frappe.get_single")
@@ -61,6 +66,24 @@ class TestTaxUtils(UnitTestCase):
 		with self.assertRaises(frappe.ValidationError):
 			get_tax_rebate(self.salary_slip, "1990-01-01")
 
+	@patch("za_local.utils.tax_utils.frappe.db.get_value", return_value="2026-2027 - TC")
+	@patch("za_local.utils.tax_utils.frappe.get_single")
+	def test_rates_are_loaded_once_per_period_until_the_single_is_saved(self, get_single, get_value):
+		get_single.return_value = frappe._dict(
+			tax_rebates_rate=[frappe._dict(payroll_period="2026-2027 - TC", primary=17820)],
+			medical_tax_credit=[frappe._dict(payroll_period="2026-2027 - TC", one_dependant=376)],
+		)
+
+		get_tax_rebate(self.salary_slip, "1990-01-01")
+		get_tax_rebate(self.salary_slip, "1980-01-01")
+		self.assertEqual(376 * 12, get_medical_aid_credit(self.salary_slip, 0))
+		self.assertEqual(1, get_single.call_count)
+		self.assertEqual(1, get_value.call_count)
+
+		clear_tax_credit_rate_cache()
+		get_tax_rebate(self.salary_slip, "1990-01-01")
+		self.assertEqual(2, get_single.call_count)
+
 	@patch("za_local.utils.hrms_detection.safe_import_hrms")
 	def test_tax_calculation_passes_a_slab_document_to_hrms(self, safe_import_hrms):
 		tax_calculator = Mock(return_value=(12345, 0))
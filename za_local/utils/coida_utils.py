@@ -6,13 +6,10 @@ import frappe
 from frappe import _
 from frappe.utils import flt
 
+from za_local.utils.component_registry import get_component_metadata, is_statutory_earning_row
 from za_local.utils.statutory_rates import get_coida_annual_earnings_cap
 
-EXCLUDED_PAYROLL_TREATMENTS = {
-	"Non-Taxable Reimbursement",
-	"Reimbursive Travel",
-	"Working Paper Only",
-}
+COIDA_BASIS_BACKFILL_CHUNK_SIZE = 1000
 
 
 def calculate_coida_contribution(assessable_remuneration, industry_rate):
@@ -101,100 +98,107 @@ def validate_industry_rates(industry_rates):
 	return {"valid": not errors, "errors": errors}
 
 
+def get_coida_basis(earnings):
+	"""Return the COIDA assessable basis of stored earning rows, as ``ZASalarySlip.set_coida_basis`` does."""
+	total = 0
+	for row in earnings or []:
+		metadata = get_component_metadata(row.salary_component)
+		if flt(row.get("amount")) and is_statutory_earning_row(row, metadata, "za_coida_applicable"):
+			total += flt(row.get("amount"))
+	return flt(total, 2)
+
+
 def get_coida_earnings_by_employee(company, from_date, to_date):
-	"""Return gross and COIDA-applicable earnings for each employee.
+	"""Return gross and COIDA-applicable earnings, with the designation, for each employee.
 
-	A persisted ``Salary Slip.za_coida_basis`` is preferred when present. Until
-	that snapshot field is installed, submitted Salary Detail earning rows are
-	aggregated from the component applicability metadata.
+	Every submitted slip carries its ``za_coida_basis`` (set on submit, and by
+	the ``backfill_salary_slip_coida_basis`` patch for older slips), so this is
+	one grouped ``SUM`` over Salary Slip.
 	"""
 	frappe.has_permission("Salary Slip", "read", throw=True)
-	salary_slip_meta = frappe.get_meta("Salary Slip")
-	if salary_slip_meta.has_field("za_coida_basis"):
-		basis_expression = "SUM(IFNULL(ss.za_coida_basis, 0))"
-		basis_rows = frappe.db.sql(
-			f"""
-				SELECT ss.employee, {basis_expression} AS assessable_total
-				FROM `tabSalary Slip` ss
-				WHERE ss.company = %(company)s
-					AND ss.start_date >= %(from_date)s
-					AND ss.end_date <= %(to_date)s
-					AND ss.docstatus = 1
-				GROUP BY ss.employee
-			""",
-			{"company": company, "from_date": from_date, "to_date": to_date},
-			as_dict=True,
-		)
-	else:
-		component_meta = frappe.get_meta("Salary Component")
-		if not component_meta.has_field("za_coida_applicable"):
-			frappe.throw(
-				_("Salary Component field za_coida_applicable is required before COIDA earnings can be calculated.")
-			)
-
-		component_conditions = ["IFNULL(sc.za_coida_applicable, 0) = 1"]
-		if component_meta.has_field("za_is_reimbursement"):
-			component_conditions.append("IFNULL(sc.za_is_reimbursement, 0) = 0")
-		if component_meta.has_field("za_payroll_treatment"):
-			component_conditions.append(
-				"IFNULL(sc.za_payroll_treatment, '') NOT IN %(excluded_treatments)s"
-			)
-
-		salary_detail_meta = frappe.get_meta("Salary Detail")
-		detail_conditions = []
-		if salary_detail_meta.has_field("statistical_component"):
-			detail_conditions.append("IFNULL(sd.statistical_component, 0) = 0")
-		if salary_detail_meta.has_field("do_not_include_in_total"):
-			detail_conditions.append("IFNULL(sd.do_not_include_in_total, 0) = 0")
-
-		all_conditions = component_conditions + detail_conditions
-		basis_rows = frappe.db.sql(
-			f"""
-				SELECT ss.employee, SUM(sd.amount) AS assessable_total
-				FROM `tabSalary Slip` ss
-				INNER JOIN `tabSalary Detail` sd
-					ON sd.parent = ss.name
-					AND sd.parenttype = 'Salary Slip'
-					AND sd.parentfield = 'earnings'
-				INNER JOIN `tabSalary Component` sc ON sc.name = sd.salary_component
-				WHERE ss.company = %(company)s
-					AND ss.start_date >= %(from_date)s
-					AND ss.end_date <= %(to_date)s
-					AND ss.docstatus = 1
-					AND {" AND ".join(all_conditions)}
-				GROUP BY ss.employee
-			""",
-			{
-				"company": company,
-				"from_date": from_date,
-				"to_date": to_date,
-				"excluded_treatments": tuple(EXCLUDED_PAYROLL_TREATMENTS),
-			},
-			as_dict=True,
+	if not frappe.get_meta("Salary Slip").has_field("za_coida_basis"):
+		frappe.throw(
+			_("Salary Slip field za_coida_basis is required before COIDA earnings can be calculated.")
 		)
 
-	gross_rows = frappe.db.sql(
+	rows = frappe.db.sql(
 		"""
-			SELECT employee, SUM(gross_pay) AS gross_total
-			FROM `tabSalary Slip`
-			WHERE company = %(company)s
-				AND start_date >= %(from_date)s
-				AND end_date <= %(to_date)s
-				AND docstatus = 1
-			GROUP BY employee
+			SELECT
+				ss.employee,
+				e.designation,
+				SUM(ss.gross_pay) AS gross_total,
+				SUM(ss.za_coida_basis) AS assessable_total
+			FROM `tabSalary Slip` ss
+			LEFT JOIN `tabEmployee` e ON e.name = ss.employee
+			WHERE ss.company = %(company)s
+				AND ss.start_date >= %(from_date)s
+				AND ss.end_date <= %(to_date)s
+				AND ss.docstatus = 1
+			GROUP BY ss.employee, e.designation
 		""",
 		{"company": company, "from_date": from_date, "to_date": to_date},
 		as_dict=True,
 	)
 
-	result = {
-		row.employee: frappe._dict(gross_total=flt(row.gross_total), assessable_total=0)
-		for row in gross_rows
+	return {
+		row.employee: frappe._dict(
+			gross_total=flt(row.gross_total),
+			assessable_total=flt(row.assessable_total),
+			designation=row.designation,
+		)
+		for row in rows
 	}
-	for row in basis_rows:
-		result.setdefault(row.employee, frappe._dict(gross_total=0, assessable_total=0))
-		result[row.employee].assessable_total = flt(row.assessable_total)
-	return result
+
+
+def _get_slips_missing_coida_basis(after, chunk_size):
+	# Currency columns are NOT NULL, so a slip that was never computed reads as zero.
+	return frappe.get_all(
+		"Salary Slip",
+		filters={"docstatus": 1, "za_coida_basis": 0, "gross_pay": ["!=", 0], "name": [">", after]},
+		order_by="name asc",
+		limit_page_length=chunk_size,
+		pluck="name",
+	)
+
+
+def backfill_salary_slip_coida_basis(chunk_size=COIDA_BASIS_BACKFILL_CHUNK_SIZE):
+	"""Set ``za_coida_basis`` on submitted slips that predate it and return the number updated."""
+	if not frappe.db.table_exists("Salary Slip") or not frappe.get_meta("Salary Slip").has_field(
+		"za_coida_basis"
+	):
+		return 0
+
+	detail_meta = frappe.get_meta("Salary Detail")
+	fields = ["parent", "salary_component", "amount"]
+	fields.extend(
+		field
+		for field in ("statistical_component", "do_not_include_in_total")
+		if detail_meta.has_field(field)
+	)
+
+	updated = 0
+	after = ""
+	while slip_names := _get_slips_missing_coida_basis(after, chunk_size):
+		earnings = {}
+		for row in frappe.get_all(
+			"Salary Detail",
+			filters={"parenttype": "Salary Slip", "parentfield": "earnings", "parent": ["in", slip_names]},
+			fields=fields,
+		):
+			earnings.setdefault(row.parent, []).append(row)
+
+		updates = {
+			name: {"za_coida_basis": basis}
+			for name in slip_names
+			if (basis := get_coida_basis(earnings.get(name)))
+		}
+		if updates:
+			frappe.db.bulk_update("Salary Slip", updates, update_modified=False)
+		frappe.db.commit()
+		updated += len(updates)
+		after = slip_names[-1]
+
+	return updated
 
 
 def calculate_annual_coida(company, from_date, to_date, industry_class=None):
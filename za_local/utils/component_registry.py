@@ -0,0 +1,198 @@
+"""Salary Component SA classification registry.
+
+Payroll, EMP201, ETI and IRP5 code classify Salary Components by their SARS
+payroll code, payroll treatment and statutory applicability flags. The
+registry loads every component and its SARS Payroll Code row with one joined
+query and keeps the result per site in the worker process. A version key in
+the site cache is cleared whenever a Salary Component or SARS Payroll Code is
+updated, so every worker reloads on its next request instead of serving stale
+classifications.
+"""
+
+from dataclasses import dataclass
+
+import frappe
+from frappe.utils import cint
+
+REGISTRY_VERSION_CACHE_KEY = "za_local:component_registry_version"
+NON_REMUNERATION_TREATMENTS = frozenset(
+	{"Reimbursive Travel", "Non-Taxable Reimbursement", "Working Paper Only"}
+)
+
+# Salary Component fields exposed to payroll code. Custom fields that are not
+# installed on the site are omitted from metadata so callers can still detect
+# an incomplete classification setup.
+COMPONENT_FIELDS = (
+	"za_sars_payroll_code",
+	"za_payroll_treatment",
+	"za_paye_inclusion_percentage",
+	"za_uif_applicable",
+	"za_sdl_applicable",
+	"za_coida_applicable",
+	"za_is_reimbursement",
+	"za_variable_pay_treatment",
+	"za_eti_wage_component",
+	"za_exclude_from_irp5",
+	"is_income_tax_component",
+)
+
+_site_registries = {}
+
+
+@dataclass(frozen=True, slots=True)
+class SARSCodeDetails:
+	code: str
+	description: str | None = None
+	category: str | None = None
+	tax_treatment: str | None = None
+	active: int = 1
+	print_sequence: int = 0
+
+	def get(self, fieldname, default=None):
+		return getattr(self, fieldname, default)
+
+
+@dataclass(frozen=True, slots=True)
+class ComponentClassification:
+	name: str
+	za_sars_payroll_code: str | None = None
+	za_payroll_treatment: str | None = None
+	za_paye_inclusion_percentage: float | None = None
+	za_uif_applicable: int | None = None
+	za_sdl_applicable: int | None = None
+	za_coida_applicable: int | None = None
+	za_is_reimbursement: int | None = None
+	za_variable_pay_treatment: str | None = None
+	za_eti_wage_component: int | None = None
+	za_exclude_from_irp5: int | None = None
+	is_income_tax_component: int | None = None
+	sars_code: SARSCodeDetails | None = None
+
+	def get(self, fieldname, default=None):
+		return getattr(self, fieldname, default)
+
+
+class ComponentClassificationRegistry:
+	"""Immutable component name -> classification map for one site."""
+
+	__slots__ = ("available_fields", "components", "sars_codes", "version")
+
+	def __init__(self, components, sars_codes, available_fields, version=None):
+		self.components = components
+		self.sars_codes = sars_codes
+		self.available_fields = frozenset(available_fields)
+		self.version = version
+
+	def get(self, salary_component):
+		return self.components.get(salary_component)
+
+	def get_metadata(self, salary_component, fields=COMPONENT_FIELDS):
+		"""Return installed classification fields as a dict, empty for unknown components."""
+		classification = self.components.get(salary_component)
+		if not classification:
+			return frappe._dict()
+		return frappe._dict(
+			{
+				fieldname: getattr(classification, fieldname)
+				for fieldname in fields
+				if fieldname in self.available_fields
+			}
+		)
+
+	def get_sars_code(self, code):
+		return self.sars_codes.get(code)
+
+	@classmethod
+	def load(cls, version=None):
+		"""Load every Salary Component with its SARS Payroll Code row in one query."""
+		meta = frappe.get_meta("Salary Component")
+		available_fields = [field for field in COMPONENT_FIELDS if meta.has_field(field)]
+
+		component = frappe.qb.DocType("Salary Component")
+		sars_code = frappe.qb.DocType("SARS Payroll Code")
+		query = frappe.qb.from_(component).select(component.name)
+		for fieldname in available_fields:
+			query = query.select(component[fieldname])
+
+		has_sars_code = "za_sars_payroll_code" in available_fields
+		if has_sars_code:
+			query = (
+				query.left_join(sars_code)
+				.on(sars_code.name == component.za_sars_payroll_code)
+				.select(
+					sars_code.name.as_("sars_code_name"),
+					sars_code.description.as_("sars_code_description"),
+					sars_code.category.as_("sars_code_category"),
+					sars_code.tax_treatment.as_("sars_code_tax_treatment"),
+					sars_code.active.as_("sars_code_active"),
+					sars_code.print_sequence.as_("sars_code_print_sequence"),
+				)
+			)
+
+		components = {}
+		sars_codes = {}
+		for row in query.run(as_dict=True):
+			details = None
+			if has_sars_code and row.sars_code_name:
+				details = sars_codes.get(row.sars_code_name)
+				if details is None:
+					details = sars_codes[row.sars_code_name] = SARSCodeDetails(
+						code=row.sars_code_name,
+						description=row.sars_code_description,
+						category=row.sars_code_category,
+						tax_treatment=row.sars_code_tax_treatment,
+						active=cint(row.sars_code_active if row.sars_code_active is not None else 1),
+						print_sequence=cint(row.sars_code_print_sequence),
+					)
+			components[row.name] = ComponentClassification(
+				name=row.name,
+				sars_code=details,
+				**{fieldname: row.get(fieldname) for fieldname in available_fields},
+			)
+
+		return cls(components, sars_codes, available_fields, version=version)
+
+
+def get_component_registry():
+	"""Return the current site's registry, reloading it when the version key changed."""
+	registry = getattr(frappe.local, "za_component_registry", None)
+	if registry is not None:
+		return registry
+
+	version = frappe.cache.get_value(REGISTRY_VERSION_CACHE_KEY)
+	if not version:
+		version = frappe.generate_hash(length=12)
+		frappe.cache.set_value(REGISTRY_VERSION_CACHE_KEY, version)
+
+	site = getattr(frappe.local, "site", None)
+	registry = _site_registries.get(site)
+	if registry is None or registry.version != version:
+		registry = ComponentClassificationRegistry.load(version=version)
+		_site_registries[site] = registry
+
+	frappe.local.za_component_registry = registry
+	return registry
+
+
+def clear_component_registry(doc=None, method=None):
+	"""Invalidate the registry in every worker for this site (Salary Component / SARS code hooks)."""
+	frappe.cache.delete_value(REGISTRY_VERSION_CACHE_KEY)
+	_site_registries.pop(getattr(frappe.local, "site", None), None)
+	frappe.local.za_component_registry = None
+
+
+def get_component_metadata(salary_component, fields=COMPONENT_FIELDS):
+	if not salary_component:
+		return frappe._dict()
+	return get_component_registry().get_metadata(salary_component, fields)
+
+
+def is_statutory_earning_row(row, metadata, applicability_field):
+	"""Return whether an earning row counts towards the UIF, SDL or COIDA basis named by ``applicability_field``."""
+	if row.get("statistical_component") or row.get("do_not_include_in_total"):
+		return False
+	if metadata.get("za_payroll_treatment") in NON_REMUNERATION_TREATMENTS:
+		return False
+	if metadata.get("za_is_reimbursement"):
+		return False
+	return metadata.get(applicability_field) not in (0, "0", False, None, "")
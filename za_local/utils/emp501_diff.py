@@ -0,0 +1,316 @@
+"""Incremental EMP501 reconciliation differences.
+
+Practitioners re-run the EMP501 reconciliation many times while they correct
+salary slips and certificates. The reconciliation cache keeps, per employee,
+the PAYE, UIF, SDL and ETI totals of the period's submitted salary slips (split
+by month) next to the employee's linked certificate totals, together with a
+fingerprint of the rows they came from: slip count and latest ``modified``,
+and the certificate's name and ``modified``. A refresh reads the fingerprints
+with one grouped query and only re-aggregates the slips of employees whose
+fingerprint changed.
+
+The diff compares each employee's certificate with their slips, and each
+month's submitted EMP201 with the slips of that month, and lists only the rows
+that are out of balance.
+"""
+
+from collections import defaultdict
+
+import frappe
+from frappe.query_builder import Case
+from frappe.query_builder.functions import Coalesce, Count, Max, Sum
+from frappe.utils import flt, getdate
+
+from za_local.sa_payroll.doctype.emp201_submission.emp201_submission import _get_emp201_bucket
+
+EMP501_DIFF_CACHE_KEY = "za_local:emp501_diff:{0}"
+EMP501_DIFF_CACHE_TTL = 7 * 24 * 60 * 60
+EMPLOYEE_BATCH_SIZE = 500
+TOTAL_FIELDS = ("paye", "uif", "sdl", "eti")
+TOTAL_TOLERANCE = 0.01
+
+
+def _empty_totals():
+	return dict.fromkeys(TOTAL_FIELDS, 0.0)
+
+
+def _month_key(date_value):
+	return getdate(date_value).strftime("%Y-%m")
+
+
+class EMP501ReconciliationCache:
+	"""Per-employee slip and certificate totals for one EMP501, refreshed incrementally."""
+
+	def __init__(self, emp501):
+		self.emp501 = emp501
+		self.cache_key = EMP501_DIFF_CACHE_KEY.format(emp501.name)
+		self.entries = {}
+		self.recomputed = 0
+
+	def refresh(self):
+		"""Bring every employee entry up to date and return ``self``."""
+		stored = {
+			employee: frappe._dict(entry)
+			for employee, entry in (frappe.cache.hgetall(self.cache_key) or {}).items()
+		}
+		slip_fingerprints = self._get_slip_fingerprints()
+		certificates = self._get_linked_certificates()
+
+		employees = set(slip_fingerprints) | set(certificates)
+		for employee in set(stored) - employees:
+			frappe.cache.hdel(self.cache_key, employee)
+
+		changed = []
+		for employee in sorted(employees):
+			certificate = certificates.get(employee)
+			fingerprint = (
+				slip_fingerprints.get(employee),
+				(certificate.name, str(certificate.modified)) if certificate else None,
+			)
+			entry = stored.get(employee)
+			if entry and entry.fingerprint == fingerprint:
+				self.entries[employee] = entry
+				continue
+
+			self.entries[employee] = frappe._dict(
+				fingerprint=fingerprint,
+				slip_months={},
+				certificate=(
+					{field: flt(certificate.get(field)) for field in TOTAL_FIELDS} if certificate else None
+				),
+				certificate_name=certificate.name if certificate else None,
+				employee_name=(certificate.employee_name if certificate else None),
+			)
+			if entry and entry.fingerprint[0] == fingerprint[0]:
+				# Only the certificate changed; the slip totals are still current.
+				self.entries[employee].slip_months = entry.slip_months
+			elif fingerprint[0]:
+				changed.append(employee)
+
+		for start in range(0, len(changed), EMPLOYEE_BATCH_SIZE):
+			batch = changed[start : start + EMPLOYEE_BATCH_SIZE]
+			for employee, slip_months in self._get_slip_month_totals(batch).items():
+				self.entries[employee].slip_months = slip_months
+
+		for employee, entry in self.entries.items():
+			if stored.get(employee) is not entry:
+				frappe.cache.hset(self.cache_key, employee, dict(entry))
+		if self.entries:
+			frappe.cache.expire(frappe.cache.make_key(self.cache_key), EMP501_DIFF_CACHE_TTL)
+		self.recomputed = len(changed)
+		return self
+
+	def get_certificate_totals(self):
+		"""Sum the linked certificates' PAYE, UIF, SDL and ETI from the refreshed entries."""
+		totals = frappe._dict(_empty_totals())
+		for entry in self.entries.values():
+			for field in TOTAL_FIELDS:
+				totals[field] += flt((entry.certificate or {}).get(field))
+		return totals
+
+	def _slip_filters(self, salary_slip):
+		return (
+			(salary_slip.company == self.emp501.company)
+			& (salary_slip.docstatus == 1)
+			& salary_slip.end_date[getdate(self.emp501.from_date) : getdate(self.emp501.to_date)]
+		)
+
+	def _get_slip_fingerprints(self):
+		salary_slip = frappe.qb.DocType("Salary Slip")
+		rows = (
+			frappe.qb.from_(salary_slip)
+			.select(
+				salary_slip.employee,
+				Count(salary_slip.name).as_("slip_count"),
+				Max(salary_slip.modified).as_("last_modified"),
+			)
+			.where(self._slip_filters(salary_slip))
+			.groupby(salary_slip.employee)
+		).run(as_dict=True)
+		return {row.employee: (row.slip_count, str(row.last_modified)) for row in rows}
+
+	def _get_linked_certificates(self):
+		names = [row.irp5_certificate for row in self.emp501.irp5_certificates or [] if row.irp5_certificate]
+		if not names:
+			return {}
+		return {
+			row.employee: row
+			for row in frappe.get_all(
+				"IRP5 Certificate",
+				filters={"name": ["in", names]},
+				fields=["name", "employee", "employee_name", "modified", *TOTAL_FIELDS],
+			)
+		}
+
+	def _get_slip_month_totals(self, employees):
+		"""Return ``{employee: {YYYY-MM: totals}}`` bucketed the way EMP201 buckets slips."""
+		salary_slip = frappe.qb.DocType("Salary Slip")
+		slip_has_eti = Case().when(Coalesce(salary_slip.za_monthly_eti, 0) != 0, 1).else_(0)
+		totals = defaultdict(lambda: defaultdict(_empty_totals))
+
+		for row in (
+			frappe.qb.from_(salary_slip)
+			.select(
+				salary_slip.employee,
+				salary_slip.end_date,
+				Sum(salary_slip.za_monthly_eti).as_("eti"),
+			)
+			.where(self._slip_filters(salary_slip))
+			.where(salary_slip.employee.isin(employees))
+			.groupby(salary_slip.employee, salary_slip.end_date)
+		).run(as_dict=True):
+			totals[row.employee][_month_key(row.end_date)]["eti"] += flt(row.eti)
+
+		def component_totals(child, parentfields):
+			return (
+				frappe.qb.from_(child)
+				.join(salary_slip)
+				.on(child.parent == salary_slip.name)
+				.select(
+					salary_slip.employee,
+					salary_slip.end_date,
+					child.salary_component,
+					slip_has_eti.as_("slip_has_eti"),
+					Sum(child.amount).as_("amount"),
+				)
+				.where(child.parenttype == "Salary Slip")
+				.where(child.parentfield.isin(parentfields))
+				.where(child.amount != 0)
+				.where(self._slip_filters(salary_slip))
+				.where(salary_slip.employee.isin(employees))
+				.groupby(salary_slip.employee, salary_slip.end_date, child.salary_component, slip_has_eti)
+			)
+
+		query = component_totals(frappe.qb.DocType("Salary Detail"), ["deductions", "earnings"]).union_all(
+			component_totals(frappe.qb.DocType("Company Contribution"), ["company_contribution"])
+		)
+		for row in query.run(as_dict=True):
+			bucket, _metadata = _get_emp201_bucket(row.salary_component)
+			if bucket == "eti" and row.slip_has_eti:
+				continue
+			if bucket in TOTAL_FIELDS:
+				totals[row.employee][_month_key(row.end_date)][bucket] += flt(row.amount)
+
+		return {
+			employee: {month: dict(values) for month, values in months.items()}
+			for employee, months in totals.items()
+		}
+
+	def get_diff(self, emp201_rows=None):
+		"""Return the employees and months whose totals do not reconcile.
+
+		``emp201_rows`` are the linked submitted EMP201 rows when the caller has
+		already read them; otherwise they are queried.
+		"""
+		employees = []
+		month_totals = defaultdict(_empty_totals)
+		for employee, entry in sorted(self.entries.items()):
+			slip_totals = _empty_totals()
+			for month, values in (entry.slip_months or {}).items():
+				for field in TOTAL_FIELDS:
+					slip_totals[field] += flt(values.get(field))
+					month_totals[month][field] += flt(values.get(field))
+
+			if not entry.certificate:
+				employees.append(
+					frappe._dict(
+						employee=employee,
+						employee_name=entry.employee_name,
+						irp5_certificate=None,
+						issue="missing_certificate",
+						salary_slips=slip_totals,
+					)
+				)
+				continue
+
+			differences = _get_differences(entry.certificate, slip_totals)
+			if differences:
+				employees.append(
+					frappe._dict(
+						employee=employee,
+						employee_name=entry.employee_name,
+						irp5_certificate=entry.certificate_name,
+						issue="out_of_balance",
+						certificate=entry.certificate,
+						salary_slips=slip_totals,
+						differences=differences,
+					)
+				)
+
+		months = []
+		emp201_months = self._get_emp201_month_totals(emp201_rows)
+		for month in sorted(set(month_totals) | set(emp201_months)):
+			declared = emp201_months.get(month)
+			if not declared:
+				months.append(
+					frappe._dict(month=month, issue="missing_emp201", salary_slips=month_totals[month])
+				)
+				continue
+			differences = _get_differences(declared.totals, month_totals.get(month) or _empty_totals())
+			if differences:
+				months.append(
+					frappe._dict(
+						month=month,
+						emp201_submission=declared.name,
+						issue="out_of_balance",
+						emp201=declared.totals,
+						salary_slips=month_totals.get(month) or _empty_totals(),
+						differences=differences,
+					)
+				)
+
+		return frappe._dict(
+			in_balance=not employees and not months,
+			employees=employees,
+			months=months,
+			employee_count=len(self.entries),
+			recomputed=self.recomputed,
+		)
+
+	def _get_emp201_month_totals(self, rows=None):
+		if rows is None:
+			names = [
+				row.emp201_submission for row in self.emp501.emp201_submissions or [] if row.emp201_submission
+			]
+			if not names:
+				return {}
+			rows = frappe.get_all(
+				"EMP201 Submission",
+				filters={"name": ["in", names], "docstatus": 1},
+				fields=[
+					"name",
+					"submission_period_start_date",
+					"gross_paye_before_eti",
+					"uif_payable",
+					"sdl_payable",
+					"eti_generated_current_month",
+				],
+			)
+		return {
+			_month_key(row.submission_period_start_date): frappe._dict(
+				name=row.name,
+				totals={
+					"paye": flt(row.gross_paye_before_eti),
+					"uif": flt(row.uif_payable),
+					"sdl": flt(row.sdl_payable),
+					"eti": flt(row.eti_generated_current_month),
+				},
+			)
+			for row in rows
+		}
+
+
+def _get_differences(expected, actual):
+	return {
+		field: flt(flt(expected.get(field)) - flt(actual.get(field)), 2)
+		for field in TOTAL_FIELDS
+		if abs(flt(expected.get(field)) - flt(actual.get(field))) > TOTAL_TOLERANCE
+	}
+
+
+def get_emp501_diff(emp501):
+	return EMP501ReconciliationCache(emp501).refresh().get_diff()
+
+
+def clear_emp501_diff_cache(emp501_name):
+	frappe.cache.delete_value(EMP501_DIFF_CACHE_KEY.format(emp501_name))
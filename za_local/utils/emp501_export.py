@@ -0,0 +1,234 @@
+"""Streaming EMP501 / IRP5 working-paper export.
+
+The working paper lists, for every IRP5 certificate linked to an EMP501
+Reconciliation, one ``Employee`` row with the certificate's employee snapshot,
+one ``Code`` row per income, deduction and company contribution line, and one
+``Totals`` row. Rows are produced by a generator that reads the certificates
+in keyset-paginated batches and written straight to a private CSV file, so
+memory use stays flat however many certificates the reconciliation carries.
+
+This is a review working paper, not a SARS PAYE BRS certificate file.
+"""
+
+import csv
+import os
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+EMP501_EXPORT_BATCH_SIZE = 1000
+EMP501_EXPORT_SYNC_LIMIT = 500
+EMP501_EXPORT_TIMEOUT = 3600
+
+EMPLOYEE_SNAPSHOT_FIELDS = (
+	"certificate_number",
+	"certificate_type",
+	"employee",
+	"employee_name",
+	"identity_type",
+	"employee_id_number",
+	"passport_number",
+	"income_tax_reference_number",
+	"employed_from",
+	"employed_to",
+	"periods_in_year",
+	"periods_worked",
+	"directive_numbers",
+)
+CERTIFICATE_TOTAL_FIELDS = (
+	"gross_taxable_income",
+	"non_taxable_income",
+	"total_deductions_contributions",
+	"paye",
+	"uif",
+	"sdl",
+	"eti",
+	"total_tax_payable",
+)
+CODE_FIELDS = ("section", "code", "description", "amount")
+CODE_LINE_TABLES = (
+	("Income", "IRP5 Income Detail", "income_code"),
+	("Deduction", "IRP5 Deduction Detail", "deduction_code"),
+	("Company Contribution", "IRP5 Company Contribution Detail", "contribution_code"),
+)
+
+WORKING_PAPER_COLUMNS = (
+	"record_type",
+	"irp5_certificate",
+	*EMPLOYEE_SNAPSHOT_FIELDS,
+	*CODE_FIELDS,
+	*CERTIFICATE_TOTAL_FIELDS,
+)
+# Spreadsheet applications evaluate cells starting with these characters.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value):
+	if value is None:
+		return ""
+	if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+		return f"'{value}"
+	return value
+
+
+def _get_certificate_batches(emp501_name, batch_size=EMP501_EXPORT_BATCH_SIZE):
+	"""Yield lists of linked certificates, ``batch_size`` at a time, ordered by name."""
+	certificate = frappe.qb.DocType("IRP5 Certificate")
+	reference = frappe.qb.DocType("EMP501 IRP5 Reference")
+	last_name = ""
+	while True:
+		batch = (
+			frappe.qb.from_(reference)
+			.join(certificate)
+			.on(certificate.name == reference.irp5_certificate)
+			.select(
+				certificate.name,
+				*(certificate[field] for field in EMPLOYEE_SNAPSHOT_FIELDS),
+				*(certificate[field] for field in CERTIFICATE_TOTAL_FIELDS),
+			)
+			.where(reference.parenttype == "EMP501 Reconciliation")
+			.where(reference.parent == emp501_name)
+			.where(certificate.name > last_name)
+			.orderby(certificate.name)
+			.limit(batch_size)
+		).run(as_dict=True)
+		if not batch:
+			return
+		yield batch
+		if len(batch) < batch_size:
+			return
+		last_name = batch[-1].name
+
+
+def _get_code_lines(certificate_names):
+	"""Return ``{certificate: [code lines]}`` for one batch of certificates."""
+	lines = {}
+	for section, doctype, code_field in CODE_LINE_TABLES:
+		for row in frappe.get_all(
+			doctype,
+			filters={"parenttype": "IRP5 Certificate", "parent": ["in", certificate_names]},
+			fields=["parent", f"{code_field} as code", "description", "amount"],
+			order_by="parent asc, idx asc",
+		):
+			lines.setdefault(row.parent, []).append(
+				frappe._dict(section=section, code=row.code, description=row.description, amount=row.amount)
+			)
+	return lines
+
+
+def iter_emp501_working_paper_rows(emp501_name, batch_size=EMP501_EXPORT_BATCH_SIZE):
+	"""Yield working-paper rows (as dicts keyed by ``WORKING_PAPER_COLUMNS``) for an EMP501."""
+	for batch in _get_certificate_batches(emp501_name, batch_size):
+		code_lines = _get_code_lines([certificate.name for certificate in batch])
+		for certificate in batch:
+			snapshot = {field: certificate.get(field) for field in EMPLOYEE_SNAPSHOT_FIELDS}
+			yield {"record_type": "Employee", "irp5_certificate": certificate.name, **snapshot}
+			for line in code_lines.get(certificate.name, []):
+				yield {
+					"record_type": "Code",
+					"irp5_certificate": certificate.name,
+					"certificate_number": certificate.certificate_number,
+					"employee": certificate.employee,
+					"section": line.section,
+					"code": line.code,
+					"description": line.description,
+					"amount": flt(line.amount, 2),
+				}
+			yield {
+				"record_type": "Totals",
+				"irp5_certificate": certificate.name,
+				"certificate_number": certificate.certificate_number,
+				"employee": certificate.employee,
+				**{field: flt(certificate.get(field), 2) for field in CERTIFICATE_TOTAL_FIELDS},
+			}
+
+
+def write_emp501_working_paper(emp501_name, batch_size=EMP501_EXPORT_BATCH_SIZE):
+	"""Stream the working paper to a private file attached to the EMP501 and return export statistics."""
+	file_name = f"{emp501_name}-working-paper-{frappe.generate_hash(length=8)}.csv"
+	file_path = frappe.get_site_path("private", "files", file_name)
+
+	rows = 0
+	certificates = 0
+	started = time.monotonic()
+	with open(file_path, "w", newline="", encoding="utf-8") as handle:
+		writer = csv.writer(handle)
+		writer.writerow(WORKING_PAPER_COLUMNS)
+		for row in iter_emp501_working_paper_rows(emp501_name, batch_size):
+			writer.writerow([_csv_value(row.get(column)) for column in WORKING_PAPER_COLUMNS])
+			rows += 1
+			if row["record_type"] == "Totals":
+				certificates += 1
+	seconds = time.monotonic() - started
+
+	file_doc = frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": file_name,
+			"file_url": f"/private/files/{file_name}",
+			"is_private": 1,
+			"attached_to_doctype": "EMP501 Reconciliation",
+			"attached_to_name": emp501_name,
+			"file_size": os.path.getsize(file_path),
+		}
+	).insert(ignore_permissions=True)
+
+	stats = frappe._dict(
+		file_url=file_doc.file_url,
+		certificates=certificates,
+		rows=rows,
+		seconds=flt(seconds, 3),
+		rows_per_second=flt(rows / seconds, 1) if seconds else rows,
+	)
+	frappe.publish_realtime(
+		"za_emp501_export_ready",
+		stats,
+		doctype="EMP501 Reconciliation",
+		docname=emp501_name,
+		after_commit=True,
+	)
+	return stats
+
+
+def run_emp501_working_paper_export(emp501_name):
+	"""Background job: write the working paper and notify the EMP501 form."""
+	stats = write_emp501_working_paper(emp501_name)
+	frappe.db.commit()
+	return stats
+
+
+@frappe.whitelist(methods=["POST"])
+def export_emp501_working_paper(emp501_name):
+	"""Export the EMP501 working paper, in the background for large reconciliations."""
+	emp501 = frappe.get_doc("EMP501 Reconciliation", emp501_name, check_permission=True)
+	if not frappe.has_permission("IRP5 Certificate", "read"):
+		frappe.throw(
+			_("You are not permitted to export IRP5 certificate data."),
+			frappe.PermissionError,
+			title=_("Insufficient Permission"),
+		)
+
+	certificate_count = len([row for row in emp501.irp5_certificates or [] if row.irp5_certificate])
+	if not certificate_count:
+		frappe.throw(_("Generate IRP5 certificates before exporting the working paper."))
+
+	if certificate_count > EMP501_EXPORT_SYNC_LIMIT:
+		frappe.enqueue(
+			run_emp501_working_paper_export,
+			queue="long",
+			timeout=EMP501_EXPORT_TIMEOUT,
+			job_id=f"za_emp501_export::{emp501_name}",
+			deduplicate=True,
+			enqueue_after_commit=True,
+			emp501_name=emp501_name,
+		)
+		frappe.msgprint(
+			_("Exporting {0} certificates in the background. The file is attached to this form when ready.")
+			.format(certificate_count),
+			alert=True,
+		)
+		return frappe._dict(queued=True, certificates=certificate_count)
+
+	return write_emp501_working_paper(emp501_name)
@@ -10,18 +10,183 @@ ETI Eligibility Criteria:
 - Employment period: First 24 months only
 - Hired on or after October 1, 2013
 - Valid SA ID or Asylum Seeker permit
+
+Payroll Entry runs use an ``ETIBatch``: employee masters and submitted ETI
+history for the whole run are prefetched with one query each, eligibility is
+resolved in memory and the run's audit logs are written with a bulk insert.
+Single slips keep the per-document path.
 """
 
+from contextlib import contextmanager
 from datetime import date, timedelta
 
 import frappe
 from frappe.utils import cint, date_diff, flt, get_first_day, getdate
 
+from za_local.utils.component_registry import get_component_registry
 from za_local.utils.statutory_rates import calculate_eti_from_pack, find_rate_pack
 
 WAGE_BASIS_REGULATED = "National or Regulated Minimum Wage"
 WAGE_BASIS_UNREGULATED = "No Regulating Measure or NMW Exempt"
 
+# Employee fields read by eligibility and minimum-wage checks.
+ETI_EMPLOYEE_FIELDS = (
+    "date_of_birth",
+    "date_of_joining",
+    "za_is_domestic_worker",
+    "za_is_connected_person_to_employer",
+    "za_id_number",
+    "za_hours_per_month",
+    "za_eti_minimum_wage_basis",
+    "za_eti_minimum_wage_rate",
+)
+
+ETI_LOG_FIELDS = (
+    "employee",
+    "employee_name",
+    "against_salary_slip",
+    "date",
+    "eti_amount",
+    "carry_forwarding_eti_amount",
+    "is_qualifying_month",
+    "qualifying_month_number",
+    "eligibility_reason",
+    "hours",
+    "monthly_remuneration",
+    "wage_paid",
+    "minimum_wage",
+)
+
+BATCH_SIZE = 1000
+
+
+class ETIBatch:
+    """Prefetched ETI inputs and deferred audit logs for one payroll run."""
+
+    def __init__(self, end_date):
+        self.end_date = getdate(end_date)
+        self._employees = {}
+        self._history = {}
+        self._pending_logs = {}
+
+    def matches(self, salary_slip):
+        return getdate(salary_slip.end_date) == self.end_date
+
+    def preload(self, employees):
+        """Load employee masters and submitted ETI history before the run month."""
+        pending = [
+            employee
+            for employee in dict.fromkeys(employees or [])
+            if employee and employee not in self._employees
+        ]
+        meta = frappe.get_meta("Employee")
+        fields = ["name", *(field for field in ETI_EMPLOYEE_FIELDS if meta.has_field(field))]
+
+        for start in range(0, len(pending), BATCH_SIZE):
+            batch = pending[start : start + BATCH_SIZE]
+            for employee in batch:
+                self._employees[employee] = None
+                self._history[employee] = []
+
+            for row in frappe.get_all("Employee", filters={"name": ["in", batch]}, fields=fields):
+                self._employees[row.name] = row
+
+            for row in frappe.get_all(
+                "Employee ETI Log",
+                filters={
+                    "employee": ["in", batch],
+                    "docstatus": 1,
+                    "date": ["<", get_first_day(self.end_date)],
+                },
+                fields=["employee", "against_salary_slip", "date", "is_qualifying_month", "eti_amount"],
+                order_by="date asc",
+            ):
+                self._history[row.employee].append(row)
+        return self
+
+    def get_employee(self, employee):
+        if employee not in self._employees:
+            self.preload([employee])
+        return self._employees[employee] or frappe.get_cached_doc("Employee", employee)
+
+    def get_history(self, employee, exclude_salary_slip=None):
+        if employee not in self._history:
+            self.preload([employee])
+        return [
+            row
+            for row in self._history[employee]
+            if not exclude_salary_slip or row.against_salary_slip != exclude_salary_slip
+        ]
+
+    def queue_log(self, values):
+        validate_eti_log_values(values)
+        self._pending_logs[values.against_salary_slip] = values
+
+    def flush(self):
+        """Bulk insert queued logs for Salary Slips that were committed by the run."""
+        if not self._pending_logs:
+            return 0
+
+        slip_names = list(self._pending_logs)
+        existing = set()
+        for start in range(0, len(slip_names), BATCH_SIZE):
+            existing.update(
+                frappe.get_all(
+                    "Salary Slip",
+                    filters={"name": ["in", slip_names[start : start + BATCH_SIZE]]},
+                    pluck="name",
+                )
+            )
+
+        now = frappe.utils.now()
+        user = frappe.session.user
+        rows = [
+            (
+                frappe.generate_hash(length=10),
+                now,
+                now,
+                user,
+                user,
+                0,
+                *(values.get(field) for field in ETI_LOG_FIELDS),
+            )
+            for slip_name, values in self._pending_logs.items()
+            if slip_name in existing
+        ]
+        if rows:
+            frappe.db.bulk_insert(
+                "Employee ETI Log",
+                ("name", "creation", "modified", "owner", "modified_by", "docstatus", *ETI_LOG_FIELDS),
+                rows,
+            )
+        self._pending_logs.clear()
+        return len(rows)
+
+
+def build_eti_batch(end_date, employees):
+    return ETIBatch(end_date).preload(employees)
+
+
+def get_active_eti_batch(salary_slip=None):
+    """Return the running Payroll Entry's ETI batch when it covers ``salary_slip``."""
+    batch = getattr(frappe.local, "za_eti_batch", None)
+    if batch and (salary_slip is None or batch.matches(salary_slip)):
+        return batch
+    return None
+
+
+@contextmanager
+def use_eti_batch(batch):
+    """Resolve ETI for slips built in this block from ``batch`` and flush its logs on exit."""
+    previous = getattr(frappe.local, "za_eti_batch", None)
+    frappe.local.za_eti_batch = batch
+    try:
+        yield batch
+        if batch:
+            batch.flush()
+    finally:
+        frappe.local.za_eti_batch = previous
+
 
 def check_eti_eligibility(employee, salary_slip, monthly_remuneration=None):
     """
@@ -34,7 +199,8 @@ def check_eti_eligibility(employee, salary_slip, monthly_remuneration=None):
     Returns:
         dict: {eligible: bool, reason: str, months_employed: int}
     """
-    emp_doc = frappe.get_cached_doc("Employee", employee)
+    batch = get_active_eti_batch(salary_slip)
+    emp_doc = batch.get_employee(employee) if batch else frappe.get_cached_doc("Employee", employee)
     payroll_settings = frappe.get_cached_doc("Payroll Settings")
     hours_per_month = get_eti_hours(emp_doc, salary_slip)
 
@@ -211,9 +377,11 @@ def get_eti_wage_paid(salary_slip):
     total = 0
     components = []
     earnings = salary_slip.get("earnings") if hasattr(salary_slip, "get") else []
+    registry = get_component_registry() if earnings else None
     for row in earnings or []:
         component = row.get("salary_component")
-        if component and frappe.get_cached_value("Salary Component", component, "za_eti_wage_component"):
+        classification = registry.get(component) if component else None
+        if classification and classification.za_eti_wage_component:
             total += flt(row.get("amount"))
             components.append(component)
     return flt(total, 2), components
@@ -227,20 +395,25 @@ def get_eti_qualifying_month_number(employee, salary_slip, joining_date):
     recorded as qualifying consume one of the 24 available months.
     """
     calculation_date = getdate(salary_slip.end_date)
-    filters = {
-        "employee": employee,
-        "docstatus": 1,
-        "date": ["<", get_first_day(calculation_date)],
-    }
-    if getattr(salary_slip, "name", None):
-        filters["against_salary_slip"] = ["!=", salary_slip.name]
-
-    history = frappe.get_all(
-        "Employee ETI Log",
-        filters=filters,
-        fields=["date", "is_qualifying_month", "eti_amount"],
-        order_by="date asc",
-    )
+    slip_name = getattr(salary_slip, "name", None)
+    batch = get_active_eti_batch(salary_slip)
+    if batch:
+        history = batch.get_history(employee, exclude_salary_slip=slip_name)
+    else:
+        filters = {
+            "employee": employee,
+            "docstatus": 1,
+            "date": ["<", get_first_day(calculation_date)],
+        }
+        if slip_name:
+            filters["against_salary_slip"] = ["!=", slip_name]
+
+        history = frappe.get_all(
+            "Employee ETI Log",
+            filters=filters,
+            fields=["date", "is_qualifying_month", "eti_amount"],
+            order_by="date asc",
+        )
     if not history:
         return calculate_months_employed(joining_date, calculation_date)
 
@@ -419,7 +592,7 @@ def get_eti_slab(months_employed=1, date_value=None):
     return None
 
 
-def log_eti_calculation(employee, salary_slip, eti_amount, eligibility_details):
+def log_eti_calculation(employee, salary_slip, eti_amount, eligibility_details, new_slip=False):
     """
     Log ETI calculation details for audit trail.
 
@@ -428,7 +601,15 @@ def log_eti_calculation(employee, salary_slip, eti_amount, eligibility_details):
         salary_slip: Salary Slip document
         eti_amount (float): Calculated ETI amount
         eligibility_details (dict): Eligibility check results
+        new_slip (bool): The slip was just inserted, so it cannot have a log yet.
+            Inside a Payroll Entry run the log is queued for the batch insert.
     """
+    values = get_eti_log_values(employee, salary_slip, eti_amount, eligibility_details)
+    batch = get_active_eti_batch(salary_slip) if new_slip else None
+    if batch:
+        batch.queue_log(values)
+        return None
+
     existing_log = frappe.db.exists(
         "Employee ETI Log", {"employee": employee, "against_salary_slip": salary_slip.name}
     )
@@ -436,25 +617,41 @@ def log_eti_calculation(employee, salary_slip, eti_amount, eligibility_details):
     if log_doc.docstatus == 1:
         return log_doc.name
 
-    log_doc.employee = employee
-    log_doc.against_salary_slip = salary_slip.name
-    log_doc.employee_name = getattr(salary_slip, "employee_name", None)
-    log_doc.date = salary_slip.end_date
-    log_doc.eti_amount = eti_amount
-    log_doc.carry_forwarding_eti_amount = 0
-    log_doc.is_qualifying_month = cint(eligibility_details.get("eligible"))
-    log_doc.qualifying_month_number = (
-        cint(eligibility_details.get("months_employed")) if eligibility_details.get("eligible") else 0
-    )
-    log_doc.eligibility_reason = eligibility_details.get("reason")
-    log_doc.hours = flt(eligibility_details.get("hours_per_month"), 2)
-    log_doc.monthly_remuneration = flt(eligibility_details.get("monthly_remuneration"), 2)
-    log_doc.wage_paid = flt(eligibility_details.get("wage_paid"), 2)
-    log_doc.minimum_wage = flt(eligibility_details.get("minimum_wage"), 2)
+    log_doc.update(values)
     log_doc.save(ignore_permissions=True)
     return log_doc.name
 
 
+def get_eti_log_values(employee, salary_slip, eti_amount, eligibility_details):
+    eligible = eligibility_details.get("eligible")
+    return frappe._dict(
+        employee=employee,
+        against_salary_slip=salary_slip.name,
+        employee_name=getattr(salary_slip, "employee_name", None),
+        date=salary_slip.end_date,
+        eti_amount=eti_amount,
+        carry_forwarding_eti_amount=0,
+        is_qualifying_month=cint(eligible),
+        qualifying_month_number=cint(eligibility_details.get("months_employed")) if eligible else 0,
+        eligibility_reason=eligibility_details.get("reason"),
+        hours=flt(eligibility_details.get("hours_per_month"), 2),
+        monthly_remuneration=flt(eligibility_details.get("monthly_remuneration"), 2),
+        wage_paid=flt(eligibility_details.get("wage_paid"), 2),
+        minimum_wage=flt(eligibility_details.get("minimum_wage"), 2),
+    )
+
+
+def validate_eti_log_values(values):
+    """Apply the Employee ETI Log controller checks to rows written by bulk insert."""
+    if cint(values.is_qualifying_month) and not (1 <= cint(values.qualifying_month_number) <= 24):
+        frappe.throw(
+            frappe._("A qualifying ETI month number must be between 1 and 24."),
+            title=frappe._("Invalid ETI Qualifying Month"),
+        )
+    if flt(values.eti_amount) < 0:
+        frappe.throw(frappe._("ETI Amount cannot be negative."))
+
+
 def submit_eti_log(employee, salary_slip):
     """Submit the calculation log only after its Salary Slip is submitted."""
     log_name = frappe.db.exists(
@@ -0,0 +1,577 @@
+"""Bulk IRP5 certificate generation for an EMP501 reconciliation.
+
+Generating certificates one employee at a time loads every Salary Slip, the
+Employee, Company, Address and Bank Account documents for each certificate.
+The bulk builder walks the reconciliation's employees in name order and, per
+chunk, reads the period's salary rows already summed per component with one
+grouped query and prefetches employee, address, bank and directive master data
+with one query each. Certificates are written and committed chunk by chunk.
+
+Large reconciliations run as a background job whose progress is kept on the
+EMP501 and committed with each chunk, so a job that is interrupted resumes
+from the first uncommitted chunk instead of starting again.
+"""
+
+import json
+from collections import defaultdict
+
+import frappe
+from frappe import _
+from frappe.query_builder import Order
+from frappe.query_builder.functions import Coalesce, Sum
+from frappe.utils import cint, getdate, now, time_diff_in_seconds
+
+from za_local.sa_payroll.doctype.irp5_certificate.irp5_certificate import (
+	require_certificate_generation_permissions,
+)
+
+IRP5_BULK_STATE_FIELD = "irp5_bulk_state"
+IRP5_BULK_CHUNK_SIZE = 500
+IRP5_BULK_TIMEOUT = 3600
+# A queued run waits behind other long jobs, so it is only treated as lost
+# after far longer than the run's own timeout.
+IRP5_BULK_QUEUE_TIMEOUT = 6 * 3600
+# Reconciliations up to this size are generated in the request.
+IRP5_BULK_SYNC_LIMIT = 50
+
+EMPLOYEE_FIELDS = (
+	"employee_name",
+	"company",
+	"first_name",
+	"middle_name",
+	"last_name",
+	"gender",
+	"date_of_birth",
+	"date_of_joining",
+	"relieving_date",
+	"passport_number",
+	"current_address",
+	"permanent_address",
+	"bank_name",
+	"bank_ac_no",
+	"za_identity_type",
+	"za_id_number",
+	"za_passport_country_of_issue",
+	"za_income_tax_reference_number",
+	"za_nature_of_person",
+	"za_residential_address",
+	"za_postal_address",
+	"za_business_address_override",
+	"za_bank_account_type",
+	"za_bank_account_holder_name",
+	"za_bank_account_holder_relationship",
+	"za_not_paid_electronically",
+	"za_payroll_payable_bank_account",
+)
+SALARY_SLIP_FIELDS = (
+	"name",
+	"employee",
+	"start_date",
+	"end_date",
+	"payroll_frequency",
+	"total_working_days",
+	"payment_days",
+	"za_monthly_eti",
+)
+BANK_ACCOUNT_FIELDS = ("name", "bank", "bank_account_no", "account_type", "account_name")
+
+
+class IRP5CertificateSource:
+	"""Salary rows and master data for the certificates of one chunk of employees."""
+
+	def __init__(self, company, from_date, to_date):
+		self.company = company
+		self.from_date = getdate(from_date)
+		self.to_date = getdate(to_date)
+		self.company_doc = frappe.get_cached_doc("Company", company)
+		self._employees = {}
+		self._salary_slips = defaultdict(list)
+		self._salary_lines = defaultdict(list)
+		self._addresses = {}
+		self._primary_addresses = {}
+		self._bank_accounts = {}
+		self._directive_numbers = defaultdict(list)
+
+	def preload(self, employees):
+		employees = list(dict.fromkeys(employee for employee in employees or [] if employee))
+		if not employees:
+			return self
+
+		meta = frappe.get_meta("Employee")
+		fields = ["name", *(field for field in EMPLOYEE_FIELDS if meta.has_field(field))]
+		for row in frappe.get_all("Employee", filters={"name": ["in", employees]}, fields=fields):
+			self._employees[row.name] = row
+
+		for row in frappe.get_all(
+			"Salary Slip",
+			filters={
+				"employee": ["in", employees],
+				"end_date": ["between", [self.from_date, self.to_date]],
+				"docstatus": 1,
+			},
+			fields=list(SALARY_SLIP_FIELDS),
+			order_by="employee asc, start_date asc",
+		):
+			self._salary_slips[row.employee].append(row)
+
+		for row in self._get_grouped_salary_lines(employees):
+			self._salary_lines[row.employee].append(row)
+
+		self._preload_addresses(employees)
+		self._preload_bank_accounts()
+		self._preload_directives(employees)
+		return self
+
+	def _get_grouped_salary_lines(self, employees):
+		"""Sum earnings, deductions and company contributions per employee and component."""
+		salary_slip = frappe.qb.DocType("Salary Slip")
+
+		def grouped_lines(child, parentfields):
+			return (
+				frappe.qb.from_(child)
+				.join(salary_slip)
+				.on(child.parent == salary_slip.name)
+				.select(
+					salary_slip.employee,
+					child.parentfield,
+					child.salary_component,
+					Sum(child.amount).as_("amount"),
+				)
+				.where(child.parenttype == "Salary Slip")
+				.where(child.parentfield.isin(parentfields))
+				.where(salary_slip.employee.isin(employees))
+				.where(salary_slip.docstatus == 1)
+				.where(salary_slip.end_date[self.from_date : self.to_date])
+				.groupby(salary_slip.employee, child.parentfield, child.salary_component)
+			)
+
+		query = grouped_lines(frappe.qb.DocType("Salary Detail"), ["earnings", "deductions"]).union_all(
+			grouped_lines(frappe.qb.DocType("Company Contribution"), ["company_contribution"])
+		)
+		return query.run(as_dict=True)
+
+	def _preload_addresses(self, employees):
+		address_names = {self.company_doc.get("za_business_address")}
+		for employee in self._employees.values():
+			address_names.update(
+				employee.get(fieldname)
+				for fieldname in (
+					"za_residential_address",
+					"za_postal_address",
+					"za_business_address_override",
+				)
+			)
+
+		address = frappe.qb.DocType("Address")
+		link = frappe.qb.DocType("Dynamic Link")
+		linked = (
+			frappe.qb.from_(link)
+			.join(address)
+			.on(link.parent == address.name)
+			.select(link.link_doctype, link.link_name, address.name)
+			.where(link.parenttype == "Address")
+			.where(
+				((link.link_doctype == "Employee") & link.link_name.isin(employees))
+				| ((link.link_doctype == "Company") & (link.link_name == self.company))
+			)
+			.orderby(link.link_doctype)
+			.orderby(link.link_name)
+			.orderby(Coalesce(address.is_primary_address, 0), order=Order.desc)
+			.orderby(address.modified, order=Order.desc)
+		).run(as_dict=True)
+		for row in linked:
+			# Rows are ordered so the first per link is the primary, most recent address.
+			self._primary_addresses.setdefault((row.link_doctype, row.link_name), row.name)
+		address_names.update(self._primary_addresses.values())
+
+		address_names = [name for name in address_names if name]
+		if address_names:
+			for row in frappe.get_all("Address", filters={"name": ["in", address_names]}, fields=["*"]):
+				self._addresses[row.name] = row
+
+	def _preload_bank_accounts(self):
+		names = {employee.get("za_payroll_payable_bank_account") for employee in self._employees.values()}
+		names = [name for name in names if name]
+		if names:
+			for row in frappe.get_all(
+				"Bank Account", filters={"name": ["in", names]}, fields=list(BANK_ACCOUNT_FIELDS)
+			):
+				self._bank_accounts[row.name] = row
+
+	def _preload_directives(self, employees):
+		if not frappe.db.exists("DocType", "Tax Directive"):
+			return
+
+		for row in frappe.get_all(
+			"Tax Directive",
+			filters={
+				"employee": ["in", employees],
+				"docstatus": 1,
+				"effective_from": ["<=", self.to_date],
+			},
+			or_filters=[
+				["effective_to", ">=", self.from_date],
+				["effective_to", "is", "not set"],
+			],
+			fields=["employee", "directive_number"],
+			order_by="effective_from asc",
+		):
+			if row.directive_number:
+				self._directive_numbers[row.employee].append(row.directive_number)
+
+	def get_employee(self, employee):
+		row = self._employees.get(employee)
+		if not row:
+			frappe.throw(_("Employee {0} not found").format(employee), frappe.DoesNotExistError)
+		return row
+
+	def get_salary_slips(self, employee):
+		return self._salary_slips.get(employee, [])
+
+	def get_salary_lines(self, employee):
+		return self._salary_lines.get(employee, [])
+
+	def get_address(self, address_name):
+		return self._addresses.get(address_name) if address_name else None
+
+	def get_primary_linked_address(self, link_doctype, link_name):
+		return self.get_address(self._primary_addresses.get((link_doctype, link_name)))
+
+	def get_bank_account(self, bank_account_name):
+		return self._bank_accounts.get(bank_account_name) if bank_account_name else None
+
+	def get_directive_numbers(self, employee):
+		numbers = self._directive_numbers.get(employee)
+		return ", ".join(numbers) if numbers else None
+
+
+class IRP5BulkBuilder:
+	"""Create or refresh every certificate of an EMP501 reconciliation chunk by chunk."""
+
+	def __init__(self, emp501, chunk_size=IRP5_BULK_CHUNK_SIZE):
+		self.emp501 = emp501
+		self.chunk_size = cint(chunk_size) or IRP5_BULK_CHUNK_SIZE
+
+	def get_chunks(self, employees):
+		return [
+			employees[start : start + self.chunk_size] for start in range(0, len(employees), self.chunk_size)
+		]
+
+	def process_chunk(self, employees, employee_names):
+		"""Generate certificates for ``employees`` and return ``{employee: result}``."""
+		source = IRP5CertificateSource(self.emp501.company, self.emp501.from_date, self.emp501.to_date)
+		source.preload(employees)
+		existing = self._get_active_certificates(employees)
+		results = {}
+		for employee in employees:
+			employee_name = employee_names.get(employee) or employee
+			savepoint = f"irp5_bulk_{frappe.generate_hash(length=8)}"
+			frappe.db.savepoint(savepoint)
+			try:
+				results[employee] = self._process_employee(
+					employee, employee_name, existing.get(employee) or [], source
+				)
+			except Exception as e:
+				frappe.db.rollback(save_point=savepoint)
+				frappe.log_error(
+					title=f"IRP5 Generation Error - {employee_name}",
+					message=frappe.get_traceback(),
+				)
+				results[employee] = frappe._dict(
+					action="error",
+					employee=employee,
+					employee_name=employee_name,
+					error=str(e),
+					error_type=type(e).__name__,
+				)
+		return results
+
+	def _get_active_certificates(self, employees):
+		certificates = defaultdict(list)
+		for row in frappe.get_all(
+			"IRP5 Certificate",
+			filters={
+				"employee": ["in", employees],
+				"tax_year": self.emp501.tax_year,
+				"company": self.emp501.company,
+				"reconciliation_period": self.emp501.reconciliation_period,
+				"docstatus": ["<", 2],
+			},
+			fields=["name", "employee", "docstatus", "status"],
+			order_by="docstatus desc, modified desc, creation desc, name desc",
+		):
+			certificates[row.employee].append(row)
+		return certificates
+
+	def _process_employee(self, employee, employee_name, existing, source):
+		if len(existing) > 1:
+			frappe.throw(
+				_(
+					"Multiple active certificates exist for {0}. Cancel the duplicate before generating again."
+				).format(employee_name),
+				title=_("Duplicate IRP5 Certificates"),
+			)
+
+		result = frappe._dict(employee=employee, employee_name=employee_name)
+		if existing and existing[0].docstatus == 1:
+			return result.update(
+				action="reused", irp5_certificate=existing[0].name, status=existing[0].status
+			)
+
+		if existing:
+			cert = frappe.get_doc("IRP5 Certificate", existing[0].name)
+			result.action = "updated"
+		else:
+			cert = frappe.new_doc("IRP5 Certificate")
+			cert.employee = employee
+			cert.tax_year = self.emp501.tax_year
+			cert.company = self.emp501.company
+			cert.reconciliation_period = self.emp501.reconciliation_period
+			result.action = "created"
+
+		cert.from_date = self.emp501.from_date
+		cert.to_date = self.emp501.to_date
+		cert.emp501_reconciliation = self.emp501.name
+		cert._bulk_source = source
+		cert.generate_certificate_data()
+		if cert.is_new():
+			cert.insert(ignore_permissions=True)
+		else:
+			cert.save(ignore_permissions=True)
+		return result.update(irp5_certificate=cert.name, status=cert.status)
+
+
+def get_irp5_bulk_state(emp501_name, for_update=False):
+	"""Return the run recorded on an EMP501 Reconciliation, or ``None``."""
+	state = frappe.db.get_value(
+		"EMP501 Reconciliation", emp501_name, IRP5_BULK_STATE_FIELD, for_update=for_update
+	)
+	if isinstance(state, str):
+		state = json.loads(state)
+	return frappe._dict(state) if state else None
+
+
+def _set_irp5_bulk_state(emp501_name, state):
+	frappe.db.set_value(
+		"EMP501 Reconciliation",
+		emp501_name,
+		IRP5_BULK_STATE_FIELD,
+		json.dumps(state, default=str),
+		update_modified=False,
+	)
+
+
+def start_irp5_bulk_generation(emp501, employee_names):
+	"""Record a new run for ``emp501`` and enqueue its job."""
+	employees = sorted(employee_names)
+	_set_irp5_bulk_state(
+		emp501.name,
+		frappe._dict(
+			employees=employees,
+			employee_names=employee_names,
+			chunk_size=IRP5_BULK_CHUNK_SIZE,
+			next_chunk=0,
+			status="Queued",
+			queued_at=now(),
+			started_at=None,
+			error=None,
+			summary=_new_irp5_bulk_summary(),
+		),
+	)
+	_enqueue_irp5_bulk_generation(emp501.name)
+	return len(employees)
+
+
+def _enqueue_irp5_bulk_generation(emp501_name):
+	frappe.enqueue(
+		run_irp5_bulk_generation,
+		queue="long",
+		timeout=IRP5_BULK_TIMEOUT,
+		job_id=f"za_irp5_bulk::{emp501_name}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		emp501_name=emp501_name,
+	)
+
+
+def run_irp5_bulk_generation(emp501_name):
+	"""Background job: generate the remaining chunks, committing after each one."""
+	state = get_irp5_bulk_state(emp501_name)
+	if not state or state.status == "Completed":
+		return
+
+	state.status = "Running"
+	state.started_at = now()
+	state.error = None
+	_set_irp5_bulk_state(emp501_name, state)
+	frappe.db.commit()
+
+	try:
+		emp501 = frappe.get_doc("EMP501 Reconciliation", emp501_name)
+		builder = IRP5BulkBuilder(emp501, state.chunk_size)
+		chunks = builder.get_chunks(state.employees)
+		for index in range(cint(state.next_chunk), len(chunks)):
+			results = builder.process_chunk(chunks[index], state.employee_names)
+			_add_irp5_bulk_results(state.summary, chunks[index], results)
+			state.next_chunk = index + 1
+			# The chunk's certificates and the progress that records them commit together.
+			_set_irp5_bulk_state(emp501_name, state)
+			frappe.db.commit()
+			_publish_irp5_bulk_progress(emp501_name, state)
+
+		finalise_irp5_bulk_generation(emp501, state.employees, state.summary)
+		state.status = "Completed"
+	except Exception:
+		frappe.db.rollback()
+		state.status = "Failed"
+		state.error = frappe.get_traceback()
+		frappe.log_error(title=f"IRP5 bulk generation failed: {emp501_name}", message=state.error)
+
+	_set_irp5_bulk_state(emp501_name, state)
+	frappe.db.commit()
+	_publish_irp5_bulk_progress(emp501_name, state)
+
+
+def generate_irp5_certificates_now(emp501, employee_names):
+	"""Generate every certificate in the current request and return the summary."""
+	employees = sorted(employee_names)
+	builder = IRP5BulkBuilder(emp501)
+	summary = _new_irp5_bulk_summary()
+	for chunk in builder.get_chunks(employees):
+		_add_irp5_bulk_results(summary, chunk, builder.process_chunk(chunk, employee_names))
+	return finalise_irp5_bulk_generation(emp501, employees, summary)
+
+
+def _new_irp5_bulk_summary():
+	return frappe._dict(created=0, updated=0, reused=0, errors=[])
+
+
+def _add_irp5_bulk_results(summary, employees, results):
+	for employee in employees:
+		result = results.get(employee)
+		if not result:
+			continue
+		if result.action == "error":
+			summary["errors"].append(
+				{
+					"employee": result.employee_name,
+					"employee_id": employee,
+					"error": result.error,
+					"error_type": result.error_type,
+				}
+			)
+		else:
+			summary[result.action] += 1
+
+
+def finalise_irp5_bulk_generation(emp501, employees, summary):
+	"""
+	Link the run's certificates to the EMP501 and return the run summary.
+
+	Links are rebuilt from the committed certificates for the company, tax year
+	and period, so chunks committed by an earlier, interrupted job stay linked.
+	"""
+	failed = {error["employee_id"] for error in summary["errors"]}
+	linked = set()
+	emp501.irp5_certificates = []
+	for row in frappe.get_all(
+		"IRP5 Certificate",
+		filters={
+			"employee": ["in", employees],
+			"tax_year": emp501.tax_year,
+			"company": emp501.company,
+			"reconciliation_period": emp501.reconciliation_period,
+			"docstatus": ["<", 2],
+		},
+		fields=["name", "employee", "employee_name", "status"],
+		order_by="employee asc, docstatus desc, modified desc, creation desc, name desc",
+	):
+		if row.employee in failed or row.employee in linked:
+			continue
+		linked.add(row.employee)
+		emp501.append(
+			"irp5_certificates",
+			{
+				"irp5_certificate": row.name,
+				"employee": row.employee,
+				"employee_name": row.employee_name,
+				"status": row.status,
+			},
+		)
+
+	emp501.save(ignore_permissions=True)
+	return frappe._dict(summary)
+
+
+def get_irp5_bulk_progress(emp501_name):
+	state = get_irp5_bulk_state(emp501_name)
+	if not state:
+		return frappe._dict(status=None)
+
+	status = "Failed" if _is_irp5_bulk_run_stalled(state) else state.status
+	total = len(state.employees)
+	processed = min(total, cint(state.next_chunk) * cint(state.chunk_size))
+	return frappe._dict(
+		status=status,
+		total=total,
+		processed=processed,
+		summary=state.get("summary"),
+		error=state.error,
+	)
+
+
+def _is_irp5_bulk_run_stalled(state):
+	"""
+	A run still Running after its job timeout was killed by the worker; one
+	still Queued long after it was enqueued lost its job.
+	"""
+	if state.status == "Running":
+		since, timeout = state.started_at, IRP5_BULK_TIMEOUT
+	elif state.status == "Queued":
+		since, timeout = state.get("queued_at"), IRP5_BULK_QUEUE_TIMEOUT
+	else:
+		return False
+	if not since:
+		return False
+	return time_diff_in_seconds(now(), since) > timeout
+
+
+def _publish_irp5_bulk_progress(emp501_name, state):
+	frappe.publish_realtime(
+		"za_irp5_bulk_progress",
+		get_irp5_bulk_progress(emp501_name),
+		doctype="EMP501 Reconciliation",
+		docname=emp501_name,
+	)
+
+
+@frappe.whitelist()
+def get_irp5_bulk_status(emp501_name):
+	"""Return progress of the background IRP5 generation for an EMP501 Reconciliation."""
+	frappe.get_doc("EMP501 Reconciliation", emp501_name).check_permission("read")
+	return get_irp5_bulk_progress(emp501_name)
+
+
+@frappe.whitelist(methods=["POST"])
+def resume_irp5_bulk_generation(emp501_name):
+	"""Re-enqueue a failed or stalled run from its first uncommitted chunk."""
+	frappe.get_doc("EMP501 Reconciliation", emp501_name).check_permission("write")
+	require_certificate_generation_permissions()
+
+	# Lock the row so two resumes cannot both re-queue the run.
+	get_irp5_bulk_state(emp501_name, for_update=True)
+	progress = get_irp5_bulk_progress(emp501_name)
+	if progress.status != "Failed":
+		frappe.msgprint(_("There is no failed IRP5 generation to resume."))
+		return False
+
+	state = get_irp5_bulk_state(emp501_name)
+	state.status = "Queued"
+	state.queued_at = now()
+	state.started_at = None
+	_set_irp5_bulk_state(emp501_name, state)
+	_enqueue_irp5_bulk_generation(emp501_name)
+	frappe.msgprint(
+		_("Resuming IRP5 generation from employee {0}.").format(progress.processed + 1), alert=True
+	)
+	return True
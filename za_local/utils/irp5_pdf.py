@@ -0,0 +1,331 @@
+"""Render every IRP5 certificate PDF of an EMP501 reconciliation in the background.
+
+The reconciliation's certificates are split into shards and each shard is a
+separate long-queue job, so rendering spreads across the available workers.
+Each certificate PDF is stored as a private File named after a hash of its
+snapshot (see ``IRP5Certificate.get_cached_pdf_file``); a certificate that has
+not changed since its last render is never drawn again. When the last shard
+settles, one more job writes every PDF into a ZIP attached to the EMP501.
+
+Shard progress is kept on the EMP501. A shard that fails, is killed at its
+timeout or whose job is lost can be retried on its own; the ZIP is only built
+once every shard has completed.
+"""
+
+import json
+import os
+import zipfile
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now, time_diff_in_seconds
+from rq.timeouts import JobTimeoutException
+
+IRP5_PDF_SHARD_FIELD = "irp5_pdf_shards"
+IRP5_PDF_SHARD_SIZE = 100
+IRP5_PDF_SHARD_TIMEOUT = 1800
+# Shards wait behind each other on the long queue, so a queued shard is only
+# treated as lost after far longer than one shard's run time.
+IRP5_PDF_SHARD_QUEUE_TIMEOUT = 6 * 3600
+
+
+def get_irp5_pdf_shards(emp501_name, for_update=False):
+	"""Return ``{shard_id: shard}`` render progress recorded on an EMP501 Reconciliation."""
+	shards = frappe.db.get_value(
+		"EMP501 Reconciliation", emp501_name, IRP5_PDF_SHARD_FIELD, for_update=for_update
+	)
+	if isinstance(shards, str):
+		shards = json.loads(shards)
+	return {shard_id: frappe._dict(shard) for shard_id, shard in (shards or {}).items()}
+
+
+def _save_irp5_pdf_shards(emp501_name, shards):
+	frappe.db.set_value(
+		"EMP501 Reconciliation",
+		emp501_name,
+		IRP5_PDF_SHARD_FIELD,
+		json.dumps(shards, default=str),
+		update_modified=False,
+	)
+
+
+def _set_irp5_pdf_shard(emp501_name, shard_id, shard):
+	# Shards settle concurrently; the row lock serialises their updates.
+	shards = get_irp5_pdf_shards(emp501_name, for_update=True)
+	shards[shard_id] = shard
+	_save_irp5_pdf_shards(emp501_name, shards)
+
+
+def _require_irp5_pdf_permissions(emp501):
+	emp501.check_permission("write")
+	if not frappe.has_permission("IRP5 Certificate", "read"):
+		frappe.throw(
+			_("You are not permitted to export IRP5 certificate data."),
+			frappe.PermissionError,
+			title=_("Insufficient Permission"),
+		)
+
+
+@frappe.whitelist(methods=["POST"])
+def render_irp5_certificate_pdfs(emp501_name):
+	"""Queue PDF rendering for every certificate linked to an EMP501 Reconciliation."""
+	emp501 = frappe.get_doc("EMP501 Reconciliation", emp501_name)
+	_require_irp5_pdf_permissions(emp501)
+
+	certificates = [row.irp5_certificate for row in emp501.irp5_certificates or [] if row.irp5_certificate]
+	if not certificates:
+		frappe.throw(_("Generate IRP5 certificates before rendering their PDFs."))
+
+	shards = {}
+	for index, start in enumerate(range(0, len(certificates), IRP5_PDF_SHARD_SIZE), start=1):
+		shards[str(index)] = frappe._dict(
+			certificates=certificates[start : start + IRP5_PDF_SHARD_SIZE],
+			status="Queued",
+			queued_at=now(),
+			started_at=None,
+			files={},
+			rendered=0,
+			errors=[],
+		)
+	_save_irp5_pdf_shards(emp501_name, shards)
+
+	for shard_id in shards:
+		_enqueue_irp5_pdf_shard(emp501_name, shard_id)
+
+	frappe.msgprint(
+		_("Rendering {0} certificate PDF(s) in {1} background job(s).").format(
+			len(certificates), len(shards)
+		),
+		alert=True,
+	)
+	return len(shards)
+
+
+def _enqueue_irp5_pdf_shard(emp501_name, shard_id):
+	frappe.enqueue(
+		run_irp5_pdf_shard,
+		queue="long",
+		timeout=IRP5_PDF_SHARD_TIMEOUT,
+		job_id=f"za_irp5_pdf_shard::{emp501_name}::{shard_id}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		emp501_name=emp501_name,
+		shard_id=shard_id,
+	)
+
+
+def run_irp5_pdf_shard(emp501_name, shard_id):
+	"""Background job: render (or reuse) the PDFs of one shard of certificates."""
+	shard = get_irp5_pdf_shards(emp501_name).get(shard_id)
+	if not shard or shard.status == "Completed":
+		return
+
+	shard.status = "Running"
+	shard.started_at = now()
+	_set_irp5_pdf_shard(emp501_name, shard_id, shard)
+	frappe.db.commit()
+
+	files = {}
+	errors = []
+	rendered = 0
+	try:
+		for certificate_name in shard.certificates:
+			try:
+				certificate = frappe.get_doc("IRP5 Certificate", certificate_name)
+				if certificate.status == "Draft":
+					frappe.throw(_("Cannot export a draft certificate. Generate certificate data first."))
+				certificate.validate_statutory_readiness(throw=True)
+				file_doc = certificate.get_cached_pdf_file()
+				if certificate.flags.pdf_rendered:
+					rendered += 1
+				files[certificate_name] = file_doc.name
+				frappe.db.commit()
+			except JobTimeoutException:
+				raise
+			except Exception as e:
+				frappe.db.rollback()
+				errors.append({"irp5_certificate": certificate_name, "error": str(e)})
+				frappe.log_error(
+					title=f"IRP5 PDF render failed: {certificate_name}",
+					message=frappe.get_traceback(),
+				)
+	except JobTimeoutException:
+		# Record the timeout so the shard can be retried, then let RQ fail the job.
+		frappe.db.rollback()
+		shard.status = "Failed"
+		_set_irp5_pdf_shard(emp501_name, shard_id, shard)
+		frappe.db.commit()
+		_update_irp5_pdf_progress(emp501_name)
+		raise
+
+	shard.files = files
+	shard.errors = errors
+	shard.rendered = rendered
+	shard.status = "Completed"
+	_set_irp5_pdf_shard(emp501_name, shard_id, shard)
+	frappe.db.commit()
+	_update_irp5_pdf_progress(emp501_name)
+
+
+def get_irp5_pdf_render_summary(emp501_name):
+	shards = get_irp5_pdf_shards(emp501_name)
+	summary = frappe._dict(
+		total=len(shards),
+		queued=0,
+		running=0,
+		completed=0,
+		failed=0,
+		rendered=0,
+		reused=0,
+		errors=[],
+		failed_shards=[],
+		missing=[],
+	)
+	for shard_id, shard in shards.items():
+		if _is_irp5_pdf_shard_stalled(shard):
+			shard.status = "Failed"
+		summary[shard.status.lower()] += 1
+		if shard.status == "Failed":
+			summary.failed_shards.append(shard_id)
+			summary.missing.extend(shard.certificates)
+		summary.rendered += cint(shard.rendered)
+		summary.reused += len(shard.files or {}) - cint(shard.rendered)
+		summary.errors.extend(shard.errors or [])
+	return summary
+
+
+def _is_irp5_pdf_shard_stalled(shard):
+	"""
+	A shard still Running after its job timeout was killed by the worker; one
+	still Queued long after it was enqueued lost its job.
+	"""
+	if shard.status == "Running":
+		since, timeout = shard.started_at, IRP5_PDF_SHARD_TIMEOUT
+	elif shard.status == "Queued":
+		since, timeout = shard.get("queued_at"), IRP5_PDF_SHARD_QUEUE_TIMEOUT
+	else:
+		return False
+	if not since:
+		return False
+	return time_diff_in_seconds(now(), since) > timeout
+
+
+def _update_irp5_pdf_progress(emp501_name):
+	summary = get_irp5_pdf_render_summary(emp501_name)
+	frappe.publish_realtime(
+		"za_irp5_pdf_progress",
+		summary,
+		doctype="EMP501 Reconciliation",
+		docname=emp501_name,
+	)
+	# A failed shard's certificates would be missing from the ZIP; it is built
+	# once the shard has been retried and every shard has completed.
+	if summary.queued or summary.running or summary.failed:
+		return
+
+	frappe.enqueue(
+		build_irp5_pdf_zip,
+		queue="long",
+		timeout=IRP5_PDF_SHARD_TIMEOUT,
+		job_id=f"za_irp5_pdf_zip::{emp501_name}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		emp501_name=emp501_name,
+	)
+
+
+def build_irp5_pdf_zip(emp501_name):
+	"""Write every rendered certificate PDF into a private ZIP attached to the EMP501.
+
+	PDFs are copied into the archive one at a time, so memory use does not grow
+	with the number of certificates. The ZIP is only written once every shard has
+	completed, and replaces the ZIP of any earlier run.
+	"""
+	shards = get_irp5_pdf_shards(emp501_name)
+	if any(shard.status != "Completed" for shard in shards.values()):
+		return None
+
+	file_names = []
+	for _shard_id, shard in sorted(shards.items(), key=lambda item: cint(item[0])):
+		file_names.extend((shard.files or {}).values())
+	if not file_names:
+		return None
+
+	zip_name = f"{emp501_name}-irp5-certificates-{frappe.generate_hash(length=8)}.zip"
+	zip_path = frappe.get_site_path("private", "files", zip_name)
+	with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+		for row in frappe.get_all(
+			"File",
+			filters={"name": ["in", file_names]},
+			fields=["name", "file_name", "file_url"],
+			order_by="file_name asc",
+		):
+			archive.write(frappe.get_site_path(row.file_url.lstrip("/")), arcname=row.file_name)
+
+	file_doc = frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": zip_name,
+			"file_url": f"/private/files/{zip_name}",
+			"is_private": 1,
+			"attached_to_doctype": "EMP501 Reconciliation",
+			"attached_to_name": emp501_name,
+			"file_size": os.path.getsize(zip_path),
+		}
+	).insert(ignore_permissions=True)
+	delete_superseded_irp5_pdf_zips(emp501_name, file_doc.name)
+	frappe.db.commit()
+
+	frappe.publish_realtime(
+		"za_irp5_pdf_progress",
+		{**get_irp5_pdf_render_summary(emp501_name), "zip_url": file_doc.file_url},
+		doctype="EMP501 Reconciliation",
+		docname=emp501_name,
+	)
+	return file_doc.file_url
+
+
+def delete_superseded_irp5_pdf_zips(emp501_name, current_file):
+	"""Remove certificate ZIPs written by earlier runs for this EMP501."""
+	for file_name in frappe.get_all(
+		"File",
+		filters={
+			"attached_to_doctype": "EMP501 Reconciliation",
+			"attached_to_name": emp501_name,
+			"file_name": ["like", f"{emp501_name}-irp5-certificates-%.zip"],
+			"name": ["!=", current_file],
+		},
+		pluck="name",
+	):
+		frappe.delete_doc("File", file_name, ignore_permissions=True, force=True)
+
+
+@frappe.whitelist(methods=["POST"])
+def retry_irp5_pdf_shards(emp501_name):
+	"""Re-enqueue failed or stalled shards; completed shards are left untouched."""
+	_require_irp5_pdf_permissions(frappe.get_doc("EMP501 Reconciliation", emp501_name))
+
+	summary = get_irp5_pdf_render_summary(emp501_name)
+	if not summary.failed_shards:
+		frappe.msgprint(_("No failed certificate PDF batches to retry."))
+		return 0
+
+	shards = get_irp5_pdf_shards(emp501_name, for_update=True)
+	for shard_id in summary.failed_shards:
+		shards[shard_id].update(status="Queued", queued_at=now(), started_at=None)
+	_save_irp5_pdf_shards(emp501_name, shards)
+	for shard_id in summary.failed_shards:
+		_enqueue_irp5_pdf_shard(emp501_name, shard_id)
+
+	frappe.msgprint(
+		_("Retrying {0} certificate PDF batch(es).").format(len(summary.failed_shards)),
+		alert=True,
+	)
+	return len(summary.failed_shards)
+
+
+@frappe.whitelist()
+def get_irp5_pdf_render_status(emp501_name):
+	"""Return shard progress for an EMP501's background certificate PDF rendering."""
+	frappe.get_doc("EMP501 Reconciliation", emp501_name).check_permission("read")
+	return get_irp5_pdf_render_summary(emp501_name)
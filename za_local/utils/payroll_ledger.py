@@ -0,0 +1,258 @@
+"""ZA Payroll Ledger: one pre-bucketed statutory row per submitted Salary Slip.
+
+The SA payroll reports all need the same per-slip totals: basic pay, PAYE,
+employee and employer UIF, SDL, ETI, retirement fund contributions, the COIDA
+basis and the slip's amounts per SARS code. Instead of re-deriving them from
+Salary Detail and Company Contribution rows on every run, the ledger row is
+written when a slip is submitted and removed when it is cancelled. Components
+are classified from the component registry with the same buckets EMP201 uses.
+
+History is filled by ``backfill_payroll_ledger``, which reads slips and their
+child rows in chunks and bulk inserts the missing ledger rows. It is safe to
+re-run and can be started with
+``bench --site <site> execute za_local.utils.payroll_ledger.backfill_payroll_ledger``.
+"""
+
+import json
+
+import frappe
+from frappe.utils import flt
+
+from za_local.sa_payroll.doctype.emp201_submission.emp201_submission import _get_emp201_bucket
+from za_local.utils.component_registry import get_component_metadata, is_statutory_earning_row
+
+PAYROLL_LEDGER_DOCTYPE = "ZA Payroll Ledger"
+PAYROLL_LEDGER_BACKFILL_CHUNK_SIZE = 500
+
+BASIC_CODES = {"3601"}
+RETIREMENT_FUND_CODES = {"4001", "4003", "4006"}
+
+SLIP_FIELDS = (
+	"name",
+	"company",
+	"employee",
+	"employee_name",
+	"department",
+	"designation",
+	"posting_date",
+	"start_date",
+	"end_date",
+	"gross_pay",
+	"total_deduction",
+	"net_pay",
+	"za_monthly_eti",
+	"za_retirement_fund_taxable_excess",
+)
+LEDGER_AMOUNT_FIELDS = (
+	"gross_pay",
+	"total_deduction",
+	"net_pay",
+	"basic",
+	"paye",
+	"uif_employee",
+	"uif_employer",
+	"sdl",
+	"eti",
+	"retirement_employee",
+	"retirement_employer",
+	"retirement_taxable_excess",
+	"coida_basis",
+)
+LEDGER_FIELDS = (
+	"salary_slip",
+	"company",
+	"employee",
+	"employee_name",
+	"department",
+	"designation",
+	"posting_date",
+	"start_date",
+	"end_date",
+	*LEDGER_AMOUNT_FIELDS,
+	"sars_code_totals",
+)
+
+
+def build_payroll_ledger_entry(salary_slip, earnings, deductions, company_contribution):
+	"""Return the ledger values for one slip and its earning, deduction and contribution rows."""
+	entry = frappe._dict(
+		salary_slip=salary_slip.name,
+		**{
+			field: salary_slip.get(field)
+			for field in ("company", "employee", "employee_name", "department", "designation")
+		},
+		**{field: salary_slip.get(field) for field in ("posting_date", "start_date", "end_date")},
+		**dict.fromkeys(LEDGER_AMOUNT_FIELDS, 0.0),
+	)
+	entry.gross_pay = flt(salary_slip.get("gross_pay"))
+	entry.total_deduction = flt(salary_slip.get("total_deduction"))
+	entry.net_pay = flt(salary_slip.get("net_pay"))
+	entry.retirement_taxable_excess = flt(salary_slip.get("za_retirement_fund_taxable_excess"))
+
+	slip_eti = flt(salary_slip.get("za_monthly_eti"))
+	code_totals = {}
+	for parentfield, rows in (
+		("earnings", earnings),
+		("deductions", deductions),
+		("company_contribution", company_contribution),
+	):
+		for row in rows or []:
+			amount = flt(row.get("amount"))
+			if not amount or not row.get("salary_component"):
+				continue
+			bucket, _metadata = _get_emp201_bucket(row.salary_component)
+			metadata = get_component_metadata(row.salary_component)
+			code = metadata.get("za_sars_payroll_code")
+			if code:
+				totals = code_totals.setdefault(code, {})
+				totals[parentfield] = flt(totals.get(parentfield)) + amount
+
+			if parentfield == "earnings":
+				if code in BASIC_CODES:
+					entry.basic += amount
+				if is_statutory_earning_row(row, metadata, "za_coida_applicable"):
+					entry.coida_basis += amount
+
+			if bucket == "paye" and parentfield == "deductions":
+				entry.paye += amount
+			elif bucket == "uif" and parentfield == "deductions":
+				entry.uif_employee += amount
+			elif bucket == "uif" and parentfield == "company_contribution":
+				entry.uif_employer += amount
+			elif bucket == "sdl" and parentfield == "company_contribution":
+				entry.sdl += amount
+			elif bucket == "eti" and not slip_eti:
+				entry.eti += amount
+			elif code in RETIREMENT_FUND_CODES and parentfield == "deductions":
+				entry.retirement_employee += amount
+			elif code in RETIREMENT_FUND_CODES and parentfield == "company_contribution":
+				entry.retirement_employer += amount
+
+	if slip_eti:
+		entry.eti = slip_eti
+	if flt(salary_slip.get("za_coida_basis")):
+		# Slips submitted before the basis was persisted read zero; keep the computed basis for those.
+		entry.coida_basis = flt(salary_slip.get("za_coida_basis"))
+	for field in LEDGER_AMOUNT_FIELDS:
+		entry[field] = flt(entry[field], 2)
+	entry.sars_code_totals = json.dumps(
+		{
+			code: {parentfield: flt(amount, 2) for parentfield, amount in totals.items()}
+			for code, totals in sorted(code_totals.items())
+		}
+	)
+	return entry
+
+
+def sync_payroll_ledger_entry(salary_slip):
+	"""Write (or rewrite) the ledger row of a submitted Salary Slip."""
+	delete_payroll_ledger_entry(salary_slip)
+	entry = build_payroll_ledger_entry(
+		salary_slip,
+		salary_slip.get("earnings"),
+		salary_slip.get("deductions"),
+		salary_slip.get("company_contribution"),
+	)
+	frappe.get_doc({"doctype": PAYROLL_LEDGER_DOCTYPE, **entry}).insert(ignore_permissions=True)
+
+
+def delete_payroll_ledger_entry(salary_slip):
+	frappe.db.delete(PAYROLL_LEDGER_DOCTYPE, {"salary_slip": salary_slip.name})
+
+
+def get_payroll_ledger_code_totals(entry):
+	"""Return the ``{sars_code: {parentfield: amount}}`` totals stored on a ledger row."""
+	value = entry.get("sars_code_totals")
+	if isinstance(value, dict):
+		return value
+	return json.loads(value or "{}")
+
+
+def _get_unledgered_slips(company, after, chunk_size):
+	salary_slip = frappe.qb.DocType("Salary Slip")
+	ledger = frappe.qb.DocType(PAYROLL_LEDGER_DOCTYPE)
+	meta = frappe.get_meta("Salary Slip")
+	fields = [field for field in SLIP_FIELDS if field == "name" or meta.has_field(field)]
+	if meta.has_field("za_coida_basis"):
+		fields.append("za_coida_basis")
+
+	query = (
+		frappe.qb.from_(salary_slip)
+		.left_join(ledger)
+		.on(ledger.salary_slip == salary_slip.name)
+		.select(*(salary_slip[field] for field in fields))
+		.where(salary_slip.docstatus == 1)
+		.where(ledger.name.isnull())
+		.where(salary_slip.name > after)
+		.orderby(salary_slip.name)
+		.limit(chunk_size)
+	)
+	if company:
+		query = query.where(salary_slip.company == company)
+	return query.run(as_dict=True)
+
+
+def _get_slip_rows(doctype, slip_names, parentfields):
+	rows = {}
+	meta = frappe.get_meta(doctype)
+	fields = ["parent", "parentfield", "salary_component", "amount"]
+	fields.extend(
+		field for field in ("statistical_component", "do_not_include_in_total") if meta.has_field(field)
+	)
+	for row in frappe.get_all(
+		doctype,
+		filters={
+			"parenttype": "Salary Slip",
+			"parent": ["in", slip_names],
+			"parentfield": ["in", parentfields],
+		},
+		fields=fields,
+		order_by="parent asc, idx asc",
+	):
+		rows.setdefault((row.parent, row.parentfield), []).append(row)
+	return rows
+
+
+def backfill_payroll_ledger(company=None, chunk_size=PAYROLL_LEDGER_BACKFILL_CHUNK_SIZE):
+	"""Insert ledger rows for every submitted Salary Slip that has none and return the count."""
+	if not frappe.db.table_exists("Salary Slip") or not frappe.db.table_exists(PAYROLL_LEDGER_DOCTYPE):
+		return 0
+
+	inserted = 0
+	after = ""
+	while slips := _get_unledgered_slips(company, after, chunk_size):
+		slip_names = [slip.name for slip in slips]
+		details = _get_slip_rows("Salary Detail", slip_names, ["earnings", "deductions"])
+		contributions = _get_slip_rows("Company Contribution", slip_names, ["company_contribution"])
+
+		now = frappe.utils.now()
+		user = frappe.session.user
+		rows = []
+		for slip in slips:
+			entry = build_payroll_ledger_entry(
+				slip,
+				details.get((slip.name, "earnings")),
+				details.get((slip.name, "deductions")),
+				contributions.get((slip.name, "company_contribution")),
+			)
+			rows.append(
+				(
+					frappe.generate_hash(length=10),
+					now,
+					now,
+					user,
+					user,
+					*(entry.get(field) for field in LEDGER_FIELDS),
+				)
+			)
+		frappe.db.bulk_insert(
+			PAYROLL_LEDGER_DOCTYPE,
+			("name", "creation", "modified", "owner", "modified_by", *LEDGER_FIELDS),
+			rows,
+			ignore_duplicates=True,
+		)
+		frappe.db.commit()
+		inserted += len(rows)
+		after = slip_names[-1]
+
+	return inserted
@@ -9,6 +9,7 @@ from datetime import datetime, timedelta
 
 import frappe
 from dateutil.relativedelta import relativedelta
+from frappe.utils import getdate
 
 from za_local.utils.hrms_detection import require_hrms, safe_import_hrms
 
@@ -39,6 +40,8 @@ if hrms_get_additional_salaries is None:
 # Frequency mapping for payroll calculations
 FREQUENCY_MONTHS = {"Quarterly": 3, "Half-Yearly": 6, "Yearly": 12}
 
+FREQUENCY_CHECK_BATCH_SIZE = 1000
+
 
 def get_current_block(frequency, date, payroll_period):
     """
@@ -123,7 +126,7 @@ def get_current_block_period(doc):
         return {}
 
     try:
-        payroll_period_doc = frappe.get_doc("Payroll Period", payroll_period)
+        payroll_period_doc = frappe.get_cached_doc("Payroll Period", payroll_period)
         frequency_map = {}
 
         for freq in FREQUENCY_MONTHS:
@@ -179,6 +182,87 @@ def is_payroll_processed(employee, frequency_period):
     )
 
 
+class PayrollFrequencyCheck:
+    """
+    Employees already paid in their Quarterly/Half-Yearly/Yearly block for a run.
+
+    Every Salary Slip in a Payroll Entry shares the company and dates, so the
+    frequency blocks, the employee frequency map and the submitted slips in
+    those blocks are loaded once with grouped queries and shared by the run.
+    """
+
+    def __init__(self, doc):
+        self.blocks = get_current_block_period(doc)
+        self.employee_frequency = get_employee_frequency_map() if self.blocks else {}
+        self._loaded = set()
+        self._processed = set()
+
+    def get_frequency(self, employee):
+        return self.employee_frequency.get(employee)
+
+    def get_block(self, employee):
+        return self.blocks.get(self.get_frequency(employee))
+
+    def preload(self, employees):
+        """Load submitted slips for employees on a block frequency in one grouped query per batch."""
+        pending = [
+            employee
+            for employee in dict.fromkeys(employees or [])
+            if employee and employee not in self._loaded and self.get_block(employee)
+        ]
+        self._loaded.update(employee for employee in employees or [] if employee)
+        if not pending:
+            return self
+
+        blocks = [self.get_block(employee) for employee in pending]
+        earliest_start = min(block.start_date for block in blocks)
+        latest_end = max(block.end_date for block in blocks)
+
+        salary_slip = frappe.qb.DocType("Salary Slip")
+        for start in range(0, len(pending), FREQUENCY_CHECK_BATCH_SIZE):
+            rows = (
+                frappe.qb.from_(salary_slip)
+                .select(salary_slip.employee, salary_slip.start_date, salary_slip.end_date)
+                .where(salary_slip.docstatus == 1)
+                .where(salary_slip.employee.isin(pending[start : start + FREQUENCY_CHECK_BATCH_SIZE]))
+                .where(salary_slip.start_date >= earliest_start)
+                .where(salary_slip.end_date <= latest_end)
+                .groupby(salary_slip.employee, salary_slip.start_date, salary_slip.end_date)
+            ).run(as_dict=True)
+
+            for row in rows:
+                block = self.get_block(row.employee)
+                if getdate(block.start_date) <= getdate(row.start_date) and getdate(
+                    row.end_date
+                ) <= getdate(block.end_date):
+                    self._processed.add(row.employee)
+        return self
+
+    def is_processed(self, employee):
+        if employee not in self._loaded:
+            self.preload([employee])
+        return employee in self._processed
+
+
+def get_payroll_frequency_check(doc, employees=None):
+    """Return the request's shared frequency check for ``doc``'s company and dates."""
+    checks = getattr(frappe.local, "za_payroll_frequency_checks", None)
+    if checks is None:
+        checks = frappe.local.za_payroll_frequency_checks = {}
+
+    key = (
+        getattr(doc, "company", None),
+        str(getattr(doc, "start_date", None)),
+        str(getattr(doc, "end_date", None)),
+    )
+    check = checks.get(key)
+    if check is None:
+        check = checks[key] = PayrollFrequencyCheck(doc)
+    if employees:
+        check.preload(employees)
+    return check
+
+
 def get_additional_salaries(employee, from_date, to_date, component_type="earnings"):
     """Return HRMS-selected Additional Salaries for the requested ZA bucket.
 
@@ -0,0 +1,199 @@
+"""Payroll-run year-to-date context.
+
+Every Salary Slip in a Payroll Entry shares the company, payroll period and
+start date, so the submitted year-to-date totals PAYE annualisation needs are
+loaded once for the whole run with grouped queries instead of per slip and per
+earning row. A slip built outside a run falls back to a lazily loaded context
+for its own employee.
+
+Employee dates of birth and active medical scheme benefits, which drive the
+tax rebate and medical tax credit, are prefetched for the run in the same way.
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+import frappe
+from frappe.query_builder.functions import Sum
+from frappe.utils import flt, getdate
+
+from za_local.utils.payroll_utils import get_payroll_period
+
+EMPLOYEE_BATCH_SIZE = 1000
+
+
+class PayrollYTDContext:
+	"""Submitted Salary Detail totals per employee between the period start and ``before_date``."""
+
+	def __init__(self, company, period_start_date, before_date):
+		self.company = company
+		self.period_start_date = getdate(period_start_date)
+		self.before_date = getdate(before_date)
+		self._totals = {}
+
+	def matches(self, company, period_start_date, before_date):
+		return (
+			self.company == company
+			and self.period_start_date == getdate(period_start_date)
+			and self.before_date == getdate(before_date)
+		)
+
+	def preload(self, employees):
+		"""Load totals for every employee not yet in the context with grouped queries."""
+		pending = [employee for employee in dict.fromkeys(employees or []) if employee and employee not in self._totals]
+		for employee in pending:
+			self._totals[employee] = {"earnings": defaultdict(float), "exempt_deductions": defaultdict(float)}
+
+		for start in range(0, len(pending), EMPLOYEE_BATCH_SIZE):
+			for row in self._get_grouped_totals(pending[start : start + EMPLOYEE_BATCH_SIZE]):
+				totals = self._totals[row.employee]
+				if row.parentfield == "earnings":
+					totals["earnings"][row.salary_component] += flt(row.amount)
+				elif row.exempted_from_income_tax:
+					totals["exempt_deductions"][row.salary_component] += flt(row.amount)
+		return self
+
+	def _get_grouped_totals(self, employees):
+		salary_slip = frappe.qb.DocType("Salary Slip")
+		salary_detail = frappe.qb.DocType("Salary Detail")
+		return (
+			frappe.qb.from_(salary_detail)
+			.join(salary_slip)
+			.on(salary_detail.parent == salary_slip.name)
+			.select(
+				salary_slip.employee,
+				salary_detail.parentfield,
+				salary_detail.salary_component,
+				salary_detail.exempted_from_income_tax,
+				Sum(salary_detail.amount).as_("amount"),
+			)
+			.where(salary_detail.parenttype == "Salary Slip")
+			.where(salary_detail.parentfield.isin(["earnings", "deductions"]))
+			.where(salary_slip.docstatus == 1)
+			.where(salary_slip.company == self.company)
+			.where(salary_slip.employee.isin(employees))
+			.where(salary_slip.start_date >= self.period_start_date)
+			.where(salary_slip.end_date < self.before_date)
+			.groupby(
+				salary_slip.employee,
+				salary_detail.parentfield,
+				salary_detail.salary_component,
+				salary_detail.exempted_from_income_tax,
+			)
+		).run(as_dict=True)
+
+	def _get_employee_totals(self, employee):
+		if employee not in self._totals:
+			self.preload([employee])
+		return self._totals[employee]
+
+	def get_earning_total(self, employee, salary_component):
+		"""Return the employee's year-to-date earnings for one component."""
+		return self._get_employee_totals(employee)["earnings"].get(salary_component, 0)
+
+	def get_exempt_deduction_totals(self, employee):
+		"""Return ``{component: amount}`` for deductions exempted from income tax."""
+		return dict(self._get_employee_totals(employee)["exempt_deductions"])
+
+
+class PayrollEmployeeTaxInputs:
+	"""Date of birth and medical scheme benefits for every employee in a run."""
+
+	def __init__(self, end_date):
+		self.end_date = getdate(end_date)
+		self._dates_of_birth = {}
+		self._medical_benefits = {}
+
+	def matches(self, end_date):
+		return self.end_date == getdate(end_date)
+
+	def preload(self, employees):
+		pending = [
+			employee
+			for employee in dict.fromkeys(employees or [])
+			if employee and employee not in self._dates_of_birth
+		]
+		for start in range(0, len(pending), EMPLOYEE_BATCH_SIZE):
+			batch = pending[start : start + EMPLOYEE_BATCH_SIZE]
+			for employee in batch:
+				self._dates_of_birth[employee] = None
+				self._medical_benefits[employee] = []
+
+			for row in frappe.get_all(
+				"Employee",
+				filters={"name": ["in", batch]},
+				fields=["name", "date_of_birth"],
+			):
+				self._dates_of_birth[row.name] = row.date_of_birth
+
+			for row in frappe.get_all(
+				"Employee Private Benefit",
+				filters={
+					"effective_from": ["<=", self.end_date],
+					"disable": 0,
+					"employee": ["in", batch],
+				},
+				fields=[
+					"employee",
+					"private_medical_aid",
+					"medical_aid_dependant",
+					"effective_from",
+					"to",
+				],
+				order_by="effective_from desc",
+			):
+				self._medical_benefits[row.employee].append(row)
+		return self
+
+	def get_date_of_birth(self, employee):
+		if employee not in self._dates_of_birth:
+			self.preload([employee])
+		return self._dates_of_birth[employee]
+
+	def get_medical_benefits(self, employee):
+		"""Return benefits effective by the run end date, newest first."""
+		if employee not in self._medical_benefits:
+			self.preload([employee])
+		return self._medical_benefits[employee]
+
+
+def build_payroll_ytd_context(company, start_date, end_date, employees):
+	"""Return a preloaded context for one payroll run, or None outside a Payroll Period."""
+	payroll_period = get_payroll_period(start_date, end_date, company)
+	if not payroll_period:
+		return None
+	return PayrollYTDContext(company, payroll_period.get("start_date"), start_date).preload(employees)
+
+
+def build_employee_tax_inputs(end_date, employees):
+	return PayrollEmployeeTaxInputs(end_date).preload(employees)
+
+
+def get_active_payroll_ytd_context():
+	return getattr(frappe.local, "za_payroll_ytd_context", None)
+
+
+@contextmanager
+def use_payroll_ytd_context(context):
+	"""Expose ``context`` to every Salary Slip built in this block."""
+	previous = get_active_payroll_ytd_context()
+	frappe.local.za_payroll_ytd_context = context
+	try:
+		yield context
+	finally:
+		frappe.local.za_payroll_ytd_context = previous
+
+
+def get_active_employee_tax_inputs():
+	return getattr(frappe.local, "za_employee_tax_inputs", None)
+
+
+@contextmanager
+def use_employee_tax_inputs(tax_inputs):
+	"""Expose prefetched rebate and medical credit inputs to Salary Slips built in this block."""
+	previous = get_active_employee_tax_inputs()
+	frappe.local.za_employee_tax_inputs = tax_inputs
+	try:
+		yield tax_inputs
+	finally:
+		frappe.local.za_employee_tax_inputs = previous
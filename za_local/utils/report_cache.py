@@ -0,0 +1,96 @@
+"""Result cache for the SA statutory script reports.
+
+The statutory reports are prepared reports, so Frappe runs them in a
+background worker and keeps the full result on the Prepared Report. Small
+results are also kept briefly in the site cache, keyed by the report, the
+user, the user's roles and User Permissions, the filters and a data-version
+fingerprint of the doctypes the report reads. Re-running a month-end report
+whose source rows have not changed returns the cached result without querying
+again. Results above ``REPORT_CACHE_MAX_ROWS`` rows are left to the Prepared
+Report rather than duplicated in Redis.
+
+The fingerprint is the row count and latest ``modified`` of each dependency
+doctype, scoped to the filtered company where the doctype has one. Any insert,
+edit, submit, cancel or delete in that scope changes the fingerprint, so a
+stale result is never served.
+"""
+
+import hashlib
+import json
+
+import frappe
+from frappe.query_builder.functions import Count, Max
+
+REPORT_CACHE_KEY = "za_local:report_result:{0}"
+REPORT_CACHE_TTL = 15 * 60
+REPORT_CACHE_MAX_ROWS = 5000
+
+
+def get_data_fingerprint(dependencies, company=None):
+	"""Return ``[doctype, row count, latest modified]`` for every dependency doctype."""
+	fingerprint = []
+	for doctype in dependencies:
+		table = frappe.qb.DocType(doctype)
+		query = frappe.qb.from_(table).select(Count("*").as_("count"), Max(table.modified).as_("modified"))
+		if company and frappe.get_meta(doctype).has_field("company"):
+			query = query.where(table.company == company)
+		row = query.run(as_dict=True)[0]
+		fingerprint.append([doctype, row.count, str(row.modified)])
+	return fingerprint
+
+
+def get_permission_fingerprint(user=None):
+	"""Return the user's roles and a version of their User Permissions.
+
+	A role or User Permission change produces a new cache key, so a narrowed
+	permission applies on the next run instead of when the entry expires.
+	"""
+	user = user or frappe.session.user
+	user_permission = frappe.qb.DocType("User Permission")
+	row = (
+		frappe.qb.from_(user_permission)
+		.select(Count("*").as_("count"), Max(user_permission.modified).as_("modified"))
+		.where(user_permission.user == user)
+	).run(as_dict=True)[0]
+	return [sorted(frappe.get_roles(user)), row.count, str(row.modified)]
+
+
+def get_report_cache_key(report_name, filters, fingerprint):
+	key_source = json.dumps(
+		[
+			report_name,
+			frappe.session.user,
+			get_permission_fingerprint(),
+			frappe.local.lang,
+			filters,
+			fingerprint,
+		],
+		sort_keys=True,
+		default=str,
+	)
+	return REPORT_CACHE_KEY.format(hashlib.sha256(key_source.encode()).hexdigest())
+
+
+def get_cached_report_result(report_name, filters, dependencies, build):
+	"""Return ``build()`` for the report, reusing the cached result while its source data is unchanged.
+
+	Callers validate filters and permissions before calling this, so a cached
+	result is only ever returned to a user who may run the report.
+	"""
+	filters = dict(filters or {})
+	fingerprint = get_data_fingerprint(dependencies, filters.get("company"))
+	cache_key = get_report_cache_key(report_name, filters, fingerprint)
+
+	result = frappe.cache.get_value(cache_key)
+	if result is not None:
+		return result
+
+	result = build()
+	if _count_result_rows(result) <= REPORT_CACHE_MAX_ROWS:
+		frappe.cache.set_value(cache_key, result, expires_in_sec=REPORT_CACHE_TTL)
+	return result
+
+
+def _count_result_rows(result):
+	data = result[1] if isinstance(result, list | tuple) and len(result) > 1 else None
+	return len(data or [])
@@ -6,13 +6,21 @@ instead of hardcoding amounts in formulas or controller methods.
 """
 
 import json
-from functools import lru_cache
+from bisect import bisect_right
+from collections import defaultdict
+from functools import cache, lru_cache
 
 import frappe
 from frappe.utils import flt, getdate
 
 from za_local.utils.file_utils import resolve_app_path
 
+_MISSING = object()
+
+# Resolved (date, tax year) -> pack lookups kept per index; bounded so a long
+# lived worker resolving many ad-hoc dates cannot grow it without limit.
+DATE_LOOKUP_CACHE_SIZE = 4096
+
 
 @lru_cache(maxsize=1)
 def _load_rate_packs():
@@ -26,8 +34,102 @@ def _load_rate_packs():
 	return tuple(packs)
 
 
+@cache
+def _split_rate_path(path: str) -> tuple:
+	return tuple(path.split("."))
+
+
+class CompiledRatePack:
+	"""One rate pack with parsed effective dates and memoised dotted-path values."""
+
+	__slots__ = ("effective_from", "effective_to", "eti_periods", "pack", "values")
+
+	def __init__(self, pack):
+		self.pack = pack
+		self.effective_from = getdate(pack.get("effective_from"))
+		self.effective_to = getdate(pack.get("effective_to"))
+		self.values = {}
+		eti = pack.get("eti") or {}
+		self.eti_periods = [
+			(getdate(period.get("effective_from")), getdate(period.get("effective_to")), {**eti, **period})
+			for period in eti.get("rate_periods") or []
+		]
+
+	def get_value(self, path: str):
+		"""Return the value at a dotted path, or ``_MISSING`` when not configured."""
+		if path in self.values:
+			return self.values[path]
+
+		value = self.pack
+		for part in _split_rate_path(path):
+			if not isinstance(value, dict) or part not in value:
+				value = _MISSING
+				break
+			value = value[part]
+		self.values[path] = value
+		return value
+
+	def get_eti_terms(self, date_value):
+		"""Return the ETI section merged with the rate period covering ``date_value``."""
+		for start, end, terms in self.eti_periods:
+			if start <= date_value <= end:
+				return terms
+		return self.pack.get("eti") or {}
+
+
+class RatePackIndex:
+	"""Active rate packs grouped by tax year and sorted by effective date.
+
+	Lookups bisect the pre-parsed ``effective_from`` dates of a tax year instead
+	of scanning and re-parsing every pack on each call.
+	"""
+
+	def __init__(self, packs):
+		grouped = defaultdict(list)
+		for pack in packs:
+			grouped[pack.get("tax_year")].append(CompiledRatePack(pack))
+
+		self._packs = {}
+		self._starts = {}
+		for tax_year, compiled in grouped.items():
+			compiled.sort(key=lambda entry: entry.effective_from)
+			self._packs[tax_year] = compiled
+			self._starts[tax_year] = [entry.effective_from for entry in compiled]
+		self._lookups = {}
+
+	def find(self, date_value, tax_year: str | None = None) -> CompiledRatePack | None:
+		key = (date_value, tax_year)
+		if date_value and key in self._lookups:
+			return self._lookups[key]
+
+		if tax_year is None:
+			tax_year = get_tax_year_for_date(date_value)
+		calculation_date = getdate(date_value or f"{tax_year.split('-')[0]}-03-01")
+
+		entry = None
+		starts = self._starts.get(tax_year)
+		if starts:
+			position = bisect_right(starts, calculation_date) - 1
+			if position >= 0:
+				candidate = self._packs[tax_year][position]
+				if calculation_date <= candidate.effective_to:
+					entry = candidate
+
+		if date_value:
+			if len(self._lookups) >= DATE_LOOKUP_CACHE_SIZE:
+				self._lookups.clear()
+			self._lookups[key] = entry
+		return entry
+
+
+@lru_cache(maxsize=1)
+def get_rate_pack_index() -> RatePackIndex:
+	return RatePackIndex(_load_rate_packs())
+
+
 def clear_rate_pack_cache():
 	_load_rate_packs.cache_clear()
+	get_rate_pack_index.cache_clear()
 
 
 def get_tax_year_for_date(date_value) -> str:
@@ -38,9 +140,19 @@ def get_tax_year_for_date(date_value) -> str:
 
 def get_rate_pack(date_value=None, tax_year: str | None = None) -> dict:
 	"""Return the active statutory pack for a date or tax year."""
-	pack = find_rate_pack(date_value, tax_year)
-	if pack:
-		return pack
+	return _get_compiled_rate_pack(date_value, tax_year).pack
+
+
+def find_rate_pack(date_value=None, tax_year: str | None = None) -> dict | None:
+	"""Return a matching rate pack without raising when one has not shipped yet."""
+	entry = get_rate_pack_index().find(date_value, tax_year)
+	return entry.pack if entry else None
+
+
+def _get_compiled_rate_pack(date_value=None, tax_year: str | None = None) -> CompiledRatePack:
+	entry = get_rate_pack_index().find(date_value, tax_year)
+	if entry:
+		return entry
 
 	tax_year = tax_year or get_tax_year_for_date(date_value)
 	frappe.throw(
@@ -49,33 +161,15 @@ def get_rate_pack(date_value=None, tax_year: str | None = None) -> dict:
 	)
 
 
-def find_rate_pack(date_value=None, tax_year: str | None = None) -> dict | None:
-	"""Return a matching rate pack without raising when one has not shipped yet."""
-	if tax_year is None:
-		tax_year = get_tax_year_for_date(date_value)
-	date_value = getdate(date_value or f"{tax_year.split('-')[0]}-03-01")
-
-	for pack in _load_rate_packs():
-		if pack.get("tax_year") != tax_year:
-			continue
-		start = getdate(pack.get("effective_from"))
-		end = getdate(pack.get("effective_to"))
-		if start <= date_value <= end:
-			return pack
-	return None
-
-
 def get_nested_rate(path: str, date_value=None, default=None):
-	value = get_rate_pack(date_value)
-	for part in path.split("."):
-		if not isinstance(value, dict) or part not in value:
-			if default is not None:
-				return default
-			frappe.throw(
-				frappe._("South African statutory rate '{0}' is not configured.").format(path),
-				title=frappe._("Missing Statutory Rate"),
-			)
-		value = value[part]
+	value = _get_compiled_rate_pack(date_value).get_value(path)
+	if value is _MISSING:
+		if default is not None:
+			return default
+		frappe.throw(
+			frappe._("South African statutory rate '{0}' is not configured.").format(path),
+			title=frappe._("Missing Statutory Rate"),
+		)
 	return value
 
 
@@ -104,12 +198,8 @@ def calculate_lump_sum_benefit_tax(amount, date_value=None, previous_lump_sums=0
 
 
 def calculate_eti_from_pack(monthly_remuneration, months_employed, date_value=None, hours_per_month=None):
-	eti = get_rate_pack(date_value).get("eti") or {}
 	calculation_date = getdate(date_value or frappe.utils.today())
-	for period in eti.get("rate_periods") or []:
-		if getdate(period.get("effective_from")) <= calculation_date <= getdate(period.get("effective_to")):
-			eti = {**eti, **period}
-			break
+	eti = _get_compiled_rate_pack(date_value).get_eti_terms(calculation_date)
 
 	if months_employed <= 0 or months_employed > 24:
 		return 0
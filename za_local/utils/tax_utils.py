@@ -87,6 +87,12 @@ def get_current_tax_slab(date_value=None, company=None):
 	return None
 
 
+TAX_RATE_CACHE_KEY = "za_local:tax_rebate_and_medical_credit_rates"
+
+REBATE_RATE_FIELDS = ("payroll_period", "primary", "secondary", "tertiary")
+MEDICAL_CREDIT_RATE_FIELDS = ("payroll_period", "one_dependant", "two_dependant", "additional_dependant")
+
+
 def _get_payroll_period_name(salary_slip):
 	date_value = getdate(salary_slip.end_date)
 	company = getattr(salary_slip, "company", None)
@@ -96,21 +102,28 @@ def _get_payroll_period_name(salary_slip):
 			title=frappe._("Missing Company"),
 		)
 
-	period = frappe.db.get_value(
-		"Payroll Period",
-		{
-			"company": company,
-			"start_date": ["<=", date_value],
-			"end_date": [">=", date_value],
-		},
-		"name",
-		order_by="start_date desc",
-	)
+	# Payroll Periods are resolved once per request for each (company, date).
+	periods = getattr(frappe.local, "za_tax_payroll_periods", None)
+	if periods is None:
+		periods = frappe.local.za_tax_payroll_periods = {}
+	period = periods.get((company, date_value))
+	if not period:
+		period = frappe.db.get_value(
+			"Payroll Period",
+			{
+				"company": company,
+				"start_date": ["<=", date_value],
+				"end_date": [">=", date_value],
+			},
+			"name",
+			order_by="start_date desc",
+		)
 	if not period:
 		frappe.throw(
 			frappe._("No Payroll Period covers {0} for company {1}.").format(date_value, company),
 			title=frappe._("Missing Payroll Period"),
 		)
+	periods[(company, date_value)] = period
 	return period
 
 
@@ -124,6 +137,48 @@ def _get_statutory_rate_row(rows, payroll_period, rate_label):
 	)
 
 
+def _get_period_rate_rows(rows, payroll_period, fields):
+	return [
+		frappe._dict({field: row.get(field) for field in fields})
+		for row in rows or []
+		if row.get("payroll_period") == payroll_period
+	]
+
+
+def get_statutory_tax_credit_rates(salary_slip):
+	"""
+	Return the rebate and medical credit rows for the slip's company payroll period.
+
+	Rows are cached per (company, payroll period) in the site cache, so bulk
+	payroll does not load the Single for every slip. The cache is cleared by
+	``clear_tax_credit_rate_cache`` when the Single is saved.
+	"""
+	company = getattr(salary_slip, "company", None)
+	payroll_period = _get_payroll_period_name(salary_slip)
+	cache_key = f"{company}::{payroll_period}"
+
+	rates = frappe.cache.hget(TAX_RATE_CACHE_KEY, cache_key)
+	if rates is None:
+		settings = frappe.get_single("Tax Rebates and Medical Tax Credit")
+		rates = frappe._dict(
+			payroll_period=payroll_period,
+			rebates_configured=bool(settings.tax_rebates_rate),
+			tax_rebates_rate=_get_period_rate_rows(settings.tax_rebates_rate, payroll_period, REBATE_RATE_FIELDS),
+			medical_credits_configured=bool(settings.medical_tax_credit),
+			medical_tax_credit=_get_period_rate_rows(
+				settings.medical_tax_credit, payroll_period, MEDICAL_CREDIT_RATE_FIELDS
+			),
+		)
+		frappe.cache.hset(TAX_RATE_CACHE_KEY, cache_key, rates)
+	return rates
+
+
+def clear_tax_credit_rate_cache(doc=None, method=None):
+	"""Drop cached rebate/medical credit rows (Tax Rebates and Medical Tax Credit on_update)."""
+	frappe.cache.delete_value(TAX_RATE_CACHE_KEY)
+	frappe.local.za_tax_payroll_periods = None
+
+
 def get_tax_rebate(salary_slip, date_of_birth):
 	"""
 	Calculate tax rebates based on employee age.
@@ -143,9 +198,8 @@ def get_tax_rebate(salary_slip, date_of_birth):
 	if not date_of_birth:
 		return 0
 
-	# Get tax rebate settings
-	rebate_settings = frappe.get_single("Tax Rebates and Medical Tax Credit")
-	if not rebate_settings.tax_rebates_rate:
+	rates = get_statutory_tax_credit_rates(salary_slip)
+	if not rates.rebates_configured:
 		frappe.throw(
 			frappe._("Tax rebate rates are not configured."),
 			title=frappe._("Missing Tax Rebate Rates"),
@@ -162,8 +216,8 @@ def get_tax_rebate(salary_slip, date_of_birth):
 		age -= 1
 
 	rebate = _get_statutory_rate_row(
-		rebate_settings.tax_rebates_rate,
-		_get_payroll_period_name(salary_slip),
+		rates.tax_rebates_rate,
+		rates.payroll_period,
 		frappe._("tax rebate"),
 	)
 	total_rebate = flt(rebate.primary)
@@ -201,17 +255,16 @@ def get_medical_aid_credit(
 	if number_of_dependants < 0:
 		return 0
 
-	# Get medical aid credit settings
-	credit_settings = frappe.get_single("Tax Rebates and Medical Tax Credit")
-	if not credit_settings.medical_tax_credit:
+	rates = get_statutory_tax_credit_rates(salary_slip)
+	if not rates.medical_credits_configured:
 		frappe.throw(
 			frappe._("Medical tax credit rates are not configured."),
 			title=frappe._("Missing Medical Tax Credit Rates"),
 		)
 
 	credit = _get_statutory_rate_row(
-		credit_settings.medical_tax_credit,
-		_get_payroll_period_name(salary_slip),
+		rates.medical_tax_credit,
+		rates.payroll_period,
 		frappe._("medical tax credit"),
 	)
 	monthly_credit = flt(credit.one_dependant)